@@ -108,6 +108,35 @@ class TopN(object):
     self._data = []
 
 
+def _top_k_indices(values, k):
+  """Returns the column indices of the k largest values in every row.
+
+  Args:
+    values: A numpy array of shape [num_rows, num_columns].
+    k: The number of indices to return per row, at most num_columns.
+
+  Returns:
+    A numpy array of shape [num_rows, k] holding, for every row, the indices of
+    the k largest values in descending order of value.
+  """
+  num_rows, num_columns = values.shape
+  rows = np.arange(num_rows)[:, np.newaxis]
+  if k < num_columns:
+    # Find the k-th largest value of every row, then break the ties at that
+    # value in favor of the smallest indices, like a stable sort.
+    kth = np.argpartition(-values, k - 1, axis=1)[:, k - 1]
+    threshold = values[np.arange(num_rows), kth][:, np.newaxis]
+    greater = values > threshold
+    equal = values == threshold
+    num_equal = k - greater.sum(axis=1, keepdims=True)
+    selected = greater | (equal & (np.cumsum(equal, axis=1) <= num_equal))
+    indices = np.nonzero(selected)[1].reshape(num_rows, k)
+  else:
+    indices = np.tile(np.arange(num_columns), [num_rows, 1])
+  order = np.argsort(-values[rows, indices], axis=1, kind="mergesort")
+  return indices[rows, order]
+
+
 class CaptionGenerator(object):
   """Class to generate captions from an image-to-text model."""
 
@@ -122,7 +151,8 @@ class CaptionGenerator(object):
     Args:
       model: Object encapsulating a trained image-to-text model. Must have
         methods feed_image() and inference_step(). For example, an instance of
-        InferenceWrapperBase.
+        InferenceWrapperBase. beam_search_batch() additionally requires
+        feed_image() to accept a list of encoded images.
       vocab: A Vocabulary object.
       beam_size: Beam size to use when generating captions.
       max_caption_length: The maximum caption length before stopping the search.
@@ -209,3 +239,149 @@ class CaptionGenerator(object):
       complete_captions = partial_captions
 
     return complete_captions.extract(sort=True)
+
+  def beam_search_batch(self, sess, encoded_images):
+    """Runs beam search caption generation on a batch of images.
+
+    Generates the same captions as beam_search() on every image, but feeds all
+    images at once and keeps the beams of the batch in numpy arrays of shape
+    [batch_size, beam_size], so that every step runs a single inference_step()
+    over the partial captions of all images. Metadata returned by
+    inference_step() is not recorded.
+
+    Args:
+      sess: TensorFlow Session object.
+      encoded_images: A list of encoded image strings.
+
+    Returns:
+      A list with, for every image, a list of Caption sorted by descending
+      score.
+    """
+    batch_size = len(encoded_images)
+    beam_size = self.beam_size
+    max_length = self.max_caption_length
+
+    # Feed in the images to get the initial states.
+    initial_states = self.model.feed_image(sess, encoded_images)
+    state_size = initial_states.shape[1]
+
+    # The partial captions, with a log-probability of -inf for empty beams. At
+    # the start of every step all partial captions have the same length.
+    sentences = np.zeros([batch_size, beam_size, max_length], dtype=np.int64)
+    sentences[:, :, 0] = self.vocab.start_id
+    logprobs = np.full([batch_size, beam_size], -np.inf)
+    logprobs[:, 0] = 0.0
+    states = np.zeros([batch_size, beam_size, state_size],
+                      dtype=initial_states.dtype)
+    states[:, 0] = initial_states
+    length = 1
+
+    # The complete captions, with a score of -inf for empty slots.
+    complete_sentences = np.zeros_like(sentences)
+    complete_lengths = np.zeros([batch_size, beam_size], dtype=np.int64)
+    complete_logprobs = np.full([batch_size, beam_size], -np.inf)
+    complete_scores = np.full([batch_size, beam_size], -np.inf)
+    complete_states = np.zeros_like(states)
+
+    batch_index = np.arange(batch_size)[:, np.newaxis]
+
+    # Run beam search.
+    for _ in range(max_length - 1):
+      # Only the partial captions are fed; the search of an image ends when
+      # it has run out of partial captions.
+      rows = np.flatnonzero(np.isfinite(logprobs))
+      if not rows.size:
+        break
+      input_feed = sentences[:, :, length - 1].reshape(-1)[rows]
+      state_feed = states.reshape(-1, state_size)[rows]
+
+      softmax, new_states, _ = self.model.inference_step(sess, input_feed,
+                                                         state_feed)
+
+      # For every partial caption, get the beam_size most probable next words.
+      num_words = min(beam_size, softmax.shape[1])
+      row_words = _top_k_indices(softmax, num_words)
+      row_probs = softmax[np.arange(rows.size)[:, np.newaxis], row_words]
+      valid = row_probs >= 1e-12  # Avoid log(0).
+      row_logprobs = np.where(
+          valid, np.log(np.where(valid, row_probs, 1.0)), -np.inf)
+
+      # Each next word gives a candidate caption. The candidates of an image
+      # are indexed by parent beam * num_words + word rank.
+      words = np.zeros([batch_size * beam_size, num_words], dtype=np.int64)
+      words[rows] = row_words
+      candidate_logprobs = np.full([batch_size * beam_size, num_words],
+                                   -np.inf)
+      candidate_logprobs[rows] = (logprobs.reshape(-1)[rows, np.newaxis] +
+                                  row_logprobs)
+      step_states = np.zeros([batch_size * beam_size, state_size],
+                             dtype=states.dtype)
+      step_states[rows] = new_states
+
+      words = words.reshape(batch_size, -1)
+      candidate_logprobs = candidate_logprobs.reshape(batch_size, -1)
+      step_states = step_states.reshape(batch_size, beam_size, state_size)
+      parents = np.arange(beam_size * num_words) // num_words
+      is_end = words == self.vocab.end_id
+
+      # Merge the candidates ending with the end word into the complete
+      # captions, keeping the beam_size highest scores.
+      end_scores = np.where(is_end, candidate_logprobs, -np.inf)
+      if self.length_normalization_factor > 0:
+        end_scores /= (length + 1)**self.length_normalization_factor
+      keep = _top_k_indices(np.hstack([complete_scores, end_scores]),
+                            beam_size)
+      from_candidates = keep >= beam_size
+      candidates = np.maximum(keep - beam_size, 0)
+      slots = np.minimum(keep, beam_size - 1)
+      new_sentences = sentences[batch_index, parents[candidates]]
+      new_sentences[:, :, length] = words[batch_index, candidates]
+      complete_sentences = np.where(
+          from_candidates[:, :, np.newaxis], new_sentences,
+          complete_sentences[batch_index, slots])
+      complete_lengths = np.where(from_candidates, length + 1,
+                                  complete_lengths[batch_index, slots])
+      complete_logprobs = np.where(
+          from_candidates, candidate_logprobs[batch_index, candidates],
+          complete_logprobs[batch_index, slots])
+      complete_scores = np.where(from_candidates,
+                                 end_scores[batch_index, candidates],
+                                 complete_scores[batch_index, slots])
+      complete_states = np.where(
+          from_candidates[:, :, np.newaxis],
+          step_states[batch_index, parents[candidates]],
+          complete_states[batch_index, slots])
+
+      # The other candidates with the beam_size highest log-probabilities are
+      # the next partial captions.
+      partial_logprobs = np.where(is_end, -np.inf, candidate_logprobs)
+      keep = _top_k_indices(partial_logprobs, beam_size)
+      sentences = sentences[batch_index, parents[keep]]
+      sentences[:, :, length] = words[batch_index, keep]
+      logprobs = partial_logprobs[batch_index, keep]
+      states = step_states[batch_index, parents[keep]]
+      length += 1
+
+    # As in beam_search(), fall back to the partial captions of the images
+    # without complete captions.
+    captions = []
+    for b in range(batch_size):
+      image_captions = []
+      if np.isfinite(complete_scores[b, 0]):
+        for i in np.flatnonzero(np.isfinite(complete_scores[b])):
+          sentence = complete_sentences[b, i, :complete_lengths[b, i]]
+          image_captions.append(Caption(
+              sentence=sentence.tolist(),
+              state=complete_states[b, i],
+              logprob=float(complete_logprobs[b, i]),
+              score=float(complete_scores[b, i])))
+      else:
+        for i in np.flatnonzero(np.isfinite(logprobs[b])):
+          image_captions.append(Caption(
+              sentence=sentences[b, i, :length].tolist(),
+              state=states[b, i],
+              logprob=float(logprobs[b, i]),
+              score=float(logprobs[b, i])))
+      captions.append(image_captions)
+
+    return captions
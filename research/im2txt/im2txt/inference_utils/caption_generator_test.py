@@ -32,6 +32,13 @@ class FakeVocab(object):
     self.end_id = 1  # Word id denoting sentence end.
 
 
+def shift_word_id(word_id, shift):
+  """Shifts the word ids other than the sentence start and end ids."""
+  if word_id < 2:
+    return word_id
+  return 2 + (word_id - 2 + shift) % 10
+
+
 class FakeModel(object):
   """Fake model for testing purposes."""
 
@@ -69,19 +76,27 @@ class FakeModel(object):
   # pylint: disable=unused-argument
 
   def feed_image(self, sess, encoded_image):
-    # Return a nominal model state.
-    return np.zeros([1, self._state_size])
+    # The model state of an image is its encoding, an integer shift of the
+    # word ids, or 0 if the image is None.
+    if isinstance(encoded_image, list):
+      return np.array([[image or 0] for image in encoded_image],
+                      dtype=np.float64)
+    return np.array([[encoded_image or 0]], dtype=np.float64)
 
   def inference_step(self, sess, input_feed, state_feed):
     # Compute the matrix of softmax distributions for the next batch of words.
     batch_size = input_feed.shape[0]
     softmax_output = np.zeros([batch_size, self._vocab_size])
-    for batch_index, word_id in enumerate(input_feed):
-      for next_word, probability in self._probabilities[word_id].items():
-        softmax_output[batch_index, next_word] = probability
-
-    # Nominal state and metadata.
-    new_state = np.zeros([batch_size, self._state_size])
+    for batch_index, (word_id, state) in enumerate(zip(input_feed,
+                                                       state_feed)):
+      shift = int(state[0])
+      for next_word, probability in self._probabilities[
+          shift_word_id(word_id, -shift)].items():
+        softmax_output[batch_index,
+                       shift_word_id(next_word, shift)] = probability
+
+    # The state keeps the shift of the image, and nominal metadata.
+    new_state = np.array(state_feed)
     metadata = None
 
     return softmax_output, new_state, metadata
@@ -101,9 +116,9 @@ class CaptionGeneratorTest(tf.test.TestCase):
     Args:
       expected_captions: A sequence of pairs (sentence, probability), where
         sentence is a list of integer ids and probability is a float in [0, 1].
-      beam_size: Parameter passed to beam_search().
-      max_caption_length: Parameter passed to beam_search().
-      length_normalization_factor: Parameter passed to beam_search().
+      beam_size: Parameter passed to CaptionGenerator.
+      max_caption_length: Parameter passed to CaptionGenerator.
+      length_normalization_factor: Parameter passed to CaptionGenerator.
     """
     expected_sentences = [c[0] for c in expected_captions]
     expected_probabilities = [c[1] for c in expected_captions]
@@ -123,6 +138,21 @@ class CaptionGeneratorTest(tf.test.TestCase):
     self.assertEqual(expected_sentences, actual_sentences)
     self.assertAllClose(expected_probabilities, actual_probabilities)
 
+    # Generate the captions of a batch of distinct images, whose captions are
+    # the expected captions with shifted word ids.
+    shifts = [0, 3, 7]
+    batch_captions = generator.beam_search_batch(sess=None,
+                                                 encoded_images=shifts)
+    self.assertEqual(len(shifts), len(batch_captions))
+    for shift, actual_captions in zip(shifts, batch_captions):
+      actual_sentences = [c.sentence for c in actual_captions]
+      actual_probabilities = [math.exp(c.logprob) for c in actual_captions]
+
+      self.assertEqual(
+          [[shift_word_id(w, shift) for w in s] for s in expected_sentences],
+          actual_sentences)
+      self.assertAllClose(expected_probabilities, actual_probabilities)
+
   def testBeamSize(self):
     # Beam size = 1.
     expected = [([0, 4, 10, 1], 0.16)]
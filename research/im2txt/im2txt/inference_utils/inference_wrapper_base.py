@@ -24,7 +24,9 @@ Subclasses must implement the following methods:
     is a numpy array whose specifics are defined by the subclass, e.g.
     concatenated LSTM state. It's assumed that feed_image() will be called
     precisely once at the start of inference for each image. Subclasses may
-    compute and/or save per-image internal context in this method.
+    compute and/or save per-image internal context in this method. Subclasses
+    may also accept a list of encoded images, returning a batch of initial
+    states, for batched caption generation.
 
   inference_step():
     Takes a batch of inputs and states at a single time-step. Returns the
@@ -154,10 +156,12 @@ class InferenceWrapperBase(object):
 
     Args:
       sess: TensorFlow Session object.
-      encoded_image: An encoded image string.
+      encoded_image: An encoded image string, or optionally a list of
+        encoded image strings.
 
     Returns:
-      state: A numpy array of shape [1, state_size].
+      state: A numpy array of shape [1, state_size], or
+        [len(encoded_image), state_size] for a list of images.
     """
     tf.logging.fatal("Please implement feed_image in subclass")
 
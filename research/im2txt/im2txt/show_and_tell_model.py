@@ -129,13 +129,16 @@ class ShowAndTellModel(object):
     """
     if self.mode == "inference":
       # In inference mode, images and inputs are fed via placeholders.
-      image_feed = tf.placeholder(dtype=tf.string, shape=[], name="image_feed")
+      # The image feed is either a single encoded image or a batch of them.
+      image_feed = tf.placeholder(dtype=tf.string, shape=None,
+                                  name="image_feed")
       input_feed = tf.placeholder(dtype=tf.int64,
                                   shape=[None],  # batch_size
                                   name="input_feed")
 
-      # Process image and insert batch dimensions.
-      images = tf.expand_dims(self.process_image(image_feed), 0)
+      # Process the images and insert the batch dimension of the inputs.
+      images = tf.map_fn(self.process_image, tf.reshape(image_feed, [-1]),
+                         dtype=tf.float32, back_prop=False)
       input_seqs = tf.expand_dims(input_feed, 1)
 
       # No target sequences or input mask in inference mode.
@@ -254,8 +257,11 @@ class ShowAndTellModel(object):
 
     with tf.variable_scope("lstm", initializer=self.initializer) as lstm_scope:
       # Feed the image embeddings to set the initial LSTM state.
-      zero_state = lstm_cell.zero_state(
-          batch_size=self.image_embeddings.get_shape()[0], dtype=tf.float32)
+      batch_size = self.image_embeddings.get_shape()[0].value
+      if batch_size is None:
+        # In inference mode, the number of fed images is only known at run time.
+        batch_size = tf.shape(self.image_embeddings)[0]
+      zero_state = lstm_cell.zero_state(batch_size=batch_size, dtype=tf.float32)
       _, initial_state = lstm_cell(self.image_embeddings, zero_state)
 
       # Allow the LSTM variables to be reused.
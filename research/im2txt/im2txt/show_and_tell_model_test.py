@@ -182,6 +182,17 @@ class ShowAndTellModelTest(tf.test.TestCase):
     }
     self._checkOutputs(expected_shapes, feed_dict)
 
+    # Test feeding a batch of images to get a batch of initial LSTM states.
+    images_feed = np.random.rand(2, 299, 299, 3)
+    feed_dict = {model.images: images_feed}
+    expected_shapes = {
+        # [batch_size, embedding_size]
+        model.image_embeddings: (2, 512),
+        # [batch_size, 2 * num_lstm_units]
+        "lstm/initial_state:0": (2, 1024),
+    }
+    self._checkOutputs(expected_shapes, feed_dict)
+
     # Test feeding a batch of inputs and LSTM states to get softmax output and
     # LSTM states.
     input_feed = np.random.randint(0, 10, size=3)
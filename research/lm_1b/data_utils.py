@@ -15,6 +15,8 @@
 
 """A library for loading 1B word benchmark dataset."""
 
+import hashlib
+import os
 import random
 
 import numpy as np
@@ -214,22 +216,114 @@ def get_batch(generator, batch_size, num_steps, max_word_length, pad=False):
     yield inputs, char_inputs, global_word_ids, targets, weights
 
 
+# Arrays of a shard cache, written in this order. The sentence offsets are
+# written last and mark the cache complete.
+SHARD_CACHE_ARRAYS = ('word_ids', 'char_rows', 'extra_chars', 'offsets')
+
+
+def vocab_hash(vocab):
+  """Returns a hash of the words and the max word length of a vocabulary."""
+  md5 = hashlib.md5()
+  md5.update(tf.compat.as_bytes('%d\n' % vocab.max_word_length))
+  for cur_id in range(vocab.size):
+    md5.update(tf.compat.as_bytes(vocab.id_to_word(cur_id) + '\n'))
+  return md5.hexdigest()
+
+
+def shard_hash(shard_name):
+  """Returns a hash of the full path, the size and the mtime of a shard."""
+  if '://' not in shard_name:
+    shard_name = os.path.abspath(shard_name)
+  stat = tf.gfile.Stat(shard_name)
+  return hashlib.md5(tf.compat.as_bytes('%s\n%d\n%d\n' % (
+      shard_name, stat.length, stat.mtime_nsec))).hexdigest()
+
+
+def build_shard_cache(shard_name, vocab, cache_prefix):
+  """Converts a text shard to memory mappable arrays of word and char ids.
+
+  The cache holds the following arrays, saved as <cache_prefix>.<name>.npy:
+
+    word_ids: [num_tokens] int32 word ids of all sentences, each sentence with
+      its <S> and </S> ids, as returned by vocab.encode.
+    char_rows: [num_tokens] int32 rows of the char ids of the tokens. A row r
+      >= 0 is vocab.word_char_ids[r], a row r < 0 is extra_chars[-r - 1].
+    extra_chars: [2 + num_oov_words, max_word_length] int32 char ids of the
+      sentence begin and end symbols and of the out of vocabulary words.
+    offsets: [num_sentences + 1] int64 start of every sentence in word_ids.
+
+  Args:
+    shard_name: file path.
+    vocab: CharsVocabulary.
+    cache_prefix: local path prefix of the cache files.
+  """
+  tf.logging.info('Caching data from: %s', shard_name)
+  with tf.gfile.Open(shard_name) as f:
+    sentences = f.readlines()
+
+  word_ids = []
+  char_rows = []
+  offsets = [0]
+  extra_chars = [vocab.bos_chars, vocab.eos_chars]
+  extra_rows = {}
+  for sentence in sentences:
+    words = sentence.split()
+    ids = vocab.encode(sentence)
+    rows = [-1]
+    for word, word_id in zip(words, ids[1:-1]):
+      if word_id != vocab.unk:
+        rows.append(word_id)
+      else:
+        if word not in extra_rows:
+          extra_rows[word] = -len(extra_chars) - 1
+          extra_chars.append(vocab.word_to_char_ids(word))
+        rows.append(extra_rows[word])
+    rows.append(-2)
+    word_ids.append(ids)
+    char_rows.append(rows)
+    offsets.append(offsets[-1] + len(ids))
+
+  arrays = {
+      'word_ids': np.concatenate(word_ids + [[]]).astype(np.int32),
+      'char_rows': np.concatenate(char_rows + [[]]).astype(np.int32),
+      'extra_chars': np.vstack(extra_chars).astype(np.int32),
+      'offsets': np.array(offsets, dtype=np.int64),
+  }
+  for name in SHARD_CACHE_ARRAYS:
+    filename = '%s.%s.npy' % (cache_prefix, name)
+    with open(filename + '.incomplete', 'wb') as f:
+      np.save(f, arrays[name])
+    os.rename(filename + '.incomplete', filename)
+  tf.logging.info('Cached %d sentences to %s', len(sentences), cache_prefix)
+
+
 class LM1BDataset(object):
   """Utility class for 1B word benchmark dataset.
 
-  The current implementation reads the data from the tokenized text files.
+  The current implementation reads the data from the tokenized text files. With
+  a cache directory, every shard is converted once to arrays of word and char
+  ids (see build_shard_cache), which are then memory mapped instead of
+  tokenizing the shard again whenever it is loaded. The cache files are named
+  after the hash of the vocabulary, so that a different vocabulary does not
+  reuse them.
   """
 
-  def __init__(self, filepattern, vocab):
+  def __init__(self, filepattern, vocab, cache_dir=None):
     """Initialize LM1BDataset reader.
 
     Args:
       filepattern: Dataset file pattern.
       vocab: Vocabulary.
+      cache_dir: Optional local directory of the shard caches.
     """
     self._vocab = vocab
     self._all_shards = tf.gfile.Glob(filepattern)
     tf.logging.info('Found %d shards at %s', len(self._all_shards), filepattern)
+    self._cache_dir = cache_dir
+    if cache_dir:
+      if not os.path.exists(cache_dir):
+        os.makedirs(cache_dir)
+      self._vocab_hash = vocab_hash(vocab)
 
   def _load_random_shard(self):
     """Randomly select a file and read it."""
@@ -244,6 +338,9 @@ class LM1BDataset(object):
     Returns:
       list of (id, char_id, global_word_id) tuples.
     """
+    if self._cache_dir:
+      return self._load_cached_shard(shard_name)
+
     tf.logging.info('Loading data from: %s', shard_name)
     with tf.gfile.Open(shard_name) as f:
       sentences = f.readlines()
@@ -262,6 +359,49 @@ class LM1BDataset(object):
     tf.logging.info('Finished loading')
     return zip(ids, chars_ids, global_word_ids)
 
+  def _load_cached_shard(self, shard_name):
+    """Memory map the cache of one file, building it if missing.
+
+    Args:
+      shard_name: file path.
+
+    Returns:
+      generator of (id, char_id, global_word_id) tuples.
+    """
+    # Files with the same name in different directories, and files modified
+    # since their cache was built, get different caches.
+    cache_prefix = os.path.join(
+        self._cache_dir,
+        '%s.%s.%s' % (os.path.basename(shard_name),
+                      shard_hash(shard_name)[:16], self._vocab_hash[:16]))
+    if not os.path.exists('%s.offsets.npy' % cache_prefix):
+      build_shard_cache(shard_name, self.vocab, cache_prefix)
+
+    tf.logging.info('Loading cached data from: %s', cache_prefix)
+    arrays = dict((name, np.load('%s.%s.npy' % (cache_prefix, name),
+                                 mmap_mode='r'))
+                  for name in SHARD_CACHE_ARRAYS)
+    word_ids = arrays['word_ids']
+    char_rows = arrays['char_rows']
+    extra_chars = np.array(arrays['extra_chars'])
+    offsets = arrays['offsets']
+    word_char_ids = self.vocab.word_char_ids
+    tf.logging.info('Loaded %d words.', len(word_ids) - len(offsets) + 1)
+
+    def _sentences():
+      for i in range(len(offsets) - 1):
+        start, end = offsets[i], offsets[i + 1]
+        rows = char_rows[start:end]
+        chars_ids = word_char_ids[np.maximum(rows, 0)]
+        extra = rows < 0
+        chars_ids[extra] = extra_chars[-rows[extra] - 1]
+        # Every sentence adds its words without <BOS> to the global word ids.
+        global_start = start - i
+        yield (word_ids[start:end], chars_ids,
+               np.arange(global_start, global_start + end - start - 1))
+
+    return _sentences()
+
   def _get_sentence(self, forever=True):
     while True:
       ids = self._load_random_shard()
@@ -15,8 +15,10 @@
 
 """Eval pre-trained 1 billion word language model.
 """
+from multiprocessing.pool import ThreadPool
 import os
 import sys
+import time
 
 import numpy as np
 from six.moves import xrange
@@ -28,7 +30,8 @@ import data_utils
 FLAGS = tf.flags.FLAGS
 # General flags.
 tf.flags.DEFINE_string('mode', 'eval',
-                       'One of [sample, eval, dump_emb, dump_lstm_emb]. '
+                       'One of [sample, eval, dump_emb, dump_lstm_emb, '
+                       'dump_lstm_emb_file]. '
                        '"sample" mode samples future word predictions, using '
                        'FLAGS.prefix as prefix (prefix could be left empty). '
                        '"eval" mode calculates perplexity of the '
@@ -38,7 +41,9 @@ tf.flags.DEFINE_string('mode', 'eval',
                        'order as words in vocabulary. All words in vocabulary '
                        'are dumped.'
                        'dump_lstm_emb dumps lstm embeddings of FLAGS.sentence '
-                       'to FLAGS.save_dir.')
+                       'to FLAGS.save_dir. '
+                       'dump_lstm_emb_file dumps lstm embeddings of all '
+                       'sentences of FLAGS.sentences_file to FLAGS.save_dir.')
 tf.flags.DEFINE_string('pbtxt', '',
                        'GraphDef proto text file used to construct model '
                        'structure.')
@@ -47,6 +52,15 @@ tf.flags.DEFINE_string('ckpt', '',
 tf.flags.DEFINE_string('vocab_file', '', 'Vocabulary file.')
 tf.flags.DEFINE_string('save_dir', '',
                        'Used for "dump_emb" mode to save word embeddings.')
+tf.flags.DEFINE_integer('num_sessions', 1,
+                        'Number of sessions run in parallel threads, each '
+                        'with its own LSTM state. "eval" mode evaluates that '
+                        'many independent sentence streams at once, "sample" '
+                        'mode generates that many samples at once and '
+                        '"dump_lstm_emb_file" mode embeds that many sentences '
+                        'at once. Every session restores its own copy of all '
+                        'the variables of the checkpoint, so each one needs '
+                        'several GB of memory.')
 # sample mode flags.
 tf.flags.DEFINE_string('prefix', '',
                        'Used for "sample" mode to predict next words.')
@@ -58,11 +72,20 @@ tf.flags.DEFINE_integer('num_samples', 3,
 # dump_lstm_emb mode flags.
 tf.flags.DEFINE_string('sentence', '',
                        'Used as input for "dump_lstm_emb" mode.')
+tf.flags.DEFINE_string('sentences_file', '',
+                       'File with one sentence per line, used as input for '
+                       '"dump_lstm_emb_file" mode.')
 # eval mode flags.
 tf.flags.DEFINE_string('input_data', '',
                        'Input data files for eval model.')
 tf.flags.DEFINE_integer('max_eval_steps', 1000000,
-                        'Maximum mumber of steps to run "eval" mode.')
+                        'Maximum number of steps to run "eval" mode, each '
+                        'step evaluating one batch. With several sessions, '
+                        'every parallel step counts as num_sessions steps.')
+tf.flags.DEFINE_string('cache_dir', '',
+                       'Optional local directory where the "eval" mode input '
+                       'files are cached as arrays of word and char ids, '
+                       'which are memory mapped on later runs.')
 
 
 # For saving demo resources, use batch size 1 and step 1.
@@ -81,6 +104,31 @@ def _LoadModel(gd_file, ckpt_file):
   Returns:
     TensorFlow session and tensors dict.
   """
+  sessions, t = _LoadSessions(gd_file, ckpt_file, 1)
+  return sessions[0], t
+
+
+def _LoadSessions(gd_file, ckpt_file, num_sessions):
+  """Load the model from GraphDef and Checkpoint into several sessions.
+
+  Every session holds its own copy of the variables, and thus of the LSTM
+  state, so that the sessions can run independent inputs in parallel. The
+  variables of the checkpoint take several GB, so the memory used grows
+  linearly with num_sessions.
+
+  Args:
+    gd_file: GraphDef proto text file.
+    ckpt_file: TensorFlow Checkpoint file.
+    num_sessions: Number of sessions.
+
+  Returns:
+    List of TensorFlow sessions and tensors dict.
+
+  Raises:
+    ValueError: if num_sessions is smaller than 1.
+  """
+  if num_sessions < 1:
+    raise ValueError('num_sessions must be at least 1, got %d.' % num_sessions)
   with tf.Graph().as_default():
     sys.stderr.write('Recovering graph.\n')
     with tf.gfile.FastGFile(gd_file, 'r') as f:
@@ -110,50 +158,109 @@ def _LoadModel(gd_file, ckpt_file):
                                      'Reshape_3:0',
                                      'global_step:0'], name='')
 
-    sys.stderr.write('Recovering checkpoint %s\n' % ckpt_file)
-    sess = tf.Session(config=tf.ConfigProto(allow_soft_placement=True))
-    sess.run('save/restore_all', {'save/Const:0': ckpt_file})
-    sess.run(t['states_init'])
+    sessions = []
+    for _ in xrange(num_sessions):
+      sys.stderr.write('Recovering checkpoint %s\n' % ckpt_file)
+      sess = tf.Session(config=tf.ConfigProto(allow_soft_placement=True))
+      sess.run('save/restore_all', {'save/Const:0': ckpt_file})
+      sess.run(t['states_init'])
+      sessions.append(sess)
 
-  return sess, t
+  return sessions, t
 
 
-def _EvalModel(dataset):
-  """Evaluate model perplexity using provided dataset.
+def _RunSessions(pool, sessions, fetches, feed_dicts):
+  """Run fetches in every session with its own feed dict, in parallel.
 
   Args:
-    dataset: LM1BDataset object.
+    pool: ThreadPool with a thread per session.
+    sessions: List of TensorFlow sessions.
+    fetches: Fetches of every session.
+    feed_dicts: List of the feed dicts of the sessions, None to skip a session.
+
+  Returns:
+    List of the fetched values of every session, None for skipped sessions.
   """
-  sess, t = _LoadModel(FLAGS.pbtxt, FLAGS.ckpt)
+  def _Run(i):
+    if feed_dicts[i] is None:
+      return None
+    return sessions[i].run(fetches, feed_dict=feed_dicts[i])
 
-  current_step = t['global_step'].eval(session=sess)
-  sys.stderr.write('Loaded step %d.\n' % current_step)
+  return pool.map(_Run, range(len(sessions)))
 
-  data_gen = dataset.get_batch(BATCH_SIZE, NUM_TIMESTEPS, forever=False)
-  sum_num = 0.0
-  sum_den = 0.0
-  perplexity = 0.0
-  for i, (inputs, char_inputs, _, targets, weights) in enumerate(data_gen):
-    input_dict = {t['inputs_in']: inputs,
-                  t['targets_in']: targets,
-                  t['target_weights_in']: weights}
-    if 'char_inputs_in' in t:
-      input_dict[t['char_inputs_in']] = char_inputs
-    log_perp = sess.run(t['log_perplexity_out'], feed_dict=input_dict)
 
-    if np.isnan(log_perp):
-      sys.stderr.error('log_perplexity is Nan.\n')
-    else:
-      sum_num += log_perp * weights.mean()
-      sum_den += weights.mean()
-    if sum_den > 0:
-      perplexity = np.exp(sum_num / sum_den)
+def _CloseSessions(pool, sessions):
+  """Stop the threads of the pool and close the sessions.
+
+  Args:
+    pool: ThreadPool with a thread per session.
+    sessions: List of TensorFlow sessions.
+  """
+  pool.close()
+  pool.join()
+  for sess in sessions:
+    sess.close()
 
-    sys.stderr.write('Eval Step: %d, Average Perplexity: %f.\n' %
-                     (i, perplexity))
 
-    if i > FLAGS.max_eval_steps:
-      break
+def _EvalModel(dataset):
+  """Evaluate model perplexity using provided dataset.
+
+  Every session evaluates an independent stream of sentences, given by one row
+  of the batches of the dataset. The num_sessions batches run in parallel count
+  as that many steps towards FLAGS.max_eval_steps.
+
+  Args:
+    dataset: LM1BDataset object.
+  """
+  sessions, t = _LoadSessions(FLAGS.pbtxt, FLAGS.ckpt, FLAGS.num_sessions)
+  pool = ThreadPool(len(sessions))
+  try:
+    current_step = t['global_step'].eval(session=sessions[0])
+    sys.stderr.write('Loaded step %d.\n' % current_step)
+
+    data_gen = dataset.get_batch(BATCH_SIZE * len(sessions), NUM_TIMESTEPS,
+                                 forever=False)
+    sum_num = 0.0
+    sum_den = 0.0
+    perplexity = 0.0
+    num_tokens = 0
+    start_time = time.time()
+    for i, (inputs, char_inputs, _, targets, weights) in enumerate(data_gen):
+      input_dicts = []
+      for j in xrange(len(sessions)):
+        rows = slice(j * BATCH_SIZE, (j + 1) * BATCH_SIZE)
+        input_dict = {t['inputs_in']: inputs[rows],
+                      t['targets_in']: targets[rows],
+                      t['target_weights_in']: weights[rows]}
+        if 'char_inputs_in' in t:
+          input_dict[t['char_inputs_in']] = char_inputs[rows]
+        input_dicts.append(input_dict)
+      log_perps = _RunSessions(pool, sessions, t['log_perplexity_out'],
+                               input_dicts)
+
+      for j, log_perp in enumerate(log_perps):
+        session_weights = weights[j * BATCH_SIZE:(j + 1) * BATCH_SIZE]
+        if np.isnan(log_perp):
+          sys.stderr.write('log_perplexity is Nan.\n')
+        else:
+          sum_num += log_perp * session_weights.mean()
+          sum_den += session_weights.mean()
+      if sum_den > 0:
+        perplexity = np.exp(sum_num / sum_den)
+      num_tokens += int(weights.sum())
+
+      sys.stderr.write('Eval Step: %d, Average Perplexity: %f.\n' %
+                       (i, perplexity))
+
+      if i > FLAGS.max_eval_steps // len(sessions):
+        break
+
+    elapsed_time = time.time() - start_time
+    sys.stderr.write('Evaluated %d tokens in %.1f sec, %.1f tokens/sec.\n' %
+                     (num_tokens, elapsed_time,
+                      num_tokens / max(elapsed_time, 1e-6)))
+  finally:
+    _CloseSessions(pool, sessions)
 
 
 def _SampleSoftmax(softmax):
@@ -163,6 +270,9 @@ def _SampleSoftmax(softmax):
 def _SampleModel(prefix_words, vocab):
   """Predict next words using the given prefix words.
 
+  Every session generates one sample at a time, starting from a reset LSTM
+  state.
+
   Args:
     prefix_words: Prefix words.
     vocab: Vocabulary. Contains max word chard id length and converts between
@@ -171,44 +281,72 @@ def _SampleModel(prefix_words, vocab):
   targets = np.zeros([BATCH_SIZE, NUM_TIMESTEPS], np.int32)
   weights = np.ones([BATCH_SIZE, NUM_TIMESTEPS], np.float32)
 
-  sess, t = _LoadModel(FLAGS.pbtxt, FLAGS.ckpt)
-
-  if prefix_words.find('<S>') != 0:
-    prefix_words = '<S> ' + prefix_words
-
-  prefix = [vocab.word_to_id(w) for w in prefix_words.split()]
-  prefix_char_ids = [vocab.word_to_char_ids(w) for w in prefix_words.split()]
-  for _ in xrange(FLAGS.num_samples):
-    inputs = np.zeros([BATCH_SIZE, NUM_TIMESTEPS], np.int32)
-    char_ids_inputs = np.zeros(
-        [BATCH_SIZE, NUM_TIMESTEPS, vocab.max_word_length], np.int32)
-    samples = prefix[:]
-    char_ids_samples = prefix_char_ids[:]
-    sent = ''
-    while True:
-      inputs[0, 0] = samples[0]
-      char_ids_inputs[0, 0, :] = char_ids_samples[0]
-      samples = samples[1:]
-      char_ids_samples = char_ids_samples[1:]
-
-      softmax = sess.run(t['softmax_out'],
-                         feed_dict={t['char_inputs_in']: char_ids_inputs,
-                                    t['inputs_in']: inputs,
-                                    t['targets_in']: targets,
-                                    t['target_weights_in']: weights})
-
-      sample = _SampleSoftmax(softmax[0])
-      sample_char_ids = vocab.word_to_char_ids(vocab.id_to_word(sample))
-
-      if not samples:
-        samples = [sample]
-        char_ids_samples = [sample_char_ids]
-      sent += vocab.id_to_word(samples[0]) + ' '
-      sys.stderr.write('%s\n' % sent)
-
-      if (vocab.id_to_word(samples[0]) == '</S>' or
-          len(sent) > FLAGS.max_sample_words):
-        break
+  sessions, t = _LoadSessions(FLAGS.pbtxt, FLAGS.ckpt, FLAGS.num_sessions)
+  pool = ThreadPool(len(sessions))
+  try:
+    if prefix_words.find('<S>') != 0:
+      prefix_words = '<S> ' + prefix_words
+
+    prefix = [vocab.word_to_id(w) for w in prefix_words.split()]
+    prefix_char_ids = [vocab.word_to_char_ids(w) for w in prefix_words.split()]
+    num_tokens = 0
+    start_time = time.time()
+    for first_sample in xrange(0, FLAGS.num_samples, len(sessions)):
+      num_active = min(len(sessions), FLAGS.num_samples - first_sample)
+      pool.map(lambda sess: sess.run(t['states_init']), sessions[:num_active])
+
+      inputs = np.zeros([num_active, BATCH_SIZE, NUM_TIMESTEPS], np.int32)
+      char_ids_inputs = np.zeros(
+          [num_active, BATCH_SIZE, NUM_TIMESTEPS, vocab.max_word_length],
+          np.int32)
+      samples = [prefix[:] for _ in xrange(num_active)]
+      char_ids_samples = [prefix_char_ids[:] for _ in xrange(num_active)]
+      sents = [''] * num_active
+      done = [False] * num_active
+      done.extend([True] * (len(sessions) - num_active))
+      while not all(done):
+        input_dicts = []
+        for j in xrange(len(sessions)):
+          if done[j]:
+            input_dicts.append(None)
+            continue
+          inputs[j, 0, 0] = samples[j][0]
+          char_ids_inputs[j, 0, 0, :] = char_ids_samples[j][0]
+          samples[j] = samples[j][1:]
+          char_ids_samples[j] = char_ids_samples[j][1:]
+          input_dicts.append({t['char_inputs_in']: char_ids_inputs[j],
+                              t['inputs_in']: inputs[j],
+                              t['targets_in']: targets,
+                              t['target_weights_in']: weights})
+
+        softmaxes = _RunSessions(pool, sessions, t['softmax_out'], input_dicts)
+
+        for j, softmax in enumerate(softmaxes):
+          if softmax is None:
+            continue
+          num_tokens += 1
+          sample = _SampleSoftmax(softmax[0])
+          sample_char_ids = vocab.word_to_char_ids(vocab.id_to_word(sample))
+
+          if not samples[j]:
+            samples[j] = [sample]
+            char_ids_samples[j] = [sample_char_ids]
+          sents[j] += vocab.id_to_word(samples[j][0]) + ' '
+          if len(sessions) == 1:
+            sys.stderr.write('%s\n' % sents[j])
+
+          if (vocab.id_to_word(samples[j][0]) == '</S>' or
+              len(sents[j]) > FLAGS.max_sample_words):
+            done[j] = True
+            if len(sessions) > 1:
+              sys.stderr.write('Sample %d: %s\n' % (first_sample + j, sents[j]))
+
+    elapsed_time = time.time() - start_time
+    sys.stderr.write('Ran %d tokens in %.1f sec, %.1f tokens/sec.\n' %
+                     (num_tokens, elapsed_time,
+                      num_tokens / max(elapsed_time, 1e-6)))
+  finally:
+    _CloseSessions(pool, sessions)
 
 
 def _DumpEmb(vocab):
@@ -270,6 +408,7 @@ def _DumpSentenceEmbedding(sentence, vocab):
   inputs = np.zeros([BATCH_SIZE, NUM_TIMESTEPS], np.int32)
   char_ids_inputs = np.zeros(
       [BATCH_SIZE, NUM_TIMESTEPS, vocab.max_word_length], np.int32)
+  start_time = time.time()
   for i in xrange(len(word_ids)):
     inputs[0, 0] = word_ids[i]
     char_ids_inputs[0, 0, :] = char_ids[i]
@@ -287,12 +426,115 @@ def _DumpSentenceEmbedding(sentence, vocab):
       np.save(f, lstm_emb)
     sys.stderr.write('LSTM embedding step %d file saved\n' % i)
 
+  elapsed_time = time.time() - start_time
+  sys.stderr.write('Embedded %d tokens in %.1f sec, %.1f tokens/sec.\n' %
+                   (len(word_ids), elapsed_time,
+                    len(word_ids) / max(elapsed_time, 1e-6)))
+
+
+def _DumpSentencesFileEmbedding(sentences_file, vocab):
+  """Dump the LSTM embeddings of all words of the sentences of a file.
+
+  Every session embeds one sentence at a time, starting from a reset LSTM
+  state, and moves on to the next sentence of the file when it is done. The
+  embeddings are written to a memory mapped FLAGS.save_dir/lstm_emb.npy of
+  shape [num_words, emb_size], in the order of the sentences, and the start of
+  every sentence in it to FLAGS.save_dir/lstm_emb_offsets.npy. FLAGS.save_dir
+  must be a local directory.
+
+  Args:
+    sentences_file: File with one sentence per line.
+    vocab: Vocabulary. Contains max word chard id length and converts between
+        words and ids.
+  """
+  assert FLAGS.save_dir, 'Must specify FLAGS.save_dir for dump_lstm_emb_file.'
+  targets = np.zeros([BATCH_SIZE, NUM_TIMESTEPS], np.int32)
+  weights = np.ones([BATCH_SIZE, NUM_TIMESTEPS], np.float32)
+
+  with tf.gfile.Open(sentences_file) as f:
+    sentences = [line.split() for line in f]
+  sentences = [words if words[:1] == ['<S>'] else ['<S>'] + words
+               for words in sentences]
+  offsets = np.cumsum([0] + [len(words) for words in sentences])
+
+  sessions, t = _LoadSessions(FLAGS.pbtxt, FLAGS.ckpt, FLAGS.num_sessions)
+  pool = ThreadPool(len(sessions))
+  try:
+    lstm_emb_out = t['lstm/lstm_1/control_dependency']
+
+    fname = os.path.join(FLAGS.save_dir, 'lstm_emb_offsets.npy')
+    np.save(fname, offsets)
+    lstm_embs = np.lib.format.open_memmap(
+        os.path.join(FLAGS.save_dir, 'lstm_emb.npy'), mode='w+',
+        dtype=np.float32,
+        shape=(offsets[-1], lstm_emb_out.get_shape()[-1].value))
+
+    inputs = np.zeros([len(sessions), BATCH_SIZE, NUM_TIMESTEPS], np.int32)
+    char_ids_inputs = np.zeros(
+        [len(sessions), BATCH_SIZE, NUM_TIMESTEPS, vocab.max_word_length],
+        np.int32)
+    # The sentence and the position in it of every session, None when idle.
+    positions = [None] * len(sessions)
+
+    def _Run(j):
+      """Embed the next word of the sentence of session j.
+
+      Returns:
+        Whether the session finished its sentence.
+      """
+      if positions[j] is None:
+        return False
+      sentence, position = positions[j]
+      if position == 0:
+        sessions[j].run(t['states_init'])
+      word = sentences[sentence][position]
+      inputs[j, 0, 0] = vocab.word_to_id(word)
+      char_ids_inputs[j, 0, 0, :] = vocab.word_to_char_ids(word)
+      feed_dict = {t['char_inputs_in']: char_ids_inputs[j],
+                   t['inputs_in']: inputs[j],
+                   t['targets_in']: targets,
+                   t['target_weights_in']: weights}
+      lstm_emb = sessions[j].run(lstm_emb_out, feed_dict=feed_dict)
+      lstm_embs[offsets[sentence] + position] = lstm_emb[0]
+      if position + 1 < len(sentences[sentence]):
+        positions[j] = (sentence, position + 1)
+        return False
+      positions[j] = None
+      return True
+
+    next_sentence = 0
+    num_done = 0
+    start_time = time.time()
+    while True:
+      for j in xrange(len(sessions)):
+        if positions[j] is None and next_sentence < len(sentences):
+          positions[j] = (next_sentence, 0)
+          next_sentence += 1
+      if all(position is None for position in positions):
+        break
+
+      num_finished = sum(pool.map(_Run, range(len(sessions))))
+      if num_finished:
+        num_done += num_finished
+        if num_done // 1000 != (num_done - num_finished) // 1000:
+          sys.stderr.write('Finished sentence %d/%d\n' %
+                           (num_done, len(sentences)))
+
+    lstm_embs.flush()
+    elapsed_time = time.time() - start_time
+    sys.stderr.write('Embedded %d tokens in %.1f sec, %.1f tokens/sec.\n' %
+                     (offsets[-1], elapsed_time,
+                      offsets[-1] / max(elapsed_time, 1e-6)))
+  finally:
+    _CloseSessions(pool, sessions)
+
 
 def main(unused_argv):
   vocab = data_utils.CharsVocabulary(FLAGS.vocab_file, MAX_WORD_LEN)
 
   if FLAGS.mode == 'eval':
-    dataset = data_utils.LM1BDataset(FLAGS.input_data, vocab)
+    dataset = data_utils.LM1BDataset(FLAGS.input_data, vocab,
+                                     cache_dir=FLAGS.cache_dir)
     _EvalModel(dataset)
   elif FLAGS.mode == 'sample':
     _SampleModel(FLAGS.prefix, vocab)
@@ -300,6 +542,8 @@ def main(unused_argv):
     _DumpEmb(vocab)
   elif FLAGS.mode == 'dump_lstm_emb':
     _DumpSentenceEmbedding(FLAGS.sentence, vocab)
+  elif FLAGS.mode == 'dump_lstm_emb_file':
+    _DumpSentencesFileEmbedding(FLAGS.sentences_file, vocab)
   else:
     raise Exception('Mode not supported.')
 
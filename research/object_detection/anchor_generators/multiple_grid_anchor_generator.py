@@ -60,7 +60,8 @@ class MultipleGridAnchorGenerator(anchor_generator.AnchorGenerator):
         outside list having the same number of entries as feature_map_shape_list
         (which is passed in at generation time).
       base_anchor_size: base anchor size as [height, width]
-                        (length-2 float tensor, default=[1.0, 1.0]).
+                        (length-2 list of floats or float tensor,
+                        default=[256.0, 256.0]).
                         The height and width values are normalized to the
                         minimum dimension of the input height and width, so that
                         when the base anchor height equals the base anchor
@@ -95,7 +96,7 @@ class MultipleGridAnchorGenerator(anchor_generator.AnchorGenerator):
       raise ValueError('box_specs_list is expected to be a '
                        'list of lists of pairs')
     if base_anchor_size is None:
-      base_anchor_size = tf.constant([256, 256], dtype=tf.float32)
+      base_anchor_size = [256.0, 256.0]
     self._base_anchor_size = base_anchor_size
     self._anchor_strides = anchor_strides
     self._anchor_offsets = anchor_offsets
@@ -306,9 +307,11 @@ def create_ssd_anchors(num_layers=6,
   Returns:
     a MultipleGridAnchorGenerator
   """
+  # The base anchor size is kept as Python floats, so that the generator does
+  # not hold tensors of the graph it is created in.
   if base_anchor_size is None:
     base_anchor_size = [1.0, 1.0]
-  base_anchor_size = tf.constant(base_anchor_size, dtype=tf.float32)
+  base_anchor_size = [float(size) for size in base_anchor_size]
   box_specs_list = []
   if scales is None or not scales:
     scales = [min_scale + (max_scale - min_scale) * i / (num_layers - 1)
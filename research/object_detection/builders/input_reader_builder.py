@@ -25,12 +25,58 @@ that wraps the build function.
 
 import tensorflow as tf
 
+from object_detection.data_decoders import decoded_example_cache
 from object_detection.data_decoders import tf_example_decoder
 from object_detection.protos import input_reader_pb2
 
 parallel_reader = tf.contrib.slim.parallel_reader
 
 
+def _build_decoder(input_reader_config):
+  """Builds a TfExampleDecoder from the InputReader config."""
+  label_map_proto_file = None
+  if input_reader_config.HasField('label_map_path'):
+    label_map_proto_file = input_reader_config.label_map_path
+  cache = None
+  if input_reader_config.decoded_example_cache_dir:
+    cache = decoded_example_cache.DecodedExampleCache(
+        input_reader_config.decoded_example_cache_dir,
+        cache_images=input_reader_config.cache_decoded_images)
+  return tf_example_decoder.TfExampleDecoder(
+      load_instance_masks=input_reader_config.load_instance_masks,
+      label_map_proto_file=label_map_proto_file,
+      decoded_example_cache=cache,
+      load_anchor_matches=input_reader_config.load_anchor_matches)
+
+
+def _build_tf_record_dataset(input_reader_config):
+  """Builds a dataset of decoded examples for a tf_record_dataset_reader."""
+  config = input_reader_config.tf_record_dataset_reader
+  filenames = []
+  for input_path in config.input_path:
+    filenames.extend(tf.gfile.Glob(input_path))
+  if not filenames:
+    raise ValueError('No files match `input_path` of `input_reader_config`: '
+                     '{}'.format(config.input_path[:]))
+
+  filename_dataset = tf.data.Dataset.from_tensor_slices(filenames)
+  if input_reader_config.shuffle:
+    filename_dataset = filename_dataset.shuffle(len(filenames))
+  filename_dataset = filename_dataset.repeat(
+      input_reader_config.num_epochs or None)
+  records_dataset = filename_dataset.apply(
+      tf.contrib.data.parallel_interleave(
+          tf.data.TFRecordDataset,
+          cycle_length=input_reader_config.num_readers,
+          sloppy=input_reader_config.shuffle))
+  if input_reader_config.shuffle:
+    records_dataset = records_dataset.shuffle(config.shuffle_buffer_size)
+  decoder = _build_decoder(input_reader_config)
+  tensor_dataset = records_dataset.map(
+      decoder.decode, num_parallel_calls=config.num_parallel_calls)
+  return tensor_dataset.prefetch(config.prefetch_buffer_size)
+
+
 def build(input_reader_config):
   """Builds a tensor dictionary based on the InputReader config.
 
@@ -38,7 +84,10 @@ def build(input_reader_config):
     input_reader_config: A input_reader_pb2.InputReader object.
 
   Returns:
-    A tensor dict based on the input_reader_config.
+    A tensor dict based on the input_reader_config. For a
+    tf_record_dataset_reader, a tf.data.Dataset of tensor dicts of decoded
+    examples instead, which trainer.create_input_queue extends with
+    preprocessing and batching.
 
   Raises:
     ValueError: On invalid input reader proto.
@@ -48,7 +97,8 @@ def build(input_reader_config):
     raise ValueError('input_reader_config not of type '
                      'input_reader_pb2.InputReader.')
 
-  if input_reader_config.WhichOneof('input_reader') == 'tf_record_input_reader':
+  input_reader_type = input_reader_config.WhichOneof('input_reader')
+  if input_reader_type == 'tf_record_input_reader':
     config = input_reader_config.tf_record_input_reader
     if not config.input_path:
       raise ValueError('At least one input path must be specified in '
@@ -63,13 +113,13 @@ def build(input_reader_config):
         dtypes=[tf.string, tf.string],
         capacity=input_reader_config.queue_capacity,
         min_after_dequeue=input_reader_config.min_after_dequeue)
-
-    label_map_proto_file = None
-    if input_reader_config.HasField('label_map_path'):
-      label_map_proto_file = input_reader_config.label_map_path
-    decoder = tf_example_decoder.TfExampleDecoder(
-        load_instance_masks=input_reader_config.load_instance_masks,
-        label_map_proto_file=label_map_proto_file)
+    decoder = _build_decoder(input_reader_config)
     return decoder.decode(string_tensor)
 
+  if input_reader_type == 'tf_record_dataset_reader':
+    if not input_reader_config.tf_record_dataset_reader.input_path:
+      raise ValueError('At least one input path must be specified in '
+                       '`input_reader_config`.')
+    return _build_tf_record_dataset(input_reader_config)
+
   raise ValueError('Unsupported input_reader_config.')
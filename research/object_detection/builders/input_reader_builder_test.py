@@ -129,6 +129,39 @@ class InputReaderBuilderTest(tf.test.TestCase):
         (1, 4, 5),
         output_dict[fields.InputDataFields.groundtruth_instance_masks].shape)
 
+  def test_build_tf_record_dataset_reader(self):
+    tf_record_path = self.create_tf_record()
+
+    input_reader_text_proto = """
+      shuffle: false
+      num_readers: 1
+      num_epochs: 2
+      tf_record_dataset_reader {{
+        input_path: '{0}'
+        num_parallel_calls: 2
+      }}
+    """.format(tf_record_path)
+    input_reader_proto = input_reader_pb2.InputReader()
+    text_format.Merge(input_reader_text_proto, input_reader_proto)
+    dataset = input_reader_builder.build(input_reader_proto)
+    self.assertTrue(isinstance(dataset, tf.data.Dataset))
+    iterator = dataset.make_initializable_iterator()
+    tensor_dict = iterator.get_next()
+
+    with self.test_session() as sess:
+      sess.run(iterator.initializer)
+      for _ in range(2):
+        output_dict = sess.run(tensor_dict)
+        self.assertEquals(
+            (4, 5, 3), output_dict[fields.InputDataFields.image].shape)
+        self.assertEquals(
+            [2], output_dict[fields.InputDataFields.groundtruth_classes])
+        self.assertAllEqual(
+            [[0.0, 0.0, 1.0, 1.0]],
+            output_dict[fields.InputDataFields.groundtruth_boxes])
+      with self.assertRaises(tf.errors.OutOfRangeError):
+        sess.run(tensor_dict)
+
   def test_raises_error_with_no_input_paths(self):
     input_reader_text_proto = """
       shuffle: false
@@ -171,7 +171,8 @@ def _build_ssd_model(ssd_config, is_training):
       classification_weight,
       localization_weight,
       normalize_loss_by_num_matches,
-      hard_example_miner)
+      hard_example_miner,
+      cache_static_anchors=ssd_config.cache_static_anchors)
 
 
 def _build_faster_rcnn_feature_extractor(
@@ -84,7 +84,8 @@ def _build_non_max_suppressor(nms_config):
       score_thresh=nms_config.score_threshold,
       iou_thresh=nms_config.iou_threshold,
       max_size_per_class=nms_config.max_detections_per_class,
-      max_total_size=nms_config.max_total_detections)
+      max_total_size=nms_config.max_total_detections,
+      use_class_batched_nms=nms_config.use_class_batched_nms)
   return non_max_suppressor_fn
 
 
@@ -19,6 +19,7 @@ import collections
 import tensorflow as tf
 
 from object_detection.core import prefetcher
+from object_detection.utils import dataset_util
 
 rt_shape_str = '_runtime_shapes'
 
@@ -109,28 +110,123 @@ class BatchQueue(object):
       A list of tensor_dicts of the requested batch_size.
     """
     batched_tensors = self._queue.dequeue()
-    # Separate input tensors from tensors containing their runtime shapes.
-    tensors = {}
-    shapes = {}
-    for key, batched_tensor in batched_tensors.items():
-      unbatched_tensor_list = tf.unstack(batched_tensor)
-      for i, unbatched_tensor in enumerate(unbatched_tensor_list):
-        if rt_shape_str in key:
-          shapes[(key[:-len(rt_shape_str)], i)] = unbatched_tensor
-        else:
-          tensors[(key, i)] = unbatched_tensor
-
-    # Undo that padding using shapes and create a list of size `batch_size` that
-    # contains tensor dictionaries.
-    tensor_dict_list = []
-    batch_size = self._batch_size
-    for batch_id in range(batch_size):
-      tensor_dict = {}
-      for key in self._static_shapes:
-        tensor_dict[key] = tf.slice(tensors[(key, batch_id)],
-                                    tf.zeros_like(shapes[(key, batch_id)]),
-                                    shapes[(key, batch_id)])
-        tensor_dict[key].set_shape(self._static_shapes[key])
-      tensor_dict_list.append(tensor_dict)
-
-    return tensor_dict_list
+    return _unbatch_and_unpad(batched_tensors, self._static_shapes,
+                              self._batch_size)
+
+
+class DatasetBatchQueue(object):
+  """Batches a tf.data.Dataset of tensor_dicts like BatchQueue.
+
+  Tensors of unequal sizes are zero padded with Dataset.padded_batch, and the
+  dequeued batches are unpadded again, so that DatasetBatchQueue can be used
+  wherever a BatchQueue is expected. Batching and prefetching run in the
+  tf.data runtime instead of queue runner threads. The same caveats on tensors
+  of vastly different sizes apply, and, as for BatchQueue, a final batch that
+  is not full is dropped.
+
+  Example input pipeline with batching:
+  ------------------------------------
+  dataset = input_reader_builder.build(input_reader_config)
+  dataset = dataset.map(preprocess_fn, num_parallel_calls=8)
+  batch_queue = batcher.DatasetBatchQueue(dataset,
+                                          batch_size=32,
+                                          prefetch_buffer_size=20)
+  tensor_dict = batch_queue.dequeue()
+  outputs = Model(tensor_dict)
+  ...
+  -----------------------------------
+  """
+
+  def __init__(self, dataset, batch_size, prefetch_buffer_size):
+    """Constructs a batch queue reading from dataset.
+
+    Args:
+      dataset: a tf.data.Dataset of tensor_dicts to batch. All tensors must
+        have a known rank.
+      batch_size: batch size.
+      prefetch_buffer_size: number of assembled batches to prefetch.
+
+    Raises:
+      ValueError: if a tensor in the dataset has an unknown rank.
+    """
+    static_shapes = collections.OrderedDict(
+        sorted(dataset.output_shapes.items()))
+    padded_shapes = {}
+    for key, shape in static_shapes.items():
+      if shape.ndims is None:
+        raise ValueError('Tensor {} must have a known rank.'.format(key))
+      padded_shapes[key] = tf.TensorShape([None] * shape.ndims)
+      padded_shapes[key + rt_shape_str] = tf.TensorShape([shape.ndims])
+
+    def add_runtime_shapes(tensor_dict):
+      tensor_dict = dict(tensor_dict)
+      for key in static_shapes:
+        tensor_dict[key + rt_shape_str] = tf.shape(tensor_dict[key])
+      return tensor_dict
+
+    def is_full_batch(batched_tensors):
+      some_key = next(iter(static_shapes))
+      return tf.equal(tf.shape(batched_tensors[some_key + rt_shape_str])[0],
+                      batch_size)
+
+    dataset = dataset.map(add_runtime_shapes)
+    dataset = dataset.padded_batch(batch_size, padded_shapes=padded_shapes)
+    dataset = dataset.filter(is_full_batch)
+    dataset = dataset.prefetch(prefetch_buffer_size)
+    self._iterator = dataset_util.make_initializable_iterator(dataset)
+    self._static_shapes = static_shapes
+    self._batch_size = batch_size
+
+  def dequeue(self):
+    """Dequeues a batch of tensor_dict from the dataset.
+
+    Returns:
+      A list of tensor_dicts of the requested batch_size.
+    """
+    batched_tensors = self._iterator.get_next()
+    for batched_tensor in batched_tensors.values():
+      batched_tensor.set_shape(
+          tf.TensorShape([self._batch_size]).concatenate(
+              batched_tensor.get_shape()[1:]))
+    return _unbatch_and_unpad(batched_tensors, self._static_shapes,
+                              self._batch_size)
+
+
+def _unbatch_and_unpad(batched_tensors, static_shapes, batch_size):
+  """Splits a padded batch into a list of unpadded tensor_dicts.
+
+  Args:
+    batched_tensors: dictionary of batched tensors, holding for every key in
+      static_shapes a padded tensor and the runtime shapes of the unpadded
+      tensors under key + rt_shape_str.
+    static_shapes: dictionary mapping keys to the static shapes of the
+      unbatched tensors.
+    batch_size: batch size.
+
+  Returns:
+    A list of tensor_dicts of size batch_size.
+  """
+  # Separate input tensors from tensors containing their runtime shapes.
+  tensors = {}
+  shapes = {}
+  for key, batched_tensor in batched_tensors.items():
+    unbatched_tensor_list = tf.unstack(batched_tensor)
+    for i, unbatched_tensor in enumerate(unbatched_tensor_list):
+      if rt_shape_str in key:
+        shapes[(key[:-len(rt_shape_str)], i)] = unbatched_tensor
+      else:
+        tensors[(key, i)] = unbatched_tensor
+
+  # Undo that padding using shapes and create a list of size `batch_size` that
+  # contains tensor dictionaries.
+  tensor_dict_list = []
+  for batch_id in range(batch_size):
+    tensor_dict = {}
+    for key in static_shapes:
+      tensor_dict[key] = tf.slice(tensors[(key, batch_id)],
+                                  tf.zeros_like(shapes[(key, batch_id)]),
+                                  shapes[(key, batch_id)])
+      tensor_dict[key].set_shape(static_shapes[key])
+    tensor_dict_list.append(tensor_dict)
+
+  return tensor_dict_list
@@ -154,5 +154,48 @@ class BatcherTest(tf.test.TestCase):
           sess.run(batch)
 
 
+class DatasetBatchQueueTest(tf.test.TestCase):
+
+  def test_batch_and_unpad_tensors_of_different_sizes(self):
+    batch_size = 3
+    num_batches = 2
+
+    def create_tensor_dict(counter):
+      counter = tf.to_int32(counter)
+      return {
+          'boxes': tf.tile(tf.reshape(tf.range(4), [1, 4]),
+                           tf.stack([counter, 1])),
+          'image': tf.reshape(tf.range(counter * counter),
+                              tf.stack([counter, counter])),
+      }
+
+    # The final batch of 2 examples is not full and must be dropped.
+    dataset = tf.data.Dataset.range(2, num_batches * batch_size + 4).map(
+        create_tensor_dict)
+    batch_queue = batcher.DatasetBatchQueue(
+        dataset, batch_size=batch_size, prefetch_buffer_size=2)
+    batch = batch_queue.dequeue()
+
+    self.assertEqual(len(batch), batch_size)
+    for tensor_dict in batch:
+      self.assertAllEqual([None, 4], tensor_dict['boxes'].get_shape().as_list())
+      self.assertAllEqual([None, None],
+                          tensor_dict['image'].get_shape().as_list())
+
+    with self.test_session() as sess:
+      sess.run(tf.tables_initializer())
+      i = 2
+      for _ in range(num_batches):
+        batch_np = sess.run(batch)
+        for tensor_dict in batch_np:
+          self.assertAllEqual(tensor_dict['boxes'],
+                              np.tile(np.arange(4), (i, 1)))
+          self.assertAllEqual(tensor_dict['image'],
+                              np.arange(i * i).reshape((i, i)))
+          i += 1
+      with self.assertRaises(tf.errors.OutOfRangeError):
+        sess.run(batch)
+
+
 if __name__ == '__main__':
   tf.test.main()
@@ -73,7 +73,8 @@ class DetectionModel(object):
 
     Args:
       field: a string key, options are
-        fields.BoxListFields.{boxes,classes,masks,keypoints}
+        fields.BoxListFields.{boxes,classes,masks,keypoints} or
+        fields.InputDataFields.groundtruth_anchor_matches
 
     Returns:
       a list of tensors holding groundtruth information (see also
@@ -91,7 +92,8 @@ class DetectionModel(object):
 
     Args:
       field: a string key, options are
-        fields.BoxListFields.{boxes,classes,masks,keypoints}
+        fields.BoxListFields.{boxes,classes,masks,keypoints} or
+        fields.InputDataFields.groundtruth_anchor_matches
 
     Returns:
       True if the groundtruth includes the given field, False otherwise.
@@ -209,7 +211,8 @@ class DetectionModel(object):
                           groundtruth_boxes_list,
                           groundtruth_classes_list,
                           groundtruth_masks_list=None,
-                          groundtruth_keypoints_list=None):
+                          groundtruth_keypoints_list=None,
+                          groundtruth_anchor_matches_list=None):
     """Provide groundtruth tensors.
 
     Args:
@@ -230,6 +233,10 @@ class DetectionModel(object):
         shape [num_boxes, num_keypoints, 2] containing keypoints.
         Keypoints are assumed to be provided in normalized coordinates and
         missing keypoints should be encoded as NaN.
+      groundtruth_anchor_matches_list: a list of 1-D int32 tensors of shape
+        [num_anchors] containing the precomputed index of the groundtruth box
+        matched to each anchor (see matcher.Match). Only used by models with
+        anchors that do not depend on the input, which then skip matching.
     """
     self._groundtruth_lists[fields.BoxListFields.boxes] = groundtruth_boxes_list
     self._groundtruth_lists[
@@ -240,6 +247,10 @@ class DetectionModel(object):
     if groundtruth_keypoints_list:
       self._groundtruth_lists[
           fields.BoxListFields.keypoints] = groundtruth_keypoints_list
+    if groundtruth_anchor_matches_list:
+      self._groundtruth_lists[
+          fields.InputDataFields.groundtruth_anchor_matches] = (
+              groundtruth_anchor_matches_list)
 
   @abstractmethod
   def restore_map(self, from_detection_checkpoint=True):
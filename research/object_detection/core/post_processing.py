@@ -20,6 +20,83 @@ import tensorflow as tf
 from object_detection.core import box_list
 from object_detection.core import box_list_ops
 from object_detection.core import standard_fields as fields
+from object_detection.utils import shape_utils
+
+
+def _validate_multiclass_nms_inputs(boxes, scores, iou_thresh, clip_window,
+                                    change_coordinate_frame):
+  """Validates the inputs of the multiclass non max suppression functions.
+
+  Raises:
+    ValueError: if iou_thresh is not in [0, 1] or if the shapes of boxes and
+      scores are invalid, or if change_coordinate_frame is set without a
+      clip_window.
+  """
+  if not 0 <= iou_thresh <= 1.0:
+    raise ValueError('iou_thresh must be between 0 and 1')
+  if scores.shape.ndims != 2:
+    raise ValueError('scores field must be of rank 2')
+  if scores.shape[1].value is None:
+    raise ValueError('scores must have statically defined second '
+                     'dimension')
+  if boxes.shape.ndims != 3:
+    raise ValueError('boxes must be of rank 3.')
+  if not (boxes.shape[1].value == scores.shape[1].value or
+          boxes.shape[1].value == 1):
+    raise ValueError('second dimension of boxes must be either 1 or equal '
+                     'to the second dimension of scores')
+  if boxes.shape[2].value != 4:
+    raise ValueError('last dimension of boxes must be of size 4.')
+  if change_coordinate_frame and clip_window is None:
+    raise ValueError('if change_coordinate_frame is True, then a clip_window'
+                     'must be specified.')
+
+
+def _filter_and_suppress_class(boxlist, score_thresh, iou_thresh,
+                               max_size_per_class, clip_window,
+                               change_coordinate_frame):
+  """Thresholds, clips and suppresses the boxes of a single class.
+
+  Args:
+    boxlist: a BoxList holding the boxes of the class and a scores field.
+    score_thresh: scalar threshold for score.
+    iou_thresh: scalar threshold for IOU.
+    max_size_per_class: maximum number of retained boxes.
+    clip_window: (optional) window to clip boxes to.
+    change_coordinate_frame: whether to normalize coordinates after clipping
+      relative to clip_window.
+
+  Returns:
+    a BoxList holding the retained boxes sorted by decreasing score, with the
+    fields of boxlist.
+  """
+  boxlist_filtered = box_list_ops.filter_greater_than(boxlist, score_thresh)
+  if clip_window is not None:
+    boxlist_filtered = box_list_ops.clip_to_window(
+        boxlist_filtered, clip_window)
+    if change_coordinate_frame:
+      boxlist_filtered = box_list_ops.change_coordinate_frame(
+          boxlist_filtered, clip_window)
+  max_selection_size = tf.minimum(max_size_per_class,
+                                  boxlist_filtered.num_boxes())
+  selected_indices = tf.image.non_max_suppression(
+      boxlist_filtered.get(),
+      boxlist_filtered.get_field(fields.BoxListFields.scores),
+      max_selection_size,
+      iou_threshold=iou_thresh)
+  return box_list_ops.gather(boxlist_filtered, selected_indices)
+
+
+def _sort_and_clip_detections(selected_boxes, max_total_size):
+  """Sorts detections by decreasing score and keeps the top max_total_size."""
+  sorted_boxes = box_list_ops.sort_by_field(selected_boxes,
+                                            fields.BoxListFields.scores)
+  if max_total_size:
+    max_total_size = tf.minimum(max_total_size,
+                                sorted_boxes.num_boxes())
+    sorted_boxes = box_list_ops.gather(sorted_boxes,
+                                       tf.range(max_total_size))
+  return sorted_boxes
 
 
 def multiclass_non_max_suppression(boxes,
@@ -81,24 +158,8 @@ def multiclass_non_max_suppression(boxes,
     ValueError: if iou_thresh is not in [0, 1] or if input boxlist does not have
       a valid scores field.
   """
-  if not 0 <= iou_thresh <= 1.0:
-    raise ValueError('iou_thresh must be between 0 and 1')
-  if scores.shape.ndims != 2:
-    raise ValueError('scores field must be of rank 2')
-  if scores.shape[1].value is None:
-    raise ValueError('scores must have statically defined second '
-                     'dimension')
-  if boxes.shape.ndims != 3:
-    raise ValueError('boxes must be of rank 3.')
-  if not (boxes.shape[1].value == scores.shape[1].value or
-          boxes.shape[1].value == 1):
-    raise ValueError('second dimension of boxes must be either 1 or equal '
-                     'to the second dimension of scores')
-  if boxes.shape[2].value != 4:
-    raise ValueError('last dimension of boxes must be of size 4.')
-  if change_coordinate_frame and clip_window is None:
-    raise ValueError('if change_coordinate_frame is True, then a clip_window'
-                     'must be specified.')
+  _validate_multiclass_nms_inputs(boxes, scores, iou_thresh, clip_window,
+                                  change_coordinate_frame)
 
   with tf.name_scope(scope, 'MultiClassNonMaxSuppression'):
     num_boxes = tf.shape(boxes)[0]
@@ -131,35 +192,149 @@ def multiclass_non_max_suppression(boxes,
       if additional_fields is not None:
         for key, tensor in additional_fields.items():
           boxlist_and_class_scores.add_field(key, tensor)
-      boxlist_filtered = box_list_ops.filter_greater_than(
-          boxlist_and_class_scores, score_thresh)
-      if clip_window is not None:
-        boxlist_filtered = box_list_ops.clip_to_window(
-            boxlist_filtered, clip_window)
-        if change_coordinate_frame:
-          boxlist_filtered = box_list_ops.change_coordinate_frame(
-              boxlist_filtered, clip_window)
-      max_selection_size = tf.minimum(max_size_per_class,
-                                      boxlist_filtered.num_boxes())
-      selected_indices = tf.image.non_max_suppression(
-          boxlist_filtered.get(),
-          boxlist_filtered.get_field(fields.BoxListFields.scores),
-          max_selection_size,
-          iou_threshold=iou_thresh)
-      nms_result = box_list_ops.gather(boxlist_filtered, selected_indices)
+      nms_result = _filter_and_suppress_class(
+          boxlist_and_class_scores, score_thresh, iou_thresh,
+          max_size_per_class, clip_window, change_coordinate_frame)
       nms_result.add_field(
           fields.BoxListFields.classes, (tf.zeros_like(
               nms_result.get_field(fields.BoxListFields.scores)) + class_idx))
       selected_boxes_list.append(nms_result)
     selected_boxes = box_list_ops.concatenate(selected_boxes_list)
-    sorted_boxes = box_list_ops.sort_by_field(selected_boxes,
-                                              fields.BoxListFields.scores)
-    if max_total_size:
-      max_total_size = tf.minimum(max_total_size,
-                                  sorted_boxes.num_boxes())
-      sorted_boxes = box_list_ops.gather(sorted_boxes,
-                                         tf.range(max_total_size))
-    return sorted_boxes
+    return _sort_and_clip_detections(selected_boxes, max_total_size)
+
+
+def class_batched_multiclass_non_max_suppression(boxes,
+                                                 scores,
+                                                 score_thresh,
+                                                 iou_thresh,
+                                                 max_size_per_class,
+                                                 max_total_size=0,
+                                                 clip_window=None,
+                                                 change_coordinate_frame=False,
+                                                 masks=None,
+                                                 additional_fields=None,
+                                                 scope=None,
+                                                 parallel_iterations=32):
+  """Multi-class non maximum suppression with a single per-class subgraph.
+
+  Computes the same detections as `multiclass_non_max_suppression`, which
+  builds one thresholding, clipping and NMS subgraph per class. This makes
+  the graph of models with many classes slow to build and export. Here the
+  per-class subgraph is built once and run over all classes by a tf.map_fn,
+  which pads the detections of every class to max_size_per_class. Only the
+  indices of the retained boxes leave the loop, so masks and additional
+  fields are gathered once for all classes.
+
+  Args:
+    boxes: A [k, q, 4] float32 tensor containing k detections. `q` can be either
+      number of classes or 1 depending on whether a separate box is predicted
+      per class.
+    scores: A [k, num_classes] float32 tensor containing the scores for each of
+      the k detections.
+    score_thresh: scalar threshold for score (low scoring boxes are removed).
+    iou_thresh: scalar threshold for IOU (new boxes that have high IOU overlap
+      with previously selected boxes are removed).
+    max_size_per_class: maximum number of retained boxes per class. Must be a
+      python integer, as it is the padded size of the detections per class.
+    max_total_size: maximum number of boxes retained over all classes. By
+      default returns all boxes retained after capping boxes per class.
+    clip_window: A float32 tensor of the form [y_min, x_min, y_max, x_max]
+      representing the window to clip and normalize boxes to before performing
+      non-max suppression.
+    change_coordinate_frame: Whether to normalize coordinates after clipping
+      relative to clip_window (this can only be set to True if a clip_window
+      is provided)
+    masks: (optional) a [k, q, mask_height, mask_width] float32 tensor
+      containing box masks. `q` can be either number of classes or 1 depending
+      on whether a separate mask is predicted per class.
+    additional_fields: (optional) If not None, a dictionary that maps keys to
+      tensors whose first dimensions are all of size `k`. After non-maximum
+      suppression, all tensors corresponding to the selected boxes will be
+      added to resulting BoxList.
+    scope: name scope.
+    parallel_iterations: (optional) number of classes to process in parallel.
+
+  Returns:
+    a BoxList holding M boxes with a rank-1 scores field representing
+      corresponding scores for each box with scores sorted in decreasing order
+      and a rank-1 classes field representing a class label for each box.
+
+  Raises:
+    ValueError: if iou_thresh is not in [0, 1] or if input boxlist does not have
+      a valid scores field.
+  """
+  _validate_multiclass_nms_inputs(boxes, scores, iou_thresh, clip_window,
+                                  change_coordinate_frame)
+
+  with tf.name_scope(scope, 'ClassBatchedMultiClassNonMaxSuppression'):
+    num_boxes = tf.shape(boxes)[0]
+    num_scores = tf.shape(scores)[0]
+    num_classes = scores.get_shape()[1].value
+    q = boxes.get_shape()[1].value
+
+    length_assert = tf.Assert(
+        tf.equal(num_boxes, num_scores),
+        ['Incorrect scores field length: actual vs expected.',
+         num_scores, num_boxes])
+    with tf.control_dependencies([length_assert]):
+      per_class_scores = tf.transpose(scores)
+    per_class_boxes = tf.transpose(boxes, [1, 0, 2])
+    box_indices_key = 'box_indices'
+
+    def _single_class_nms_fn(class_idx):
+      """Returns the padded detections of a class and their number."""
+      boxlist_and_class_scores = box_list.BoxList(
+          tf.gather(per_class_boxes, class_idx if q > 1 else 0))
+      boxlist_and_class_scores.add_field(
+          fields.BoxListFields.scores, tf.gather(per_class_scores, class_idx))
+      boxlist_and_class_scores.add_field(box_indices_key, tf.range(num_boxes))
+      nms_result = _filter_and_suppress_class(
+          boxlist_and_class_scores, score_thresh, iou_thresh,
+          max_size_per_class, clip_window, change_coordinate_frame)
+      padded_result = box_list_ops.pad_or_clip_box_list(nms_result,
+                                                        max_size_per_class)
+      return (padded_result.get(),
+              padded_result.get_field(fields.BoxListFields.scores),
+              padded_result.get_field(box_indices_key),
+              nms_result.num_boxes())
+
+    (per_class_nmsed_boxes, per_class_nmsed_scores, per_class_box_indices,
+     per_class_num_detections) = tf.map_fn(
+         _single_class_nms_fn,
+         elems=tf.range(num_classes),
+         dtype=(tf.float32, tf.float32, tf.int32, tf.int32),
+         parallel_iterations=parallel_iterations,
+         back_prop=False)
+
+    # Concatenating the valid detections in class order matches the order of
+    # multiclass_non_max_suppression, so that ties are sorted identically.
+    valid_indices = tf.to_int32(tf.reshape(tf.where(tf.reshape(
+        tf.sequence_mask(per_class_num_detections, max_size_per_class),
+        [-1])), [-1]))
+    box_indices = tf.gather(tf.reshape(per_class_box_indices, [-1]),
+                            valid_indices)
+    classes = tf.gather(
+        tf.reshape(tf.tile(tf.expand_dims(tf.range(num_classes), 1),
+                           [1, max_size_per_class]), [-1]), valid_indices)
+    selected_boxes = box_list.BoxList(tf.gather(
+        tf.reshape(per_class_nmsed_boxes, [-1, 4]), valid_indices))
+    selected_boxes.add_field(
+        fields.BoxListFields.scores,
+        tf.gather(tf.reshape(per_class_nmsed_scores, [-1]), valid_indices))
+    selected_boxes.add_field(fields.BoxListFields.classes,
+                             tf.to_float(classes))
+    if masks is not None:
+      masks_shape = shape_utils.combined_static_and_dynamic_shape(masks)
+      flattened_masks = tf.reshape(masks, [-1] + masks_shape[2:])
+      mask_indices = box_indices * q
+      if q > 1:
+        mask_indices += classes
+      selected_boxes.add_field(fields.BoxListFields.masks,
+                               tf.gather(flattened_masks, mask_indices))
+    if additional_fields is not None:
+      for key, tensor in additional_fields.items():
+        selected_boxes.add_field(key, tf.gather(tensor, box_indices))
+    return _sort_and_clip_detections(selected_boxes, max_total_size)
 
 
 def batch_multiclass_non_max_suppression(boxes,
@@ -174,7 +349,8 @@ def batch_multiclass_non_max_suppression(boxes,
                                          masks=None,
                                          additional_fields=None,
                                          scope=None,
-                                         parallel_iterations=32):
+                                         parallel_iterations=32,
+                                         use_class_batched_nms=False):
   """Multi-class version of non maximum suppression that operates on a batch.
 
   This op is similar to `multiclass_non_max_suppression` but operates on a batch
@@ -212,6 +388,11 @@ def batch_multiclass_non_max_suppression(boxes,
     scope: tf scope name.
     parallel_iterations: (optional) number of batch items to process in
       parallel.
+    use_class_batched_nms: (optional) whether to suppress each image with
+      `class_batched_multiclass_non_max_suppression` instead of
+      `multiclass_non_max_suppression`. Both give the same detections, but the
+      former builds a graph whose size does not depend on the number of
+      classes.
 
   Returns:
     'nmsed_boxes': A [batch_size, max_detections, 4] float32 tensor
@@ -338,7 +519,11 @@ def batch_multiclass_non_max_suppression(boxes,
                        tf.stack([per_image_num_valid_boxes] +
                                 (additional_field_dim - 1) * [-1])),
               [-1] + [dim.value for dim in additional_field_shape[1:]])
-      nmsed_boxlist = multiclass_non_max_suppression(
+      if use_class_batched_nms:
+        multiclass_nms_fn = class_batched_multiclass_non_max_suppression
+      else:
+        multiclass_nms_fn = multiclass_non_max_suppression
+      nmsed_boxlist = multiclass_nms_fn(
           per_image_boxes,
           per_image_scores,
           score_thresh,
@@ -954,6 +954,120 @@ class MulticlassNonMaxSuppressionTest(tf.test.TestCase):
                             exp_nms_additional_fields[key])
       self.assertAllClose(num_detections, [1, 1])
 
+  def _assertSameDetectionsAsMulticlassNms(self, num_boxes, num_classes, q,
+                                           max_total_size=0, clip_window=None,
+                                           change_coordinate_frame=False):
+    random_state = np.random.RandomState(0)
+    mins = random_state.uniform(0, 10, size=[num_boxes, q, 2])
+    maxs = mins + random_state.uniform(1, 5, size=[num_boxes, q, 2])
+    boxes = tf.constant(np.concatenate([mins, maxs], axis=2), tf.float32)
+    # Repeated scores check that ties are broken in the same order.
+    scores = tf.constant(np.round(random_state.uniform(
+        0, 1, size=[num_boxes, num_classes]), 1), tf.float32)
+    masks = tf.constant(random_state.uniform(0, 1, size=[num_boxes, q, 3, 3]),
+                        tf.float32)
+    additional_fields = {'keypoints': tf.constant(random_state.uniform(
+        0, 1, size=[num_boxes, 2, 2]), tf.float32)}
+    nms_kwargs = {
+        'score_thresh': 0.2,
+        'iou_thresh': 0.5,
+        'max_size_per_class': 5,
+        'max_total_size': max_total_size,
+        'clip_window': clip_window,
+        'change_coordinate_frame': change_coordinate_frame,
+        'masks': masks,
+        'additional_fields': additional_fields,
+    }
+    nms = post_processing.multiclass_non_max_suppression(
+        boxes, scores, **nms_kwargs)
+    class_batched_nms = (
+        post_processing.class_batched_multiclass_non_max_suppression(
+            boxes, scores, **nms_kwargs))
+
+    nms_fields = [fields.BoxListFields.scores, fields.BoxListFields.classes,
+                  fields.BoxListFields.masks, 'keypoints']
+    with self.test_session() as sess:
+      nms_output, class_batched_nms_output = sess.run([
+          [nms.get()] + [nms.get_field(field) for field in nms_fields],
+          [class_batched_nms.get()] +
+          [class_batched_nms.get_field(field) for field in nms_fields]])
+      self.assertGreater(nms_output[0].shape[0], 0)
+      for expected, actual in zip(nms_output, class_batched_nms_output):
+        self.assertAllEqual(expected, actual)
+
+  def test_class_batched_multiclass_nms_with_shared_boxes(self):
+    self._assertSameDetectionsAsMulticlassNms(num_boxes=50, num_classes=7, q=1)
+
+  def test_class_batched_multiclass_nms_with_separate_boxes(self):
+    self._assertSameDetectionsAsMulticlassNms(num_boxes=50, num_classes=7, q=7)
+
+  def test_class_batched_multiclass_nms_with_total_cap(self):
+    self._assertSameDetectionsAsMulticlassNms(num_boxes=50, num_classes=7, q=7,
+                                              max_total_size=10)
+
+  def test_class_batched_multiclass_nms_with_clip_window(self):
+    self._assertSameDetectionsAsMulticlassNms(
+        num_boxes=50, num_classes=3, q=1,
+        clip_window=tf.constant([2, 2, 9, 8], tf.float32),
+        change_coordinate_frame=True)
+
+  def test_class_batched_multiclass_nms_with_invalid_scores_size(self):
+    boxes = tf.constant([[[0, 0, 1, 1]],
+                         [[0, 0.1, 1, 1.1]]], tf.float32)
+    scores = tf.constant([[.9]])
+    nms = post_processing.class_batched_multiclass_non_max_suppression(
+        boxes, scores, 0.1, 0.5, 4)
+    with self.test_session() as sess:
+      with self.assertRaisesWithPredicateMatch(
+          tf.errors.InvalidArgumentError, 'Incorrect scores field length'):
+        sess.run(nms.get())
+
+  def test_batch_multiclass_nms_with_class_batched_nms(self):
+    boxes = tf.constant([[[[0, 0, 1, 1], [0, 0, 4, 5]],
+                          [[0, 0.1, 1, 1.1], [0, 0.1, 2, 1.1]],
+                          [[0, -0.1, 1, 0.9], [0, -0.1, 1, 0.9]],
+                          [[0, 10, 1, 11], [0, 10, 1, 11]]],
+                         [[[0, 10.1, 1, 11.1], [0, 10.1, 1, 11.1]],
+                          [[0, 100, 1, 101], [0, 100, 1, 101]],
+                          [[0, 1000, 1, 1002], [0, 999, 2, 1004]],
+                          [[0, 1000, 1, 1002.1], [0, 999, 2, 1002.7]]]],
+                        tf.float32)
+    scores = tf.constant([[[.9, 0.01], [.75, 0.05],
+                           [.6, 0.01], [.95, 0]],
+                          [[.5, 0.01], [.3, 0.01],
+                           [.01, .85], [.01, .5]]])
+    score_thresh = 0.1
+    iou_thresh = .5
+    max_output_size = 4
+
+    exp_nms_corners = np.array([[[0, 10, 1, 11],
+                                 [0, 0, 1, 1],
+                                 [0, 0, 0, 0],
+                                 [0, 0, 0, 0]],
+                                [[0, 999, 2, 1004],
+                                 [0, 10.1, 1, 11.1],
+                                 [0, 100, 1, 101],
+                                 [0, 0, 0, 0]]])
+    exp_nms_scores = np.array([[.95, .9, 0, 0],
+                               [.85, .5, .3, 0]])
+    exp_nms_classes = np.array([[0, 0, 0, 0],
+                                [1, 0, 0, 0]])
+
+    (nmsed_boxes, nmsed_scores, nmsed_classes, _, _, num_detections
+    ) = post_processing.batch_multiclass_non_max_suppression(
+        boxes, scores, score_thresh, iou_thresh,
+        max_size_per_class=max_output_size, max_total_size=max_output_size,
+        use_class_batched_nms=True)
+
+    with self.test_session() as sess:
+      (nmsed_boxes, nmsed_scores, nmsed_classes,
+       num_detections) = sess.run([nmsed_boxes, nmsed_scores, nmsed_classes,
+                                   num_detections])
+      self.assertAllClose(nmsed_boxes, exp_nms_corners)
+      self.assertAllClose(nmsed_scores, exp_nms_scores)
+      self.assertAllClose(nmsed_classes, exp_nms_classes)
+      self.assertAllClose(num_detections, [2, 3])
+
 
 if __name__ == '__main__':
   tf.test.main()
@@ -893,66 +893,24 @@ def _strict_random_crop_image(image,
                [num_instances, num_keypoints, 2]
   """
   with tf.name_scope('RandomCropImage', values=[image, boxes]):
-    image_shape = tf.shape(image)
-
-    # boxes are [N, 4]. Lets first make them [N, 1, 4].
-    boxes_expanded = tf.expand_dims(
-        tf.clip_by_value(
-            boxes, clip_value_min=0.0, clip_value_max=1.0), 1)
-
-    sample_distorted_bounding_box = tf.image.sample_distorted_bounding_box(
-        image_shape,
-        bounding_boxes=boxes_expanded,
-        min_object_covered=min_object_covered,
-        aspect_ratio_range=aspect_ratio_range,
-        area_range=area_range,
-        max_attempts=100,
-        use_image_if_no_bounding_boxes=True)
-
-    im_box_begin, im_box_size, im_box = sample_distorted_bounding_box
+    im_box_begin, im_box_size, im_box = _sample_crop_window(
+        tf.shape(image), boxes, min_object_covered, aspect_ratio_range,
+        area_range)
 
     new_image = tf.slice(image, im_box_begin, im_box_size)
     new_image.set_shape([None, None, image.get_shape()[2]])
 
-    # [1, 4]
-    im_box_rank2 = tf.squeeze(im_box, squeeze_dims=[0])
-    # [4]
-    im_box_rank1 = tf.squeeze(im_box)
-
-    boxlist = box_list.BoxList(boxes)
-    boxlist.add_field('labels', labels)
-
-    if label_scores is not None:
-      boxlist.add_field('label_scores', label_scores)
-
-    im_boxlist = box_list.BoxList(im_box_rank2)
-
-    # remove boxes that are outside cropped image
-    boxlist, inside_window_ids = box_list_ops.prune_completely_outside_window(
-        boxlist, im_box_rank1)
-
-    # remove boxes that are outside image
-    overlapping_boxlist, keep_ids = box_list_ops.prune_non_overlapping_boxes(
-        boxlist, im_boxlist, overlap_thresh)
-
-    # change the coordinate of the remaining boxes
-    new_labels = overlapping_boxlist.get_field('labels')
-    new_boxlist = box_list_ops.change_coordinate_frame(overlapping_boxlist,
-                                                       im_box_rank1)
-    new_boxes = new_boxlist.get()
-    new_boxes = tf.clip_by_value(
-        new_boxes, clip_value_min=0.0, clip_value_max=1.0)
+    (new_boxes, new_labels, new_label_scores, new_keypoints,
+     kept_ids) = _crop_groundtruth_to_window(boxes, labels, label_scores,
+                                             keypoints, im_box, overlap_thresh)
 
     result = [new_image, new_boxes, new_labels]
 
     if label_scores is not None:
-      new_label_scores = overlapping_boxlist.get_field('label_scores')
       result.append(new_label_scores)
 
     if masks is not None:
-      masks_of_boxes_inside_window = tf.gather(masks, inside_window_ids)
-      masks_of_boxes_completely_inside_window = tf.gather(
-          masks_of_boxes_inside_window, keep_ids)
+      masks_of_boxes_completely_inside_window = tf.gather(masks, kept_ids)
       masks_box_begin = [0, im_box_begin[0], im_box_begin[1]]
       masks_box_size = [-1, im_box_size[0], im_box_size[1]]
       new_masks = tf.slice(
@@ -961,18 +919,114 @@ def _strict_random_crop_image(image,
       result.append(new_masks)
 
     if keypoints is not None:
-      keypoints_of_boxes_inside_window = tf.gather(keypoints, inside_window_ids)
-      keypoints_of_boxes_completely_inside_window = tf.gather(
-          keypoints_of_boxes_inside_window, keep_ids)
-      new_keypoints = keypoint_ops.change_coordinate_frame(
-          keypoints_of_boxes_completely_inside_window, im_box_rank1)
-      new_keypoints = keypoint_ops.prune_outside_window(new_keypoints,
-                                                        [0.0, 0.0, 1.0, 1.0])
       result.append(new_keypoints)
 
     return tuple(result)
 
 
+def _sample_crop_window(image_shape, boxes, min_object_covered,
+                        aspect_ratio_range, area_range):
+  """Samples a crop window for _strict_random_crop_image.
+
+  Args:
+    image_shape: rank 1 int32 tensor with the [height, width, channels] of the
+      image.
+    boxes: rank 2 float32 tensor containing the bounding boxes with shape
+           [num_instances, 4] in normalized coordinates.
+    min_object_covered: the cropped image must cover at least this fraction of
+                        at least one of the input bounding boxes.
+    aspect_ratio_range: allowed range for aspect ratio of cropped image.
+    area_range: allowed range for area ratio between cropped image and the
+                original image.
+
+  Returns:
+    im_box_begin: rank 1 int32 tensor [offset_height, offset_width, 0].
+    im_box_size: rank 1 int32 tensor [crop_height, crop_width, -1].
+    im_box: rank 1 float32 tensor [ymin, xmin, ymax, xmax] holding the crop
+      window in normalized coordinates.
+  """
+  # boxes are [N, 4]. Lets first make them [N, 1, 4].
+  boxes_expanded = tf.expand_dims(
+      tf.clip_by_value(
+          boxes, clip_value_min=0.0, clip_value_max=1.0), 1)
+
+  sample_distorted_bounding_box = tf.image.sample_distorted_bounding_box(
+      image_shape,
+      bounding_boxes=boxes_expanded,
+      min_object_covered=min_object_covered,
+      aspect_ratio_range=aspect_ratio_range,
+      area_range=area_range,
+      max_attempts=100,
+      use_image_if_no_bounding_boxes=True)
+
+  im_box_begin, im_box_size, im_box = sample_distorted_bounding_box
+  return im_box_begin, im_box_size, tf.reshape(im_box, [4])
+
+
+def _crop_groundtruth_to_window(boxes, labels, label_scores, keypoints,
+                                window, overlap_thresh):
+  """Prunes and transforms groundtruth into the frame of a crop window.
+
+  Args:
+    boxes: rank 2 float32 tensor containing the bounding boxes with shape
+           [num_instances, 4] in normalized coordinates.
+    labels: rank 1 int32 tensor containing the object classes.
+    label_scores: float32 tensor of shape [num_instances] or None.
+    keypoints: rank 3 float32 tensor with shape
+               [num_instances, num_keypoints, 2] or None.
+    window: rank 1 float32 tensor [ymin, xmin, ymax, xmax] of the crop.
+    overlap_thresh: minimum overlap thresh with new cropped
+                    image to keep the box.
+
+  Returns:
+    new_boxes: boxes in the frame of the crop, clipped to it.
+    new_labels: labels of the kept boxes.
+    new_label_scores: scores of the kept boxes, or None.
+    new_keypoints: keypoints in the frame of the crop, or None. Keypoints
+      outside the crop are set to NaN.
+    kept_ids: rank 1 int32 tensor with the indices of the kept instances.
+  """
+  boxlist = box_list.BoxList(boxes)
+  boxlist.add_field('labels', labels)
+
+  if label_scores is not None:
+    boxlist.add_field('label_scores', label_scores)
+
+  im_boxlist = box_list.BoxList(tf.expand_dims(window, 0))
+
+  # remove boxes that are outside cropped image
+  boxlist, inside_window_ids = box_list_ops.prune_completely_outside_window(
+      boxlist, window)
+
+  # remove boxes that are outside image
+  overlapping_boxlist, keep_ids = box_list_ops.prune_non_overlapping_boxes(
+      boxlist, im_boxlist, overlap_thresh)
+  kept_ids = tf.gather(inside_window_ids, keep_ids)
+
+  # change the coordinate of the remaining boxes
+  new_labels = overlapping_boxlist.get_field('labels')
+  new_boxlist = box_list_ops.change_coordinate_frame(overlapping_boxlist,
+                                                     window)
+  new_boxes = new_boxlist.get()
+  new_boxes = tf.clip_by_value(
+      new_boxes, clip_value_min=0.0, clip_value_max=1.0)
+
+  new_label_scores = None
+  if label_scores is not None:
+    new_label_scores = overlapping_boxlist.get_field('label_scores')
+
+  new_keypoints = None
+  if keypoints is not None:
+    keypoints_of_boxes_completely_inside_window = tf.gather(keypoints,
+                                                            kept_ids)
+    new_keypoints = keypoint_ops.change_coordinate_frame(
+        keypoints_of_boxes_completely_inside_window, window)
+    new_keypoints = keypoint_ops.prune_outside_window(new_keypoints,
+                                                      [0.0, 0.0, 1.0, 1.0])
+
+  return new_boxes, new_labels, new_label_scores, new_keypoints, kept_ids
+
+
 def random_crop_image(image,
                       boxes,
                       labels,
@@ -1124,36 +1178,9 @@ def random_pad_image(image,
   image_shape = tf.shape(image)
   image_height = image_shape[0]
   image_width = image_shape[1]
-
-  if max_image_size is None:
-    max_image_size = tf.stack([image_height * 2, image_width * 2])
-  max_image_size = tf.maximum(max_image_size,
-                              tf.stack([image_height, image_width]))
-
-  if min_image_size is None:
-    min_image_size = tf.stack([image_height, image_width])
-  min_image_size = tf.maximum(min_image_size,
-                              tf.stack([image_height, image_width]))
-
-  target_height = tf.cond(
-      max_image_size[0] > min_image_size[0],
-      lambda: _random_integer(min_image_size[0], max_image_size[0], seed),
-      lambda: max_image_size[0])
-
-  target_width = tf.cond(
-      max_image_size[1] > min_image_size[1],
-      lambda: _random_integer(min_image_size[1], max_image_size[1], seed),
-      lambda: max_image_size[1])
-
-  offset_height = tf.cond(
-      target_height > image_height,
-      lambda: _random_integer(0, target_height - image_height, seed),
-      lambda: tf.constant(0, dtype=tf.int32))
-
-  offset_width = tf.cond(
-      target_width > image_width,
-      lambda: _random_integer(0, target_width - image_width, seed),
-      lambda: tf.constant(0, dtype=tf.int32))
+  (offset_height, offset_width, target_height,
+   target_width) = _sample_pad_window(image_height, image_width,
+                                      min_image_size, max_image_size, seed)
 
   new_image = tf.image.pad_to_bounding_box(
       image,
@@ -1188,6 +1215,54 @@ def random_pad_image(image,
   return new_image, new_boxes
 
 
+def _sample_pad_window(image_height, image_width, min_image_size,
+                       max_image_size, seed):
+  """Samples the padded size and image offset for random_pad_image.
+
+  Args:
+    image_height: int32 scalar tensor, height of the image.
+    image_width: int32 scalar tensor, width of the image.
+    min_image_size: see random_pad_image.
+    max_image_size: see random_pad_image.
+    seed: random seed.
+
+  Returns:
+    offset_height, offset_width, target_height, target_width: int32 scalar
+    tensors as expected by tf.image.pad_to_bounding_box.
+  """
+  if max_image_size is None:
+    max_image_size = tf.stack([image_height * 2, image_width * 2])
+  max_image_size = tf.maximum(max_image_size,
+                              tf.stack([image_height, image_width]))
+
+  if min_image_size is None:
+    min_image_size = tf.stack([image_height, image_width])
+  min_image_size = tf.maximum(min_image_size,
+                              tf.stack([image_height, image_width]))
+
+  target_height = tf.cond(
+      max_image_size[0] > min_image_size[0],
+      lambda: _random_integer(min_image_size[0], max_image_size[0], seed),
+      lambda: max_image_size[0])
+
+  target_width = tf.cond(
+      max_image_size[1] > min_image_size[1],
+      lambda: _random_integer(min_image_size[1], max_image_size[1], seed),
+      lambda: max_image_size[1])
+
+  offset_height = tf.cond(
+      target_height > image_height,
+      lambda: _random_integer(0, target_height - image_height, seed),
+      lambda: tf.constant(0, dtype=tf.int32))
+
+  offset_width = tf.cond(
+      target_width > image_width,
+      lambda: _random_integer(0, target_width - image_width, seed),
+      lambda: tf.constant(0, dtype=tf.int32))
+
+  return offset_height, offset_width, target_height, target_width
+
+
 def random_crop_pad_image(image,
                           boxes,
                           labels,
@@ -2343,6 +2418,481 @@ def ssd_random_crop_pad_fixed_aspect_ratio(
   return result
 
 
+def _compose_windows(window, sub_window):
+  """Composes a window with a sub-window given in the frame of the window.
+
+  Args:
+    window: rank 1 float32 tensor [ymin, xmin, ymax, xmax] in normalized
+      coordinates of some image. ymin > ymax (xmin > xmax) denotes a window
+      that is flipped vertically (horizontally).
+    sub_window: rank 1 float32 tensor [ymin, xmin, ymax, xmax] in normalized
+      coordinates of the window. May be flipped too, and may extend outside of
+      [0, 1] for padding.
+
+  Returns:
+    The sub-window in normalized coordinates of the image.
+  """
+  ymin, xmin, ymax, xmax = tf.unstack(window)
+  height = ymax - ymin
+  width = xmax - xmin
+  sub_ymin, sub_xmin, sub_ymax, sub_xmax = tf.unstack(sub_window)
+  return tf.stack([ymin + sub_ymin * height, xmin + sub_xmin * width,
+                   ymin + sub_ymax * height, xmin + sub_xmax * width])
+
+
+class _GeometricView(object):
+  """An image and its instance masks seen through pending geometric ops.
+
+  In the fused geometric mode of `preprocess`, consecutive flips, crops, pads
+  and scales do not transform the image and masks. Each op samples its random
+  parameters exactly like the op it replaces, transforms the (small)
+  groundtruth tensors right away, and composes its effect on the image into
+  the window of the source image seen by the view. materialize() then samples
+  the window once.
+
+  Attributes:
+    window: rank 1 float32 tensor [ymin, xmin, ymax, xmax] of the view in
+      normalized coordinates of the source image, see _compose_windows.
+    size: rank 1 int32 tensor [height, width] of the view.
+    instance_indices: rank 1 int32 tensor with the indices of the source masks
+      of the instances in view, or None if there are no masks.
+    pad_color: rank 1 float32 tensor with the color of the pixels of the view
+      outside of the source image, or None if the view was not padded.
+    is_scaled: whether the view was scaled, so that its pixels need to be
+      interpolated.
+    num_ops: number of ops composed into the view.
+  """
+
+  def __init__(self, image, masks=None):
+    """Constructs a view of the full image.
+
+    Args:
+      image: rank 3 float32 tensor with shape [height, width, channels].
+      masks: (optional) rank 3 float32 tensor with shape
+        [num_instances, height, width] containing instance masks.
+    """
+    self._image = image
+    self._masks = masks
+    self.window = tf.constant([0.0, 0.0, 1.0, 1.0])
+    image_shape = tf.shape(image)
+    self.size = image_shape[:2]
+    self._channels = image_shape[2:]
+    self.instance_indices = None
+    if masks is not None:
+      self.instance_indices = tf.range(tf.shape(masks)[0])
+    self.pad_color = None
+    self.is_scaled = False
+    self.num_ops = 0
+
+  @property
+  def has_masks(self):
+    return self._masks is not None
+
+  def image_shape(self):
+    """Returns the [height, width, channels] of the view as a tensor."""
+    return tf.concat([self.size, self._channels], 0)
+
+  def mean_color(self):
+    """Returns the mean color of the view, which must not have any ops yet."""
+    if self.num_ops:
+      raise ValueError('The mean color is only known for an unchanged view.')
+    return tf.reduce_mean(self._image, axis=[0, 1])
+
+  def compose(self, sub_window, size):
+    """Narrows the view to sub_window, see _compose_windows, of shape size."""
+    self.window = _compose_windows(self.window, sub_window)
+    self.size = size
+    self.num_ops += 1
+
+  def _source_pixel_window(self):
+    """Returns the top left source pixel and flips of an unscaled view.
+
+    Returns:
+      lows: rank 1 int32 tensor [row, column] of the source pixel in the top
+        left corner of the view, if it were not flipped. May lie outside of
+        the source image if the view is padded.
+      flipped: rank 1 bool tensor [vertically, horizontally].
+    """
+    source_size = tf.to_float(tf.shape(self._image)[:2])
+    ymin, xmin, ymax, xmax = tf.unstack(self.window)
+    starts = tf.to_int32(tf.round(tf.stack([ymin, xmin]) * source_size))
+    ends = tf.to_int32(tf.round(tf.stack([ymax, xmax]) * source_size))
+    return tf.minimum(starts, ends), tf.greater(starts, ends)
+
+  def _slice(self, tensor, lows, flipped):
+    """Copies the pixels of an unscaled view from a [height, width, c] tensor.
+
+    Pixels outside of the source are set to zero.
+    """
+    source_size = tf.shape(tensor)[:2]
+    crop_lows = tf.clip_by_value(lows, 0, source_size)
+    crop_highs = tf.clip_by_value(lows + self.size, 0, source_size)
+    new_tensor = tf.slice(tensor, tf.concat([crop_lows, [0]], 0),
+                          tf.concat([crop_highs - crop_lows, [-1]], 0))
+    if self.pad_color is not None:
+      offsets = crop_lows - lows
+      new_tensor = tf.image.pad_to_bounding_box(
+          new_tensor, offsets[0], offsets[1], self.size[0], self.size[1])
+    new_tensor = tf.cond(flipped[0], lambda: tf.reverse(new_tensor, [0]),
+                         lambda: new_tensor)
+    new_tensor = tf.cond(flipped[1], lambda: tf.reverse(new_tensor, [1]),
+                         lambda: new_tensor)
+    return new_tensor
+
+  def _sampling_box(self):
+    """Returns the crop_and_resize box sampling the pixels of a scaled view.
+
+    crop_and_resize maps the box corners onto the centers of the corner
+    pixels, whereas windows denote pixel edges.
+    """
+    source_size = tf.to_float(tf.shape(self._image)[:2])
+    size = tf.to_float(self.size)
+    ymin, xmin, ymax, xmax = tf.unstack(self.window)
+    starts = tf.stack([ymin, xmin]) * source_size
+    ends = tf.stack([ymax, xmax]) * source_size
+    half_pixels = 0.5 * (ends - starts) / size
+    scale = tf.maximum(source_size - 1.0, 1.0)
+    box = tf.concat([(starts + half_pixels - 0.5) / scale,
+                     (ends - half_pixels - 0.5) / scale], 0)
+    if self.pad_color is None:
+      # Keep rounding errors from pushing border pixels outside of the source.
+      box = tf.clip_by_value(box, 0.0, 1.0)
+    return tf.expand_dims(box, 0)
+
+  def _resample(self, tensor, box):
+    """Resamples a scaled view from a [height, width, c] tensor.
+
+    Pixels outside of the source are set to zero.
+    """
+    return tf.image.crop_and_resize(
+        tf.expand_dims(tensor, 0), box, tf.zeros([1], dtype=tf.int32),
+        self.size)[0]
+
+  def materialize(self):
+    """Samples the view.
+
+    Unscaled views are copied from the source with a single slice (and pad and
+    reverse, if padded or flipped). Scaled views are resampled with a single
+    bilinear crop_and_resize.
+
+    Returns:
+      image: rank 3 float32 tensor of shape [height, width, channels].
+      masks: rank 3 float32 tensor of shape [num_instances, height, width], or
+        None if the view has no masks.
+    """
+    with tf.name_scope('MaterializeGeometricView'):
+      if self.is_scaled:
+        box = self._sampling_box()
+        sample_fn = lambda tensor: self._resample(tensor, box)
+      else:
+        lows, flipped = self._source_pixel_window()
+        sample_fn = lambda tensor: self._slice(tensor, lows, flipped)
+
+      image = self._image
+      if self.pad_color is not None:
+        # Sample a channel of ones to know where the view lies outside of the
+        # source image.
+        image = tf.concat([image, tf.ones_like(image[:, :, :1])], 2)
+      new_image = sample_fn(image)
+      if self.pad_color is not None:
+        inside_source = new_image[:, :, -1:]
+        new_image = (new_image[:, :, :-1] +
+                     (1.0 - inside_source) * self.pad_color)
+      new_image.set_shape([None, None, self._image.get_shape()[2]])
+
+      new_masks = None
+      if self._masks is not None:
+        masks = tf.gather(self._masks, self.instance_indices)
+        new_masks = tf.transpose(
+            sample_fn(tf.transpose(masks, [1, 2, 0])), [2, 0, 1])
+        if self.is_scaled:
+          new_masks = tf.to_float(tf.greater_equal(new_masks, 0.5))
+        new_masks.set_shape([None, None, None])
+    return new_image, new_masks
+
+
+def _fused_random_horizontal_flip(view,
+                                  boxes=None,
+                                  masks=None,
+                                  keypoints=None,
+                                  keypoint_flip_permutation=None,
+                                  seed=None):
+  """Fused counterpart of random_horizontal_flip operating on a view."""
+  if keypoints is not None and keypoint_flip_permutation is None:
+    raise ValueError(
+        'keypoints are provided but keypoints_flip_permutation is not provided')
+
+  with tf.name_scope('RandomHorizontalFlip', values=[boxes]):
+    do_a_flip_random = tf.greater(tf.random_uniform([], seed=seed), 0.5)
+    view.compose(
+        tf.cond(do_a_flip_random, lambda: tf.constant([0.0, 1.0, 1.0, 0.0]),
+                lambda: tf.constant([0.0, 0.0, 1.0, 1.0])), view.size)
+    result = [view]
+    if boxes is not None:
+      boxes = tf.cond(do_a_flip_random, lambda: _flip_boxes_left_right(boxes),
+                      lambda: boxes)
+      result.append(boxes)
+    if masks is not None:
+      result.append(masks)
+    if keypoints is not None:
+      permutation = keypoint_flip_permutation
+      keypoints = tf.cond(
+          do_a_flip_random,
+          lambda: keypoint_ops.flip_horizontal(keypoints, 0.5, permutation),
+          lambda: keypoints)
+      result.append(keypoints)
+    return tuple(result)
+
+
+def _fused_random_vertical_flip(view,
+                                boxes=None,
+                                masks=None,
+                                keypoints=None,
+                                keypoint_flip_permutation=None,
+                                seed=None):
+  """Fused counterpart of random_vertical_flip operating on a view."""
+  if keypoints is not None and keypoint_flip_permutation is None:
+    raise ValueError(
+        'keypoints are provided but keypoints_flip_permutation is not provided')
+
+  with tf.name_scope('RandomVerticalFlip', values=[boxes]):
+    do_a_flip_random = tf.greater(tf.random_uniform([], seed=seed), 0.5)
+    view.compose(
+        tf.cond(do_a_flip_random, lambda: tf.constant([1.0, 0.0, 0.0, 1.0]),
+                lambda: tf.constant([0.0, 0.0, 1.0, 1.0])), view.size)
+    result = [view]
+    if boxes is not None:
+      boxes = tf.cond(do_a_flip_random, lambda: _flip_boxes_up_down(boxes),
+                      lambda: boxes)
+      result.append(boxes)
+    if masks is not None:
+      result.append(masks)
+    if keypoints is not None:
+      permutation = keypoint_flip_permutation
+      keypoints = tf.cond(
+          do_a_flip_random,
+          lambda: keypoint_ops.flip_vertical(keypoints, 0.5, permutation),
+          lambda: keypoints)
+      result.append(keypoints)
+    return tuple(result)
+
+
+def _fused_random_image_scale(view,
+                              masks=None,
+                              min_scale_ratio=0.5,
+                              max_scale_ratio=2.0,
+                              seed=None):
+  """Fused counterpart of random_image_scale operating on a view."""
+  with tf.name_scope('RandomImageScale'):
+    size_coef = tf.random_uniform([],
+                                  minval=min_scale_ratio,
+                                  maxval=max_scale_ratio,
+                                  dtype=tf.float32, seed=seed)
+    view.compose(tf.constant([0.0, 0.0, 1.0, 1.0]),
+                 tf.to_int32(tf.to_float(view.size) * size_coef))
+    view.is_scaled = True
+    result = [view]
+    if masks is not None:
+      result.append(masks)
+    return tuple(result)
+
+
+def _fused_random_pad_image(view,
+                            boxes,
+                            min_image_size=None,
+                            max_image_size=None,
+                            pad_color=None,
+                            seed=None):
+  """Fused counterpart of random_pad_image operating on a view.
+
+  A view holds a single pad color, which for the default pad color is the mean
+  color of the view. `preprocess` therefore materializes views before padding
+  them again, or before padding a transformed view with the default color.
+  """
+  if pad_color is None:
+    pad_color = view.mean_color()
+
+  image_height = view.size[0]
+  image_width = view.size[1]
+  (offset_height, offset_width, target_height,
+   target_width) = _sample_pad_window(image_height, image_width,
+                                      min_image_size, max_image_size, seed)
+
+  # setting boxes
+  new_window = tf.to_float(
+      tf.stack([
+          -offset_height, -offset_width, target_height - offset_height,
+          target_width - offset_width
+      ]))
+  new_window /= tf.to_float(
+      tf.stack([image_height, image_width, image_height, image_width]))
+  boxlist = box_list.BoxList(boxes)
+  new_boxlist = box_list_ops.change_coordinate_frame(boxlist, new_window)
+  new_boxes = new_boxlist.get()
+
+  view.compose(new_window, tf.stack([target_height, target_width]))
+  view.pad_color = pad_color
+  return view, new_boxes
+
+
+def _strict_random_crop_view_state(state, image_channels, min_object_covered,
+                                   aspect_ratio_range, area_range,
+                                   overlap_thresh):
+  """Crops a view state, see _fused_random_crop_image.
+
+  Args:
+    state: dictionary holding the 'window', 'size', 'boxes' and 'labels' and
+      optionally the 'instance_indices', 'label_scores' and 'keypoints' of a
+      view and its groundtruth.
+    image_channels: rank 1 int32 tensor holding the number of channels.
+    min_object_covered: see random_crop_image.
+    aspect_ratio_range: see random_crop_image.
+    area_range: see random_crop_image.
+    overlap_thresh: see random_crop_image.
+
+  Returns:
+    The cropped state, with the same keys as state.
+  """
+  with tf.name_scope('RandomCropImage', values=[state['boxes']]):
+    image_shape = tf.concat([state['size'], image_channels], 0)
+    _, im_box_size, im_box = _sample_crop_window(
+        image_shape, state['boxes'], min_object_covered, aspect_ratio_range,
+        area_range)
+    (new_boxes, new_labels, new_label_scores, new_keypoints,
+     kept_ids) = _crop_groundtruth_to_window(
+         state['boxes'], state['labels'], state.get('label_scores'),
+         state.get('keypoints'), im_box, overlap_thresh)
+    new_state = {
+        'window': _compose_windows(state['window'], im_box),
+        'size': im_box_size[:2],
+        'boxes': new_boxes,
+        'labels': new_labels,
+    }
+    if 'label_scores' in state:
+      new_state['label_scores'] = new_label_scores
+    if 'keypoints' in state:
+      new_state['keypoints'] = new_keypoints
+    if 'instance_indices' in state:
+      new_state['instance_indices'] = tf.gather(state['instance_indices'],
+                                                kept_ids)
+    return new_state
+
+
+def _random_crop_view_state(state, image_channels, min_object_covered,
+                            aspect_ratio_range, area_range, overlap_thresh,
+                            random_coef, seed):
+  """Crops a view state with probability 1 - random_coef."""
+  def strict_random_crop_fn():
+    new_state = _strict_random_crop_view_state(
+        state, image_channels, min_object_covered, aspect_ratio_range,
+        area_range, overlap_thresh)
+    return tuple(new_state[key] for key in keys)
+
+  keys = sorted(state)
+  # avoids tf.cond to make faster RCNN training on borg. See b/140057645.
+  if random_coef < sys.float_info.min:
+    result = strict_random_crop_fn()
+  else:
+    do_a_crop_random = tf.random_uniform([], seed=seed)
+    do_a_crop_random = tf.greater(do_a_crop_random, random_coef)
+    result = tf.cond(do_a_crop_random, strict_random_crop_fn,
+                     lambda: tuple(state[key] for key in keys))
+  return dict(zip(keys, result))
+
+
+def _get_view_state(view, boxes, labels, label_scores, keypoints):
+  """Returns the state of a view and its groundtruth as a dictionary."""
+  state = {'window': view.window, 'size': view.size, 'boxes': boxes,
+           'labels': labels}
+  if view.has_masks:
+    state['instance_indices'] = view.instance_indices
+  if label_scores is not None:
+    state['label_scores'] = label_scores
+  if keypoints is not None:
+    state['keypoints'] = keypoints
+  return state
+
+
+def _set_view_state(view, state, masks):
+  """Updates view from state, returning the results of a crop op."""
+  view.window = state['window']
+  view.size = state['size']
+  view.num_ops += 1
+  if view.has_masks:
+    view.instance_indices = state['instance_indices']
+  result = [view, state['boxes'], state['labels']]
+  if 'label_scores' in state:
+    result.append(state['label_scores'])
+  if masks is not None:
+    result.append(masks)
+  if 'keypoints' in state:
+    result.append(state['keypoints'])
+  return tuple(result)
+
+
+def _fused_random_crop_image(view,
+                             boxes,
+                             labels,
+                             label_scores=None,
+                             masks=None,
+                             keypoints=None,
+                             min_object_covered=1.0,
+                             aspect_ratio_range=(0.75, 1.33),
+                             area_range=(0.1, 1.0),
+                             overlap_thresh=0.3,
+                             random_coef=0.0,
+                             seed=None):
+  """Fused counterpart of random_crop_image operating on a view."""
+  state = _get_view_state(view, boxes, labels, label_scores, keypoints)
+  state = _random_crop_view_state(
+      state, view.image_shape()[2:], min_object_covered, aspect_ratio_range,
+      area_range, overlap_thresh, random_coef, seed)
+  return _set_view_state(view, state, masks)
+
+
+def _fused_ssd_random_crop(view,
+                           boxes,
+                           labels,
+                           label_scores=None,
+                           masks=None,
+                           keypoints=None,
+                           min_object_covered=(0.0, 0.1, 0.3, 0.5, 0.7, 0.9,
+                                               1.0),
+                           aspect_ratio_range=((0.5, 2.0),) * 7,
+                           area_range=((0.1, 1.0),) * 7,
+                           overlap_thresh=(0.0, 0.1, 0.3, 0.5, 0.7, 0.9, 1.0),
+                           random_coef=(0.15,) * 7,
+                           seed=None):
+  """Fused counterpart of ssd_random_crop operating on a view."""
+  state = _get_view_state(view, boxes, labels, label_scores, keypoints)
+  keys = sorted(state)
+  image_channels = view.image_shape()[2:]
+
+  def random_crop_selector(selected_result, index):
+    new_state = _random_crop_view_state(
+        dict(zip(keys, selected_result)), image_channels,
+        min_object_covered[index], aspect_ratio_range[index],
+        area_range[index], overlap_thresh[index], random_coef[index], seed)
+    return tuple(new_state[key] for key in keys)
+
+  result = _apply_with_random_selector_tuples(
+      tuple(state[key] for key in keys),
+      random_crop_selector,
+      num_cases=len(min_object_covered))
+  return _set_view_state(view, dict(zip(keys, result)), masks)
+
+
+# Geometric preprocessing functions with a fused counterpart, see preprocess.
+_FUSED_GEOMETRIC_OPS = {
+    random_horizontal_flip: _fused_random_horizontal_flip,
+    random_vertical_flip: _fused_random_vertical_flip,
+    random_image_scale: _fused_random_image_scale,
+    random_pad_image: _fused_random_pad_image,
+    random_crop_image: _fused_random_crop_image,
+    ssd_random_crop: _fused_ssd_random_crop,
+}
+
+
 def get_default_func_arg_map(include_label_scores=False,
                              include_instance_masks=False,
                              include_keypoints=False):
@@ -2480,7 +3030,18 @@ def get_default_func_arg_map(include_label_scores=False,
   return prep_func_arg_map
 
 
-def preprocess(tensor_dict, preprocess_options, func_arg_map=None):
+def _materialize_geometric_view(tensor_dict):
+  """Replaces a _GeometricView image in tensor_dict by the sampled image."""
+  view = tensor_dict.get(fields.InputDataFields.image)
+  if isinstance(view, _GeometricView):
+    image, masks = view.materialize()
+    tensor_dict[fields.InputDataFields.image] = image
+    if masks is not None:
+      tensor_dict[fields.InputDataFields.groundtruth_instance_masks] = masks
+
+
+def preprocess(tensor_dict, preprocess_options, func_arg_map=None,
+               fuse_geometric_ops=False):
   """Preprocess images and bounding boxes.
 
   Various types of preprocessing (to be implemented) based on the
@@ -2488,6 +3049,17 @@ def preprocess(tensor_dict, preprocess_options, func_arg_map=None):
   boxes), "white balance image" (affects only image), etc. If self._options
   is None, no preprocessing is done.
 
+  With fuse_geometric_ops, consecutive random_horizontal_flip,
+  random_vertical_flip, random_image_scale, random_pad_image, random_crop_image
+  and ssd_random_crop ops are fused: their random parameters are sampled as by
+  the individual ops (and from the same distributions), and the groundtruth
+  boxes, labels and keypoints are transformed as by the individual ops, but the
+  image and instance masks are only sampled once, at the end of the run of
+  geometric ops. Flipped, cropped and padded pixels are identical to those of
+  the individual ops. Scaled images are resampled with a single bilinear
+  crop_and_resize instead, and masks are scaled, flipped, cropped and padded
+  together with the image.
+
   Args:
     tensor_dict: dictionary that contains images, boxes, and can contain other
                  things as well.
@@ -2505,6 +3077,7 @@ def preprocess(tensor_dict, preprocess_options, func_arg_map=None):
                         their values.
     func_arg_map: mapping from preprocessing functions to arguments that they
                   expect to receive and return.
+    fuse_geometric_ops: whether to fuse consecutive geometric ops, see above.
 
   Returns:
     tensor_dict: which contains the preprocessed images, bounding boxes, etc.
@@ -2528,6 +3101,12 @@ def preprocess(tensor_dict, preprocess_options, func_arg_map=None):
     image = tf.squeeze(images, squeeze_dims=[0])
     tensor_dict[fields.InputDataFields.image] = image
 
+  # Views transform the instance masks if any fused op handles them.
+  fuse_masks = (
+      fields.InputDataFields.groundtruth_instance_masks in tensor_dict and
+      any(fields.InputDataFields.groundtruth_instance_masks in
+          func_arg_map.get(func, ()) for func in _FUSED_GEOMETRIC_OPS))
+
   # Preprocess inputs based on preprocess_options
   for option in preprocess_options:
     func, params = option
@@ -2540,6 +3119,29 @@ def preprocess(tensor_dict, preprocess_options, func_arg_map=None):
         raise ValueError('The function %s requires argument %s' %
                          (func.__name__, a))
 
+    view = tensor_dict.get(fields.InputDataFields.image)
+    fuse = (fuse_geometric_ops and func in _FUSED_GEOMETRIC_OPS and
+            fields.InputDataFields.image in arg_names)
+    if isinstance(view, _GeometricView):
+      reads_pixels = (
+          fields.InputDataFields.image in arg_names or
+          fields.InputDataFields.groundtruth_instance_masks in arg_names)
+      # A view holds a single pad color, and only knows its mean color (the
+      # default pad color) before any op was applied.
+      if (reads_pixels and not fuse) or (func is random_pad_image and (
+          view.pad_color is not None or
+          (params.get('pad_color') is None and view.num_ops))):
+        _materialize_geometric_view(tensor_dict)
+    if fuse:
+      if not isinstance(tensor_dict[fields.InputDataFields.image],
+                        _GeometricView):
+        masks = None
+        if fuse_masks:
+          masks = tensor_dict[fields.InputDataFields.groundtruth_instance_masks]
+        tensor_dict[fields.InputDataFields.image] = _GeometricView(
+            tensor_dict[fields.InputDataFields.image], masks)
+      func = _FUSED_GEOMETRIC_OPS[func]
+
     def get_arg(key):
       return tensor_dict[key] if key is not None else None
 
@@ -2552,6 +3154,8 @@ def preprocess(tensor_dict, preprocess_options, func_arg_map=None):
     for res, arg_name in zip(results, arg_names):
       tensor_dict[arg_name] = res
 
+  _materialize_geometric_view(tensor_dict)
+
   # changes the image to images (rank 3 to rank 4) to be compatible to what
   # we received in the first place
   if fields.InputDataFields.image in tensor_dict:
@@ -0,0 +1,115 @@
+# Copyright 2017 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+r"""Micro-benchmark for the fused geometric mode of preprocessor.preprocess.
+
+Measures the examples/sec of the data augmentation of the default SSD and
+Faster R-CNN configs, and of a longer chain of geometric ops, on a synthetic
+example with and without fuse_geometric_ops.
+
+Example usage:
+    python -m object_detection.core.preprocessor_benchmark
+"""
+import time
+
+import numpy as np
+import tensorflow as tf
+
+from object_detection.core import preprocessor
+from object_detection.core import standard_fields as fields
+
+_IMAGE_SIZE = [480, 640]
+_NUM_BOXES = 10
+_NUM_WARMUP_RUNS = 10
+_NUM_RUNS = 200
+
+_PREPROCESS_OPTIONS = [
+    ('ssd', [
+        (preprocessor.random_horizontal_flip, {}),
+        (preprocessor.ssd_random_crop, {}),
+    ]),
+    ('faster_rcnn', [
+        (preprocessor.random_horizontal_flip, {}),
+    ]),
+    ('geometric_chain', [
+        (preprocessor.random_horizontal_flip, {}),
+        (preprocessor.random_vertical_flip, {}),
+        (preprocessor.random_image_scale, {}),
+        (preprocessor.random_pad_image, {}),
+        (preprocessor.random_crop_image, {}),
+    ]),
+]
+
+
+def _create_tensor_dict(include_instance_masks, seed=0):
+  """Creates a synthetic decoded example."""
+  random_state = np.random.RandomState(seed)
+  height, width = _IMAGE_SIZE
+  image = random_state.uniform(0, 255, size=[1, height, width, 3])
+  mins = random_state.uniform(0.0, 0.5, size=[_NUM_BOXES, 2])
+  maxs = mins + random_state.uniform(0.1, 0.5, size=[_NUM_BOXES, 2])
+  boxes = np.hstack([mins, maxs])
+  tensor_dict = {
+      fields.InputDataFields.image: tf.constant(image, dtype=tf.float32),
+      fields.InputDataFields.groundtruth_boxes:
+          tf.constant(boxes, dtype=tf.float32),
+      fields.InputDataFields.groundtruth_classes:
+          tf.constant(random_state.randint(1, 10, size=[_NUM_BOXES])),
+  }
+  if include_instance_masks:
+    masks = np.zeros([_NUM_BOXES, height, width], dtype=np.float32)
+    for mask, box in zip(masks, boxes):
+      ymin, xmin, ymax, xmax = (box * [height, width, height, width]).astype(
+          np.int32)
+      mask[ymin:ymax, xmin:xmax] = 1.0
+    tensor_dict[fields.InputDataFields.groundtruth_instance_masks] = (
+        tf.constant(masks))
+  return tensor_dict
+
+
+def _examples_per_sec(preprocess_options, include_instance_masks,
+                      fuse_geometric_ops):
+  """Returns the examples/sec of preprocess for the given options."""
+  with tf.Graph().as_default():
+    tensor_dict = preprocessor.preprocess(
+        _create_tensor_dict(include_instance_masks), preprocess_options,
+        func_arg_map=preprocessor.get_default_func_arg_map(
+            include_instance_masks=include_instance_masks),
+        fuse_geometric_ops=fuse_geometric_ops)
+    # Only fetch a scalar, so that the transfer of the outputs is not timed.
+    outputs = tf.group(*tensor_dict.values())
+    with tf.Session() as sess:
+      for _ in range(_NUM_WARMUP_RUNS):
+        sess.run(outputs)
+      start_time = time.time()
+      for _ in range(_NUM_RUNS):
+        sess.run(outputs)
+      return _NUM_RUNS / (time.time() - start_time)
+
+
+def main():
+  for name, preprocess_options in _PREPROCESS_OPTIONS:
+    for include_instance_masks in [False, True]:
+      unfused = _examples_per_sec(preprocess_options, include_instance_masks,
+                                  fuse_geometric_ops=False)
+      fused = _examples_per_sec(preprocess_options, include_instance_masks,
+                                fuse_geometric_ops=True)
+      print('%s (masks=%s): %.1f examples/sec unfused, %.1f examples/sec fused '
+            '(%.2fx)' % (name, include_instance_masks, unfused, fused,
+                         fused / unfused))
+
+
+if __name__ == '__main__':
+  main()
@@ -2284,5 +2284,119 @@ class PreprocessorTest(tf.test.TestCase):
                                             include_instance_masks=True,
                                             include_keypoints=True)
 
+  def createCoordinateTestImage(self, height, width):
+    """Returns an image whose pixels hold their row and column indices."""
+    rows, cols = np.mgrid[0:height, 0:width].astype(np.float32)
+    image = np.stack([rows, cols, np.ones_like(rows)], axis=2)
+    return tf.constant(np.expand_dims(image, 0))
+
+  def _checkFusedGeometricOps(self, preprocess_options, clipped_boxes=False,
+                              num_runs=20):
+    """Checks that fused ops keep the image, box and mask consistent."""
+    height, width = 60, 80
+    # The box covers source rows [15, 45) and columns [20, 60).
+    boxes = np.array([[0.25, 0.25, 0.75, 0.75]], dtype=np.float32)
+    masks = np.zeros([1, height, width], dtype=np.float32)
+    masks[0, 15:45, 20:60] = 1.0
+    tensor_dict = {
+        fields.InputDataFields.image:
+            self.createCoordinateTestImage(height, width),
+        fields.InputDataFields.groundtruth_boxes: tf.constant(boxes),
+        fields.InputDataFields.groundtruth_classes: tf.constant([1]),
+        fields.InputDataFields.groundtruth_instance_masks: tf.constant(masks),
+    }
+    preprocessor_arg_map = preprocessor.get_default_func_arg_map(
+        include_instance_masks=True)
+    tensor_dict = preprocessor.preprocess(
+        tensor_dict, preprocess_options, func_arg_map=preprocessor_arg_map,
+        fuse_geometric_ops=True)
+    with self.test_session() as sess:
+      for _ in range(num_runs):
+        output_dict = sess.run(tensor_dict)
+        image = output_dict[fields.InputDataFields.image][0]
+        boxes = output_dict[fields.InputDataFields.groundtruth_boxes]
+        masks = output_dict[fields.InputDataFields.groundtruth_instance_masks]
+        self.assertEqual(masks.shape[1:], image.shape[:2])
+        self.assertEqual(masks.shape[0], boxes.shape[0])
+        # Pixels are copied, not interpolated.
+        self.assertAllClose(image, np.round(image), atol=1e-3)
+        if not boxes.shape[0]:
+          continue
+        out_height, out_width = image.shape[:2]
+        ymin, xmin, ymax, xmax = np.round(
+            boxes[0] * [out_height, out_width, out_height, out_width]).astype(
+                np.int32)
+        box_pixels = image[ymin:ymax, xmin:xmax]
+        box_rows = np.unique(np.round(box_pixels[:, :, 0]))
+        box_cols = np.unique(np.round(box_pixels[:, :, 1]))
+        if clipped_boxes:
+          self.assertTrue(set(box_rows) <= set(range(15, 45)))
+          self.assertTrue(set(box_cols) <= set(range(20, 60)))
+        else:
+          self.assertAllEqual(box_rows, np.arange(15, 45))
+          self.assertAllEqual(box_cols, np.arange(20, 60))
+        box_area = (ymax - ymin) * (xmax - xmin)
+        self.assertEqual(masks[0].sum(), box_area)
+        self.assertEqual(masks[0, ymin:ymax, xmin:xmax].sum(), box_area)
+
+  def testFusedFlipsAndCrop(self):
+    preprocess_options = [
+        (preprocessor.random_horizontal_flip, {}),
+        (preprocessor.random_vertical_flip, {}),
+        (preprocessor.random_crop_image, {'random_coef': 0.5}),
+        (preprocessor.random_horizontal_flip, {}),
+    ]
+    self._checkFusedGeometricOps(preprocess_options)
+
+  def testFusedPadAndCrop(self):
+    preprocess_options = [
+        (preprocessor.random_pad_image, {
+            'pad_color': tf.constant([-1.0, -1.0, -1.0])}),
+        (preprocessor.random_crop_image, {}),
+        (preprocessor.random_horizontal_flip, {}),
+    ]
+    self._checkFusedGeometricOps(preprocess_options)
+
+  def testFusedSSDRandomCrop(self):
+    preprocess_options = [
+        (preprocessor.random_horizontal_flip, {}),
+        (preprocessor.ssd_random_crop, {}),
+    ]
+    self._checkFusedGeometricOps(preprocess_options, clipped_boxes=True)
+
+  def testFusedOpsAroundNonGeometricOp(self):
+    preprocess_options = [
+        (preprocessor.random_horizontal_flip, {}),
+        (preprocessor.random_pixel_value_scale, {
+            'minval': 1.0, 'maxval': 1.0}),
+        (preprocessor.random_pad_image, {
+            'pad_color': tf.constant([-1.0, -1.0, -1.0])}),
+        (preprocessor.random_pad_image, {
+            'pad_color': tf.constant([-2.0, -2.0, -2.0])}),
+        (preprocessor.random_crop_image, {}),
+    ]
+    self._checkFusedGeometricOps(preprocess_options, num_runs=5)
+
+  def testFusedImageScale(self):
+    image = self.createColorfulTestImage()
+    tensor_dict = {fields.InputDataFields.image: tf.to_float(image)}
+    preprocess_options = [
+        (preprocessor.random_horizontal_flip, {}),
+        (preprocessor.random_image_scale, {
+            'min_scale_ratio': 0.5, 'max_scale_ratio': 2.0}),
+    ]
+    tensor_dict = preprocessor.preprocess(
+        tensor_dict, preprocess_options, fuse_geometric_ops=True)
+    with self.test_session() as sess:
+      for _ in range(5):
+        scaled_image = sess.run(tensor_dict[fields.InputDataFields.image])
+        self.assertTrue(50 <= scaled_image.shape[1] <= 400)
+        self.assertTrue(100 <= scaled_image.shape[2] <= 800)
+        self.assertAllClose(scaled_image.shape[1] * 2, scaled_image.shape[2],
+                            atol=2)
+        self.assertTrue(np.all(scaled_image >= 0.0))
+        self.assertTrue(np.all(scaled_image <= 255.0))
+
+
 if __name__ == '__main__':
   tf.test.main()
@@ -57,6 +57,8 @@ class InputDataFields(object):
     groundtruth_keypoints: ground truth keypoints.
     groundtruth_keypoint_visibilities: ground truth keypoint visibilities.
     groundtruth_label_scores: groundtruth label scores.
+    groundtruth_anchor_matches: precomputed index of the groundtruth box
+      matched to each anchor (see matcher.Match).
   """
   image = 'image'
   original_image = 'original_image'
@@ -79,6 +81,7 @@ class InputDataFields(object):
   groundtruth_keypoints = 'groundtruth_keypoints'
   groundtruth_keypoint_visibilities = 'groundtruth_keypoint_visibilities'
   groundtruth_label_scores = 'groundtruth_label_scores'
+  groundtruth_anchor_matches = 'groundtruth_anchor_matches'
 
 
 class DetectionResultFields(object):
@@ -171,6 +174,8 @@ class TfExampleFields(object):
     detection_bbox_ymax: ymax coordinates of a detection box.
     detection_bbox_xmax: xmax coordinates of a detection box.
     detection_score: detection score for the class label and box.
+    anchor_matches: precomputed index of the groundtruth box matched to each
+      anchor of a model, -1 for unmatched and -2 for ignored anchors.
   """
   image_encoded = 'image/encoded'
   image_format = 'image/format'  # format is reserved keyword
@@ -203,3 +208,4 @@ class TfExampleFields(object):
   detection_bbox_ymax = 'image/detection/bbox/ymax'
   detection_bbox_xmax = 'image/detection/bbox/xmax'
   detection_score = 'image/detection/score'
+  anchor_matches = 'image/anchor_matches'
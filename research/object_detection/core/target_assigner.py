@@ -94,7 +94,7 @@ class TargetAssigner(object):
     return self._box_coder
 
   def assign(self, anchors, groundtruth_boxes, groundtruth_labels=None,
-             **params):
+             match=None, **params):
     """Assign classification and regression targets to each anchor.
 
     For a given set of anchors and groundtruth detections, match anchors
@@ -113,6 +113,9 @@ class TargetAssigner(object):
         [d_1, ... d_k] can be empty (corresponding to scalar inputs).  When set
         to None, groundtruth_labels assumes a binary problem where all
         ground_truth boxes get a positive label (of 1).
+      match: (optional) a precomputed matcher.Match object between anchors and
+        groundtruth_boxes, e.g. computed offline for a fixed set of anchors.
+        If provided, the similarity computation and matching are skipped.
       **params: Additional keyword arguments for specific implementations of
               the Matcher.
 
@@ -150,9 +153,16 @@ class TargetAssigner(object):
 
     with tf.control_dependencies(
         [unmatched_shape_assert, labels_and_box_shapes_assert]):
-      match_quality_matrix = self._similarity_calc.compare(groundtruth_boxes,
-                                                           anchors)
-      match = self._matcher.match(match_quality_matrix, **params)
+      if match is None:
+        match_quality_matrix = self._similarity_calc.compare(groundtruth_boxes,
+                                                             anchors)
+        match = self._matcher.match(match_quality_matrix, **params)
+      else:
+        match_size_assert = tf.assert_equal(
+            tf.size(match.match_results), anchors.num_boxes(),
+            message='Precomputed match and anchors have incompatible shapes!')
+        with tf.control_dependencies([match_size_assert]):
+          match = mat.Match(tf.identity(match.match_results))
       reg_targets = self._create_regression_targets(anchors,
                                                     groundtruth_boxes,
                                                     match)
@@ -391,7 +401,8 @@ def create_target_assigner(reference, stage=None,
 def batch_assign_targets(target_assigner,
                          anchors_batch,
                          gt_box_batch,
-                         gt_class_targets_batch):
+                         gt_class_targets_batch,
+                         match_batch=None):
   """Batched assignment of classification and regression targets.
 
   Args:
@@ -404,6 +415,8 @@ def batch_assign_targets(target_assigner,
       each tensor has shape [num_gt_boxes_i, classification_target_size] and
       num_gt_boxes_i is the number of boxes in the ith boxlist of
       gt_box_batch.
+    match_batch: (optional) a list of precomputed matcher.Match objects with
+      length batch_size, see TargetAssigner.assign.
 
   Returns:
     batch_cls_targets: a tensor with shape [batch_size, num_anchors,
@@ -420,7 +433,7 @@ def batch_assign_targets(target_assigner,
     ValueError: if input list lengths are inconsistent, i.e.,
       batch_size == len(gt_box_batch) == len(gt_class_targets_batch)
         and batch_size == len(anchors_batch) unless anchors_batch is a single
-        BoxList.
+        BoxList, and batch_size == len(match_batch) if match_batch is given.
   """
   if not isinstance(anchors_batch, list):
     anchors_batch = len(gt_box_batch) * [anchors_batch]
@@ -432,16 +445,20 @@ def batch_assign_targets(target_assigner,
           == len(gt_class_targets_batch)):
     raise ValueError('batch size incompatible with lengths of anchors_batch, '
                      'gt_box_batch and gt_class_targets_batch.')
+  if match_batch is None:
+    match_batch = len(gt_box_batch) * [None]
+  elif len(match_batch) != len(gt_box_batch):
+    raise ValueError('batch size incompatible with length of match_batch.')
   cls_targets_list = []
   cls_weights_list = []
   reg_targets_list = []
   reg_weights_list = []
   match_list = []
-  for anchors, gt_boxes, gt_class_targets in zip(
-      anchors_batch, gt_box_batch, gt_class_targets_batch):
+  for anchors, gt_boxes, gt_class_targets, precomputed_match in zip(
+      anchors_batch, gt_box_batch, gt_class_targets_batch, match_batch):
     (cls_targets, cls_weights, reg_targets,
      reg_weights, match) = target_assigner.assign(
-         anchors, gt_boxes, gt_class_targets)
+         anchors, gt_boxes, gt_class_targets, match=precomputed_match)
     cls_targets_list.append(cls_targets)
     cls_weights_list.append(cls_weights)
     reg_targets_list.append(reg_targets)
@@ -19,6 +19,7 @@ import tensorflow as tf
 
 from object_detection.box_coders import mean_stddev_box_coder
 from object_detection.core import box_list
+from object_detection.core import matcher as mat
 from object_detection.core import region_similarity_calculator
 from object_detection.core import target_assigner as targetassigner
 from object_detection.matchers import argmax_matcher
@@ -121,6 +122,56 @@ class TargetAssignerTest(tf.test.TestCase):
       self.assertEquals(reg_weights_out.dtype, np.float32)
       self.assertEquals(matching_anchors_out.dtype, np.int32)
 
+  def test_assign_with_precomputed_match(self):
+    similarity_calc = region_similarity_calculator.IouSimilarity()
+    matcher = argmax_matcher.ArgMaxMatcher(matched_threshold=0.5,
+                                           unmatched_threshold=0.3)
+    box_coder = mean_stddev_box_coder.MeanStddevBoxCoder()
+    target_assigner = targetassigner.TargetAssigner(
+        similarity_calc, matcher, box_coder)
+
+    prior_means = tf.constant([[0.0, 0.0, 0.5, 0.5],
+                               [0.5, 0.5, 1.0, 0.8],
+                               [0.0, 0.5, .9, 1.0]])
+    prior_stddevs = tf.constant(3 * [4 * [.1]])
+    priors = box_list.BoxList(prior_means)
+    priors.add_field('stddev', prior_stddevs)
+
+    box_corners = [[0.0, 0.0, 0.5, 0.5],
+                   [0.5, 0.5, 0.9, 0.9]]
+    boxes = box_list.BoxList(tf.constant(box_corners))
+
+    matched_result = target_assigner.assign(priors, boxes)
+    precomputed_match = mat.Match(tf.constant([0, 1, -2], dtype=tf.int32))
+    precomputed_result = target_assigner.assign(priors, boxes,
+                                                match=precomputed_match)
+    with self.test_session() as sess:
+      matched_out, precomputed_out = sess.run(
+          [matched_result[:4] + (matched_result[4].match_results,),
+           precomputed_result[:4] + (precomputed_result[4].match_results,)])
+      for matched_tensor, precomputed_tensor in zip(matched_out,
+                                                    precomputed_out):
+        self.assertAllClose(matched_tensor, precomputed_tensor)
+
+  def test_assign_with_precomputed_match_of_wrong_size(self):
+    similarity_calc = region_similarity_calculator.IouSimilarity()
+    matcher = argmax_matcher.ArgMaxMatcher(matched_threshold=0.5)
+    box_coder = mean_stddev_box_coder.MeanStddevBoxCoder()
+    target_assigner = targetassigner.TargetAssigner(
+        similarity_calc, matcher, box_coder)
+
+    priors = box_list.BoxList(tf.constant([[0.0, 0.0, 0.5, 0.5],
+                                           [0.5, 0.5, 1.0, 0.8]]))
+    priors.add_field('stddev', tf.constant(2 * [4 * [.1]]))
+    boxes = box_list.BoxList(tf.constant([[0.0, 0.0, 0.5, 0.5]]))
+    precomputed_match = mat.Match(tf.constant([0, -1, -1], dtype=tf.int32))
+    result = target_assigner.assign(priors, boxes, match=precomputed_match)
+    with self.test_session() as sess:
+      with self.assertRaisesWithPredicateMatch(
+          tf.errors.InvalidArgumentError,
+          'Precomputed match and anchors have incompatible shapes'):
+        sess.run(result[0])
+
   def test_assign_multiclass(self):
     similarity_calc = region_similarity_calculator.NegSqDistSimilarity()
     matcher = bipartite_matcher.GreedyBipartiteMatcher()
@@ -0,0 +1,234 @@
+# Copyright 2017 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""A persistent cache of decoded examples.
+
+Evaluation jobs decode the same records for every checkpoint they evaluate.
+DecodedExampleCache stores the decoded tensors of each record in a local
+memory-mapped file keyed by a fingerprint of the serialized record, so that
+subsequent passes over the data skip proto parsing and, optionally, image
+decoding.
+
+The cache directory holds two files:
+  decoded_examples.data: the concatenated raw bytes of all cached arrays.
+  decoded_examples.index: a pickled dictionary mapping record fingerprints to
+    the dtype, shape and location of each of their cached items.
+
+Records decoded with different decoder options are cached separately, but the
+cache does not know how the decoding functions are implemented: the cache
+directory must be cleared whenever they change.
+"""
+import atexit
+import os
+import pickle
+import threading
+
+import numpy as np
+import tensorflow as tf
+
+_DATA_FILENAME = 'decoded_examples.data'
+_INDEX_FILENAME = 'decoded_examples.index'
+# dtype name used in the index for string items, which are stored as raw bytes.
+_BYTES_DTYPE = 'bytes'
+
+
+class DecodedExampleCache(object):
+  """Memory-mapped cache of decoded examples keyed by record fingerprint."""
+
+  def __init__(self, cache_dir, cache_images=False, flush_every=100):
+    """Constructor opens (or creates) the cache in cache_dir.
+
+    Args:
+      cache_dir: local directory holding the cache files.
+      cache_images: whether decoded images are cached too. Decoded images are
+        much larger than the encoded ones, so this trades disk space for the
+        cost of decoding.
+      flush_every: the index is written to disk every flush_every insertions,
+        and when the process exits.
+    """
+    self._cache_images = cache_images
+    self._flush_every = flush_every
+    tf.gfile.MakeDirs(cache_dir)
+    self._data_path = os.path.join(cache_dir, _DATA_FILENAME)
+    self._index_path = os.path.join(cache_dir, _INDEX_FILENAME)
+    self._index = {}
+    if os.path.exists(self._index_path):
+      with open(self._index_path, 'rb') as index_file:
+        self._index = pickle.load(index_file)
+    self._data_file = open(self._data_path, 'ab')
+    # Bytes past the last flushed index are not referenced and are skipped.
+    self._data_size = os.path.getsize(self._data_path)
+    self._data_map = None
+    self._num_unflushed = 0
+    self._lock = threading.Lock()
+    atexit.register(self.flush)
+
+  @property
+  def cache_images(self):
+    return self._cache_images
+
+  def __len__(self):
+    return len(self._index)
+
+  def contains(self, fingerprint, keys):
+    """Returns whether all items in keys are cached for fingerprint."""
+    with self._lock:
+      entry = self._index.get(fingerprint)
+      return entry is not None and all(key in entry for key in keys)
+
+  def lookup(self, fingerprint, keys):
+    """Returns the cached arrays of the items in keys for fingerprint.
+
+    Args:
+      fingerprint: the fingerprint of the serialized record.
+      keys: the item names to look up.
+
+    Returns:
+      A list with one numpy array (or bytes object for string items) per key.
+
+    Raises:
+      KeyError: if an item is not cached.
+    """
+    with self._lock:
+      entry = self._index[fingerprint]
+      locations = [entry[key] for key in keys]
+      if self._data_size and (self._data_map is None or
+                              len(self._data_map) < self._data_size):
+        self._data_file.flush()
+        self._data_map = np.memmap(self._data_path, dtype=np.uint8, mode='r')
+      data_map = self._data_map
+    values = []
+    for dtype, shape, offset, num_bytes in locations:
+      if num_bytes:
+        data = data_map[offset:offset + num_bytes]
+      else:
+        data = np.zeros([0], dtype=np.uint8)
+      if dtype == _BYTES_DTYPE:
+        values.append(data.tostring())
+      else:
+        values.append(np.array(data.view(np.dtype(dtype)).reshape(shape)))
+    return values
+
+  def insert(self, fingerprint, items):
+    """Caches the given items of a record, unless the record is cached already.
+
+    Args:
+      fingerprint: the fingerprint of the serialized record.
+      items: dictionary mapping item names to numpy arrays or bytes objects.
+
+    Raises:
+      ValueError: if an item is a string array that is not a scalar.
+    """
+    with self._lock:
+      entry = self._index.get(fingerprint, {})
+      if all(key in entry for key in items):
+        return
+      entry = dict(entry)
+      for key, value in items.items():
+        value = np.asarray(value)
+        if value.dtype.kind in ('O', 'S'):
+          if value.ndim:
+            raise ValueError('Only scalar string items can be cached.')
+          dtype, shape, data = _BYTES_DTYPE, (), value.item()
+        else:
+          value = np.ascontiguousarray(value)
+          dtype, shape, data = value.dtype.str, value.shape, value.tostring()
+        self._data_file.write(data)
+        entry[key] = (dtype, shape, self._data_size, len(data))
+        self._data_size += len(data)
+      self._data_file.flush()
+      self._index[fingerprint] = entry
+      self._num_unflushed += 1
+      if self._num_unflushed >= self._flush_every:
+        self._flush_index()
+
+  def flush(self):
+    """Writes the index of the cached records to disk."""
+    with self._lock:
+      if self._num_unflushed:
+        self._flush_index()
+
+  def _flush_index(self):
+    """Writes the index to disk. Must be called with self._lock held."""
+    self._data_file.flush()
+    os.fsync(self._data_file.fileno())
+    tmp_path = self._index_path + '.tmp'
+    with open(tmp_path, 'wb') as index_file:
+      pickle.dump(self._index, index_file, pickle.HIGHEST_PROTOCOL)
+    os.rename(tmp_path, self._index_path)
+    self._num_unflushed = 0
+
+  def decode(self, serialized_example, decode_fn, item_specs,
+             uncached_keys=(), decode_uncached_fn=None, decoder_options=None):
+    """Decodes a serialized record, reading from or filling the cache.
+
+    The first time a record is seen its tensors are computed by decode_fn and
+    stored in the cache. Afterwards they are read from the cache, except for the
+    items in uncached_keys which are computed by decode_uncached_fn.
+
+    Args:
+      serialized_example: a scalar string tensor holding the serialized record.
+      decode_fn: a function mapping serialized_example to a dictionary of
+        decoded tensors.
+      item_specs: a dictionary mapping the names of the items returned by
+        decode_fn to (dtype, static shape) tuples of their tensors. String items
+        must be scalars.
+      uncached_keys: names of the items that are not cached.
+      decode_uncached_fn: a function mapping serialized_example to a dictionary
+        holding the items in uncached_keys.
+      decoder_options: an optional picklable and hashable value identifying the
+        options of decode_fn. The items of a record decoded with different
+        options are cached separately.
+
+    Returns:
+      A dictionary of decoded tensors with the same keys as item_specs.
+    """
+    uncached_keys = sorted(uncached_keys)
+    keys = sorted(set(item_specs) - set(uncached_keys))
+    fingerprint = tf.string_to_hash_bucket_fast(serialized_example, 2**63 - 1)
+
+    def cache_key(fp):
+      if decoder_options is None:
+        return fp
+      return (decoder_options, int(fp))
+    found = tf.py_func(lambda fp: self.contains(cache_key(fp), keys),
+                       [fingerprint], tf.bool, stateful=True)
+    found.set_shape([])
+
+    def from_cache():
+      values = tf.py_func(lambda fp: self.lookup(cache_key(fp), keys),
+                          [fingerprint],
+                          [item_specs[key][0] for key in keys], stateful=True)
+      uncached = decode_uncached_fn(serialized_example) if uncached_keys else {}
+      return values + [uncached[key] for key in uncached_keys]
+
+    def decode_and_insert():
+      tensor_dict = decode_fn(serialized_example)
+
+      def insert(fp, *values):
+        self.insert(cache_key(fp), dict(zip(keys, values)))
+        return True
+      inserted = tf.py_func(insert,
+                            [fingerprint] + [tensor_dict[key] for key in keys],
+                            tf.bool, stateful=True)
+      with tf.control_dependencies([inserted]):
+        return [tf.identity(tensor_dict[key])
+                for key in keys + uncached_keys]
+
+    values = tf.cond(found, from_cache, decode_and_insert)
+    tensor_dict = {}
+    for key, value in zip(keys + uncached_keys, values):
+      value.set_shape(item_specs[key][1])
+      tensor_dict[key] = value
+    return tensor_dict
@@ -0,0 +1,99 @@
+# Copyright 2017 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for object_detection.data_decoders.decoded_example_cache."""
+
+import os
+import numpy as np
+import tensorflow as tf
+
+from object_detection.data_decoders import decoded_example_cache
+
+
+class DecodedExampleCacheTest(tf.test.TestCase):
+
+  def _cache_dir(self, name):
+    return os.path.join(self.get_temp_dir(), name)
+
+  def testInsertAndLookup(self):
+    cache = decoded_example_cache.DecodedExampleCache(self._cache_dir('simple'))
+    items = {
+        'boxes': np.array([[0.0, 0.1, 0.5, 0.6]], dtype=np.float32),
+        'classes': np.array([3], dtype=np.int64),
+        'is_crowd': np.array([True]),
+        'empty': np.zeros([0, 4], dtype=np.float32),
+        'source_id': 'image_id',
+    }
+    keys = sorted(items)
+    self.assertFalse(cache.contains(7, keys))
+    cache.insert(7, items)
+    self.assertTrue(cache.contains(7, keys))
+    self.assertFalse(cache.contains(7, keys + ['image']))
+    self.assertFalse(cache.contains(8, keys))
+
+    values = cache.lookup(7, keys)
+    for key, value in zip(keys, values):
+      if key == 'source_id':
+        self.assertEqual(value, 'image_id')
+      else:
+        self.assertEqual(value.dtype, items[key].dtype)
+        self.assertAllEqual(value, items[key])
+
+  def testPersistsAcrossInstances(self):
+    cache_dir = self._cache_dir('persistent')
+    cache = decoded_example_cache.DecodedExampleCache(cache_dir, flush_every=2)
+    cache.insert(1, {'classes': np.array([1, 2])})
+    cache.insert(2, {'classes': np.array([3])})
+    # Not yet flushed to the index.
+    cache.insert(3, {'classes': np.array([4])})
+
+    reopened_cache = decoded_example_cache.DecodedExampleCache(cache_dir)
+    self.assertEqual(len(reopened_cache), 2)
+    self.assertAllEqual(reopened_cache.lookup(2, ['classes'])[0], [3])
+    self.assertFalse(reopened_cache.contains(3, ['classes']))
+
+    cache.flush()
+    reopened_cache = decoded_example_cache.DecodedExampleCache(cache_dir)
+    self.assertEqual(len(reopened_cache), 3)
+    self.assertAllEqual(reopened_cache.lookup(3, ['classes'])[0], [4])
+
+  def testDecodeReadsFromCache(self):
+    cache = decoded_example_cache.DecodedExampleCache(self._cache_dir('decode'))
+    num_decodes = []
+
+    def decode_fn(serialized_example):
+      def count(value):
+        num_decodes.append(1)
+        return value
+      length = tf.py_func(count, [tf.size(tf.string_split(
+          tf.expand_dims(serialized_example, 0), delimiter=',').values)],
+                          tf.int32)
+      return {'length': length, 'value': serialized_example}
+
+    item_specs = {'length': (tf.int32, tf.TensorShape([])),
+                  'value': (tf.string, tf.TensorShape([]))}
+    serialized_example = tf.placeholder(tf.string, shape=[])
+    tensor_dict = cache.decode(serialized_example, decode_fn, item_specs)
+
+    with self.test_session() as sess:
+      for example in ['a,b', 'a,b,c', 'a,b']:
+        result = sess.run(tensor_dict, {serialized_example: example})
+        self.assertEqual(result['length'], len(example.split(',')))
+        self.assertEqual(result['value'], example)
+    self.assertEqual(len(num_decodes), 2)
+    self.assertEqual(len(cache), 2)
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -33,7 +33,9 @@ class TfExampleDecoder(data_decoder.DataDecoder):
   def __init__(self,
                load_instance_masks=False,
                label_map_proto_file=None,
-               use_display_name=False):
+               use_display_name=False,
+               decoded_example_cache=None,
+               load_anchor_matches=False):
     """Constructor sets keys_to_features and items_to_handlers.
 
     Args:
@@ -46,7 +48,16 @@ class TfExampleDecoder(data_decoder.DataDecoder):
       use_display_name: whether or not to use the `display_name` for label
         mapping (instead of `name`).  Only used if label_map_proto_file is
         provided.
+      decoded_example_cache: an optional
+        decoded_example_cache.DecodedExampleCache. If provided, decoded
+        examples are stored in and read back from the cache.
+      load_anchor_matches: whether or not to load the anchor matches
+        precomputed by dataset_tools/add_anchor_matches_to_tf_record.py.
     """
+    self._decoded_example_cache = decoded_example_cache
+    # Identifies the decoded items in the cache.
+    self._decoder_options = (load_instance_masks, label_map_proto_file,
+                             use_display_name, load_anchor_matches)
     self.keys_to_features = {
         'image/encoded':
             tf.FixedLenFeature((), tf.string, default_value=''),
@@ -113,6 +124,12 @@ class TfExampleDecoder(data_decoder.DataDecoder):
               slim_example_decoder.ItemHandlerCallback(
                   ['image/object/mask', 'image/height', 'image/width'],
                   self._reshape_instance_masks))
+    if load_anchor_matches:
+      anchor_matches_key = fields.TfExampleFields.anchor_matches
+      self.keys_to_features[anchor_matches_key] = tf.VarLenFeature(tf.int64)
+      self.items_to_handlers[
+          fields.InputDataFields.groundtruth_anchor_matches] = (
+              slim_example_decoder.Tensor(anchor_matches_key))
     # TODO: Add label_handler that decodes from 'image/object/class/text'
     # primarily after the recent tf.contrib.slim changes make into a release
     # supported by cloudml.
@@ -151,8 +168,26 @@ class TfExampleDecoder(data_decoder.DataDecoder):
         [None] indicating if the boxes represent `group_of` instances.
       fields.InputDataFields.groundtruth_instance_masks - 3D int64 tensor of
         shape [None, None, None] containing instance masks.
+      fields.InputDataFields.groundtruth_anchor_matches - 1D int64 tensor of
+        shape [None] containing the index of the groundtruth box matched to
+        each anchor, -1 for unmatched and -2 for ignored anchors.
     """
     serialized_example = tf.reshape(tf_example_string_tensor, shape=[])
+    if self._decoded_example_cache is None:
+      tensor_dict = self._decode(serialized_example)
+    else:
+      uncached_keys = []
+      if not self._decoded_example_cache.cache_images:
+        uncached_keys = [fields.InputDataFields.image]
+      tensor_dict = self._decoded_example_cache.decode(
+          serialized_example, self._decode, self._item_specs(),
+          uncached_keys=uncached_keys, decode_uncached_fn=self._decode_image,
+          decoder_options=self._decoder_options)
+    tensor_dict[fields.InputDataFields.image].set_shape([None, None, 3])
+    return tensor_dict
+
+  def _decode(self, serialized_example):
+    """Decodes all items of a scalar serialized example."""
     decoder = slim_example_decoder.TFExampleDecoder(self.keys_to_features,
                                                     self.items_to_handlers)
     keys = decoder.list_items()
@@ -160,9 +195,27 @@ class TfExampleDecoder(data_decoder.DataDecoder):
     tensor_dict = dict(zip(keys, tensors))
     is_crowd = fields.InputDataFields.groundtruth_is_crowd
     tensor_dict[is_crowd] = tf.cast(tensor_dict[is_crowd], dtype=tf.bool)
-    tensor_dict[fields.InputDataFields.image].set_shape([None, None, 3])
     return tensor_dict
 
+  def _decode_image(self, serialized_example):
+    """Decodes only the image of a scalar serialized example."""
+    image_key = fields.InputDataFields.image
+    keys_to_features = {
+        key: self.keys_to_features[key]
+        for key in ['image/encoded', 'image/format']
+    }
+    decoder = slim_example_decoder.TFExampleDecoder(
+        keys_to_features, {image_key: self.items_to_handlers[image_key]})
+    image, = decoder.decode(serialized_example, items=[image_key])
+    return {image_key: image}
+
+  def _item_specs(self):
+    """Returns a dict mapping decoded items to their dtypes and shapes."""
+    with tf.Graph().as_default():
+      tensor_dict = self._decode(tf.placeholder(tf.string, shape=[]))
+    return {key: (tensor.dtype, tensor.get_shape())
+            for key, tensor in tensor_dict.items()}
+
   def _reshape_instance_masks(self, keys_to_tensors):
     """Reshape instance segmentation masks.
 
@@ -20,6 +20,7 @@ import numpy as np
 import tensorflow as tf
 
 from object_detection.core import standard_fields as fields
+from object_detection.data_decoders import decoded_example_cache
 from object_detection.data_decoders import tf_example_decoder
 
 
@@ -345,6 +346,107 @@ class TfExampleDecoderTest(tf.test.TestCase):
     self.assertTrue(fields.InputDataFields.groundtruth_instance_masks
                     not in tensor_dict)
 
+  def testDecodeAnchorMatches(self):
+    image_tensor = np.random.randint(255, size=(4, 5, 3)).astype(np.uint8)
+    encoded_jpeg = self._EncodeImage(image_tensor)
+    anchor_matches = [0, -1, -2, 1, -1]
+    example = tf.train.Example(features=tf.train.Features(feature={
+        'image/encoded': self._BytesFeature(encoded_jpeg),
+        'image/format': self._BytesFeature('jpeg'),
+        'image/anchor_matches': self._Int64Feature(anchor_matches),
+    })).SerializeToString()
+
+    example_decoder = tf_example_decoder.TfExampleDecoder()
+    tensor_dict = example_decoder.decode(tf.convert_to_tensor(example))
+    self.assertTrue(fields.InputDataFields.groundtruth_anchor_matches
+                    not in tensor_dict)
+
+    example_decoder = tf_example_decoder.TfExampleDecoder(
+        load_anchor_matches=True)
+    tensor_dict = example_decoder.decode(tf.convert_to_tensor(example))
+    with self.test_session() as sess:
+      tensor_dict = sess.run(tensor_dict)
+    self.assertAllEqual(
+        anchor_matches,
+        tensor_dict[fields.InputDataFields.groundtruth_anchor_matches])
+
+  def testDecodeWithCache(self):
+    image_tensor = np.random.randint(255, size=(4, 5, 3)).astype(np.uint8)
+    encoded_jpeg = self._EncodeImage(image_tensor)
+    decoded_jpeg = self._DecodeImage(encoded_jpeg)
+    bbox_ymins = [0.0, 4.0]
+    bbox_xmins = [1.0, 5.0]
+    bbox_ymaxs = [2.0, 6.0]
+    bbox_xmaxs = [3.0, 7.0]
+    example = tf.train.Example(features=tf.train.Features(feature={
+        'image/encoded': self._BytesFeature(encoded_jpeg),
+        'image/format': self._BytesFeature('jpeg'),
+        'image/source_id': self._BytesFeature('image_id'),
+        'image/object/bbox/ymin': self._FloatFeature(bbox_ymins),
+        'image/object/bbox/xmin': self._FloatFeature(bbox_xmins),
+        'image/object/bbox/ymax': self._FloatFeature(bbox_ymaxs),
+        'image/object/bbox/xmax': self._FloatFeature(bbox_xmaxs),
+        'image/object/class/label': self._Int64Feature([3, 4]),
+        'image/object/is_crowd': self._Int64Feature([0, 1]),
+    })).SerializeToString()
+
+    for cache_images in [False, True]:
+      cache = decoded_example_cache.DecodedExampleCache(
+          os.path.join(self.get_temp_dir(), 'cache_{}'.format(cache_images)),
+          cache_images=cache_images)
+      example_decoder = tf_example_decoder.TfExampleDecoder(
+          decoded_example_cache=cache)
+      tensor_dict = example_decoder.decode(tf.convert_to_tensor(example))
+
+      self.assertAllEqual((tensor_dict[fields.InputDataFields.image].
+                           get_shape().as_list()), [None, None, 3])
+      self.assertAllEqual(
+          (tensor_dict[fields.InputDataFields.groundtruth_boxes].
+           get_shape().as_list()), [None, 4])
+      with self.test_session() as sess:
+        first_tensor_dict = sess.run(tensor_dict)
+        self.assertEqual(len(cache), 1)
+        second_tensor_dict = sess.run(tensor_dict)
+
+      expected_boxes = np.vstack([bbox_ymins, bbox_xmins,
+                                  bbox_ymaxs, bbox_xmaxs]).transpose()
+      for result in [first_tensor_dict, second_tensor_dict]:
+        self.assertAllEqual(decoded_jpeg,
+                            result[fields.InputDataFields.image])
+        self.assertEqual('image_id',
+                         result[fields.InputDataFields.source_id])
+        self.assertAllEqual(
+            expected_boxes, result[fields.InputDataFields.groundtruth_boxes])
+        self.assertAllEqual(
+            [3, 4], result[fields.InputDataFields.groundtruth_classes])
+        self.assertAllEqual(
+            [False, True], result[fields.InputDataFields.groundtruth_is_crowd])
+
+  def testDecodersWithDifferentOptionsDoNotShareCachedExamples(self):
+    image_tensor = np.random.randint(255, size=(4, 5, 3)).astype(np.uint8)
+    example = tf.train.Example(features=tf.train.Features(feature={
+        'image/encoded': self._BytesFeature(self._EncodeImage(image_tensor)),
+        'image/format': self._BytesFeature('jpeg'),
+        'image/object/class/label': self._Int64Feature([3]),
+    })).SerializeToString()
+    cache = decoded_example_cache.DecodedExampleCache(
+        os.path.join(self.get_temp_dir(), 'cache_options'))
+    tensor_dicts = [
+        tf_example_decoder.TfExampleDecoder(
+            decoded_example_cache=cache,
+            load_anchor_matches=load_anchor_matches).decode(
+                tf.convert_to_tensor(example))
+        for load_anchor_matches in [False, True]]
+    self.assertFalse(fields.InputDataFields.groundtruth_anchor_matches
+                     in tensor_dicts[0])
+    self.assertTrue(fields.InputDataFields.groundtruth_anchor_matches
+                    in tensor_dicts[1])
+    with self.test_session() as sess:
+      sess.run(tensor_dicts[0])
+      self.assertEqual(len(cache), 1)
+      sess.run(tensor_dicts[1])
+      self.assertEqual(len(cache), 2)
+
 
 if __name__ == '__main__':
   tf.test.main()
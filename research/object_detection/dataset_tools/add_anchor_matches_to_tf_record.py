@@ -0,0 +1,183 @@
+# Copyright 2017 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+r"""Precomputes the groundtruth-to-anchor matches of an SSD model.
+
+SSD models with a fixed_shape_resizer use the same anchors for every image, so
+the match between the anchors and the groundtruth boxes of an example only
+depends on the example. This tool runs the similarity calculator and matcher
+of the model on every example of the input TFRecords and writes a copy of the
+records with the matches added in the 'image/anchor_matches' feature: the index
+of the groundtruth box matched to each anchor, -1 for unmatched and -2 for
+ignored anchors.
+
+Training with `load_anchor_matches: true` in the train input reader then skips
+matching. The matches are only valid for models with the same image resizer,
+anchor generator, feature extractor, similarity calculator and matcher, and for
+training without data augmentation that changes the groundtruth boxes.
+
+Example usage:
+    python object_detection/dataset_tools/add_anchor_matches_to_tf_record.py \
+        --pipeline_config_path=path/to/ssd_mobilenet_v1.config \
+        --input_tfrecord_pattern=/data/train.record-* \
+        --output_dir=/data/with_anchor_matches
+"""
+import os
+
+import numpy as np
+import tensorflow as tf
+
+from google.protobuf import text_format
+from object_detection.builders import matcher_builder
+from object_detection.builders import model_builder
+from object_detection.builders import region_similarity_calculator_builder
+from object_detection.core import box_list
+from object_detection.core import standard_fields as fields
+from object_detection.protos import pipeline_pb2
+
+flags = tf.app.flags
+flags.DEFINE_string('pipeline_config_path', '',
+                    'Path to a pipeline_pb2.TrainEvalPipelineConfig config '
+                    'file of an SSD model.')
+flags.DEFINE_string('input_tfrecord_pattern', '',
+                    'Glob pattern of the input TFRecords.')
+flags.DEFINE_string('output_dir', '', 'Directory to write the TFRecords with '
+                    'anchor matches to, with the names of the input files.')
+FLAGS = flags.FLAGS
+
+
+def generate_anchors(model_config):
+  """Generates the anchors of an SSD model with a fixed input shape.
+
+  Args:
+    model_config: a model_pb2.DetectionModel config of an SSD model with a
+      fixed_shape_resizer.
+
+  Returns:
+    A [num_anchors, 4] float32 numpy array holding the anchors in normalized
+    coordinates.
+
+  Raises:
+    ValueError: if the model is not an SSD model with a fixed_shape_resizer.
+  """
+  if model_config.WhichOneof('model') != 'ssd':
+    raise ValueError('Anchor matches can only be precomputed for SSD models.')
+  image_resizer_config = model_config.ssd.image_resizer
+  if image_resizer_config.WhichOneof('image_resizer_oneof') != (
+      'fixed_shape_resizer'):
+    raise ValueError('Anchor matches can only be precomputed for models with '
+                     'a fixed_shape_resizer.')
+  height = image_resizer_config.fixed_shape_resizer.height
+  width = image_resizer_config.fixed_shape_resizer.width
+  with tf.Graph().as_default():
+    model = model_builder.build(model_config, is_training=False)
+    preprocessed_inputs = model.preprocess(tf.zeros([1, height, width, 3]))
+    prediction_dict = model.predict(preprocessed_inputs)
+    with tf.Session() as sess:
+      return sess.run(prediction_dict['anchors'])
+
+
+class AnchorMatcher(object):
+  """Matches groundtruth boxes to fixed anchors like an SSD model."""
+
+  def __init__(self, ssd_config, anchors):
+    """Constructor.
+
+    Args:
+      ssd_config: a ssd_pb2.Ssd config holding the similarity calculator and
+        matcher of the model.
+      anchors: a [num_anchors, 4] float32 numpy array holding the anchors.
+    """
+    self._graph = tf.Graph()
+    with self._graph.as_default():
+      similarity_calc = region_similarity_calculator_builder.build(
+          ssd_config.similarity_calculator)
+      matcher = matcher_builder.build(ssd_config.matcher)
+      self._groundtruth_boxes = tf.placeholder(tf.float32, shape=[None, 4])
+      match_quality_matrix = similarity_calc.compare(
+          box_list.BoxList(self._groundtruth_boxes),
+          box_list.BoxList(tf.constant(anchors, dtype=tf.float32)))
+      self._match_results = matcher.match(match_quality_matrix).match_results
+    self._sess = tf.Session(graph=self._graph)
+
+  def match(self, groundtruth_boxes):
+    """Returns the anchor matches of a [num_boxes, 4] array of boxes."""
+    return self._sess.run(self._match_results,
+                          {self._groundtruth_boxes: groundtruth_boxes})
+
+  def close(self):
+    self._sess.close()
+
+
+def _get_groundtruth_boxes(tf_example):
+  """Returns the [num_boxes, 4] groundtruth boxes of a tf.train.Example."""
+  feature_map = tf_example.features.feature
+  coordinates = [
+      feature_map[key].float_list.value for key in [
+          fields.TfExampleFields.object_bbox_ymin,
+          fields.TfExampleFields.object_bbox_xmin,
+          fields.TfExampleFields.object_bbox_ymax,
+          fields.TfExampleFields.object_bbox_xmax]
+  ]
+  return np.array(coordinates, dtype=np.float32).reshape([4, -1]).transpose()
+
+
+def add_anchor_matches(input_path, output_path, anchor_matcher):
+  """Copies a TFRecord of tf.train.Examples, adding their anchor matches.
+
+  Args:
+    input_path: path of the input TFRecord.
+    output_path: path of the output TFRecord.
+    anchor_matcher: an AnchorMatcher.
+
+  Returns:
+    The number of records written.
+  """
+  num_records = 0
+  with tf.python_io.TFRecordWriter(output_path) as writer:
+    for record in tf.python_io.tf_record_iterator(input_path):
+      tf_example = tf.train.Example.FromString(record)
+      anchor_matches = anchor_matcher.match(_get_groundtruth_boxes(tf_example))
+      feature = tf_example.features.feature[
+          fields.TfExampleFields.anchor_matches]
+      feature.Clear()
+      feature.int64_list.value.extend(anchor_matches.tolist())
+      writer.write(tf_example.SerializeToString())
+      num_records += 1
+  return num_records
+
+
+def main(_):
+  pipeline_config = pipeline_pb2.TrainEvalPipelineConfig()
+  with tf.gfile.GFile(FLAGS.pipeline_config_path, 'r') as f:
+    text_format.Merge(f.read(), pipeline_config)
+  anchors = generate_anchors(pipeline_config.model)
+  tf.logging.info('Generated %d anchors.', anchors.shape[0])
+
+  anchor_matcher = AnchorMatcher(pipeline_config.model.ssd, anchors)
+  tf.gfile.MakeDirs(FLAGS.output_dir)
+  try:
+    for input_path in sorted(tf.gfile.Glob(FLAGS.input_tfrecord_pattern)):
+      output_path = os.path.join(FLAGS.output_dir,
+                                 os.path.basename(input_path))
+      num_records = add_anchor_matches(input_path, output_path, anchor_matcher)
+      tf.logging.info('Wrote %d records to %s.', num_records, output_path)
+  finally:
+    anchor_matcher.close()
+
+
+if __name__ == '__main__':
+  tf.logging.set_verbosity(tf.logging.INFO)
+  tf.app.run()
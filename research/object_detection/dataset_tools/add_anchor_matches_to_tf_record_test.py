@@ -0,0 +1,94 @@
+# Copyright 2017 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for add_anchor_matches_to_tf_record.py."""
+import os
+
+import numpy as np
+import tensorflow as tf
+
+from google.protobuf import text_format
+from object_detection.dataset_tools import add_anchor_matches_to_tf_record
+from object_detection.protos import model_pb2
+from object_detection.utils import dataset_util
+
+
+class AddAnchorMatchesToTfRecordTest(tf.test.TestCase):
+
+  def _create_tf_example(self, boxes):
+    boxes = np.array(boxes, dtype=np.float32).reshape([-1, 4])
+    return tf.train.Example(features=tf.train.Features(feature={
+        'image/source_id': dataset_util.bytes_feature('image'),
+        'image/object/bbox/ymin': dataset_util.float_list_feature(
+            boxes[:, 0].tolist()),
+        'image/object/bbox/xmin': dataset_util.float_list_feature(
+            boxes[:, 1].tolist()),
+        'image/object/bbox/ymax': dataset_util.float_list_feature(
+            boxes[:, 2].tolist()),
+        'image/object/bbox/xmax': dataset_util.float_list_feature(
+            boxes[:, 3].tolist()),
+    }))
+
+  def test_add_anchor_matches(self):
+    model_text_proto = """
+      ssd {
+        similarity_calculator {
+          iou_similarity {
+          }
+        }
+        matcher {
+          argmax_matcher {
+            matched_threshold: 0.5
+            unmatched_threshold: 0.3
+          }
+        }
+      }
+    """
+    model_proto = model_pb2.DetectionModel()
+    text_format.Merge(model_text_proto, model_proto)
+    anchors = np.array([[0.0, 0.0, 0.5, 0.5],
+                        [0.0, 0.5, 0.5, 1.0],
+                        [0.5, 0.0, 1.0, 0.5],
+                        [0.5, 0.5, 1.0, 1.0]], dtype=np.float32)
+    anchor_matcher = add_anchor_matches_to_tf_record.AnchorMatcher(
+        model_proto.ssd, anchors)
+
+    input_path = os.path.join(self.get_temp_dir(), 'input.record')
+    output_path = os.path.join(self.get_temp_dir(), 'output.record')
+    with tf.python_io.TFRecordWriter(input_path) as writer:
+      writer.write(self._create_tf_example(
+          [[0.5, 0.5, 1.0, 1.0], [0.0, 0.0, 0.4, 0.5]]).SerializeToString())
+      writer.write(self._create_tf_example([]).SerializeToString())
+    num_records = add_anchor_matches_to_tf_record.add_anchor_matches(
+        input_path, output_path, anchor_matcher)
+    anchor_matcher.close()
+
+    self.assertEqual(num_records, 2)
+    output_examples = [
+        tf.train.Example.FromString(record)
+        for record in tf.python_io.tf_record_iterator(output_path)]
+    self.assertEqual(len(output_examples), 2)
+    self.assertAllEqual(
+        output_examples[0].features.feature[
+            'image/anchor_matches'].int64_list.value, [1, -1, -1, 0])
+    self.assertAllEqual(
+        output_examples[1].features.feature[
+            'image/anchor_matches'].int64_list.value, [-1, -1, -1, -1])
+    self.assertEqual(
+        output_examples[0].features.feature[
+            'image/source_id'].bytes_list.value, ['image'])
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -20,11 +20,16 @@ Example usage:
         --data_dir=/home/user/VOCdevkit \
         --year=VOC2012 \
         --output_path=/home/user/pascal.record
+
+Use --num_workers to convert images in parallel and --num_shards to split the
+output into several TFRecords. An interrupted conversion can be continued with
+--resume.
 """
 from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import functools
 import hashlib
 import io
 import logging
@@ -34,6 +39,7 @@ from lxml import etree
 import PIL.Image
 import tensorflow as tf
 
+from object_detection.dataset_tools import tf_record_creation_util
 from object_detection.utils import dataset_util
 from object_detection.utils import label_map_util
 
@@ -50,6 +56,10 @@ flags.DEFINE_string('label_map_path', 'data/pascal_label_map.pbtxt',
                     'Path to label map proto')
 flags.DEFINE_boolean('ignore_difficult_instances', False, 'Whether to ignore '
                      'difficult instances')
+flags.DEFINE_integer('num_shards', 1, 'Number of output TFRecord shards.')
+flags.DEFINE_integer('num_workers', 1, 'Number of processes converting images.')
+flags.DEFINE_boolean('resume', False, 'Whether to resume an interrupted '
+                     'conversion, skipping the images it already wrote.')
 FLAGS = flags.FLAGS
 
 SETS = ['train', 'val', 'trainval', 'test']
@@ -143,6 +153,36 @@ def dict_to_tf_example(data,
   return example
 
 
+def create_tf_example_from_annotation(example_id,
+                                      data_dir,
+                                      annotations_dir,
+                                      label_map_dict,
+                                      ignore_difficult_instances=False):
+  """Reads the annotation of an example and converts it to tf.Example proto.
+
+  Args:
+    example_id: String of the form <year>/<image name>.
+    data_dir: Path to root directory holding PASCAL dataset.
+    annotations_dir: Path of the annotations directory, relative to the
+      directory of the example's year.
+    label_map_dict: A map from string label names to integers ids.
+    ignore_difficult_instances: Whether to skip difficult instances in the
+      dataset  (default: False).
+
+  Returns:
+    example: The converted tf.Example.
+  """
+  year, example = example_id.split('/')
+  path = os.path.join(data_dir, year, annotations_dir, example + '.xml')
+  with tf.gfile.GFile(path, 'r') as fid:
+    xml_str = fid.read()
+  xml = etree.fromstring(xml_str)
+  data = dataset_util.recursive_parse_xml_to_dict(xml)['annotation']
+
+  return dict_to_tf_example(data, data_dir, label_map_dict,
+                            ignore_difficult_instances)
+
+
 def main(_):
   if FLAGS.set not in SETS:
     raise ValueError('set must be in : {}'.format(SETS))
@@ -154,30 +194,26 @@ def main(_):
   if FLAGS.year != 'merged':
     years = [FLAGS.year]
 
-  writer = tf.python_io.TFRecordWriter(FLAGS.output_path)
-
   label_map_dict = label_map_util.get_label_map_dict(FLAGS.label_map_path)
 
+  example_ids = []
   for year in years:
     logging.info('Reading from PASCAL %s dataset.', year)
     examples_path = os.path.join(data_dir, year, 'ImageSets', 'Main',
                                  'aeroplane_' + FLAGS.set + '.txt')
-    annotations_dir = os.path.join(data_dir, year, FLAGS.annotations_dir)
     examples_list = dataset_util.read_examples_list(examples_path)
-    for idx, example in enumerate(examples_list):
-      if idx % 100 == 0:
-        logging.info('On image %d of %d', idx, len(examples_list))
-      path = os.path.join(annotations_dir, example + '.xml')
-      with tf.gfile.GFile(path, 'r') as fid:
-        xml_str = fid.read()
-      xml = etree.fromstring(xml_str)
-      data = dataset_util.recursive_parse_xml_to_dict(xml)['annotation']
-
-      tf_example = dict_to_tf_example(data, FLAGS.data_dir, label_map_dict,
-                                      FLAGS.ignore_difficult_instances)
-      writer.write(tf_example.SerializeToString())
-
-  writer.close()
+    example_ids.extend(year + '/' + example for example in examples_list)
+
+  create_tf_example_fn = functools.partial(
+      create_tf_example_from_annotation,
+      data_dir=data_dir,
+      annotations_dir=FLAGS.annotations_dir,
+      label_map_dict=label_map_dict,
+      ignore_difficult_instances=FLAGS.ignore_difficult_instances)
+  tf_record_creation_util.write_sharded_tf_records(
+      example_ids, create_tf_example_fn, FLAGS.output_path,
+      num_shards=FLAGS.num_shards, num_workers=FLAGS.num_workers,
+      resume=FLAGS.resume)
 
 
 if __name__ == '__main__':
@@ -26,6 +26,7 @@ Example usage:
         --output_dir=/home/user/pet/output
 """
 
+import functools
 import hashlib
 import io
 import logging
@@ -38,6 +39,7 @@ import numpy as np
 import PIL.Image
 import tensorflow as tf
 
+from object_detection.dataset_tools import tf_record_creation_util
 from object_detection.utils import dataset_util
 from object_detection.utils import label_map_util
 
@@ -50,6 +52,11 @@ flags.DEFINE_boolean('faces_only', True, 'If True, generates bounding boxes '
                      'for pet faces.  Otherwise generates bounding boxes (as '
                      'well as segmentations for full pet bodies).  Note that '
                      'in the latter case, the resulting files are much larger.')
+flags.DEFINE_integer('num_shards', 1, 'Number of shards of each output '
+                     'TFRecord.')
+flags.DEFINE_integer('num_workers', 1, 'Number of processes converting images.')
+flags.DEFINE_boolean('resume', False, 'Whether to resume an interrupted '
+                     'conversion, skipping the images it already wrote.')
 FLAGS = flags.FLAGS
 
 
@@ -190,12 +197,52 @@ def dict_to_tf_example(data,
   return example
 
 
+def create_tf_example_from_annotation(example,
+                                      label_map_dict,
+                                      annotations_dir,
+                                      image_dir,
+                                      faces_only=True):
+  """Reads the annotation of an example and converts it to tf.Example proto.
+
+  Args:
+    example: Name of the example.
+    label_map_dict: The label map dictionary.
+    annotations_dir: Directory where annotation files are stored.
+    image_dir: Directory where image files are stored.
+    faces_only: If True, generates bounding boxes for pet faces.  Otherwise
+      generates bounding boxes (as well as segmentations for full pet bodies).
+
+  Returns:
+    The converted tf.Example, or None if the example is missing or invalid.
+  """
+  xml_path = os.path.join(annotations_dir, 'xmls', example + '.xml')
+  mask_path = os.path.join(annotations_dir, 'trimaps', example + '.png')
+
+  if not os.path.exists(xml_path):
+    logging.warning('Could not find %s, ignoring example.', xml_path)
+    return None
+  with tf.gfile.GFile(xml_path, 'r') as fid:
+    xml_str = fid.read()
+  xml = etree.fromstring(xml_str)
+  data = dataset_util.recursive_parse_xml_to_dict(xml)['annotation']
+
+  try:
+    return dict_to_tf_example(
+        data, mask_path, label_map_dict, image_dir, faces_only=faces_only)
+  except ValueError:
+    logging.warning('Invalid example: %s, ignoring.', xml_path)
+    return None
+
+
 def create_tf_record(output_filename,
                      label_map_dict,
                      annotations_dir,
                      image_dir,
                      examples,
-                     faces_only=True):
+                     faces_only=True,
+                     num_shards=1,
+                     num_workers=1,
+                     resume=False):
   """Creates a TFRecord file from examples.
 
   Args:
@@ -206,30 +253,19 @@ def create_tf_record(output_filename,
     examples: Examples to parse and save to tf record.
     faces_only: If True, generates bounding boxes for pet faces.  Otherwise
       generates bounding boxes (as well as segmentations for full pet bodies).
+    num_shards: Number of output shards.
+    num_workers: Number of processes converting examples.
+    resume: Whether to resume an interrupted conversion.
   """
-  writer = tf.python_io.TFRecordWriter(output_filename)
-  for idx, example in enumerate(examples):
-    if idx % 100 == 0:
-      logging.info('On image %d of %d', idx, len(examples))
-    xml_path = os.path.join(annotations_dir, 'xmls', example + '.xml')
-    mask_path = os.path.join(annotations_dir, 'trimaps', example + '.png')
-
-    if not os.path.exists(xml_path):
-      logging.warning('Could not find %s, ignoring example.', xml_path)
-      continue
-    with tf.gfile.GFile(xml_path, 'r') as fid:
-      xml_str = fid.read()
-    xml = etree.fromstring(xml_str)
-    data = dataset_util.recursive_parse_xml_to_dict(xml)['annotation']
-
-    try:
-      tf_example = dict_to_tf_example(
-          data, mask_path, label_map_dict, image_dir, faces_only=faces_only)
-      writer.write(tf_example.SerializeToString())
-    except ValueError:
-      logging.warning('Invalid example: %s, ignoring.', xml_path)
-
-  writer.close()
+  create_tf_example_fn = functools.partial(
+      create_tf_example_from_annotation,
+      label_map_dict=label_map_dict,
+      annotations_dir=annotations_dir,
+      image_dir=image_dir,
+      faces_only=faces_only)
+  tf_record_creation_util.write_sharded_tf_records(
+      examples, create_tf_example_fn, output_filename, num_shards=num_shards,
+      num_workers=num_workers, resume=resume)
 
 
 # TODO(derekjchow): Add test for pet/PASCAL main files.
@@ -262,9 +298,13 @@ def main(_):
     val_output_path = os.path.join(FLAGS.output_dir,
                                    'pet_val_with_masks.record')
   create_tf_record(train_output_path, label_map_dict, annotations_dir,
-                   image_dir, train_examples, faces_only=FLAGS.faces_only)
+                   image_dir, train_examples, faces_only=FLAGS.faces_only,
+                   num_shards=FLAGS.num_shards, num_workers=FLAGS.num_workers,
+                   resume=FLAGS.resume)
   create_tf_record(val_output_path, label_map_dict, annotations_dir,
-                   image_dir, val_examples, faces_only=FLAGS.faces_only)
+                   image_dir, val_examples, faces_only=FLAGS.faces_only,
+                   num_shards=FLAGS.num_shards, num_workers=FLAGS.num_workers,
+                   resume=FLAGS.resume)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,258 @@
+# Copyright 2017 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+r"""Shared engine for converting datasets into sharded TFRecords.
+
+The dataset converters describe a dataset as a list of string example ids and a
+function mapping an example id to a tf.train.Example (or None to skip the
+example). write_sharded_tf_records then:
+
+  * runs the conversion function on a pool of worker processes, keeping at most
+    a bounded number of examples in flight,
+  * writes the resulting examples in input order into round-robin output
+    shards: the example at position i of the id list goes to shard
+    i % num_shards,
+  * periodically records the ids of the examples that have been written, so
+    that an interrupted conversion can be resumed with the same id list.
+"""
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import collections
+import itertools
+import multiprocessing
+import time
+
+import tensorflow as tf
+
+COMPLETED_IDS_SUFFIX = '.completed_ids'
+
+# The conversion function used by worker processes, set by _init_worker.
+_worker_create_tf_example_fn = None
+
+
+def get_shard_paths(output_path, num_shards):
+  """Returns the output paths for the given number of shards.
+
+  Args:
+    output_path: The base output path.
+    num_shards: The number of shards.
+
+  Returns:
+    A list of num_shards paths. A single shard is written to output_path
+    itself, multiple shards follow the <output_path>-<shard>-of-<num_shards>
+    naming convention.
+  """
+  if num_shards == 1:
+    return [output_path]
+  return ['{}-{:05d}-of-{:05d}'.format(output_path, idx, num_shards)
+          for idx in range(num_shards)]
+
+
+def _init_worker(create_tf_example_fn):
+  """Stores the conversion function in a worker process."""
+  global _worker_create_tf_example_fn
+  _worker_create_tf_example_fn = create_tf_example_fn
+
+
+def _serialize_example(create_tf_example_fn, example_id):
+  """Converts an example id and serializes the result (None if skipped)."""
+  tf_example = create_tf_example_fn(example_id)
+  if tf_example is None:
+    return None
+  return tf_example.SerializeToString()
+
+
+def _worker_serialize_example(example_id):
+  """Worker process entry point for _serialize_example."""
+  return _serialize_example(_worker_create_tf_example_fn, example_id)
+
+
+def _read_completed_ids(completed_ids_path):
+  """Reads the completed example ids, ignoring a partially written last line."""
+  if not tf.gfile.Exists(completed_ids_path):
+    return set()
+  with tf.gfile.GFile(completed_ids_path, 'r') as fid:
+    lines = fid.read().split('\n')
+  return set(lines[:-1])
+
+
+def _open_resumed_writer(path, num_records):
+  """Opens a TFRecord writer for path keeping only its first num_records.
+
+  Records beyond num_records were written after the last checkpoint of the
+  completed ids and are dropped, since their examples will be converted again.
+
+  Args:
+    path: Path of the shard.
+    num_records: Number of records to keep.
+
+  Returns:
+    A tf.python_io.TFRecordWriter positioned after the kept records.
+
+  Raises:
+    ValueError: if the shard holds fewer than num_records records.
+  """
+  tmp_path = path + '.tmp'
+  # A leftover temporary file means that a previous resume was interrupted
+  # while copying, in which case it holds the complete original shard.
+  if not tf.gfile.Exists(tmp_path):
+    if not tf.gfile.Exists(path):
+      if num_records:
+        raise ValueError('Missing shard {} with {} completed records.'.format(
+            path, num_records))
+      return tf.python_io.TFRecordWriter(path)
+    tf.gfile.Rename(path, tmp_path)
+
+  writer = tf.python_io.TFRecordWriter(path)
+  num_copied = 0
+  for record in itertools.islice(
+      tf.python_io.tf_record_iterator(tmp_path), num_records):
+    writer.write(record)
+    num_copied += 1
+  if num_copied != num_records:
+    writer.close()
+    raise ValueError('Shard {} holds {} records, expected {}.'.format(
+        path, num_copied, num_records))
+  tf.gfile.Remove(tmp_path)
+  return writer
+
+
+def write_sharded_tf_records(example_ids,
+                             create_tf_example_fn,
+                             output_path,
+                             num_shards=1,
+                             num_workers=1,
+                             max_in_flight=None,
+                             resume=False,
+                             checkpoint_every=100):
+  """Converts examples in parallel and writes them to sharded TFRecords.
+
+  Args:
+    example_ids: List of unique string ids of the examples to convert. Shards
+      are assigned by position in this list, so a resumed conversion must use
+      the same list.
+    create_tf_example_fn: Function mapping an example id to a tf.train.Example,
+      or to None if the example should be skipped. Must be picklable (e.g. a
+      module level function or a functools.partial of one) if num_workers > 1.
+    output_path: Base path of the output TFRecords, see get_shard_paths.
+    num_shards: Number of output shards.
+    num_workers: Number of worker processes converting examples. If 1, examples
+      are converted in the calling process.
+    max_in_flight: Maximum number of examples submitted to the workers but not
+      yet written. Defaults to 4 * num_workers.
+    resume: If True, skips the examples listed in the completed ids file
+      (<output_path>.completed_ids) of a previous run and appends to its
+      shards. Otherwise existing outputs are overwritten.
+    checkpoint_every: The shards are flushed and the completed ids file is
+      updated every checkpoint_every written examples.
+
+  Returns:
+    The number of examples written in this run.
+
+  Raises:
+    ValueError: if num_shards or num_workers is not positive, or if a resumed
+      shard does not match the completed ids.
+  """
+  if num_shards < 1:
+    raise ValueError('num_shards must be positive.')
+  if num_workers < 1:
+    raise ValueError('num_workers must be positive.')
+  if max_in_flight is None:
+    max_in_flight = 4 * num_workers
+
+  completed_ids_path = output_path + COMPLETED_IDS_SUFFIX
+  shard_paths = get_shard_paths(output_path, num_shards)
+  completed_ids = set()
+  if resume:
+    completed_ids = _read_completed_ids(completed_ids_path)
+  records_per_shard = [0] * num_shards
+  pending = []
+  for position, example_id in enumerate(example_ids):
+    if example_id in completed_ids:
+      records_per_shard[position % num_shards] += 1
+    else:
+      pending.append((position, example_id))
+  if completed_ids:
+    tf.logging.info('Resuming after %d completed examples, %d remaining.',
+                    len(example_ids) - len(pending), len(pending))
+
+  writers = []
+  completed_ids_file = None
+  pool = None
+  try:
+    for path, num_records in zip(shard_paths, records_per_shard):
+      if resume:
+        writers.append(_open_resumed_writer(path, num_records))
+      else:
+        writers.append(tf.python_io.TFRecordWriter(path))
+    # Rewriting the completed ids also drops a partially written last line.
+    completed_ids_file = tf.gfile.GFile(completed_ids_path, 'w')
+    completed_ids_file.write(''.join(
+        v + '\n' for v in example_ids if v in completed_ids))
+    if num_workers > 1:
+      pool = multiprocessing.Pool(num_workers, initializer=_init_worker,
+                                  initargs=(create_tf_example_fn,))
+
+    def checkpoint(written_ids):
+      for writer in writers:
+        writer.flush()
+      completed_ids_file.write(''.join(v + '\n' for v in written_ids))
+      completed_ids_file.flush()
+
+    in_flight = collections.deque()
+    written_ids = []
+    num_processed = 0
+    num_written = 0
+    start_time = time.time()
+    pending_iter = iter(pending)
+    while True:
+      for position, example_id in itertools.islice(
+          pending_iter, max_in_flight - len(in_flight)):
+        if pool:
+          result = pool.apply_async(_worker_serialize_example, (example_id,))
+        else:
+          result = _serialize_example(create_tf_example_fn, example_id)
+        in_flight.append((position, example_id, result))
+      if not in_flight:
+        break
+      position, example_id, result = in_flight.popleft()
+      serialized_example = result.get() if pool else result
+      num_processed += 1
+      if serialized_example is not None:
+        writers[position % num_shards].write(serialized_example)
+        written_ids.append(example_id)
+        num_written += 1
+        if len(written_ids) >= checkpoint_every:
+          checkpoint(written_ids)
+          written_ids = []
+      if num_processed % 100 == 0:
+        tf.logging.info(
+            'Processed %d of %d examples (%.1f examples/sec).', num_processed,
+            len(pending), num_processed / (time.time() - start_time))
+    checkpoint(written_ids)
+  finally:
+    if pool:
+      pool.terminate()
+    if completed_ids_file:
+      completed_ids_file.close()
+    for writer in writers:
+      writer.close()
+
+  elapsed = time.time() - start_time
+  tf.logging.info('Wrote %d of %d examples to %d shard(s) in %.1f seconds '
+                  '(%.1f examples/sec).', num_written, num_processed,
+                  num_shards, elapsed, num_processed / max(elapsed, 1e-9))
+  return num_written
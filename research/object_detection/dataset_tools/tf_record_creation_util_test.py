@@ -0,0 +1,88 @@
+# Copyright 2017 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for tf_record_creation_util.py."""
+
+import os
+
+import tensorflow as tf
+
+from object_detection.dataset_tools import tf_record_creation_util
+from object_detection.utils import dataset_util
+
+
+def create_tf_example(example_id):
+  """Skips ids starting with 'skip', otherwise stores the id in an example."""
+  if example_id.startswith('skip'):
+    return None
+  return tf.train.Example(features=tf.train.Features(feature={
+      'image/source_id': dataset_util.bytes_feature(example_id),
+  }))
+
+
+def read_source_ids(path):
+  source_ids = []
+  for record in tf.python_io.tf_record_iterator(path):
+    tf_example = tf.train.Example.FromString(record)
+    source_ids.append(
+        tf_example.features.feature['image/source_id'].bytes_list.value[0])
+  return source_ids
+
+
+class WriteShardedTfRecordsTest(tf.test.TestCase):
+
+  def _output_path(self, name):
+    return os.path.join(self.get_temp_dir(), name)
+
+  def test_single_shard(self):
+    output_path = self._output_path('single.tfrecord')
+    num_written = tf_record_creation_util.write_sharded_tf_records(
+        ['a', 'skip_b', 'c'], create_tf_example, output_path)
+    self.assertEqual(num_written, 2)
+    self.assertAllEqual(read_source_ids(output_path), ['a', 'c'])
+
+  def test_round_robin_shards_with_workers(self):
+    output_path = self._output_path('sharded.tfrecord')
+    example_ids = ['id_{}'.format(i) for i in range(10)]
+    tf_record_creation_util.write_sharded_tf_records(
+        example_ids, create_tf_example, output_path, num_shards=3,
+        num_workers=2, max_in_flight=3)
+    shard_paths = tf_record_creation_util.get_shard_paths(output_path, 3)
+    self.assertEqual(shard_paths[1], output_path + '-00001-of-00003')
+    for shard, shard_path in enumerate(shard_paths):
+      self.assertAllEqual(read_source_ids(shard_path), example_ids[shard::3])
+
+  def test_resume_drops_records_written_after_checkpoint(self):
+    output_path = self._output_path('resumed.tfrecord')
+    example_ids = ['id_{}'.format(i) for i in range(7)]
+    tf_record_creation_util.write_sharded_tf_records(
+        example_ids[:5], create_tf_example, output_path, num_shards=2)
+    # Simulate an interruption after the examples were written but before all
+    # of them were recorded as completed.
+    with tf.gfile.GFile(
+        output_path + tf_record_creation_util.COMPLETED_IDS_SUFFIX, 'w') as f:
+      f.write('id_0\nid_1\nid_2\nid_')
+
+    num_written = tf_record_creation_util.write_sharded_tf_records(
+        example_ids, create_tf_example, output_path, num_shards=2, resume=True)
+    self.assertEqual(num_written, 4)
+    shard_paths = tf_record_creation_util.get_shard_paths(output_path, 2)
+    self.assertAllEqual(read_source_ids(shard_paths[0]),
+                        ['id_0', 'id_2', 'id_4', 'id_6'])
+    self.assertAllEqual(read_source_ids(shard_paths[1]),
+                        ['id_1', 'id_3', 'id_5'])
+
+
+if __name__ == '__main__':
+  tf.test.main()
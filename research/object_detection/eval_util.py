@@ -26,6 +26,7 @@ from object_detection.core import keypoint_ops
 from object_detection.core import standard_fields as fields
 from object_detection.utils import label_map_util
 from object_detection.utils import ops
+from object_detection.utils import profiling_util
 from object_detection.utils import visualization_utils as vis_utils
 
 slim = tf.contrib.slim
@@ -136,7 +137,8 @@ def visualize_detection_results(result_dict,
         category_index,
         keypoints=groundtruth_keypoints,
         use_normalized_coordinates=False,
-        max_boxes_to_draw=None)
+        max_boxes_to_draw=None,
+        use_numpy_rasterizer=True)
   vis_utils.visualize_boxes_and_labels_on_image_array(
       image,
       detection_boxes,
@@ -148,7 +150,8 @@ def visualize_detection_results(result_dict,
       use_normalized_coordinates=False,
       max_boxes_to_draw=max_num_predictions,
       min_score_thresh=min_score_thresh,
-      agnostic_mode=agnostic_mode)
+      agnostic_mode=agnostic_mode,
+      use_numpy_rasterizer=True)
 
   if export_dir:
     export_path = os.path.join(export_dir, 'export-{}.png'.format(tag))
@@ -177,7 +180,8 @@ def _run_checkpoint_once(tensor_dict,
                          num_batches=1,
                          master='',
                          save_graph=False,
-                         save_graph_dir=''):
+                         save_graph_dir='',
+                         partial_eval_interval=0):
   """Evaluates metrics defined in evaluators.
 
   This function loads the latest checkpoint in checkpoint_dirs and evaluates
@@ -216,6 +220,9 @@ def _run_checkpoint_once(tensor_dict,
     save_graph: whether or not the Tensorflow graph is stored as a pbtxt file.
     save_graph_dir: where to store the Tensorflow graph on disk. If save_graph
       is True this must be non-empty.
+    partial_eval_interval: if positive, the metrics of the images evaluated so
+      far are logged every this many batches, using partial_evaluate() of the
+      evaluators.
 
   Returns:
     global_step: the count of global steps.
@@ -245,30 +252,39 @@ def _run_checkpoint_once(tensor_dict,
     tf.train.write_graph(sess.graph_def, save_graph_dir, 'eval.pbtxt')
 
   counters = {'skipped': 0, 'success': 0}
+  timer = profiling_util.StageTimer()
   with tf.contrib.slim.queues.QueueRunners(sess):
     try:
       for batch in range(int(num_batches)):
         if (batch + 1) % 100 == 0:
           logging.info('Running eval ops batch %d/%d', batch + 1, num_batches)
-        if not batch_processor:
-          try:
-            result_dict = sess.run(tensor_dict)
-            counters['success'] += 1
-          except tf.errors.InvalidArgumentError:
-            logging.info('Skipping image')
-            counters['skipped'] += 1
-            result_dict = {}
-        else:
-          result_dict = batch_processor(tensor_dict, sess, batch, counters)
-        for evaluator in evaluators:
-          # TODO: Use image_id tensor once we fix the input data
-          # decoders to return correct image_id.
-          # TODO: result_dict contains batches of images, while
-          # add_single_ground_truth_image_info expects a single image. Fix
-          evaluator.add_single_ground_truth_image_info(
-              image_id=batch, groundtruth_dict=result_dict)
-          evaluator.add_single_detected_image_info(
-              image_id=batch, detections_dict=result_dict)
+        with timer.time('run_batch'):
+          if not batch_processor:
+            try:
+              result_dict = sess.run(tensor_dict)
+              counters['success'] += 1
+            except tf.errors.InvalidArgumentError:
+              logging.info('Skipping image')
+              counters['skipped'] += 1
+              result_dict = {}
+          else:
+            result_dict = batch_processor(tensor_dict, sess, batch, counters)
+        with timer.time('accumulate_metrics'):
+          for evaluator in evaluators:
+            # TODO: Use image_id tensor once we fix the input data
+            # decoders to return correct image_id.
+            # TODO: result_dict contains batches of images, while
+            # add_single_ground_truth_image_info expects a single image. Fix
+            evaluator.add_single_ground_truth_image_info(
+                image_id=batch, groundtruth_dict=result_dict)
+            evaluator.add_single_detected_image_info(
+                image_id=batch, detections_dict=result_dict)
+        if partial_eval_interval and (batch + 1) % partial_eval_interval == 0:
+          with timer.time('partial_metrics'):
+            for evaluator in evaluators:
+              for key, value in sorted(evaluator.partial_evaluate().items()):
+                logging.info('Partial %s after %d batches: %f', key,
+                             batch + 1, value)
       logging.info('Running eval batches done.')
     except tf.errors.OutOfRangeError:
       logging.info('Done evaluating -- epoch limit reached')
@@ -277,12 +293,15 @@ def _run_checkpoint_once(tensor_dict,
       logging.info('# success: %d', counters['success'])
       logging.info('# skipped: %d', counters['skipped'])
       all_evaluator_metrics = {}
-      for evaluator in evaluators:
-        metrics = evaluator.evaluate()
-        evaluator.clear()
-        if any(key in all_evaluator_metrics for key in metrics):
-          raise ValueError('Metric names between evaluators must not collide.')
-        all_evaluator_metrics.update(metrics)
+      with timer.time('compute_metrics'):
+        for evaluator in evaluators:
+          metrics = evaluator.evaluate()
+          evaluator.clear()
+          if any(key in all_evaluator_metrics for key in metrics):
+            raise ValueError(
+                'Metric names between evaluators must not collide.')
+          all_evaluator_metrics.update(metrics)
+      logging.info('Eval time by stage: %s', timer.report())
       global_step = tf.train.global_step(sess, tf.train.get_global_step())
   sess.close()
   return (global_step, all_evaluator_metrics)
@@ -301,7 +320,8 @@ def repeated_checkpoint_run(tensor_dict,
                             max_number_of_evaluations=None,
                             master='',
                             save_graph=False,
-                            save_graph_dir=''):
+                            save_graph_dir='',
+                            partial_eval_interval=0):
   """Periodically evaluates desired tensors using checkpoint_dirs or restore_fn.
 
   This function repeatedly loads a checkpoint and evaluates a desired
@@ -341,6 +361,8 @@ def repeated_checkpoint_run(tensor_dict,
     save_graph: whether or not the Tensorflow graph is saved as a pbtxt file.
     save_graph_dir: where to save on disk the Tensorflow graph. If store_graph
       is True this must be non-empty.
+    partial_eval_interval: if positive, the metrics of the images evaluated so
+      far are logged every this many batches.
 
   Returns:
     metrics: A dictionary containing metric names and values in the latest
@@ -378,7 +400,8 @@ def repeated_checkpoint_run(tensor_dict,
                                                   variables_to_restore,
                                                   restore_fn, num_batches,
                                                   master, save_graph,
-                                                  save_graph_dir)
+                                                  save_graph_dir,
+                                                  partial_eval_interval)
       write_metrics(metrics, global_step, summary_dir)
     number_of_evaluations += 1
 
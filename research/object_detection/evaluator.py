@@ -24,6 +24,7 @@ import tensorflow as tf
 from object_detection import eval_util
 from object_detection.core import prefetcher
 from object_detection.core import standard_fields as fields
+from object_detection.utils import dataset_util
 from object_detection.utils import object_detection_evaluation
 
 # A dictionary of metric names to classes that implement the metric. The classes
@@ -46,15 +47,21 @@ def _extract_prediction_tensors(model,
 
   Args:
     model: model to perform predictions with.
-    create_input_dict_fn: function to create input tensor dictionaries.
+    create_input_dict_fn: function to create an input tensor dictionary, or a
+      tf.data.Dataset of them.
     ignore_groundtruth: whether groundtruth should be ignored.
 
   Returns:
     tensor_dict: A tensor dictionary with evaluations.
   """
   input_dict = create_input_dict_fn()
-  prefetch_queue = prefetcher.prefetch(input_dict, capacity=500)
-  input_dict = prefetch_queue.dequeue()
+  if isinstance(input_dict, tf.data.Dataset):
+    # Datasets prefetch decoded examples themselves.
+    input_dict = dataset_util.make_initializable_iterator(
+        input_dict).get_next()
+  else:
+    prefetch_queue = prefetcher.prefetch(input_dict, capacity=500)
+    input_dict = prefetch_queue.dequeue()
   original_image = tf.expand_dims(input_dict[fields.InputDataFields.image], 0)
   preprocessed_image = model.preprocess(tf.to_float(original_image))
   prediction_dict = model.predict(preprocessed_image)
@@ -108,7 +115,8 @@ def get_evaluators(eval_config, categories):
     raise ValueError('Metric not found: {}'.format(eval_metric_fn_key))
   return [
       EVAL_METRICS_CLASS_DICT[eval_metric_fn_key](
-          categories=categories)
+          categories=categories,
+          streaming=eval_config.streaming_evaluation)
   ]
 
 
@@ -207,6 +215,7 @@ def evaluate(create_input_dict_fn, create_model_fn, eval_config, categories,
                                  if eval_config.max_evals else None),
       master=eval_config.eval_master,
       save_graph=eval_config.save_graph,
-      save_graph_dir=(eval_dir if eval_config.save_graph else ''))
+      save_graph_dir=(eval_dir if eval_config.save_graph else ''),
+      partial_eval_interval=eval_config.partial_eval_interval)
 
   return metrics
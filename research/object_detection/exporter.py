@@ -17,20 +17,36 @@
 import logging
 import os
 import tempfile
+import time
+import numpy as np
 import tensorflow as tf
 from tensorflow.core.protobuf import rewriter_config_pb2
 from tensorflow.python import pywrap_tensorflow
 from tensorflow.python.client import session
 from tensorflow.python.framework import graph_util
+from tensorflow.python.framework import tensor_util
 from tensorflow.python.platform import gfile
 from tensorflow.python.saved_model import signature_constants
 from tensorflow.python.training import saver as saver_lib
+from tensorflow.tools.graph_transforms import TransformGraph
 from object_detection.builders import model_builder
 from object_detection.core import standard_fields as fields
 from object_detection.data_decoders import tf_example_decoder
+from object_detection.utils import dataset_util
 
 slim = tf.contrib.slim
 
+# Input index of the weights of the ops whose constant weights are quantized by
+# quantize_weights.
+_WEIGHT_INPUT_INDEX_BY_OP = {
+    'Conv2D': 1,
+    'DepthwiseConv2dNative': 1,
+    'MatMul': 1,
+}
+
+# Number of runs per image when timing graphs for the export report.
+_REPORT_NUM_RUNS = 10
+
 
 # TODO: Replace with freeze_graph.freeze_graph_with_def_protos when
 # newer version of Tensorflow becomes more common.
@@ -321,6 +337,219 @@ def _write_graph_and_checkpoint(inference_graph_def,
       saver.save(sess, model_path)
 
 
+def _node_name(input_name):
+  """Returns the name of the node producing an input of a NodeDef."""
+  return input_name.lstrip('^').split(':')[0]
+
+
+def quantize_weights(graph_def, minimum_size=1024):
+  """Quantizes the constant weights of convolutions and matmuls to 8 bits.
+
+  Each float32 constant holding the weights of a Conv2D, DepthwiseConv2dNative
+  or MatMul op, possibly through Identity ops, is replaced by a quint8 constant
+  and its range, dequantized by a Dequantize op of the same name. This shrinks
+  the weights 4x while computing in float, so the graph runs on any device.
+
+  Unlike the `quantize_weights` graph transform, constants that are not
+  weights, e.g. the anchors of an SSD model, keep their full precision.
+
+  Args:
+    graph_def: a frozen tf.GraphDef.
+    minimum_size: weights with fewer elements are not quantized.
+
+  Returns:
+    a tf.GraphDef with quantized weights.
+  """
+  node_by_name = {node.name: node for node in graph_def.node}
+  weight_names = set()
+  for node in graph_def.node:
+    if node.op not in _WEIGHT_INPUT_INDEX_BY_OP:
+      continue
+    weight_name = _node_name(node.input[_WEIGHT_INPUT_INDEX_BY_OP[node.op]])
+    while node_by_name[weight_name].op == 'Identity':
+      weight_name = _node_name(node_by_name[weight_name].input[0])
+    if node_by_name[weight_name].op == 'Const':
+      weight_names.add(weight_name)
+
+  quantized_graph_def = tf.GraphDef()
+  quantized_graph_def.versions.CopyFrom(graph_def.versions)
+  quantized_graph_def.library.CopyFrom(graph_def.library)
+  for node in graph_def.node:
+    weights = None
+    if node.name in weight_names:
+      weights = tensor_util.MakeNdarray(node.attr['value'].tensor)
+    if (weights is None or weights.dtype != np.float32 or
+        weights.size < minimum_size):
+      quantized_graph_def.node.extend([node])
+      continue
+    # Include zero in the range so that it stays close to representable.
+    min_value = min(float(weights.min()), 0.0)
+    max_value = max(float(weights.max()), 0.0)
+    if max_value == min_value:
+      quantized_graph_def.node.extend([node])
+      continue
+    quantized_weights = np.round((weights - min_value) * 255.0 /
+                                 (max_value - min_value)).astype(np.uint8)
+    for suffix, value, dtype in [('_quantized_value', quantized_weights,
+                                  tf.quint8),
+                                 ('_quantized_min', min_value, tf.float32),
+                                 ('_quantized_max', max_value, tf.float32)]:
+      const_node = quantized_graph_def.node.add()
+      const_node.op = 'Const'
+      const_node.name = node.name + suffix
+      const_node.device = node.device
+      const_node.attr['dtype'].type = dtype.as_datatype_enum
+      const_node.attr['value'].tensor.CopyFrom(
+          tensor_util.make_tensor_proto(value, dtype=dtype))
+    dequantize_node = quantized_graph_def.node.add()
+    dequantize_node.op = 'Dequantize'
+    dequantize_node.name = node.name
+    dequantize_node.device = node.device
+    dequantize_node.input.extend([node.name + '_quantized_value',
+                                  node.name + '_quantized_min',
+                                  node.name + '_quantized_max'])
+    dequantize_node.attr['T'].type = tf.quint8.as_datatype_enum
+    dequantize_node.attr['mode'].s = b'MIN_FIRST'
+  return quantized_graph_def
+
+
+def transform_frozen_graph(frozen_graph_def,
+                           input_node_names,
+                           output_node_names,
+                           fold_batch_norms=False,
+                           strip_training_nodes=False,
+                           quantize_weights_min_size=None):
+  """Reduces the size and the inference cost of a frozen graph.
+
+  Args:
+    frozen_graph_def: a frozen tf.GraphDef.
+    input_node_names: list of the names of the input nodes.
+    output_node_names: list of the names of the output nodes.
+    fold_batch_norms: whether to fold constant subgraphs and batch norms into
+      the weights of the preceding convolutions and matmuls.
+    strip_training_nodes: whether to remove the nodes that are only useful
+      during training, i.e. numeric checks, gradient stops and colocation
+      constraints with the variables.
+    quantize_weights_min_size: if not None, the constant weights with at least
+      that many elements are quantized to 8 bits, see quantize_weights.
+
+  Returns:
+    the transformed tf.GraphDef.
+  """
+  # Identity nodes are kept, as removing them breaks the while loops of
+  # tf.map_fn used in the pre- and postprocessing.
+  transforms = []
+  if strip_training_nodes:
+    transforms.extend([
+        'remove_nodes(op=CheckNumerics, op=StopGradient)',
+        'remove_attribute(attribute_name=_class)',
+    ])
+  if fold_batch_norms:
+    transforms.extend([
+        'fold_constants(ignore_errors=true)',
+        'fold_batch_norms',
+        'fold_old_batch_norms',
+    ])
+  transformed_graph_def = frozen_graph_def
+  if transforms:
+    logging.info('Applying graph transforms: %s', ', '.join(transforms))
+    transformed_graph_def = TransformGraph(
+        frozen_graph_def, input_node_names, output_node_names, transforms)
+  if quantize_weights_min_size is not None:
+    transformed_graph_def = quantize_weights(transformed_graph_def,
+                                             quantize_weights_min_size)
+  return transformed_graph_def
+
+
+def _load_report_inputs(input_type, image_paths, input_shape=None):
+  """Reads images to feed to the input placeholder of an exported graph.
+
+  Args:
+    input_type: Type of input for the graph.
+    image_paths: list of paths of JPEG or PNG images.
+    input_shape: the shape of an `image_tensor` input. Images are resized if
+      it has a fixed height and width.
+
+  Returns:
+    a list with one batch of size 1 to feed per image.
+  """
+  encoded_images = []
+  for image_path in image_paths:
+    with gfile.GFile(image_path, 'rb') as f:
+      encoded_images.append(f.read())
+  if input_type == 'encoded_image_string_tensor':
+    return [[encoded_image] for encoded_image in encoded_images]
+  if input_type == 'tf_example':
+    feeds = []
+    for image_path, encoded_image in zip(image_paths, encoded_images):
+      image_format = b'png' if image_path.lower().endswith('.png') else b'jpeg'
+      feeds.append([tf.train.Example(features=tf.train.Features(feature={
+          'image/encoded': dataset_util.bytes_feature(encoded_image),
+          'image/format': dataset_util.bytes_feature(image_format),
+      })).SerializeToString()])
+    return feeds
+  with tf.Graph().as_default():
+    encoded_image_placeholder = tf.placeholder(tf.string, shape=[])
+    image = tf.image.decode_image(encoded_image_placeholder, channels=3)
+    if (input_shape is not None and input_shape[1] is not None and
+        input_shape[2] is not None):
+      image.set_shape([None, None, 3])
+      image = tf.cast(tf.image.resize_images(
+          image, input_shape[1:3]), tf.uint8)
+    with session.Session() as sess:
+      return [[sess.run(image, {encoded_image_placeholder: encoded_image})]
+              for encoded_image in encoded_images]
+
+
+def _time_frozen_graph(frozen_graph_def, input_tensor_name,
+                       output_tensor_names, feeds):
+  """Returns the mean time in seconds to run a frozen graph on a batch."""
+  with tf.Graph().as_default() as graph:
+    tf.import_graph_def(frozen_graph_def, name='')
+    input_tensor = graph.get_tensor_by_name(input_tensor_name)
+    output_tensors = [graph.get_tensor_by_name(name)
+                      for name in output_tensor_names]
+    with session.Session(graph=graph) as sess:
+      for feed in feeds:
+        sess.run(output_tensors, {input_tensor: feed})
+      start_time = time.time()
+      for _ in range(_REPORT_NUM_RUNS):
+        for feed in feeds:
+          sess.run(output_tensors, {input_tensor: feed})
+      return (time.time() - start_time) / (_REPORT_NUM_RUNS * len(feeds))
+
+
+def _write_export_report(report_path, frozen_graph_def, transformed_graph_def,
+                         input_tensor_name, output_tensor_names, feeds):
+  """Writes a report comparing the size and latency of two frozen graphs.
+
+  Args:
+    report_path: Path to write the report.
+    frozen_graph_def: tf.GraphDef holding the frozen graph.
+    transformed_graph_def: tf.GraphDef holding the transformed frozen graph.
+    input_tensor_name: name of the input tensor of both graphs.
+    output_tensor_names: names of the output tensors of both graphs.
+    feeds: list of batches to feed to the input tensor.
+  """
+  lines = ['%-12s %12s %8s %14s' % ('graph', 'size (MB)', 'nodes',
+                                    'ms per batch')]
+  latencies = []
+  for name, graph_def in [('frozen', frozen_graph_def),
+                          ('transformed', transformed_graph_def)]:
+    latencies.append(_time_frozen_graph(graph_def, input_tensor_name,
+                                        output_tensor_names, feeds))
+    lines.append('%-12s %12.2f %8d %14.1f' % (
+        name, graph_def.ByteSize() / 2.0**20, len(graph_def.node),
+        1000.0 * latencies[-1]))
+  lines.append('Size reduction: %.2fx, speedup: %.2fx on %d batches.' % (
+      frozen_graph_def.ByteSize() / float(transformed_graph_def.ByteSize()),
+      latencies[0] / latencies[1], len(feeds)))
+  report = '\n'.join(lines) + '\n'
+  with gfile.GFile(report_path, 'w') as f:
+    f.write(report)
+  logging.info('Export report:\n%s', report)
+
+
 def _export_inference_graph(input_type,
                             detection_model,
                             use_moving_averages,
@@ -329,7 +558,11 @@ def _export_inference_graph(input_type,
                             additional_output_tensor_names=None,
                             input_shape=None,
                             optimize_graph=True,
-                            output_collection_name='inference_op'):
+                            output_collection_name='inference_op',
+                            fold_batch_norms=False,
+                            strip_training_nodes=False,
+                            quantize_weights_min_size=None,
+                            report_image_paths=None):
   """Export helper."""
   tf.gfile.MakeDirs(output_directory)
   frozen_graph_path = os.path.join(output_directory,
@@ -389,9 +622,19 @@ def _export_inference_graph(input_type,
       clear_devices=True,
       optimize_graph=optimize_graph,
       initializer_nodes='')
-  _write_frozen_graph(frozen_graph_path, frozen_graph_def)
-  _write_saved_model(saved_model_path, frozen_graph_def,
+  transformed_graph_def = transform_frozen_graph(
+      frozen_graph_def, [placeholder_tensor.op.name],
+      output_node_names.split(','), fold_batch_norms, strip_training_nodes,
+      quantize_weights_min_size)
+  _write_frozen_graph(frozen_graph_path, transformed_graph_def)
+  _write_saved_model(saved_model_path, transformed_graph_def,
                      placeholder_tensor, outputs)
+  if report_image_paths:
+    _write_export_report(
+        os.path.join(output_directory, 'export_report.txt'), frozen_graph_def,
+        transformed_graph_def, placeholder_tensor.name,
+        [tensor.name for tensor in outputs.values()],
+        _load_report_inputs(input_type, report_image_paths, input_shape))
 
 
 def export_inference_graph(input_type,
@@ -401,7 +644,11 @@ def export_inference_graph(input_type,
                            input_shape=None,
                            optimize_graph=True,
                            output_collection_name='inference_op',
-                           additional_output_tensor_names=None):
+                           additional_output_tensor_names=None,
+                           fold_batch_norms=False,
+                           strip_training_nodes=False,
+                           quantize_weights_min_size=None,
+                           report_image_paths=None):
   """Exports inference graph for the model specified in the pipeline config.
 
   Args:
@@ -417,6 +664,16 @@ def export_inference_graph(input_type,
       If None, does not add output tensors to a collection.
     additional_output_tensor_names: list of additional output
     tensors to include in the frozen graph.
+    fold_batch_norms: Whether to fold batch norms into the weights of the
+      frozen graph.
+    strip_training_nodes: Whether to remove training-only nodes from the
+      frozen graph.
+    quantize_weights_min_size: If not None, quantizes the convolution and
+      fully connected weights of the frozen graph with at least that many
+      elements to 8 bits.
+    report_image_paths: If not empty, list of images to compare the size and
+      latency of the frozen graph with and without the transformations on.
+      The report is written to `export_report.txt` in output_directory.
   """
   detection_model = model_builder.build(pipeline_config.model,
                                         is_training=False)
@@ -424,4 +681,6 @@ def export_inference_graph(input_type,
                           pipeline_config.eval_config.use_moving_averages,
                           trained_checkpoint_prefix,
                           output_directory, additional_output_tensor_names,
-                          input_shape, optimize_graph, output_collection_name)
+                          input_shape, optimize_graph, output_collection_name,
+                          fold_batch_norms, strip_training_nodes,
+                          quantize_weights_min_size, report_image_paths)
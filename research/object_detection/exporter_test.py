@@ -599,6 +599,86 @@ class ExportInferenceGraphTest(tf.test.TestCase):
         self.assertAllClose(masks_np, np.arange(64).reshape([2, 2, 4, 4]))
         self.assertAllClose(num_detections_np, [2, 1])
 
+  def test_quantize_weights(self):
+    weights = np.linspace(-1.0, 2.0, num=2 * 2 * 3 * 4).reshape([2, 2, 3, 4])
+    with tf.Graph().as_default() as g:
+      inputs = tf.placeholder(tf.float32, shape=[1, 4, 4, 3], name='inputs')
+      anchors = tf.constant(np.linspace(0.0, 1.0, num=64), tf.float32,
+                            name='anchors')
+      conv = tf.nn.conv2d(inputs, tf.constant(weights, tf.float32,
+                                              name='weights'),
+                          strides=[1, 1, 1, 1], padding='SAME')
+      tf.identity(tf.reduce_sum(conv) + tf.reduce_sum(anchors), name='output')
+    quantized_graph_def = exporter.quantize_weights(g.as_graph_def(),
+                                                    minimum_size=16)
+    node_by_name = {node.name: node for node in quantized_graph_def.node}
+    self.assertEqual(node_by_name['weights'].op, 'Dequantize')
+    self.assertEqual(node_by_name['anchors'].op, 'Const')
+
+    with tf.Graph().as_default() as quantized_graph:
+      tf.import_graph_def(quantized_graph_def, name='')
+      with self.test_session(graph=quantized_graph) as sess:
+        quantized_weights = sess.run('weights:0')
+    self.assertAllClose(quantized_weights, weights, atol=3.0 / 255)
+
+  def test_quantize_weights_skips_small_weights(self):
+    with tf.Graph().as_default() as g:
+      inputs = tf.placeholder(tf.float32, shape=[1, 3], name='inputs')
+      tf.matmul(inputs, tf.ones([3, 2]), name='output')
+    quantized_graph_def = exporter.quantize_weights(g.as_graph_def(),
+                                                    minimum_size=16)
+    self.assertNotIn('Dequantize',
+                     [node.op for node in quantized_graph_def.node])
+
+  def test_export_transformed_graph_and_report(self):
+    tmp_dir = self.get_temp_dir()
+    trained_checkpoint_prefix = os.path.join(tmp_dir, 'model.ckpt')
+    self._save_checkpoint_from_mock_model(trained_checkpoint_prefix,
+                                          use_moving_averages=False)
+    output_directory = os.path.join(tmp_dir, 'output')
+    inference_graph_path = os.path.join(output_directory,
+                                        'frozen_inference_graph.pb')
+    image_path = os.path.join(tmp_dir, 'image.jpg')
+    with tf.gfile.GFile(image_path, 'wb') as f:
+      f.write(self._create_encoded_image_string(
+          np.ones((4, 4, 3)).astype(np.uint8), 'jpg'))
+    with mock.patch.object(
+        model_builder, 'build', autospec=True) as mock_builder:
+      mock_builder.return_value = FakeModel()
+      pipeline_config = pipeline_pb2.TrainEvalPipelineConfig()
+      pipeline_config.eval_config.use_moving_averages = False
+      exporter.export_inference_graph(
+          input_type='image_tensor',
+          pipeline_config=pipeline_config,
+          trained_checkpoint_prefix=trained_checkpoint_prefix,
+          output_directory=output_directory,
+          fold_batch_norms=True,
+          strip_training_nodes=True,
+          quantize_weights_min_size=1,
+          report_image_paths=[image_path])
+
+    with tf.gfile.GFile(os.path.join(output_directory,
+                                     'export_report.txt')) as f:
+      report = f.read()
+    self.assertIn('frozen', report)
+    self.assertIn('transformed', report)
+
+    inference_graph = self._load_inference_graph(inference_graph_path)
+    self.assertIn('Dequantize', [op.type for op in
+                                 inference_graph.get_operations()])
+    with self.test_session(graph=inference_graph) as sess:
+      image_tensor = inference_graph.get_tensor_by_name('image_tensor:0')
+      boxes = inference_graph.get_tensor_by_name('detection_boxes:0')
+      num_detections = inference_graph.get_tensor_by_name('num_detections:0')
+      boxes_np, num_detections_np = sess.run(
+          [boxes, num_detections],
+          feed_dict={image_tensor: np.ones((2, 4, 4, 3)).astype(np.uint8)})
+      self.assertAllClose(boxes_np, [[[0.0, 0.0, 0.5, 0.5],
+                                      [0.5, 0.5, 0.8, 0.8]],
+                                     [[0.5, 0.5, 1.0, 1.0],
+                                      [0.0, 0.0, 0.0, 0.0]]])
+      self.assertAllClose(num_detections_np, [2, 1])
+
 
 if __name__ == '__main__':
   tf.test.main()
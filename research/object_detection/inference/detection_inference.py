@@ -50,6 +50,71 @@ def build_input(tfrecord_paths):
   return serialized_example_tensor, image_tensor
 
 
+def build_batched_input(tfrecord_paths, batch_size, num_decode_threads=4,
+                        image_size=None):
+  """Builds a batched input pipeline using tf.data.
+
+  Examples are decoded (and optionally resized) in a parallel map stage and then
+  grouped into batches. When no image_size is given, images in a batch are
+  zero-padded at the bottom and right to the largest image in the batch; the
+  original image shapes are returned so that detections can be mapped back to
+  the unpadded images (see build_batched_inference_graph).
+
+  Args:
+    tfrecord_paths: List of paths to the input TFRecords
+    batch_size: Maximum number of examples per batch. The final batch may be
+      smaller.
+    num_decode_threads: Number of examples to decode in parallel.
+    image_size: Optional (height, width) tuple. If provided, all images are
+      resized to this size instead of being padded.
+
+  Returns:
+    serialized_examples_tensor: The serialized examples in the batch. String
+        tensor, shape=[batch]
+    images_tensor: The decoded images. Uint8 tensor,
+        shape=[batch, height, width, 3]
+    image_shapes_tensor: The shapes of the decoded images before padding or
+        resizing. Int32 tensor, shape=[batch, 3]
+  """
+  def decode(serialized_example):
+    features = tf.parse_single_example(
+        serialized_example,
+        features={
+            standard_fields.TfExampleFields.image_encoded:
+                tf.FixedLenFeature([], tf.string),
+        })
+    encoded_image = features[standard_fields.TfExampleFields.image_encoded]
+    image = tf.image.decode_image(encoded_image, channels=3)
+    image.set_shape([None, None, 3])
+    image_shape = tf.shape(image)
+    if image_size is not None:
+      image = tf.image.resize_images(image, image_size)
+      image = tf.cast(tf.round(image), tf.uint8)
+    return serialized_example, image, image_shape
+
+  dataset = tf.data.TFRecordDataset(tfrecord_paths)
+  dataset = dataset.map(decode, num_parallel_calls=num_decode_threads)
+  dataset = dataset.padded_batch(
+      batch_size, padded_shapes=([], [None, None, 3], [3]))
+  dataset = dataset.prefetch(1)
+  (serialized_examples_tensor, images_tensor,
+   image_shapes_tensor) = dataset.make_one_shot_iterator().get_next()
+  return serialized_examples_tensor, images_tensor, image_shapes_tensor
+
+
+def _import_inference_graph(image_tensor, inference_graph_path):
+  """Imports the inference graph with image_tensor as its input."""
+  with tf.gfile.Open(inference_graph_path, 'r') as graph_def_file:
+    graph_content = graph_def_file.read()
+  graph_def = tf.GraphDef()
+  graph_def.MergeFromString(graph_content)
+
+  tf.import_graph_def(
+      graph_def, name='', input_map={'image_tensor': image_tensor})
+
+  return tf.get_default_graph()
+
+
 def build_inference_graph(image_tensor, inference_graph_path):
   """Loads the inference graph and connects it to the input image.
 
@@ -65,15 +130,7 @@ def build_inference_graph(image_tensor, inference_graph_path):
     detected_labels_tensor: Detected labels. Int64 tensor,
         shape=[num_detections]
   """
-  with tf.gfile.Open(inference_graph_path, 'r') as graph_def_file:
-    graph_content = graph_def_file.read()
-  graph_def = tf.GraphDef()
-  graph_def.MergeFromString(graph_content)
-
-  tf.import_graph_def(
-      graph_def, name='', input_map={'image_tensor': image_tensor})
-
-  g = tf.get_default_graph()
+  g = _import_inference_graph(image_tensor, inference_graph_path)
 
   num_detections_tensor = tf.squeeze(
       g.get_tensor_by_name('num_detections:0'), 0)
@@ -95,6 +152,49 @@ def build_inference_graph(image_tensor, inference_graph_path):
   return detected_boxes_tensor, detected_scores_tensor, detected_labels_tensor
 
 
+def build_batched_inference_graph(images_tensor, inference_graph_path,
+                                  image_shapes_tensor=None):
+  """Loads the inference graph and connects it to a batch of images.
+
+  Args:
+    images_tensor: The input images. uint8 tensor,
+        shape=[batch, None, None, 3]
+    inference_graph_path: Path to the inference graph with embedded weights
+    image_shapes_tensor: Optional shapes of the images before padding. Int32
+        tensor, shape=[batch, 3]. If provided, the detected boxes, which are
+        normalized with respect to the padded images, are rescaled to be
+        normalized with respect to the original images and clipped to [0, 1].
+
+  Returns:
+    detected_boxes_tensor: Detected boxes. Float tensor,
+        shape=[batch, max_detections, 4]
+    detected_scores_tensor: Detected scores. Float tensor,
+        shape=[batch, max_detections]
+    detected_labels_tensor: Detected labels. Int64 tensor,
+        shape=[batch, max_detections]
+    num_detections_tensor: Number of valid detections per image. Int32 tensor,
+        shape=[batch]
+  """
+  g = _import_inference_graph(images_tensor, inference_graph_path)
+
+  num_detections_tensor = tf.cast(
+      g.get_tensor_by_name('num_detections:0'), tf.int32)
+  detected_boxes_tensor = g.get_tensor_by_name('detection_boxes:0')
+  detected_scores_tensor = g.get_tensor_by_name('detection_scores:0')
+  detected_labels_tensor = tf.cast(
+      g.get_tensor_by_name('detection_classes:0'), tf.int64)
+
+  if image_shapes_tensor is not None:
+    padded_size = tf.to_float(tf.shape(images_tensor)[1:3])
+    image_sizes = tf.to_float(image_shapes_tensor[:, :2])
+    scale = tf.tile(padded_size / image_sizes, [1, 2])
+    detected_boxes_tensor = tf.minimum(
+        detected_boxes_tensor * tf.expand_dims(scale, 1), 1.0)
+
+  return (detected_boxes_tensor, detected_scores_tensor,
+          detected_labels_tensor, num_detections_tensor)
+
+
 def infer_detections_and_add_to_example(
     serialized_example_tensor, detected_boxes_tensor, detected_scores_tensor,
     detected_labels_tensor, discard_image_pixels):
@@ -112,12 +212,56 @@ def infer_detections_and_add_to_example(
   Returns:
     The de-serialized TF example augmented with the inferred detections.
   """
-  tf_example = tf.train.Example()
   (serialized_example, detected_boxes, detected_scores,
    detected_classes) = tf.get_default_session().run([
        serialized_example_tensor, detected_boxes_tensor, detected_scores_tensor,
        detected_labels_tensor
    ])
+  return _add_detections_to_example(serialized_example, detected_boxes,
+                                    detected_scores, detected_classes,
+                                    discard_image_pixels)
+
+
+def infer_detections_and_add_to_examples(
+    serialized_examples_tensor, detected_boxes_tensor, detected_scores_tensor,
+    detected_labels_tensor, num_detections_tensor, discard_image_pixels):
+  """Runs a batch of detections and adds them to the corresponding examples.
+
+  Args:
+    serialized_examples_tensor: Serialized TF examples. String tensor,
+        shape=[batch]
+    detected_boxes_tensor: Detected boxes. Float tensor,
+        shape=[batch, max_detections, 4]
+    detected_scores_tensor: Detected scores. Float tensor,
+        shape=[batch, max_detections]
+    detected_labels_tensor: Detected labels. Int64 tensor,
+        shape=[batch, max_detections]
+    num_detections_tensor: Number of valid detections per example. Int32
+        tensor, shape=[batch]
+    discard_image_pixels: If true, discards the images from the results
+  Returns:
+    A list with one de-serialized TF example per input example, each augmented
+    with its inferred detections.
+  """
+  (serialized_examples, detected_boxes, detected_scores, detected_classes,
+   num_detections) = tf.get_default_session().run([
+       serialized_examples_tensor, detected_boxes_tensor,
+       detected_scores_tensor, detected_labels_tensor, num_detections_tensor
+   ])
+  tf_examples = []
+  for i, serialized_example in enumerate(serialized_examples):
+    n = num_detections[i]
+    tf_examples.append(_add_detections_to_example(
+        serialized_example, detected_boxes[i, :n], detected_scores[i, :n],
+        detected_classes[i, :n], discard_image_pixels))
+  return tf_examples
+
+
+def _add_detections_to_example(serialized_example, detected_boxes,
+                               detected_scores, detected_classes,
+                               discard_image_pixels):
+  """Parses serialized_example and adds the given detections to it."""
+  tf_example = tf.train.Example()
   detected_boxes = detected_boxes.T
 
   tf_example.ParseFromString(serialized_example)
@@ -30,8 +30,8 @@ def get_mock_tfrecord_path():
   return os.path.join(tf.test.get_temp_dir(), 'mock.tfrec')
 
 
-def create_mock_tfrecord():
-  pil_image = Image.fromarray(np.array([[[123, 0, 0]]], dtype=np.uint8), 'RGB')
+def create_mock_tf_example(image_array):
+  pil_image = Image.fromarray(image_array, 'RGB')
   image_output_stream = StringIO.StringIO()
   pil_image.save(image_output_stream, format='png')
   encoded_image = image_output_stream.getvalue()
@@ -43,11 +43,26 @@ def create_mock_tfrecord():
           dataset_util.bytes_feature(encoded_image),
   }
 
-  tf_example = tf.train.Example(features=tf.train.Features(feature=feature_map))
+  return tf.train.Example(features=tf.train.Features(feature=feature_map))
+
+
+def create_mock_tfrecord():
+  tf_example = create_mock_tf_example(
+      np.array([[[123, 0, 0]]], dtype=np.uint8))
   with tf.python_io.TFRecordWriter(get_mock_tfrecord_path()) as writer:
     writer.write(tf_example.SerializeToString())
 
 
+def create_mock_batched_tfrecord():
+  """Writes a 1x1 image with value 123 and a 2x2 image with value 1."""
+  with tf.python_io.TFRecordWriter(get_mock_tfrecord_path()) as writer:
+    writer.write(create_mock_tf_example(
+        np.array([[[123, 0, 0]]], dtype=np.uint8)).SerializeToString())
+    writer.write(create_mock_tf_example(
+        np.array([[[1, 0, 0], [0, 0, 0]],
+                  [[0, 0, 0], [0, 0, 0]]], dtype=np.uint8)).SerializeToString())
+
+
 def get_mock_graph_path():
   return os.path.join(tf.test.get_temp_dir(), 'mock_graph.pb')
 
@@ -72,6 +87,29 @@ def create_mock_graph():
     fl.write(graph_def.SerializeToString())
 
 
+def create_mock_batched_graph():
+  g = tf.Graph()
+  with g.as_default():
+    in_image_tensor = tf.placeholder(
+        tf.uint8, shape=[None, None, None, 3], name='image_tensor')
+    batch_size = tf.shape(in_image_tensor)[0]
+    tf.fill(tf.expand_dims(batch_size, 0), 2.0, name='num_detections')
+    tf.tile(
+        tf.constant(
+            [[[0, 0.4, 0.3, 0.5], [0.1, 0.2, 0.8, 0.9], [0.2, 0.3, 0.4, 0.5]]]),
+        tf.stack([batch_size, 1, 1]), name='detection_boxes')
+    tf.tile(tf.constant([[0.1, 0.2, 0.3]]), tf.stack([batch_size, 1]),
+            name='detection_scores')
+    tf.identity(
+        tf.constant([[1.0, 2.0, 3.0]]) * tf.expand_dims(tf.reduce_sum(
+            tf.cast(in_image_tensor, dtype=tf.float32), axis=[1, 2, 3]), 1),
+        name='detection_classes')
+    graph_def = g.as_graph_def()
+
+  with tf.gfile.Open(get_mock_graph_path(), 'w') as fl:
+    fl.write(graph_def.SerializeToString())
+
+
 class InferDetectionsTests(tf.test.TestCase):
 
   def test_simple(self):
@@ -171,6 +209,85 @@ class InferDetectionsTests(tf.test.TestCase):
             value { float_list { value: [1.0, 2.0, 3.0, 4.0] } } } }
     """, tf_example)
 
+  def test_batched_with_padding(self):
+    create_mock_batched_graph()
+    create_mock_batched_tfrecord()
+
+    (serialized_examples_tensor, images_tensor,
+     image_shapes_tensor) = detection_inference.build_batched_input(
+         [get_mock_tfrecord_path()], batch_size=2, num_decode_threads=2)
+    self.assertAllEqual(images_tensor.get_shape().as_list(),
+                        [None, None, None, 3])
+
+    (detected_boxes_tensor, detected_scores_tensor, detected_labels_tensor,
+     num_detections_tensor) = detection_inference.build_batched_inference_graph(
+         images_tensor, get_mock_graph_path(), image_shapes_tensor)
+
+    with self.test_session(use_gpu=False) as sess:
+      sess.run(tf.global_variables_initializer())
+      sess.run(tf.local_variables_initializer())
+
+      tf_examples = detection_inference.infer_detections_and_add_to_examples(
+          serialized_examples_tensor, detected_boxes_tensor,
+          detected_scores_tensor, detected_labels_tensor,
+          num_detections_tensor, True)
+      with self.assertRaises(tf.errors.OutOfRangeError):
+        detection_inference.infer_detections_and_add_to_examples(
+            serialized_examples_tensor, detected_boxes_tensor,
+            detected_scores_tensor, detected_labels_tensor,
+            num_detections_tensor, True)
+
+    self.assertEqual(len(tf_examples), 2)
+    # The 1x1 image is padded to 2x2, so its boxes are scaled by 2 and clipped.
+    self.assertProtoEquals(r"""
+        features {
+          feature {
+            key: "image/detection/bbox/ymin"
+            value { float_list { value: [0.0, 0.2] } } }
+          feature {
+            key: "image/detection/bbox/xmin"
+            value { float_list { value: [0.8, 0.4] } } }
+          feature {
+            key: "image/detection/bbox/ymax"
+            value { float_list { value: [0.6, 1.0] } } }
+          feature {
+            key: "image/detection/bbox/xmax"
+            value { float_list { value: [1.0, 1.0] } } }
+          feature {
+            key: "image/detection/label"
+            value { int64_list { value: [123, 246] } } }
+          feature {
+            key: "image/detection/score"
+            value { float_list { value: [0.1, 0.2] } } }
+          feature {
+            key: "test_field"
+            value { float_list { value: [1.0, 2.0, 3.0, 4.0] } } } }
+    """, tf_examples[0])
+    self.assertProtoEquals(r"""
+        features {
+          feature {
+            key: "image/detection/bbox/ymin"
+            value { float_list { value: [0.0, 0.1] } } }
+          feature {
+            key: "image/detection/bbox/xmin"
+            value { float_list { value: [0.4, 0.2] } } }
+          feature {
+            key: "image/detection/bbox/ymax"
+            value { float_list { value: [0.3, 0.8] } } }
+          feature {
+            key: "image/detection/bbox/xmax"
+            value { float_list { value: [0.5, 0.9] } } }
+          feature {
+            key: "image/detection/label"
+            value { int64_list { value: [1, 2] } } }
+          feature {
+            key: "image/detection/score"
+            value { float_list { value: [0.1, 0.2] } } }
+          feature {
+            key: "test_field"
+            value { float_list { value: [1.0, 2.0, 3.0, 4.0] } } } }
+    """, tf_examples[1])
+
 
 if __name__ == '__main__':
   tf.test.main()
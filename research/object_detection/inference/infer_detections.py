@@ -32,9 +32,15 @@ The script can also discard the image pixels in the output. This greatly
 reduces the output size and can potentially accelerate reading data in
 subsequent processing steps that don't require the images (e.g. computing
 metrics).
+
+Setting --batch_size greater than 1 switches to a batched tf.data pipeline that
+decodes --num_decode_threads images in parallel and runs the inference graph
+once per batch. Images in a batch are padded to a common size unless
+--image_size is given, in which case they are resized to that size.
 """
 
 import itertools
+import time
 import tensorflow as tf
 from object_detection.inference import detection_inference
 
@@ -49,6 +55,16 @@ tf.flags.DEFINE_boolean('discard_image_pixels', False,
                         ' significantly reduces the output size and is useful'
                         ' if the subsequent tools don\'t need access to the'
                         ' images (e.g. when computing evaluation measures).')
+tf.flags.DEFINE_integer('batch_size', 1,
+                        'Number of images to run through the inference graph'
+                        ' per session call.')
+tf.flags.DEFINE_integer('num_decode_threads', 4,
+                        'Number of images to decode in parallel when'
+                        ' batch_size > 1.')
+tf.flags.DEFINE_string('image_size', '',
+                       'Optional comma separated height,width to resize images'
+                       ' to when batch_size > 1. If empty, images are padded to'
+                       ' the largest image in each batch instead.')
 
 FLAGS = tf.flags.FLAGS
 
@@ -62,10 +78,18 @@ def main(_):
     if not getattr(FLAGS, flag_name):
       raise ValueError('Flag --{} is required'.format(flag_name))
 
+  input_tfrecord_paths = [
+      v for v in FLAGS.input_tfrecord_paths.split(',') if v]
+  tf.logging.info('Reading input from %d files', len(input_tfrecord_paths))
+  if FLAGS.batch_size > 1:
+    _run_batched_inference(input_tfrecord_paths)
+  else:
+    _run_inference(input_tfrecord_paths)
+
+
+def _run_inference(input_tfrecord_paths):
+  """Runs inference one image at a time."""
   with tf.Session() as sess:
-    input_tfrecord_paths = [
-        v for v in FLAGS.input_tfrecord_paths.split(',') if v]
-    tf.logging.info('Reading input from %d files', len(input_tfrecord_paths))
     serialized_example_tensor, image_tensor = detection_inference.build_input(
         input_tfrecord_paths)
     tf.logging.info('Reading graph and building model...')
@@ -77,6 +101,7 @@ def main(_):
         FLAGS.output_tfrecord_path))
     sess.run(tf.local_variables_initializer())
     tf.train.start_queue_runners()
+    start_time = time.time()
     with tf.python_io.TFRecordWriter(
         FLAGS.output_tfrecord_path) as tf_record_writer:
       try:
@@ -90,6 +115,58 @@ def main(_):
           tf_record_writer.write(tf_example.SerializeToString())
       except tf.errors.OutOfRangeError:
         tf.logging.info('Finished processing records')
+    _log_throughput(counter, time.time() - start_time)
+
+
+def _run_batched_inference(input_tfrecord_paths):
+  """Runs inference on batches of FLAGS.batch_size images."""
+  image_size = None
+  if FLAGS.image_size:
+    image_size = [int(v) for v in FLAGS.image_size.split(',')]
+    if len(image_size) != 2:
+      raise ValueError('--image_size must be of the form height,width')
+
+  with tf.Session() as sess:
+    (serialized_examples_tensor, images_tensor,
+     image_shapes_tensor) = detection_inference.build_batched_input(
+         input_tfrecord_paths, FLAGS.batch_size, FLAGS.num_decode_threads,
+         image_size)
+    tf.logging.info('Reading graph and building model...')
+    (detected_boxes_tensor, detected_scores_tensor, detected_labels_tensor,
+     num_detections_tensor) = detection_inference.build_batched_inference_graph(
+         images_tensor, FLAGS.inference_graph,
+         image_shapes_tensor if image_size is None else None)
+
+    tf.logging.info('Running inference and writing output to {}'.format(
+        FLAGS.output_tfrecord_path))
+    sess.run(tf.local_variables_initializer())
+    counter = 0
+    start_time = time.time()
+    with tf.python_io.TFRecordWriter(
+        FLAGS.output_tfrecord_path) as tf_record_writer:
+      try:
+        for batch_counter in itertools.count():
+          tf.logging.log_every_n(tf.logging.INFO, 'Processed %d images...', 10,
+                                 counter)
+          tf_examples = (
+              detection_inference.infer_detections_and_add_to_examples(
+                  serialized_examples_tensor, detected_boxes_tensor,
+                  detected_scores_tensor, detected_labels_tensor,
+                  num_detections_tensor, FLAGS.discard_image_pixels))
+          for tf_example in tf_examples:
+            tf_record_writer.write(tf_example.SerializeToString())
+          counter += len(tf_examples)
+      except tf.errors.OutOfRangeError:
+        tf.logging.info('Finished processing records')
+    tf.logging.info('Processed %d batches', batch_counter)
+    _log_throughput(counter, time.time() - start_time)
+
+
+def _log_throughput(num_images, elapsed_secs):
+  """Logs the number of processed images and the images/sec throughput."""
+  tf.logging.info('Processed %d images in %.1f seconds (%.2f images/sec)',
+                  num_images, elapsed_secs,
+                  num_images / max(elapsed_secs, 1e-9))
 
 
 if __name__ == '__main__':
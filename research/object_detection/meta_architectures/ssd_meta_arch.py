@@ -24,6 +24,7 @@ import tensorflow as tf
 
 from object_detection.core import box_list
 from object_detection.core import box_predictor as bpredictor
+from object_detection.core import matcher as mat
 from object_detection.core import model
 from object_detection.core import standard_fields as fields
 from object_detection.core import target_assigner
@@ -119,7 +120,8 @@ class SSDMetaArch(model.DetectionModel):
                localization_loss_weight,
                normalize_loss_by_num_matches,
                hard_example_miner,
-               add_summaries=True):
+               add_summaries=True,
+               cache_static_anchors=False):
     """SSDMetaArch Constructor.
 
     TODO: group NMS parameters + score converter into a class and loss
@@ -158,6 +160,10 @@ class SSDMetaArch(model.DetectionModel):
       hard_example_miner: a losses.HardExampleMiner object (can be None)
       add_summaries: boolean (default: True) controlling whether summary ops
         should be added to tensorflow graph.
+      cache_static_anchors: boolean (default: False) controlling whether
+        anchors are computed once and embedded in the graph as constants when
+        the input and feature map shapes are static (e.g. with a
+        fixed_shape_resizer). The anchor generator must not hold tensors.
     """
     super(SSDMetaArch, self).__init__(num_classes=box_predictor.num_classes)
     self._is_training = is_training
@@ -198,6 +204,10 @@ class SSDMetaArch(model.DetectionModel):
 
     self._anchors = None
     self._add_summaries = add_summaries
+    self._cache_static_anchors = cache_static_anchors
+    # Maps (feature map shapes, image height, image width) to a dictionary of
+    # the numpy arrays of the fields of the anchors.
+    self._anchor_cache = {}
 
   @property
   def anchors(self):
@@ -263,11 +273,10 @@ class SSDMetaArch(model.DetectionModel):
       feature_maps = self._feature_extractor.extract_features(
           preprocessed_inputs)
     feature_map_spatial_dims = self._get_feature_map_spatial_dims(feature_maps)
-    image_shape = tf.shape(preprocessed_inputs)
-    self._anchors = self._anchor_generator.generate(
-        feature_map_spatial_dims,
-        im_height=image_shape[1],
-        im_width=image_shape[2])
+    image_shape = shape_utils.combined_static_and_dynamic_shape(
+        preprocessed_inputs)
+    self._anchors = self._generate_anchors(
+        feature_map_spatial_dims, image_shape[1], image_shape[2])
     (box_encodings, class_predictions_with_background
     ) = self._add_box_predictions_to_feature_maps(feature_maps)
     predictions_dict = {
@@ -340,6 +349,56 @@ class SSDMetaArch(model.DetectionModel):
           cls_predictions_with_background_list, 1)
     return box_encodings, class_predictions_with_background
 
+  def _generate_anchors(self, feature_map_spatial_dims, im_height, im_width):
+    """Generates anchors, reading them from the anchor cache if possible.
+
+    If static anchors are cached and all shapes are static, the anchors are
+    generated once per set of shapes in a separate graph, evaluated on the CPU
+    and embedded in the model graph as constants. Otherwise they are generated
+    in the model graph.
+
+    Args:
+      feature_map_spatial_dims: a list of (height, width) pairs of the feature
+        maps, see _get_feature_map_spatial_dims.
+      im_height: the height of the preprocessed images, an integer or a scalar
+        int32 tensor.
+      im_width: the width of the preprocessed images, an integer or a scalar
+        int32 tensor.
+
+    Returns:
+      a box_list.BoxList holding the anchors.
+    """
+    shapes = [im_height, im_width] + [
+        dim for dims in feature_map_spatial_dims for dim in dims]
+    if not (self._cache_static_anchors and
+            all(isinstance(dim, int) for dim in shapes)):
+      return self._anchor_generator.generate(
+          feature_map_spatial_dims, im_height=im_height, im_width=im_width)
+
+    cache_key = (tuple(tuple(dims) for dims in feature_map_spatial_dims),
+                 im_height, im_width)
+    if cache_key not in self._anchor_cache:
+      # The separate graph keeps the anchor ops out of the model graph, and
+      # hiding the GPUs keeps the session from allocating GPU memory.
+      with tf.Graph().as_default():
+        anchors = self._anchor_generator.generate(
+            [tuple(dims) for dims in feature_map_spatial_dims],
+            im_height=im_height, im_width=im_width)
+        anchor_fields = anchors.get_all_fields()
+        with tf.Session(
+            config=tf.ConfigProto(device_count={'GPU': 0})) as sess:
+          anchor_arrays = sess.run(
+              [anchors.get_field(field) for field in anchor_fields])
+      self._anchor_cache[cache_key] = dict(zip(anchor_fields, anchor_arrays))
+
+    anchor_arrays = self._anchor_cache[cache_key]
+    with tf.name_scope(self._anchor_generator.name_scope()):
+      anchors = box_list.BoxList(tf.constant(anchor_arrays['boxes']))
+      for field, array in anchor_arrays.items():
+        if field != 'boxes':
+          anchors.add_field(field, tf.constant(array))
+    return anchors
+
   def _get_feature_map_spatial_dims(self, feature_maps):
     """Return list of spatial dimensions for each feature map in a list.
 
@@ -449,11 +508,16 @@ class SSDMetaArch(model.DetectionModel):
       keypoints = None
       if self.groundtruth_has_field(fields.BoxListFields.keypoints):
         keypoints = self.groundtruth_lists(fields.BoxListFields.keypoints)
+      anchor_matches = None
+      if self.groundtruth_has_field(
+          fields.InputDataFields.groundtruth_anchor_matches):
+        anchor_matches = self.groundtruth_lists(
+            fields.InputDataFields.groundtruth_anchor_matches)
       (batch_cls_targets, batch_cls_weights, batch_reg_targets,
        batch_reg_weights, match_list) = self._assign_targets(
            self.groundtruth_lists(fields.BoxListFields.boxes),
            self.groundtruth_lists(fields.BoxListFields.classes),
-           keypoints)
+           keypoints, anchor_matches)
       if self._add_summaries:
         self._summarize_input(
             self.groundtruth_lists(fields.BoxListFields.boxes), match_list)
@@ -515,7 +579,8 @@ class SSDMetaArch(model.DetectionModel):
                                               'NegativeAnchorLossCDF')
 
   def _assign_targets(self, groundtruth_boxes_list, groundtruth_classes_list,
-                      groundtruth_keypoints_list=None):
+                      groundtruth_keypoints_list=None,
+                      groundtruth_anchor_matches_list=None):
     """Assign groundtruth targets.
 
     Adds a background class to each one-hot encoding of groundtruth classes
@@ -532,6 +597,10 @@ class SSDMetaArch(model.DetectionModel):
         index assumed to map to the first non-background class.
       groundtruth_keypoints_list: (optional) a list of 3-D tensors of shape
         [num_boxes, num_keypoints, 2]
+      groundtruth_anchor_matches_list: (optional) a list of 1-D integer tensors
+        of shape [num_anchors] containing precomputed matches between anchors
+        and groundtruth boxes (see matcher.Match). If provided, the matcher is
+        not run.
 
     Returns:
       batch_cls_targets: a tensor with shape [batch_size, num_anchors,
@@ -556,9 +625,13 @@ class SSDMetaArch(model.DetectionModel):
       for boxlist, keypoints in zip(
           groundtruth_boxlists, groundtruth_keypoints_list):
         boxlist.add_field(fields.BoxListFields.keypoints, keypoints)
+    match_list = None
+    if groundtruth_anchor_matches_list is not None:
+      match_list = [mat.Match(tf.to_int32(anchor_matches))
+                    for anchor_matches in groundtruth_anchor_matches_list]
     return target_assigner.batch_assign_targets(
         self._target_assigner, self.anchors, groundtruth_boxlists,
-        groundtruth_classes_with_background_list)
+        groundtruth_classes_with_background_list, match_list)
 
   def _summarize_input(self, groundtruth_boxes_list, match_list):
     """Creates tensorflow summaries for the input boxes and anchors.
@@ -18,6 +18,7 @@ import functools
 import numpy as np
 import tensorflow as tf
 
+from object_detection.anchor_generators import multiple_grid_anchor_generator
 from object_detection.core import anchor_generator
 from object_detection.core import box_list
 from object_detection.core import losses
@@ -78,9 +79,14 @@ class SsdMetaArchTest(tf.test.TestCase):
     we will also always end up with an extra padded row in the detection
     results.
     """
+    self._model = self._create_model()
+
+  def _create_model(self, cache_static_anchors=False,
+                    anchor_generator_object=None):
     is_training = False
     self._num_classes = 1
-    mock_anchor_generator = MockAnchorGenerator2x2()
+    if anchor_generator_object is None:
+      anchor_generator_object = MockAnchorGenerator2x2()
     mock_box_predictor = test_utils.MockBoxPredictor(
         is_training, self._num_classes)
     mock_box_coder = test_utils.MockBoxCoder()
@@ -112,13 +118,14 @@ class SsdMetaArchTest(tf.test.TestCase):
 
     self._num_anchors = 4
     self._code_size = 4
-    self._model = ssd_meta_arch.SSDMetaArch(
-        is_training, mock_anchor_generator, mock_box_predictor, mock_box_coder,
-        fake_feature_extractor, mock_matcher, region_similarity_calculator,
+    return ssd_meta_arch.SSDMetaArch(
+        is_training, anchor_generator_object, mock_box_predictor,
+        mock_box_coder, fake_feature_extractor, mock_matcher,
+        region_similarity_calculator,
         image_resizer_fn, non_max_suppression_fn, tf.identity,
         classification_loss, localization_loss, classification_loss_weight,
         localization_loss_weight, normalize_loss_by_num_matches,
-        hard_example_miner)
+        hard_example_miner, cache_static_anchors=cache_static_anchors)
 
   def test_preprocess_preserves_input_shapes(self):
     image_shapes = [(3, None, None, 3),
@@ -245,6 +252,77 @@ class SsdMetaArchTest(tf.test.TestCase):
       self.assertAllClose(losses_out['classification_loss'],
                           expected_classification_loss)
 
+  def test_loss_with_precomputed_anchor_matches(self):
+    batch_size = 2
+    preprocessed_input = tf.random_uniform((batch_size, 2, 2, 3),
+                                           dtype=tf.float32)
+    groundtruth_boxes_list = [tf.constant([[0, 0, .5, .5]], dtype=tf.float32),
+                              tf.constant([[0, 0, .5, .5]], dtype=tf.float32)]
+    groundtruth_classes_list = [tf.constant([[1]], dtype=tf.float32),
+                                tf.constant([[1]], dtype=tf.float32)]
+    # Ignoring all but the last anchor overrides the mock matcher.
+    groundtruth_anchor_matches_list = [
+        tf.constant([-2, -2, -2, -1], dtype=tf.int64),
+        tf.constant([-2, -2, -2, -1], dtype=tf.int64)]
+    self._model.provide_groundtruth(
+        groundtruth_boxes_list, groundtruth_classes_list,
+        groundtruth_anchor_matches_list=groundtruth_anchor_matches_list)
+    prediction_dict = self._model.predict(preprocessed_input)
+    loss_dict = self._model.loss(prediction_dict)
+
+    expected_localization_loss = 0.0
+    expected_classification_loss = (batch_size * (self._num_classes+1) *
+                                    np.log(2.0))
+    init_op = tf.global_variables_initializer()
+    with self.test_session() as sess:
+      sess.run(init_op)
+      losses_out = sess.run(loss_dict)
+
+      self.assertAllClose(losses_out['localization_loss'],
+                          expected_localization_loss)
+      self.assertAllClose(losses_out['classification_loss'],
+                          expected_classification_loss)
+
+  def test_predict_caches_static_anchors(self):
+    model = self._create_model(cache_static_anchors=True)
+    expected_anchors = [[0, 0, .5, .5],
+                        [0, .5, .5, 1],
+                        [.5, 0, 1, .5],
+                        [.5, .5, 1, 1]]
+    for _ in range(2):
+      prediction_dict = model.predict(tf.zeros((2, 2, 2, 3)))
+      self.assertEqual(prediction_dict['anchors'].op.type, 'Const')
+    self.assertEqual(len(model._anchor_cache), 1)
+
+    dynamic_prediction_dict = model.predict(
+        tf.placeholder(tf.float32, shape=(None, None, None, 3)))
+    self.assertNotEqual(dynamic_prediction_dict['anchors'].op.type, 'Const')
+
+    with self.test_session() as sess:
+      self.assertAllClose(sess.run(prediction_dict['anchors']),
+                          expected_anchors)
+
+  def test_predict_caches_static_ssd_anchors(self):
+    # The anchor generator is created in the model graph, while the cached
+    # anchors are generated in a separate graph.
+    def create_model(cache_static_anchors):
+      return self._create_model(
+          cache_static_anchors=cache_static_anchors,
+          anchor_generator_object=(
+              multiple_grid_anchor_generator.create_ssd_anchors(
+                  num_layers=1, scales=[0.5], aspect_ratios=(1.0,),
+                  interpolated_scale_aspect_ratio=0.0,
+                  reduce_boxes_in_lowest_layer=False)))
+    preprocessed_inputs = tf.zeros((2, 2, 2, 3))
+    prediction_dict = create_model(True).predict(preprocessed_inputs)
+    self.assertEqual(prediction_dict['anchors'].op.type, 'Const')
+    expected_prediction_dict = create_model(False).predict(preprocessed_inputs)
+
+    with self.test_session() as sess:
+      anchors, expected_anchors = sess.run(
+          [prediction_dict['anchors'], expected_prediction_dict['anchors']])
+    self.assertAllClose(anchors, expected_anchors)
+
   def test_restore_map_for_detection_ckpt(self):
     init_op = tf.global_variables_initializer()
     saver = tf.train.Saver()
@@ -30,8 +30,14 @@ Example usage:
         --eval_dir=path/to/eval_dir \
         --eval_config_path=path/to/evaluation/configuration/file \
         --input_config_path=path/to/input/configuration/file
+
+With --num_workers greater than 1 the input files are parsed and matched in
+that many processes, one file at a time. Every worker sends back only the
+per-class scores, tp/fp labels and groundtruth counts of its file, which are
+merged in file order and give exactly the same metrics as a serial run.
 """
 import csv
+import multiprocessing
 import os
 import re
 import tensorflow as tf
@@ -50,6 +56,9 @@ flags.DEFINE_string('eval_config_path', None,
                     'Path to an eval_pb2.EvalConfig config file.')
 flags.DEFINE_string('input_config_path', None,
                     'Path to an eval_pb2.InputConfig config file.')
+flags.DEFINE_integer('num_workers', 1,
+                     'Number of processes used to parse and evaluate the '
+                     'input files in parallel.')
 
 FLAGS = flags.FLAGS
 
@@ -73,7 +82,69 @@ def _generate_filenames(filenames):
   return result
 
 
-def read_data_and_evaluate(input_config, eval_config):
+def _add_examples_from_file(input_path, object_detection_evaluator):
+  """Adds the groundtruth and detections stored in a tf_record file.
+
+  Args:
+    input_path: path to a tf_record file of tf.Examples holding both
+      groundtruth and detections.
+    object_detection_evaluator: a DetectionEvaluator to add the images to.
+
+  Returns:
+    processed_images: number of records read from the file.
+    skipped_images: number of records that could not be parsed.
+  """
+  tf.logging.info('Processing file: {0}'.format(input_path))
+
+  record_iterator = tf.python_io.tf_record_iterator(path=input_path)
+  data_parser = tf_example_parser.TfExampleDetectionAndGTParser()
+
+  skipped_images = 0
+  processed_images = 0
+  for string_record in record_iterator:
+    tf.logging.log_every_n(tf.logging.INFO, 'Processed %d images...', 1000,
+                           processed_images)
+    processed_images += 1
+
+    example = tf.train.Example()
+    example.ParseFromString(string_record)
+    decoded_dict = data_parser.parse(example)
+
+    if decoded_dict:
+      object_detection_evaluator.add_single_ground_truth_image_info(
+          decoded_dict[standard_fields.DetectionResultFields.key],
+          decoded_dict)
+      object_detection_evaluator.add_single_detected_image_info(
+          decoded_dict[standard_fields.DetectionResultFields.key],
+          decoded_dict)
+    else:
+      skipped_images += 1
+      tf.logging.info('Skipped images: {0}'.format(skipped_images))
+  return processed_images, skipped_images
+
+
+def _evaluate_file(args):
+  """Worker function evaluating a single tf_record file in its own evaluator.
+
+  Args:
+    args: a tuple (input_path, eval_config, categories).
+
+  Returns:
+    statistics: the ObjectDetectionEvalStatistics holding the per-class scores,
+      tp/fp labels and groundtruth counts of the images in the file.
+    processed_images: number of records read from the file.
+    skipped_images: number of records that could not be parsed.
+  """
+  input_path, eval_config, categories = args
+  object_detection_evaluator = evaluator.get_evaluators(
+      eval_config, categories)[0]
+  processed_images, skipped_images = _add_examples_from_file(
+      input_path, object_detection_evaluator)
+  return (object_detection_evaluator.get_statistics(), processed_images,
+          skipped_images)
+
+
+def read_data_and_evaluate(input_config, eval_config, num_workers=1):
   """Reads pre-computed object detections and groundtruth from tf_record.
 
   Args:
@@ -81,6 +152,9 @@ def read_data_and_evaluate(input_config, eval_config):
       object_detection.protos.InputReader.
     eval_config: evaluation config proto of type
       object_detection.protos.EvalConfig.
+    num_workers: number of processes used to parse and evaluate the input
+      files. With more than one worker every file is evaluated in a separate
+      evaluator and the statistics of the files are merged in file order.
 
   Returns:
     Evaluated detections metrics.
@@ -101,33 +175,32 @@ def read_data_and_evaluate(input_config, eval_config):
     # Support a single evaluator
     object_detection_evaluator = object_detection_evaluators[0]
 
+    filenames = _generate_filenames(input_paths)
     skipped_images = 0
     processed_images = 0
-    for input_path in _generate_filenames(input_paths):
-      tf.logging.info('Processing file: {0}'.format(input_path))
-
-      record_iterator = tf.python_io.tf_record_iterator(path=input_path)
-      data_parser = tf_example_parser.TfExampleDetectionAndGTParser()
-
-      for string_record in record_iterator:
-        tf.logging.log_every_n(tf.logging.INFO, 'Processed %d images...', 1000,
-                               processed_images)
-        processed_images += 1
-
-        example = tf.train.Example()
-        example.ParseFromString(string_record)
-        decoded_dict = data_parser.parse(example)
-
-        if decoded_dict:
-          object_detection_evaluator.add_single_ground_truth_image_info(
-              decoded_dict[standard_fields.DetectionResultFields.key],
-              decoded_dict)
-          object_detection_evaluator.add_single_detected_image_info(
-              decoded_dict[standard_fields.DetectionResultFields.key],
-              decoded_dict)
-        else:
-          skipped_images += 1
-          tf.logging.info('Skipped images: {0}'.format(skipped_images))
+    if num_workers > 1 and len(filenames) > 1:
+      pool = multiprocessing.Pool(min(num_workers, len(filenames)))
+      try:
+        # imap returns the results in file order, which keeps the merged
+        # per-class scores in the same order as in a serial run.
+        for (file_statistics, file_processed_images,
+             file_skipped_images) in pool.imap(
+                 _evaluate_file,
+                 [(filename, eval_config, categories)
+                  for filename in filenames]):
+          object_detection_evaluator.merge(file_statistics)
+          processed_images += file_processed_images
+          skipped_images += file_skipped_images
+      finally:
+        pool.terminate()
+    else:
+      for input_path in filenames:
+        file_processed_images, file_skipped_images = _add_examples_from_file(
+            input_path, object_detection_evaluator)
+        processed_images += file_processed_images
+        skipped_images += file_skipped_images
+    tf.logging.info('Processed {0} images, skipped {1} images.'.format(
+        processed_images, skipped_images))
 
     return object_detection_evaluator.evaluate()
 
@@ -163,7 +236,8 @@ def main(argv):
   eval_config = configs['eval_config']
   input_config = configs['eval_input_config']
 
-  metrics = read_data_and_evaluate(input_config, eval_config)
+  metrics = read_data_and_evaluate(input_config, eval_config,
+                                   num_workers=FLAGS.num_workers)
 
   # Save metrics
   write_metrics(metrics, FLAGS.eval_dir)
@@ -14,9 +14,15 @@
 # ==============================================================================
 """Tests for utilities in offline_eval_map_corloc binary."""
 
+import os
+
 import tensorflow as tf
 
+from object_detection.core import standard_fields
 from object_detection.metrics import offline_eval_map_corloc as offline_eval
+from object_detection.protos import eval_pb2
+from object_detection.protos import input_reader_pb2
+from object_detection.utils import dataset_util
 
 
 class OfflineEvalMapCorlocTest(tf.test.TestCase):
@@ -53,6 +59,59 @@ class OfflineEvalMapCorlocTest(tf.test.TestCase):
         '/path/to/-00001-of-00003.record', '/path/to/-00002-of-00003.record'
     ])
 
+  def _create_tf_example(self, image_id, groundtruth, detections):
+    """Returns a tf.Example with boxes given as (class, ymin, xmin) tuples."""
+    fields = standard_fields.TfExampleFields
+    feature = {
+        fields.source_id: dataset_util.bytes_feature(image_id),
+        fields.object_class_label: dataset_util.int64_list_feature(
+            [label for label, _, _ in groundtruth]),
+        fields.detection_class_label: dataset_util.int64_list_feature(
+            [label for label, _, _, _ in detections]),
+        fields.detection_score: dataset_util.float_list_feature(
+            [score for _, score, _, _ in detections]),
+    }
+    for prefix, boxes in [('object', [box[-2:] for box in groundtruth]),
+                          ('detection', [box[-2:] for box in detections])]:
+      feature['image/%s/bbox/ymin' % prefix] = dataset_util.float_list_feature(
+          [ymin for ymin, _ in boxes])
+      feature['image/%s/bbox/xmin' % prefix] = dataset_util.float_list_feature(
+          [xmin for _, xmin in boxes])
+      feature['image/%s/bbox/ymax' % prefix] = dataset_util.float_list_feature(
+          [ymin + 0.5 for ymin, _ in boxes])
+      feature['image/%s/bbox/xmax' % prefix] = dataset_util.float_list_feature(
+          [xmin + 0.5 for _, xmin in boxes])
+    return tf.train.Example(features=tf.train.Features(feature=feature))
+
+  def test_readDataAndEvaluateWithWorkers(self):
+    tmpdir = self.get_temp_dir()
+    label_map_path = os.path.join(tmpdir, 'label_map.pbtxt')
+    with tf.gfile.Open(label_map_path, 'w') as f:
+      f.write('item { id: 1 name: "cat" } item { id: 2 name: "dog" }')
+
+    files = [
+        [(b'img1', [(1, 0.0, 0.0), (2, 0.5, 0.5)],
+          [(1, 0.9, 0.0, 0.0), (2, 0.4, 0.0, 0.5)]),
+         (b'img2', [(2, 0.0, 0.0)], [(2, 0.8, 0.0, 0.0), (1, 0.6, 0.5, 0.5)])],
+        [(b'img3', [(1, 0.5, 0.0)], [(1, 0.7, 0.5, 0.0), (1, 0.3, 0.0, 0.5)])],
+        [(b'img4', [(2, 0.0, 0.5)], [(2, 0.5, 0.5, 0.0)])],
+    ]
+    input_config = input_reader_pb2.InputReader(label_map_path=label_map_path)
+    for i, examples in enumerate(files):
+      input_path = os.path.join(tmpdir, 'detections-%d.record' % i)
+      with tf.python_io.TFRecordWriter(input_path) as writer:
+        for image_id, groundtruth, detections in examples:
+          writer.write(self._create_tf_example(
+              image_id, groundtruth, detections).SerializeToString())
+      input_config.tf_record_input_reader.input_path.append(input_path)
+    eval_config = eval_pb2.EvalConfig(metrics_set='pascal_voc_metrics')
+
+    metrics = offline_eval.read_data_and_evaluate(input_config, eval_config)
+    parallel_metrics = offline_eval.read_data_and_evaluate(
+        input_config, eval_config, num_workers=2)
+    self.assertGreater(metrics['PASCAL/Precision/mAP@0.5IOU'], 0.0)
+    self.assertEqual(metrics, parallel_metrics)
+
 
 if __name__ == '__main__':
   tf.test.main()
@@ -29,35 +29,33 @@ from object_detection.core import batcher
 from object_detection.core import preprocessor
 from object_detection.core import standard_fields as fields
 from object_detection.utils import ops as util_ops
+from object_detection.utils import profiling_util
 from object_detection.utils import variables_helper
 from deployment import model_deploy
 
 slim = tf.contrib.slim
 
 
-def create_input_queue(batch_size_per_clone, create_tensor_dict_fn,
-                       batch_queue_capacity, num_batch_queue_threads,
-                       prefetch_queue_capacity, data_augmentation_options):
-  """Sets up reader, prefetcher and returns input queue.
+def _transform_input_data(tensor_dict, data_augmentation_options,
+                          fuse_geometric_ops=False):
+  """Converts a decoded tensor_dict into the inputs of a BatchQueue.
 
   Args:
-    batch_size_per_clone: batch size to use per clone.
-    create_tensor_dict_fn: function to create tensor dictionary.
-    batch_queue_capacity: maximum number of elements to store within a queue.
-    num_batch_queue_threads: number of threads to use for batching.
-    prefetch_queue_capacity: maximum capacity of the queue used to prefetch
-                             assembled batches.
+    tensor_dict: a dictionary of tensors of a single decoded example.
     data_augmentation_options: a list of tuples, where each tuple contains a
       data augmentation function and a dictionary containing arguments and their
       values (see preprocessor.py).
+    fuse_geometric_ops: whether to fuse consecutive geometric augmentations,
+      see preprocessor.preprocess.
 
   Returns:
-    input queue: a batcher.BatchQueue object holding enqueued tensor_dicts
-      (which hold images, boxes and targets).  To get a batch of tensor_dicts,
-      call input_queue.Dequeue().
-  """
-  tensor_dict = create_tensor_dict_fn()
+    The tensor_dict with a [1, height, width, channels] float image, augmented
+    according to data_augmentation_options.
 
+  Raises:
+    ValueError: if the tensor_dict holds precomputed anchor matches and a data
+      augmentation option transforms the groundtruth boxes.
+  """
   tensor_dict[fields.InputDataFields.image] = tf.expand_dims(
       tensor_dict[fields.InputDataFields.image], 0)
 
@@ -69,13 +67,68 @@ def create_input_queue(batch_size_per_clone, create_tensor_dict_fn,
                             in tensor_dict)
   include_keypoints = (fields.InputDataFields.groundtruth_keypoints
                        in tensor_dict)
+  if fields.InputDataFields.groundtruth_anchor_matches in tensor_dict:
+    # Anchor matches are precomputed from the decoded boxes.
+    func_arg_map = preprocessor.get_default_func_arg_map()
+    for func, _ in data_augmentation_options or []:
+      if fields.InputDataFields.groundtruth_boxes in func_arg_map.get(func, ()):
+        raise ValueError('Precomputed anchor matches cannot be used with data '
+                         'augmentation that changes the groundtruth boxes: '
+                         '{}.'.format(func.__name__))
   if data_augmentation_options:
     tensor_dict = preprocessor.preprocess(
         tensor_dict, data_augmentation_options,
         func_arg_map=preprocessor.get_default_func_arg_map(
             include_instance_masks=include_instance_masks,
-            include_keypoints=include_keypoints))
+            include_keypoints=include_keypoints),
+        fuse_geometric_ops=fuse_geometric_ops)
+  return tensor_dict
+
+
+def create_input_queue(batch_size_per_clone, create_tensor_dict_fn,
+                       batch_queue_capacity, num_batch_queue_threads,
+                       prefetch_queue_capacity, data_augmentation_options,
+                       fuse_geometric_preprocessing=False):
+  """Sets up reader, prefetcher and returns input queue.
 
+  If create_tensor_dict_fn returns a tf.data.Dataset of tensor dictionaries
+  (see the tf_record_dataset_reader input reader) instead of a tensor
+  dictionary, preprocessing, batching and prefetching are added to the
+  dataset, and num_batch_queue_threads examples are preprocessed in parallel.
+
+  Args:
+    batch_size_per_clone: batch size to use per clone.
+    create_tensor_dict_fn: function to create tensor dictionary.
+    batch_queue_capacity: maximum number of elements to store within a queue.
+    num_batch_queue_threads: number of threads to use for batching.
+    prefetch_queue_capacity: maximum capacity of the queue used to prefetch
+                             assembled batches.
+    data_augmentation_options: a list of tuples, where each tuple contains a
+      data augmentation function and a dictionary containing arguments and their
+      values (see preprocessor.py).
+    fuse_geometric_preprocessing: whether to fuse consecutive geometric
+      augmentations, see preprocessor.preprocess.
+
+  Returns:
+    input queue: a batcher.BatchQueue (or batcher.DatasetBatchQueue) object
+      holding enqueued tensor_dicts (which hold images, boxes and targets).  To
+      get a batch of tensor_dicts, call input_queue.Dequeue().
+  """
+  tensor_dict = create_tensor_dict_fn()
+  transform_input_data_fn = functools.partial(
+      _transform_input_data,
+      data_augmentation_options=data_augmentation_options,
+      fuse_geometric_ops=fuse_geometric_preprocessing)
+
+  if isinstance(tensor_dict, tf.data.Dataset):
+    dataset = tensor_dict.map(transform_input_data_fn,
+                              num_parallel_calls=num_batch_queue_threads)
+    return batcher.DatasetBatchQueue(
+        dataset,
+        batch_size=batch_size_per_clone,
+        prefetch_buffer_size=prefetch_queue_capacity)
+
+  tensor_dict = transform_input_data_fn(tensor_dict)
   input_queue = batcher.BatchQueue(
       tensor_dict,
       batch_size=batch_size_per_clone,
@@ -108,6 +161,9 @@ def get_inputs(input_queue, num_classes, merge_multiple_label_boxes=False):
     keypoints_list: a list of 3-D float tensors of shape [num_boxes,
       num_keypoints, 2] containing keypoints for objects if present in the
       input queue. Else returns None.
+    anchor_matches_list: a list of 1-D int64 tensors of shape [num_anchors]
+      containing precomputed anchor matches if present in the input queue.
+      Else returns None.
   """
   read_data_list = input_queue.dequeue()
   label_id_offset = 1
@@ -129,10 +185,14 @@ def get_inputs(input_queue, num_classes, merge_multiple_label_boxes=False):
           indices=classes_gt, depth=num_classes, left_pad=0)
     masks_gt = read_data.get(fields.InputDataFields.groundtruth_instance_masks)
     keypoints_gt = read_data.get(fields.InputDataFields.groundtruth_keypoints)
+    anchor_matches_gt = read_data.get(
+        fields.InputDataFields.groundtruth_anchor_matches)
     if (merge_multiple_label_boxes and (
-        masks_gt is not None or keypoints_gt is not None)):
+        masks_gt is not None or keypoints_gt is not None or
+        anchor_matches_gt is not None)):
       raise NotImplementedError('Multi-label support is only for boxes.')
-    return image, key, location_gt, classes_gt, masks_gt, keypoints_gt
+    return (image, key, location_gt, classes_gt, masks_gt, keypoints_gt,
+            anchor_matches_gt)
 
   return zip(*map(extract_images_and_targets, read_data_list))
 
@@ -147,7 +207,8 @@ def _create_losses(input_queue, create_model_fn, train_config):
   """
   detection_model = create_model_fn()
   (images, _, groundtruth_boxes_list, groundtruth_classes_list,
-   groundtruth_masks_list, groundtruth_keypoints_list) = get_inputs(
+   groundtruth_masks_list, groundtruth_keypoints_list,
+   groundtruth_anchor_matches_list) = get_inputs(
        input_queue,
        detection_model.num_classes,
        train_config.merge_multiple_label_boxes)
@@ -157,11 +218,15 @@ def _create_losses(input_queue, create_model_fn, train_config):
     groundtruth_masks_list = None
   if any(keypoints is None for keypoints in groundtruth_keypoints_list):
     groundtruth_keypoints_list = None
+  if any(anchor_matches is None
+         for anchor_matches in groundtruth_anchor_matches_list):
+    groundtruth_anchor_matches_list = None
 
   detection_model.provide_groundtruth(groundtruth_boxes_list,
                                       groundtruth_classes_list,
                                       groundtruth_masks_list,
-                                      groundtruth_keypoints_list)
+                                      groundtruth_keypoints_list,
+                                      groundtruth_anchor_matches_list)
   prediction_dict = detection_model.predict(images)
 
   losses_dict = detection_model.loss(prediction_dict)
@@ -214,7 +279,8 @@ def train(create_tensor_dict_fn, create_model_fn, train_config, master, task,
           train_config.batch_size // num_clones, create_tensor_dict_fn,
           train_config.batch_queue_capacity,
           train_config.num_batch_queue_threads,
-          train_config.prefetch_queue_capacity, data_augmentation_options)
+          train_config.prefetch_queue_capacity, data_augmentation_options,
+          train_config.fuse_geometric_preprocessing)
 
     # Gather initial summaries.
     # TODO(rathodv): See if summaries can be added/extracted from global tf
@@ -316,6 +382,17 @@ def train(create_tensor_dict_fn, create_model_fn, train_config, master, task,
     saver = tf.train.Saver(
         keep_checkpoint_every_n_hours=keep_checkpoint_every_n_hours)
 
+    train_step_fn = slim.learning.train_step
+    summary_writer_kwargs = {}
+    if train_config.profile_every_n_steps:
+      # Share the summary writer of the trainer with the profiler.
+      summary_writer = tf.summary.FileWriter(train_dir)
+      summary_writer_kwargs['summary_writer'] = summary_writer
+      profiler = profiling_util.TrainProfiler(
+          train_dir, train_config.profile_every_n_steps, summary_writer,
+          save_traces=train_config.save_profile_traces)
+      train_step_fn = profiler.train_step
+
     slim.learning.train(
         train_tensor,
         logdir=train_dir,
@@ -329,4 +406,6 @@ def train(create_tensor_dict_fn, create_model_fn, train_config, master, task,
             train_config.num_steps if train_config.num_steps else None),
         save_summaries_secs=120,
         sync_optimizer=sync_optimizer,
-        saver=saver)
+        saver=saver,
+        train_step_fn=train_step_fn,
+        **summary_writer_kwargs)
@@ -26,6 +26,10 @@ from object_detection.utils import np_box_list
 from object_detection.utils import np_box_ops
 
 
+# Number of boxes processed at a time by the greedy non maximum suppression.
+_NMS_BLOCK_SIZE = 512
+
+
 class SortOrder(object):
   """Enum class for sort order.
 
@@ -208,29 +212,126 @@ def non_max_suppression(boxlist,
     else:
       return boxlist
 
-  boxes = boxlist.get()
-  num_boxes = boxlist.num_boxes()
-  # is_index_valid is True only for all remaining valid boxes,
-  is_index_valid = np.full(num_boxes, 1, dtype=bool)
-  selected_indices = []
-  num_output = 0
-  for i in xrange(num_boxes):
-    if num_output < max_output_size:
-      if is_index_valid[i]:
-        num_output += 1
-        selected_indices.append(i)
-        is_index_valid[i] = False
-        valid_indices = np.where(is_index_valid)[0]
-        if valid_indices.size == 0:
-          break
+  selected_indices = _greedy_non_max_suppression(
+      boxlist.get(), max_output_size, iou_threshold)
+  return gather(boxlist, selected_indices)
+
+
+def _is_suppressed(boxes, classes, selected_indices, candidate_indices,
+                   iou_threshold):
+  """Returns which candidate boxes are suppressed by which selected boxes.
+
+  Args:
+    boxes: a numpy array of shape [N, 4] holding all boxes.
+    classes: an integer numpy array of shape [N] with the class of each box, or
+      None if all boxes belong to the same class.
+    selected_indices: a 1-d integer numpy array of length K indexing boxes.
+    candidate_indices: a 1-d integer numpy array of length L indexing boxes.
+    iou_threshold: intersection over union threshold.
 
-        intersect_over_union = np_box_ops.iou(
-            np.expand_dims(boxes[i, :], axis=0), boxes[valid_indices, :])
-        intersect_over_union = np.squeeze(intersect_over_union, axis=0)
-        is_index_valid[valid_indices] = np.logical_and(
-            is_index_valid[valid_indices],
-            intersect_over_union <= iou_threshold)
-  return gather(boxlist, np.array(selected_indices))
+  Returns:
+    a boolean numpy array of shape [K, L].
+  """
+  # A NaN IOU (two boxes with zero area) also suppresses, like the original
+  # box-by-box implementation did.
+  is_suppressed = np.logical_not(
+      np_box_ops.iou(boxes[selected_indices, :], boxes[candidate_indices, :])
+      <= iou_threshold)
+  if classes is None:
+    return is_suppressed
+  return np.logical_and(
+      is_suppressed,
+      np.equal(np.expand_dims(classes[selected_indices], axis=1),
+               np.expand_dims(classes[candidate_indices], axis=0)))
+
+
+def _greedy_non_max_suppression(boxes,
+                                max_output_size,
+                                iou_threshold,
+                                classes=None,
+                                block_size=_NMS_BLOCK_SIZE):
+  """Greedy non maximum suppression on boxes sorted by decreasing score.
+
+  Boxes are processed in blocks of block_size. The boxes of a block are first
+  checked against the boxes selected in earlier blocks, and the remaining ones
+  are then selected greedily using the pairwise IOU matrix of the block. This
+  selects exactly the same boxes as suppressing boxes one at a time, but only
+  does vectorized work per block and bounds the size of the temporary IOU
+  matrices by block_size x block_size.
+
+  Args:
+    boxes: a numpy array of shape [N, 4] holding boxes sorted by decreasing
+      score.
+    max_output_size: maximum number of retained boxes (per class if classes is
+      given).
+    iou_threshold: intersection over union threshold. If 1.0, no box is
+      suppressed.
+    classes: (optional) an integer numpy array of shape [N]. If given, boxes
+      only suppress boxes of the same class.
+    block_size: number of boxes processed at a time.
+
+  Returns:
+    a 1-d integer numpy array with the indices of the selected boxes in
+    increasing order.
+  """
+  num_boxes = boxes.shape[0]
+  order = np.arange(num_boxes)
+  class_ids = np.zeros(num_boxes, dtype=np.int64)
+  if classes is not None:
+    # Going through the boxes class by class keeps most blocks within a single
+    # class, so only the boxes selected for the same classes have to be
+    # checked. The relative order of the boxes of each class is unchanged.
+    order = np.argsort(classes, kind='mergesort')
+    boxes = boxes[order, :]
+    _, class_ids = np.unique(classes[order], return_inverse=True)
+    classes = class_ids
+
+  num_selected_per_class = np.zeros(
+      class_ids[-1] + 1 if num_boxes else 0, dtype=np.int64)
+  selected_indices = np.zeros([0], dtype=np.int64)
+  for block_start in range(0, num_boxes, block_size):
+    block_indices = np.arange(block_start,
+                              min(block_start + block_size, num_boxes))
+    block_indices = block_indices[
+        num_selected_per_class[class_ids[block_indices]] < max_output_size]
+    if block_indices.size == 0:
+      continue
+    block_class_ids = class_ids[block_indices]
+
+    if iou_threshold < 1.0:
+      # Boxes selected for the classes before this block can be skipped.
+      candidate_suppressors = selected_indices[np.searchsorted(
+          class_ids[selected_indices], block_class_ids[0]):]
+      for suppressor_start in range(0, candidate_suppressors.size,
+                                    block_size):
+        is_suppressed = _is_suppressed(
+            boxes, classes,
+            candidate_suppressors[suppressor_start:
+                                  suppressor_start + block_size],
+            block_indices, iou_threshold)
+        is_kept = np.logical_not(np.any(is_suppressed, axis=0))
+        block_indices = block_indices[is_kept]
+        block_class_ids = block_class_ids[is_kept]
+        if block_indices.size == 0:
+          break
+      if block_indices.size == 0:
+        continue
+      is_suppressing = _is_suppressed(boxes, classes, block_indices,
+                                      block_indices, iou_threshold)
+
+    is_suppressed = np.zeros(block_indices.size, dtype=bool)
+    is_selected = np.zeros(block_indices.size, dtype=bool)
+    for i in range(block_indices.size):
+      if (is_suppressed[i] or
+          num_selected_per_class[block_class_ids[i]] >= max_output_size):
+        continue
+      is_selected[i] = True
+      num_selected_per_class[block_class_ids[i]] += 1
+      if iou_threshold < 1.0:
+        is_suppressed |= is_suppressing[i]
+    selected_indices = np.concatenate(
+        [selected_indices, block_indices[is_selected]])
+  return np.sort(order[selected_indices])
 
 
 def multi_class_non_max_suppression(boxlist, score_thresh, iou_thresh,
@@ -287,21 +388,25 @@ def multi_class_non_max_suppression(boxlist, score_thresh, iou_thresh,
   if num_boxes != num_scores:
     raise ValueError('Incorrect scores field length: actual vs expected.')
 
-  selected_boxes_list = []
-  for class_idx in range(num_classes):
-    boxlist_and_class_scores = np_box_list.BoxList(boxlist.get())
-    class_scores = np.reshape(scores[0:num_scores, class_idx], [-1])
-    boxlist_and_class_scores.add_field('scores', class_scores)
-    boxlist_filt = filter_scores_greater_than(boxlist_and_class_scores,
-                                              score_thresh)
-    nms_result = non_max_suppression(boxlist_filt,
-                                     max_output_size=max_output_size,
-                                     iou_threshold=iou_thresh,
-                                     score_threshold=score_thresh)
-    nms_result.add_field(
-        'classes', np.zeros_like(nms_result.get_field('scores')) + class_idx)
-    selected_boxes_list.append(nms_result)
-  selected_boxes = concatenate(selected_boxes_list)
+  # All (box, class) pairs above the score threshold go through a single
+  # greedy pass in which boxes only suppress boxes of the same class.
+  box_indices, class_indices = np.nonzero(np.greater(scores, score_thresh))
+  candidate_scores = scores[box_indices, class_indices]
+  sorted_indices = np.argsort(candidate_scores)[::-1]
+  selected_indices = sorted_indices[_greedy_non_max_suppression(
+      boxlist.get()[box_indices[sorted_indices], :],
+      max_output_size,
+      iou_thresh,
+      classes=class_indices[sorted_indices])]
+  # Group the selected boxes by class before the final sort, as if the
+  # classes had been suppressed one after the other.
+  selected_indices = selected_indices[np.argsort(
+      class_indices[selected_indices], kind='mergesort')]
+  selected_boxes = np_box_list.BoxList(
+      boxlist.get()[box_indices[selected_indices], :])
+  selected_boxes.add_field('scores', candidate_scores[selected_indices])
+  selected_boxes.add_field(
+      'classes', class_indices[selected_indices].astype(scores.dtype))
   sorted_boxes = sort_by_field(selected_boxes, 'scores')
   return sorted_boxes
 
@@ -381,8 +486,8 @@ def prune_non_overlapping_boxes(boxlist1, boxlist2, minoverlap=0.0):
   Returns:
     A pruned boxlist with size [N', 4].
   """
-  intersection_over_area = ioa(boxlist2, boxlist1)  # [M, N] tensor
-  intersection_over_area = np.amax(intersection_over_area, axis=0)  # [N] tensor
+  # Max over boxlist2 of the [M, N] ioa, without materializing it.
+  intersection_over_area = np_box_ops.max_ioa(boxlist2.get(), boxlist1.get())
   keep_bool = np.greater_equal(intersection_over_area, np.array(minoverlap))
   keep_inds = np.nonzero(keep_bool)[0]
   new_boxlist1 = gather(boxlist1, keep_inds)
@@ -0,0 +1,81 @@
+# Copyright 2017 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+r"""Micro-benchmark for the numpy non maximum suppression ops.
+
+Times np_box_list_ops.non_max_suppression and
+np_box_list_ops.multi_class_non_max_suppression on random boxes.
+
+Example usage:
+    python -m object_detection.utils.np_box_list_ops_benchmark
+"""
+import time
+
+import numpy as np
+
+from object_detection.utils import np_box_list
+from object_detection.utils import np_box_list_ops
+
+_NUM_BOXES = [1000, 10000, 50000]
+_NUM_CLASSES = 90
+_IOU_THRESHOLD = 0.5
+_MAX_OUTPUT_SIZE = 100
+_NUM_RUNS = 3
+
+
+def _random_boxlist(num_boxes, num_classes=None, seed=0):
+  """Creates a BoxList of random boxes in a 1000 x 1000 image."""
+  random_state = np.random.RandomState(seed)
+  centers = random_state.uniform(0, 1000, size=[num_boxes, 2])
+  sizes = random_state.uniform(10, 100, size=[num_boxes, 2])
+  boxlist = np_box_list.BoxList(
+      np.hstack([centers - sizes / 2, centers + sizes / 2]))
+  if num_classes is None:
+    boxlist.add_field('scores', random_state.uniform(size=num_boxes))
+  else:
+    boxlist.add_field('scores',
+                      random_state.uniform(size=[num_boxes, num_classes]))
+  return boxlist
+
+
+def _time(fn):
+  """Returns the best wall time of fn over _NUM_RUNS runs, in seconds."""
+  times = []
+  for _ in range(_NUM_RUNS):
+    start_time = time.time()
+    fn()
+    times.append(time.time() - start_time)
+  return min(times)
+
+
+def main():
+  for num_boxes in _NUM_BOXES:
+    boxlist = _random_boxlist(num_boxes)
+    for max_output_size in [_MAX_OUTPUT_SIZE, num_boxes]:
+      seconds = _time(lambda: np_box_list_ops.non_max_suppression(  # pylint: disable=cell-var-from-loop
+          boxlist, max_output_size, _IOU_THRESHOLD))
+      print('non_max_suppression: num_boxes=%d max_output_size=%d: %.4fs' %
+            (num_boxes, max_output_size, seconds))
+
+    # Keep the number of (box, class) candidates comparable to num_boxes.
+    boxlist = _random_boxlist(num_boxes // 10, _NUM_CLASSES)
+    seconds = _time(lambda: np_box_list_ops.multi_class_non_max_suppression(  # pylint: disable=cell-var-from-loop
+        boxlist, 0.9, _IOU_THRESHOLD, _MAX_OUTPUT_SIZE))
+    print('multi_class_non_max_suppression: num_boxes=%d num_classes=%d: '
+          '%.4fs' % (num_boxes // 10, _NUM_CLASSES, seconds))
+
+
+if __name__ == '__main__':
+  main()
@@ -382,6 +382,33 @@ class NonMaximumSuppressionTest(tf.test.TestCase):
         boxlist, max_output_size, iou_threshold)
     self.assertAllClose(nms_boxlist.get(), expected_boxes)
 
+  def test_greedy_nms_is_independent_of_block_size(self):
+    boxes = np.array([[0, 0, 1, 1], [0, 0.1, 1, 1.1], [0, 0.2, 1, 1.2],
+                      [0, 0.3, 1, 1.3], [0, 10, 1, 11], [0, 10.1, 1, 11.1],
+                      [0, 10.5, 1, 11.5], [0, 100, 1, 101]],
+                     dtype=float)
+    iou_threshold = 0.6
+    expected_indices = np.array([0, 3, 4, 6, 7])
+    for block_size in [1, 2, 3, 100]:
+      selected_indices = np_box_list_ops._greedy_non_max_suppression(
+          boxes, 10, iou_threshold, block_size=block_size)
+      self.assertAllEqual(selected_indices, expected_indices)
+    selected_indices = np_box_list_ops._greedy_non_max_suppression(
+        boxes, 3, iou_threshold, block_size=2)
+    self.assertAllEqual(selected_indices, expected_indices[:3])
+
+  def test_greedy_nms_suppresses_within_classes(self):
+    boxes = np.array([[0, 0, 1, 1], [0, 0, 1, 1], [0, 0.1, 1, 1.1],
+                      [0, 0, 1, 1], [0, 0.1, 1, 1.1]],
+                     dtype=float)
+    classes = np.array([3, 5, 3, 5, 3])
+    selected_indices = np_box_list_ops._greedy_non_max_suppression(
+        boxes, 10, 0.5, classes=classes, block_size=2)
+    self.assertAllEqual(selected_indices, np.array([0, 1]))
+    selected_indices = np_box_list_ops._greedy_non_max_suppression(
+        boxes, 2, 1.0, classes=classes, block_size=2)
+    self.assertAllEqual(selected_indices, np.array([0, 1, 2, 3]))
+
   def test_multiclass_nms(self):
     boxlist = np_box_list.BoxList(
         np.array(
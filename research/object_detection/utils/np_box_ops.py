@@ -18,9 +18,18 @@
 Example box operations that are supported:
   * Areas: compute bounding box areas
   * IOU: pairwise intersection-over-union scores
+
+The pairwise operations are computed in tiles of rows of the first box
+collection, so that the temporaries never exceed _MAX_TILE_SIZE elements
+whatever the number of boxes. The dense [N, M] results can be written to a
+caller provided buffer (e.g. float32 to halve their size), and the *_above_
+threshold, top_k_iou and max_ioa variants never materialize the dense matrix.
 """
 import numpy as np
 
+# Maximum number of elements of the [rows, M] temporaries of a tile.
+_MAX_TILE_SIZE = 1 << 20
+
 
 def area(boxes):
   """Computes area of boxes.
@@ -34,51 +43,97 @@ def area(boxes):
   return (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
 
 
-def intersection(boxes1, boxes2):
+def _tiles(num_rows, num_cols):
+  """Yields [start, end) row ranges of tiles of at most _MAX_TILE_SIZE."""
+  tile_rows = max(1, _MAX_TILE_SIZE // max(num_cols, 1))
+  for start in range(0, num_rows, tile_rows):
+    yield start, min(start + tile_rows, num_rows)
+
+
+def _non_negative(values):
+  """Returns max(values, 0) as float64, in place when values are float64."""
+  if values.dtype == np.float64:
+    return np.maximum(values, 0.0, out=values)
+  return np.maximum(values, 0.0, dtype=np.float64)
+
+
+def _intersection(boxes1, boxes2):
+  """Computes the [N, M] float64 intersection areas of a single tile."""
+  [y_min1, x_min1, y_max1, x_max1] = np.split(boxes1, 4, axis=1)
+  [y_min2, x_min2, y_max2, x_max2] = np.split(boxes2, 4, axis=1)
+
+  intersect_heights = np.minimum(y_max1, np.transpose(y_max2))
+  intersect_heights -= np.maximum(y_min1, np.transpose(y_min2))
+  intersect_heights = _non_negative(intersect_heights)
+  intersect_widths = np.minimum(x_max1, np.transpose(x_max2))
+  intersect_widths -= np.maximum(x_min1, np.transpose(x_min2))
+  intersect_widths = _non_negative(intersect_widths)
+  intersect_heights *= intersect_widths
+  return intersect_heights
+
+
+def _iou(boxes1, boxes2):
+  """Computes the [N, M] float64 intersection-over-union of a single tile."""
+  intersect = _intersection(boxes1, boxes2)
+  union = np.add.outer(area(boxes1), area(boxes2))
+  if union.dtype == np.float64:
+    union = np.subtract(union, intersect, out=union)
+  else:
+    union = union - intersect
+  return np.divide(intersect, union, out=intersect)
+
+
+def _ioa(boxes1, boxes2):
+  """Computes the [N, M] float64 intersection-over-area of a single tile."""
+  intersect = _intersection(boxes1, boxes2)
+  areas = np.expand_dims(area(boxes2), axis=0)
+  return np.divide(intersect, areas, out=intersect)
+
+
+def _tiled(overlap_fn, boxes1, boxes2, out):
+  """Computes a dense pairwise overlap matrix one tile of rows at a time."""
+  shape = (boxes1.shape[0], boxes2.shape[0])
+  if out is None:
+    out = np.empty(shape, dtype=np.float64)
+  elif out.shape != shape:
+    raise ValueError('out must have shape {} but has shape {}.'.format(
+        shape, out.shape))
+  for start, end in _tiles(*shape):
+    out[start:end] = overlap_fn(boxes1[start:end], boxes2)
+  return out
+
+
+def intersection(boxes1, boxes2, out=None):
   """Compute pairwise intersection areas between boxes.
 
   Args:
     boxes1: a numpy array with shape [N, 4] holding N boxes
     boxes2: a numpy array with shape [M, 4] holding M boxes
+    out: (optional) a float numpy array with shape [N, M] to write the result
+      to. By default a float64 array is allocated.
 
   Returns:
     a numpy array with shape [N*M] representing pairwise intersection area
   """
-  [y_min1, x_min1, y_max1, x_max1] = np.split(boxes1, 4, axis=1)
-  [y_min2, x_min2, y_max2, x_max2] = np.split(boxes2, 4, axis=1)
-
-  all_pairs_min_ymax = np.minimum(y_max1, np.transpose(y_max2))
-  all_pairs_max_ymin = np.maximum(y_min1, np.transpose(y_min2))
-  intersect_heights = np.maximum(
-      np.zeros(all_pairs_max_ymin.shape),
-      all_pairs_min_ymax - all_pairs_max_ymin)
-  all_pairs_min_xmax = np.minimum(x_max1, np.transpose(x_max2))
-  all_pairs_max_xmin = np.maximum(x_min1, np.transpose(x_min2))
-  intersect_widths = np.maximum(
-      np.zeros(all_pairs_max_xmin.shape),
-      all_pairs_min_xmax - all_pairs_max_xmin)
-  return intersect_heights * intersect_widths
+  return _tiled(_intersection, boxes1, boxes2, out)
 
 
-def iou(boxes1, boxes2):
+def iou(boxes1, boxes2, out=None):
   """Computes pairwise intersection-over-union between box collections.
 
   Args:
     boxes1: a numpy array with shape [N, 4] holding N boxes.
     boxes2: a numpy array with shape [M, 4] holding N boxes.
+    out: (optional) a float numpy array with shape [N, M] to write the result
+      to. By default a float64 array is allocated.
 
   Returns:
     a numpy array with shape [N, M] representing pairwise iou scores.
   """
-  intersect = intersection(boxes1, boxes2)
-  area1 = area(boxes1)
-  area2 = area(boxes2)
-  union = np.expand_dims(area1, axis=1) + np.expand_dims(
-      area2, axis=0) - intersect
-  return intersect / union
+  return _tiled(_iou, boxes1, boxes2, out)
 
 
-def ioa(boxes1, boxes2):
+def ioa(boxes1, boxes2, out=None):
   """Computes pairwise intersection-over-area between box collections.
 
   Intersection-over-area (ioa) between two boxes box1 and box2 is defined as
@@ -88,10 +143,120 @@ def ioa(boxes1, boxes2):
   Args:
     boxes1: a numpy array with shape [N, 4] holding N boxes.
     boxes2: a numpy array with shape [M, 4] holding N boxes.
+    out: (optional) a float numpy array with shape [N, M] to write the result
+      to. By default a float64 array is allocated.
 
   Returns:
     a numpy array with shape [N, M] representing pairwise ioa scores.
   """
-  intersect = intersection(boxes1, boxes2)
-  areas = np.expand_dims(area(boxes2), axis=0)
-  return intersect / areas
+  return _tiled(_ioa, boxes1, boxes2, out)
+
+
+def _pairs_above_threshold(overlap_fn, boxes1, boxes2, threshold):
+  """Returns the sparse pairs whose overlap is at least threshold."""
+  indices1 = [np.zeros([0], dtype=np.int64)]
+  indices2 = [np.zeros([0], dtype=np.int64)]
+  values = [np.zeros([0], dtype=np.float64)]
+  for start, end in _tiles(boxes1.shape[0], boxes2.shape[0]):
+    overlaps = overlap_fn(boxes1[start:end], boxes2)
+    rows, cols = np.nonzero(overlaps >= threshold)
+    indices1.append(rows + start)
+    indices2.append(cols)
+    values.append(overlaps[rows, cols])
+  return (np.concatenate(indices1), np.concatenate(indices2),
+          np.concatenate(values))
+
+
+def iou_above_threshold(boxes1, boxes2, threshold):
+  """Computes the pairs of boxes whose iou is at least a threshold.
+
+  The result is the sparse (COO) form of iou(boxes1, boxes2) >= threshold and
+  is computed without materializing the dense [N, M] matrix.
+
+  Args:
+    boxes1: a numpy array with shape [N, 4] holding N boxes.
+    boxes2: a numpy array with shape [M, 4] holding M boxes.
+    threshold: minimum iou of the returned pairs.
+
+  Returns:
+    indices1: an int64 numpy array with shape [K] indexing boxes1.
+    indices2: an int64 numpy array with shape [K] indexing boxes2.
+    values: a float64 numpy array with shape [K] holding the iou of the pairs.
+    The pairs are sorted by indices1 first and indices2 second.
+  """
+  return _pairs_above_threshold(_iou, boxes1, boxes2, threshold)
+
+
+def ioa_above_threshold(boxes1, boxes2, threshold):
+  """Computes the pairs of boxes whose ioa is at least a threshold.
+
+  The result is the sparse (COO) form of ioa(boxes1, boxes2) >= threshold and
+  is computed without materializing the dense [N, M] matrix.
+
+  Args:
+    boxes1: a numpy array with shape [N, 4] holding N boxes.
+    boxes2: a numpy array with shape [M, 4] holding M boxes.
+    threshold: minimum ioa of the returned pairs.
+
+  Returns:
+    indices1: an int64 numpy array with shape [K] indexing boxes1.
+    indices2: an int64 numpy array with shape [K] indexing boxes2.
+    values: a float64 numpy array with shape [K] holding the ioa of the pairs.
+    The pairs are sorted by indices1 first and indices2 second.
+  """
+  return _pairs_above_threshold(_ioa, boxes1, boxes2, threshold)
+
+
+def top_k_iou(boxes1, boxes2, k):
+  """Finds, for each box in boxes1, the k boxes in boxes2 of highest iou.
+
+  Args:
+    boxes1: a numpy array with shape [N, 4] holding N boxes.
+    boxes2: a numpy array with shape [M, 4] holding M boxes.
+    k: number of boxes to return for each box in boxes1. At most M boxes are
+      returned.
+
+  Returns:
+    indices: an int64 numpy array with shape [N, min(k, M)] indexing boxes2,
+      sorted by decreasing iou along each row.
+    values: a float64 numpy array with shape [N, min(k, M)] holding the iou.
+  """
+  k = min(k, boxes2.shape[0])
+  indices = np.zeros([boxes1.shape[0], k], dtype=np.int64)
+  values = np.zeros([boxes1.shape[0], k], dtype=np.float64)
+  if k == 0:
+    return indices, values
+  for start, end in _tiles(boxes1.shape[0], boxes2.shape[0]):
+    overlaps = _iou(boxes1[start:end], boxes2)
+    rows = np.expand_dims(np.arange(end - start), axis=1)
+    top_k = np.argpartition(-overlaps, k - 1, axis=1)[:, :k]
+    top_k_values = overlaps[rows, top_k]
+    order = np.argsort(-top_k_values, axis=1, kind='mergesort')
+    indices[start:end] = top_k[rows, order]
+    values[start:end] = top_k_values[rows, order]
+  return indices, values
+
+
+def max_ioa(boxes1, boxes2):
+  """Computes, for each box in boxes2, its maximum ioa with boxes1.
+
+  This is np.amax(ioa(boxes1, boxes2), axis=0) without materializing the dense
+  [N, M] matrix.
+
+  Args:
+    boxes1: a numpy array with shape [N, 4] holding N boxes, N > 0.
+    boxes2: a numpy array with shape [M, 4] holding M boxes.
+
+  Returns:
+    a float64 numpy array with shape [M].
+
+  Raises:
+    ValueError: if boxes1 is empty.
+  """
+  if boxes1.shape[0] == 0:
+    raise ValueError('boxes1 must hold at least one box.')
+  result = None
+  for start, end in _tiles(boxes1.shape[0], boxes2.shape[0]):
+    tile_max = np.amax(_ioa(boxes1[start:end], boxes2), axis=0)
+    result = tile_max if result is None else np.maximum(result, tile_max)
+  return result
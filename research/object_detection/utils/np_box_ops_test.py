@@ -64,5 +64,71 @@ class BoxOpsTests(tf.test.TestCase):
     self.assertAllClose(ioa21, expected_ioa21)
 
 
+class TiledBoxOpsTests(tf.test.TestCase):
+
+  def setUp(self):
+    boxes1 = np.array([[4.0, 3.0, 7.0, 5.0], [5.0, 6.0, 10.0, 7.0],
+                       [0.0, 0.0, 1.0, 1.0]],
+                      dtype=float)
+    boxes2 = np.array([[3.0, 4.0, 6.0, 8.0], [14.0, 14.0, 15.0, 15.0],
+                       [0.0, 0.0, 20.0, 20.0], [4.0, 3.0, 7.0, 5.0]],
+                      dtype=float)
+    self.boxes1 = boxes1
+    self.boxes2 = boxes2
+    self._max_tile_size = np_box_ops._MAX_TILE_SIZE
+
+  def tearDown(self):
+    np_box_ops._MAX_TILE_SIZE = self._max_tile_size
+
+  def testTiledIOUMatchesSingleTile(self):
+    expected_iou = np_box_ops.iou(self.boxes1, self.boxes2)
+    expected_ioa = np_box_ops.ioa(self.boxes2, self.boxes1)
+    np_box_ops._MAX_TILE_SIZE = 4
+    self.assertAllEqual(np_box_ops.iou(self.boxes1, self.boxes2), expected_iou)
+    self.assertAllEqual(np_box_ops.ioa(self.boxes2, self.boxes1), expected_ioa)
+
+  def testIOUWithOutputBuffer(self):
+    out = np.zeros([3, 4], dtype=np.float32)
+    iou = np_box_ops.iou(self.boxes1, self.boxes2, out=out)
+    self.assertIs(iou, out)
+    self.assertAllClose(out, np_box_ops.iou(self.boxes1, self.boxes2))
+    with self.assertRaises(ValueError):
+      np_box_ops.iou(self.boxes1, self.boxes2, out=np.zeros([4, 3]))
+
+  def testIOUAboveThreshold(self):
+    np_box_ops._MAX_TILE_SIZE = 4
+    indices1, indices2, values = np_box_ops.iou_above_threshold(
+        self.boxes1, self.boxes2, 0.01)
+    self.assertAllEqual(indices1, [0, 0, 0, 1, 1])
+    self.assertAllEqual(indices2, [0, 2, 3, 0, 2])
+    self.assertAllClose(values,
+                        [2.0 / 16.0, 6.0 / 400.0, 1.0, 1.0 / 16.0, 5.0 / 400.0])
+
+  def testIOAAboveThreshold(self):
+    indices1, indices2, values = np_box_ops.ioa_above_threshold(
+        self.boxes2, self.boxes1, 0.5)
+    self.assertAllEqual(indices1, [2, 2, 2, 3])
+    self.assertAllEqual(indices2, [0, 1, 2, 0])
+    self.assertAllClose(values, [1.0, 1.0, 1.0, 1.0])
+
+  def testTopKIOU(self):
+    indices, values = np_box_ops.top_k_iou(self.boxes1, self.boxes2, 2)
+    # The second box of the last row is any of the non overlapping boxes.
+    self.assertAllEqual(indices[:, 0], [3, 0, 2])
+    self.assertAllEqual(indices[:2, 1], [0, 2])
+    self.assertAllClose(values, [[1.0, 2.0 / 16.0], [1.0 / 16.0, 5.0 / 400.0],
+                                 [1.0 / 400.0, 0.0]])
+    indices, values = np_box_ops.top_k_iou(self.boxes1, self.boxes2, 10)
+    self.assertAllEqual(indices.shape, [3, 4])
+
+  def testMaxIOA(self):
+    np_box_ops._MAX_TILE_SIZE = 4
+    max_ioa = np_box_ops.max_ioa(self.boxes2, self.boxes1)
+    self.assertAllClose(
+        max_ioa, np.amax(np_box_ops.ioa(self.boxes2, self.boxes1), axis=0))
+    with self.assertRaises(ValueError):
+      np_box_ops.max_ioa(np.zeros([0, 4]), self.boxes1)
+
+
 if __name__ == '__main__':
   tf.test.main()
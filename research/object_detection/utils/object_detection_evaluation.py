@@ -95,6 +95,15 @@ class DetectionEvaluator(object):
     """Evaluates detections and returns a dictionary of metrics."""
     pass
 
+  @abstractmethod
+  def partial_evaluate(self):
+    """Evaluates the detections added so far without modifying the state.
+
+    Returns:
+      A dictionary of metrics.
+    """
+    pass
+
   @abstractmethod
   def clear(self):
     """Clears the state to prepare for a fresh evaluation."""
@@ -109,7 +118,8 @@ class ObjectDetectionEvaluator(DetectionEvaluator):
                matching_iou_threshold=0.5,
                evaluate_corlocs=False,
                metric_prefix=None,
-               use_weighted_mean_ap=False):
+               use_weighted_mean_ap=False,
+               streaming=False):
     """Constructor.
 
     Args:
@@ -125,17 +135,22 @@ class ObjectDetectionEvaluator(DetectionEvaluator):
       use_weighted_mean_ap: (optional) boolean which determines if the mean
         average precision is computed directly from the scores and tp_fp_labels
         of all classes.
+      streaming: (optional) boolean which determines if the groundtruth of an
+        image is released once its detections have been added, see
+        ObjectDetectionEvaluation.
     """
     super(ObjectDetectionEvaluator, self).__init__(categories)
     self._num_classes = max([cat['id'] for cat in categories])
     self._matching_iou_threshold = matching_iou_threshold
     self._use_weighted_mean_ap = use_weighted_mean_ap
+    self._streaming = streaming
     self._label_id_offset = 1
     self._evaluation = ObjectDetectionEvaluation(
         self._num_classes,
         matching_iou_threshold=self._matching_iou_threshold,
         use_weighted_mean_ap=self._use_weighted_mean_ap,
-        label_id_offset=self._label_id_offset)
+        label_id_offset=self._label_id_offset,
+        streaming=self._streaming)
     self._image_ids = set([])
     self._evaluate_corlocs = evaluate_corlocs
     self._metric_prefix = (metric_prefix + '/') if metric_prefix else ''
@@ -227,12 +242,33 @@ class ObjectDetectionEvaluator(DetectionEvaluator):
     """
     (per_class_ap, mean_ap, _, _, per_class_corloc, mean_corloc) = (
         self._evaluation.evaluate())
+    return self._get_metrics_dict(per_class_ap, mean_ap, per_class_corloc,
+                                  mean_corloc)
+
+  def partial_evaluate(self):
+    """Computes the mean average precision of the images added so far.
+
+    Unlike evaluate(), this leaves the accumulated state unchanged, so it can
+    be called periodically during a long running (streaming) evaluation. See
+    ObjectDetectionEvaluation.partial_evaluate() for its cost.
+
+    Returns:
+      A dictionary of metrics like the one returned by evaluate(), without the
+      CorLoc metrics.
+    """
+    per_class_ap, mean_ap = self._evaluation.partial_evaluate()
+    return self._get_metrics_dict(per_class_ap, mean_ap)
+
+  def _get_metrics_dict(self, per_class_ap, mean_ap, per_class_corloc=None,
+                        mean_corloc=None):
+    """Returns the dictionary of metrics, with CorLoc if given and enabled."""
+    evaluate_corlocs = self._evaluate_corlocs and per_class_corloc is not None
     pascal_metrics = {
         self._metric_prefix +
         'Precision/mAP@{}IOU'.format(self._matching_iou_threshold):
             mean_ap
     }
-    if self._evaluate_corlocs:
+    if evaluate_corlocs:
       pascal_metrics[self._metric_prefix + 'Precision/meanCorLoc@{}IOU'.format(
           self._matching_iou_threshold)] = mean_corloc
     category_index = label_map_util.create_category_index(self._categories)
@@ -245,7 +281,7 @@ class ObjectDetectionEvaluator(DetectionEvaluator):
         pascal_metrics[display_name] = per_class_ap[idx]
 
         # Optionally add CorLoc metrics.classes
-        if self._evaluate_corlocs:
+        if evaluate_corlocs:
           display_name = (
               self._metric_prefix + 'PerformanceByCategory/CorLoc@{}IOU/{}'
               .format(self._matching_iou_threshold,
@@ -254,26 +290,61 @@ class ObjectDetectionEvaluator(DetectionEvaluator):
 
     return pascal_metrics
 
+  def get_statistics(self):
+    """Returns the statistics of the images added so far.
+
+    Returns:
+      An ObjectDetectionEvalStatistics holding the per-class scores and tp/fp
+      labels and the groundtruth counts, but not the groundtruth itself, to be
+      merged into another evaluator with merge().
+    """
+    return self._evaluation.get_statistics()
+
+  def merge(self, statistics):
+    """Merges the statistics of the images of another evaluator into this one.
+
+    The images of `statistics` are appended after the images already added, so
+    merging the statistics of evaluators built over consecutive shards of a
+    dataset in shard order gives exactly the same metrics as adding every image
+    to a single evaluator.
+
+    Args:
+      statistics: An ObjectDetectionEvalStatistics returned by get_statistics()
+        of an evaluator constructed with the same categories and parameters as
+        this one.
+
+    Raises:
+      ValueError: If an image was added to both evaluators.
+    """
+    duplicate_image_ids = self._image_ids & statistics.image_keys
+    if duplicate_image_ids:
+      raise ValueError('Image with id {} already added.'.format(
+          next(iter(duplicate_image_ids))))
+    self._evaluation.merge(statistics)
+    self._image_ids.update(statistics.image_keys)
+
   def clear(self):
     """Clears the state to prepare for a fresh evaluation."""
     self._evaluation = ObjectDetectionEvaluation(
         self._num_classes,
         matching_iou_threshold=self._matching_iou_threshold,
         use_weighted_mean_ap=self._use_weighted_mean_ap,
-        label_id_offset=self._label_id_offset)
+        label_id_offset=self._label_id_offset,
+        streaming=self._streaming)
     self._image_ids.clear()
 
 
 class PascalDetectionEvaluator(ObjectDetectionEvaluator):
   """A class to evaluate detections using PASCAL metrics."""
 
-  def __init__(self, categories, matching_iou_threshold=0.5):
+  def __init__(self, categories, matching_iou_threshold=0.5, streaming=False):
     super(PascalDetectionEvaluator, self).__init__(
         categories,
         matching_iou_threshold=matching_iou_threshold,
         evaluate_corlocs=False,
         metric_prefix='PASCAL',
-        use_weighted_mean_ap=False)
+        use_weighted_mean_ap=False,
+        streaming=streaming)
 
 
 class WeightedPascalDetectionEvaluator(ObjectDetectionEvaluator):
@@ -290,13 +361,14 @@ class WeightedPascalDetectionEvaluator(ObjectDetectionEvaluator):
   tp_fp_labels.
   """
 
-  def __init__(self, categories, matching_iou_threshold=0.5):
+  def __init__(self, categories, matching_iou_threshold=0.5, streaming=False):
     super(WeightedPascalDetectionEvaluator, self).__init__(
         categories,
         matching_iou_threshold=matching_iou_threshold,
         evaluate_corlocs=False,
         metric_prefix='WeightedPASCAL',
-        use_weighted_mean_ap=True)
+        use_weighted_mean_ap=True,
+        streaming=streaming)
 
 
 class OpenImagesDetectionEvaluator(ObjectDetectionEvaluator):
@@ -309,7 +381,8 @@ class OpenImagesDetectionEvaluator(ObjectDetectionEvaluator):
   def __init__(self,
                categories,
                matching_iou_threshold=0.5,
-               evaluate_corlocs=False):
+               evaluate_corlocs=False,
+               streaming=False):
     """Constructor.
 
     Args:
@@ -319,12 +392,15 @@ class OpenImagesDetectionEvaluator(ObjectDetectionEvaluator):
       matching_iou_threshold: IOU threshold to use for matching groundtruth
         boxes to detection boxes.
       evaluate_corlocs: if True, additionally evaluates and returns CorLoc.
+      streaming: if True, the groundtruth of an image is released once its
+        detections have been added, see ObjectDetectionEvaluation.
     """
     super(OpenImagesDetectionEvaluator, self).__init__(
         categories,
         matching_iou_threshold,
         evaluate_corlocs,
-        metric_prefix='OpenImagesV2')
+        metric_prefix='OpenImagesV2',
+        streaming=streaming)
 
   def add_single_ground_truth_image_info(self, image_id, groundtruth_dict):
     """Adds groundtruth for a single image to be used for evaluation.
@@ -382,8 +458,90 @@ ObjectDetectionEvalMetrics = collections.namedtuple(
     ])
 
 
+ObjectDetectionEvalStatistics = collections.namedtuple(
+    'ObjectDetectionEvalStatistics', [
+        'image_keys', 'scores_per_class', 'tp_fp_labels_per_class',
+        'num_gt_instances_per_class', 'num_gt_imgs_per_class',
+        'num_images_correctly_detected_per_class'
+    ])
+
+
+class _GrowableArray(object):
+  """A 1-d numpy array supporting amortized constant time appends."""
+
+  def __init__(self, initial_capacity=64):
+    self._data = None
+    self._size = 0
+    self._initial_capacity = initial_capacity
+
+  def extend(self, values):
+    """Appends a 1-d numpy array, using its dtype for the first append."""
+    if self._data is None:
+      self._data = np.empty(
+          max(self._initial_capacity, values.shape[0]), dtype=values.dtype)
+    new_size = self._size + values.shape[0]
+    if new_size > self._data.shape[0]:
+      data = np.empty(max(new_size, 2 * self._data.shape[0]),
+                      dtype=self._data.dtype)
+      data[:self._size] = self._data[:self._size]
+      self._data = data
+    self._data[self._size:new_size] = values
+    self._size = new_size
+
+  def get(self):
+    """Returns a view of the values appended so far."""
+    if self._data is None:
+      return np.array([])
+    return self._data[:self._size]
+
+  def __len__(self):
+    return self._size
+
+
+class _SortedDetections(object):
+  """Scores and tp/fp labels kept sorted by decreasing score.
+
+  New detections are sorted on their own and merged into the ones already
+  sorted, so that the precision and recall of a growing set of detections can
+  be computed repeatedly without sorting all of them every time.
+  """
+
+  def __init__(self):
+    self._scores = np.array([], dtype=float)
+    self._tp_fp_labels = np.array([], dtype=bool)
+
+  def __len__(self):
+    return self._scores.size
+
+  def add(self, scores, tp_fp_labels):
+    """Merges new detections, placed after sorted ones with equal scores."""
+    order = np.argsort(-scores, kind='mergesort')
+    positions = np.searchsorted(-self._scores, -scores[order], side='right')
+    self._scores = np.insert(self._scores, positions, scores[order])
+    self._tp_fp_labels = np.insert(self._tp_fp_labels, positions,
+                                   tp_fp_labels[order])
+
+  def compute_precision_recall(self, num_gt):
+    """Like metrics.compute_precision_recall on the sorted detections."""
+    if num_gt == 0:
+      return None, None
+    cum_true_positives = np.cumsum(self._tp_fp_labels.astype(int))
+    precision = cum_true_positives.astype(float) / np.arange(
+        1, cum_true_positives.size + 1)
+    recall = cum_true_positives.astype(float) / num_gt
+    return precision, recall
+
+
 class ObjectDetectionEvaluation(object):
-  """Internal implementation of Pascal object detection metrics."""
+  """Internal implementation of Pascal object detection metrics.
+
+  In streaming mode the groundtruth of an image is dropped as soon as its
+  detections have been matched, and the per-class scores and tp/fp labels are
+  kept in growable numpy buffers instead of lists of per-image arrays. This
+  bounds the memory of long running evaluations by the size of the detection
+  results, and partial_evaluate() can be used to monitor the running mAP.
+  Groundtruth must then be added before the detections of the same image.
+  """
 
   def __init__(self,
                num_groundtruth_classes,
@@ -391,12 +549,14 @@ class ObjectDetectionEvaluation(object):
                nms_iou_threshold=1.0,
                nms_max_output_boxes=10000,
                use_weighted_mean_ap=False,
-               label_id_offset=0):
+               label_id_offset=0,
+               streaming=False):
     self.per_image_eval = per_image_evaluation.PerImageEvaluation(
         num_groundtruth_classes, matching_iou_threshold, nms_iou_threshold,
         nms_max_output_boxes)
     self.num_class = num_groundtruth_classes
     self.label_id_offset = label_id_offset
+    self.streaming = streaming
 
     self.groundtruth_boxes = {}
     self.groundtruth_class_labels = {}
@@ -406,8 +566,7 @@ class ObjectDetectionEvaluation(object):
     self.num_gt_imgs_per_class = np.zeros(self.num_class, dtype=int)
 
     self.detection_keys = set()
-    self.scores_per_class = [[] for _ in range(self.num_class)]
-    self.tp_fp_labels_per_class = [[] for _ in range(self.num_class)]
+    self._init_detections_per_class()
     self.num_images_correctly_detected_per_class = np.zeros(self.num_class)
     self.average_precision_per_class = np.empty(self.num_class, dtype=float)
     self.average_precision_per_class.fill(np.nan)
@@ -417,10 +576,54 @@ class ObjectDetectionEvaluation(object):
 
     self.use_weighted_mean_ap = use_weighted_mean_ap
 
+  def _init_detections_per_class(self):
+    # Sorted copies of the detections, updated by partial_evaluate().
+    self._sorted_detections_per_class = [
+        _SortedDetections() for _ in range(self.num_class)]
+    self._sorted_detections_all_classes = _SortedDetections()
+    # Number of entries of scores_per_class already in the sorted copies.
+    self._num_sorted_entries_per_class = np.zeros(self.num_class, dtype=int)
+    if self.streaming:
+      self.scores_per_class = [
+          _GrowableArray() for _ in range(self.num_class)]
+      self.tp_fp_labels_per_class = [
+          _GrowableArray() for _ in range(self.num_class)]
+    else:
+      self.scores_per_class = [[] for _ in range(self.num_class)]
+      self.tp_fp_labels_per_class = [[] for _ in range(self.num_class)]
+
+  def _add_detections_for_class(self, class_index, scores, tp_fp_labels):
+    if self.streaming:
+      self.scores_per_class[class_index].extend(scores)
+      self.tp_fp_labels_per_class[class_index].extend(tp_fp_labels)
+    else:
+      self.scores_per_class[class_index].append(scores)
+      self.tp_fp_labels_per_class[class_index].append(tp_fp_labels)
+
+  def _get_detections_for_class(self, class_index, start=0):
+    """Returns the scores and tp/fp labels accumulated for a class.
+
+    Args:
+      class_index: index of the class.
+      start: number of leading entries of scores_per_class[class_index] to
+        skip; these are detections in streaming mode and per-image arrays
+        otherwise.
+
+    Returns:
+      scores: float numpy array of the scores.
+      tp_fp_labels: boolean numpy array of the tp/fp labels.
+    """
+    if len(self.scores_per_class[class_index]) <= start:
+      return np.array([], dtype=float), np.array([], dtype=bool)
+    if self.streaming:
+      return (self.scores_per_class[class_index].get()[start:],
+              self.tp_fp_labels_per_class[class_index].get()[start:])
+    return (np.concatenate(self.scores_per_class[class_index][start:]),
+            np.concatenate(self.tp_fp_labels_per_class[class_index][start:]))
+
   def clear_detections(self):
-    self.detection_keys = {}
-    self.scores_per_class = [[] for _ in range(self.num_class)]
-    self.tp_fp_labels_per_class = [[] for _ in range(self.num_class)]
+    self.detection_keys = set()
+    self._init_detections_per_class()
     self.num_images_correctly_detected_per_class = np.zeros(self.num_class)
     self.average_precision_per_class = np.zeros(self.num_class, dtype=float)
     self.precisions_per_class = []
@@ -525,11 +728,69 @@ class ObjectDetectionEvaluation(object):
 
     for i in range(self.num_class):
       if scores[i].shape[0] > 0:
-        self.scores_per_class[i].append(scores[i])
-        self.tp_fp_labels_per_class[i].append(tp_fp_labels[i])
+        self._add_detections_for_class(i, scores[i], tp_fp_labels[i])
     (self.num_images_correctly_detected_per_class
     ) += is_class_correctly_detected_in_image
 
+    if self.streaming:
+      # The groundtruth of an image is not needed once its detections have
+      # been matched; only the per-class statistics are kept.
+      self.groundtruth_boxes.pop(image_key, None)
+      self.groundtruth_class_labels.pop(image_key, None)
+      self.groundtruth_is_difficult_list.pop(image_key, None)
+      self.groundtruth_is_group_of_list.pop(image_key, None)
+
+  def get_statistics(self):
+    """Returns the statistics accumulated so far.
+
+    Returns:
+      An ObjectDetectionEvalStatistics with the keys of the images added, the
+      concatenated scores and tp/fp labels of every class, and the groundtruth
+      and correct detection counts. These are all that evaluate() needs, so
+      they are a compact summary of the evaluation to merge into another one.
+    """
+    detections = [self._get_detections_for_class(class_index)
+                  for class_index in range(self.num_class)]
+    return ObjectDetectionEvalStatistics(
+        image_keys=set(self.detection_keys) | set(self.groundtruth_boxes),
+        scores_per_class=[scores for scores, _ in detections],
+        tp_fp_labels_per_class=[tp_fp_labels for _, tp_fp_labels in detections],
+        num_gt_instances_per_class=self.num_gt_instances_per_class.copy(),
+        num_gt_imgs_per_class=self.num_gt_imgs_per_class.copy(),
+        num_images_correctly_detected_per_class=(
+            self.num_images_correctly_detected_per_class.copy()))
+
+  def merge(self, statistics):
+    """Merges the statistics of another evaluation into this one.
+
+    The scores and tp/fp labels of `statistics` are appended after the ones
+    already accumulated, preserving the order in which images were added. The
+    groundtruth of the other evaluation is not merged, so the detections of its
+    images cannot be added to this evaluation afterwards.
+
+    Args:
+      statistics: An ObjectDetectionEvalStatistics returned by get_statistics()
+        of an evaluation with the same number of classes.
+
+    Raises:
+      ValueError: If the number of classes of the two evaluations differ.
+    """
+    num_class = len(statistics.num_gt_instances_per_class)
+    if num_class != self.num_class:
+      raise ValueError('Cannot merge evaluations with {} and {} classes.'
+                       .format(self.num_class, num_class))
+    self.num_gt_instances_per_class += statistics.num_gt_instances_per_class
+    self.num_gt_imgs_per_class += statistics.num_gt_imgs_per_class
+
+    self.detection_keys.update(statistics.image_keys)
+    for class_index in range(self.num_class):
+      if statistics.scores_per_class[class_index].size:
+        self._add_detections_for_class(
+            class_index, statistics.scores_per_class[class_index],
+            statistics.tp_fp_labels_per_class[class_index])
+    self.num_images_correctly_detected_per_class += (
+        statistics.num_images_correctly_detected_per_class)
+
   def _update_ground_truth_statistics(self, groundtruth_class_labels,
                                       groundtruth_is_difficult_list,
                                       groundtruth_is_group_of_list):
@@ -583,12 +844,7 @@ class ObjectDetectionEvaluation(object):
     for class_index in range(self.num_class):
       if self.num_gt_instances_per_class[class_index] == 0:
         continue
-      if not self.scores_per_class[class_index]:
-        scores = np.array([], dtype=float)
-        tp_fp_labels = np.array([], dtype=bool)
-      else:
-        scores = np.concatenate(self.scores_per_class[class_index])
-        tp_fp_labels = np.concatenate(self.tp_fp_labels_per_class[class_index])
+      scores, tp_fp_labels = self._get_detections_for_class(class_index)
       if self.use_weighted_mean_ap:
         all_scores = np.append(all_scores, scores)
         all_tp_fp_labels = np.append(all_tp_fp_labels, tp_fp_labels)
@@ -614,3 +870,47 @@ class ObjectDetectionEvaluation(object):
     return ObjectDetectionEvalMetrics(
         self.average_precision_per_class, mean_ap, self.precisions_per_class,
         self.recalls_per_class, self.corloc_per_class, mean_corloc)
+
+  def partial_evaluate(self):
+    """Computes the mean average precision of the detections added so far.
+
+    Unlike evaluate(), this does not modify the accumulated state, so it can be
+    called periodically during a long running (streaming) evaluation. The
+    detections are kept sorted by score between calls, so that every call only
+    gathers and sorts the detections added since the previous one, in both
+    streaming and non-streaming mode, and merges them in linear time.
+    Detections with equal scores may be ordered differently than in evaluate(),
+    which can slightly change the average precisions of classes with tied
+    scores.
+
+    Returns:
+      average_precision_per_class: float numpy array of average precision for
+          each class, nan for classes without groundtruth instances.
+      mean_ap: mean average precision of all classes, float scalar.
+    """
+    average_precision_per_class = np.empty(self.num_class, dtype=float)
+    average_precision_per_class.fill(np.nan)
+    for class_index in range(self.num_class):
+      if self.num_gt_instances_per_class[class_index] == 0:
+        continue
+      num_entries = len(self.scores_per_class[class_index])
+      scores, tp_fp_labels = self._get_detections_for_class(
+          class_index, self._num_sorted_entries_per_class[class_index])
+      self._num_sorted_entries_per_class[class_index] = num_entries
+      sorted_detections = self._sorted_detections_per_class[class_index]
+      sorted_detections.add(scores, tp_fp_labels)
+      if self.use_weighted_mean_ap:
+        self._sorted_detections_all_classes.add(scores, tp_fp_labels)
+      precision, recall = sorted_detections.compute_precision_recall(
+          self.num_gt_instances_per_class[class_index])
+      average_precision_per_class[class_index] = (
+          metrics.compute_average_precision(precision, recall))
+
+    if self.use_weighted_mean_ap:
+      precision, recall = (
+          self._sorted_detections_all_classes.compute_precision_recall(
+              np.sum(self.num_gt_instances_per_class)))
+      mean_ap = metrics.compute_average_precision(precision, recall)
+    else:
+      mean_ap = np.nanmean(average_precision_per_class)
+    return average_precision_per_class, mean_ap
@@ -191,6 +191,88 @@ class PascalEvaluationTest(tf.test.TestCase):
            standard_fields.InputDataFields.groundtruth_classes:
            groundtruth_class_labels1})
 
+  def test_merge_matches_single_evaluator(self):
+    categories = [{'id': 1, 'name': 'cat'},
+                  {'id': 2, 'name': 'dog'},
+                  {'id': 3, 'name': 'elephant'}]
+    images = [
+        ('img1', np.array([[0, 0, 1, 1], [0, 0, 2, 2]], dtype=float),
+         np.array([1, 2], dtype=int),
+         np.array([[0, 0, 1, 1], [0, 0, 2, 2]], dtype=float),
+         np.array([0.5, 0.9], dtype=float), np.array([1, 2], dtype=int)),
+        ('img2', np.array([[10, 10, 11, 11], [10, 10, 12, 12]], dtype=float),
+         np.array([1, 3], dtype=int),
+         np.array([[10, 10, 11, 11], [100, 100, 120, 120]], dtype=float),
+         np.array([0.7, 0.5], dtype=float), np.array([1, 3], dtype=int)),
+    ]
+    single_evaluator = object_detection_evaluation.PascalDetectionEvaluator(
+        categories)
+    shard_evaluators = [
+        object_detection_evaluation.PascalDetectionEvaluator(categories)
+        for _ in images
+    ]
+    for evaluator, image in zip([single_evaluator] * len(images) +
+                                shard_evaluators, images + images):
+      (image_key, groundtruth_boxes, groundtruth_class_labels, detected_boxes,
+       detected_scores, detected_class_labels) = image
+      evaluator.add_single_ground_truth_image_info(
+          image_key,
+          {standard_fields.InputDataFields.groundtruth_boxes:
+           groundtruth_boxes,
+           standard_fields.InputDataFields.groundtruth_classes:
+           groundtruth_class_labels.copy()})
+      evaluator.add_single_detected_image_info(
+          image_key,
+          {standard_fields.DetectionResultFields.detection_boxes:
+           detected_boxes,
+           standard_fields.DetectionResultFields.detection_scores:
+           detected_scores,
+           standard_fields.DetectionResultFields.detection_classes:
+           detected_class_labels.copy()})
+    merged_evaluator = shard_evaluators[0]
+    statistics = shard_evaluators[1].get_statistics()
+    self.assertEqual(set(['img2']), statistics.image_keys)
+    merged_evaluator.merge(statistics)
+    self.assertEqual(single_evaluator.evaluate(), merged_evaluator.evaluate())
+    with self.assertRaises(ValueError):
+      merged_evaluator.merge(statistics)
+
+  def test_streaming_partial_evaluate_matches_evaluate(self):
+    categories = [{'id': 1, 'name': 'cat'},
+                  {'id': 2, 'name': 'dog'}]
+    pascal_evaluator = object_detection_evaluation.PascalDetectionEvaluator(
+        categories, streaming=True)
+    images = [
+        ('img1', np.array([[0, 0, 1, 1], [0, 0, 2, 2]], dtype=float),
+         np.array([1, 2], dtype=int),
+         np.array([[0, 0, 1, 1], [5, 5, 6, 6]], dtype=float),
+         np.array([0.5, 0.9], dtype=float), np.array([1, 2], dtype=int)),
+        ('img2', np.array([[10, 10, 11, 11]], dtype=float),
+         np.array([2], dtype=int),
+         np.array([[10, 10, 11, 11], [0, 0, 1, 1]], dtype=float),
+         np.array([0.7, 0.6], dtype=float), np.array([2, 1], dtype=int)),
+    ]
+    for (image_key, groundtruth_boxes, groundtruth_class_labels,
+         detected_boxes, detected_scores, detected_class_labels) in images:
+      pascal_evaluator.add_single_ground_truth_image_info(
+          image_key,
+          {standard_fields.InputDataFields.groundtruth_boxes:
+           groundtruth_boxes,
+           standard_fields.InputDataFields.groundtruth_classes:
+           groundtruth_class_labels})
+      pascal_evaluator.add_single_detected_image_info(
+          image_key,
+          {standard_fields.DetectionResultFields.detection_boxes:
+           detected_boxes,
+           standard_fields.DetectionResultFields.detection_scores:
+           detected_scores,
+           standard_fields.DetectionResultFields.detection_classes:
+           detected_class_labels})
+      partial_metrics = pascal_evaluator.partial_evaluate()
+    self.assertEqual(pascal_evaluator.evaluate(), partial_metrics)
+    self.assertAlmostEqual(
+        partial_metrics['PASCAL/PerformanceByCategory/AP@0.5IOU/dog'], 0.25)
+
 
 class WeightedPascalEvaluationTest(tf.test.TestCase):
 
@@ -431,6 +513,109 @@ class ObjectDetectionEvaluationTest(tf.test.TestCase):
     self.assertAlmostEqual(expected_mean_ap, mean_ap)
     self.assertAlmostEqual(expected_mean_corloc, mean_corloc)
 
+  def test_merge_after_clear_detections(self):
+    statistics = self.od_eval.get_statistics()
+    self.od_eval.clear_detections()
+    self.od_eval.merge(statistics)
+    self.assertEqual(set(['img1', 'img2', 'img3']), self.od_eval.detection_keys)
+    scores_per_class0 = np.concatenate(self.od_eval.scores_per_class[0])
+    self.assertTrue(np.allclose(np.array([0.8, 0.7], dtype=float),
+                                scores_per_class0))
+
+
+class ObjectDetectionEvaluationStreamingTest(tf.test.TestCase):
+
+  def setUp(self):
+    num_groundtruth_classes = 3
+    self.od_eval = object_detection_evaluation.ObjectDetectionEvaluation(
+        num_groundtruth_classes)
+    self.streaming_od_eval = (
+        object_detection_evaluation.ObjectDetectionEvaluation(
+            num_groundtruth_classes, streaming=True))
+    for od_eval in [self.od_eval, self.streaming_od_eval]:
+      image_key1 = 'img1'
+      groundtruth_boxes1 = np.array([[0, 0, 1, 1], [0, 0, 2, 2], [0, 0, 3, 3]],
+                                    dtype=float)
+      groundtruth_class_labels1 = np.array([0, 2, 1], dtype=int)
+      od_eval.add_single_ground_truth_image_info(
+          image_key1, groundtruth_boxes1, groundtruth_class_labels1)
+      detected_boxes1 = np.array([[0, 0, 1, 1], [0, 0, 2.2, 2.2]], dtype=float)
+      detected_class_labels1 = np.array([0, 2], dtype=int)
+      detected_scores1 = np.array([0.6, 0.4], dtype=float)
+      od_eval.add_single_detected_image_info(
+          image_key1, detected_boxes1, detected_scores1, detected_class_labels1)
+
+      image_key2 = 'img2'
+      groundtruth_boxes2 = np.array([[10, 10, 11, 11], [10, 10, 12, 12]],
+                                    dtype=float)
+      groundtruth_class_labels2 = np.array([0, 2], dtype=int)
+      od_eval.add_single_ground_truth_image_info(
+          image_key2, groundtruth_boxes2, groundtruth_class_labels2)
+      detected_boxes2 = np.array(
+          [[10, 10, 11, 11], [100, 100, 120, 120], [10, 10, 12, 12]],
+          dtype=float)
+      detected_class_labels2 = np.array([0, 0, 1], dtype=int)
+      detected_scores2 = np.array([0.7, 0.8, 0.9], dtype=float)
+      od_eval.add_single_detected_image_info(
+          image_key2, detected_boxes2, detected_scores2, detected_class_labels2)
+
+  def test_releases_groundtruth(self):
+    self.assertFalse(self.streaming_od_eval.groundtruth_boxes)
+    self.assertFalse(self.streaming_od_eval.groundtruth_class_labels)
+    self.assertEqual(2, len(self.od_eval.groundtruth_boxes))
+
+  def test_partial_evaluate(self):
+    expected_average_precision_per_class = np.array([2. / 3., 0, 0.5],
+                                                    dtype=float)
+    for od_eval in [self.od_eval, self.streaming_od_eval]:
+      average_precision_per_class, mean_ap = od_eval.partial_evaluate()
+      self.assertTrue(np.allclose(expected_average_precision_per_class,
+                                  average_precision_per_class))
+      self.assertAlmostEqual(7. / 18., mean_ap)
+
+  def test_partial_evaluate_sorts_only_new_detections(self):
+    for od_eval in [self.od_eval, self.streaming_od_eval]:
+      od_eval.partial_evaluate()
+      groundtruth_boxes3 = np.array([[0, 0, 5, 5]], dtype=float)
+      groundtruth_class_labels3 = np.array([0], dtype=int)
+      od_eval.add_single_ground_truth_image_info(
+          'img3', groundtruth_boxes3, groundtruth_class_labels3)
+      detected_boxes3 = np.array([[0, 0, 5, 5], [50, 50, 60, 60]],
+                                 dtype=float)
+      detected_class_labels3 = np.array([0, 2], dtype=int)
+      detected_scores3 = np.array([0.65, 0.5], dtype=float)
+      od_eval.add_single_detected_image_info(
+          'img3', detected_boxes3, detected_scores3, detected_class_labels3)
+      average_precision_per_class, mean_ap = od_eval.partial_evaluate()
+      self.assertTrue(np.array_equal(
+          [len(scores) for scores in od_eval.scores_per_class],
+          od_eval._num_sorted_entries_per_class))
+      expected_average_precision_per_class, expected_mean_ap = (
+          od_eval.evaluate()[:2])
+      self.assertTrue(np.allclose(expected_average_precision_per_class,
+                                  average_precision_per_class))
+      self.assertAlmostEqual(expected_mean_ap, mean_ap)
+
+  def test_evaluate_matches_non_streaming(self):
+    (average_precision_per_class, mean_ap, precisions_per_class,
+     recalls_per_class, corloc_per_class,
+     mean_corloc) = self.od_eval.evaluate()
+    (streaming_average_precision_per_class, streaming_mean_ap,
+     streaming_precisions_per_class, streaming_recalls_per_class,
+     streaming_corloc_per_class,
+     streaming_mean_corloc) = self.streaming_od_eval.evaluate()
+    self.assertTrue(np.array_equal(average_precision_per_class,
+                                   streaming_average_precision_per_class))
+    self.assertEqual(mean_ap, streaming_mean_ap)
+    for i in range(len(precisions_per_class)):
+      self.assertTrue(np.array_equal(precisions_per_class[i],
+                                     streaming_precisions_per_class[i]))
+      self.assertTrue(np.array_equal(recalls_per_class[i],
+                                     streaming_recalls_per_class[i]))
+    self.assertTrue(np.array_equal(corloc_per_class,
+                                   streaming_corloc_per_class))
+    self.assertEqual(mean_corloc, streaming_mean_corloc)
+
 
 if __name__ == '__main__':
   tf.test.main()
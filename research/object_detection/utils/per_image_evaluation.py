@@ -22,6 +22,7 @@ import numpy as np
 
 from object_detection.utils import np_box_list
 from object_detection.utils import np_box_list_ops
+from object_detection.utils import np_box_ops
 
 
 class PerImageEvaluation(object):
@@ -104,6 +105,9 @@ class PerImageEvaluation(object):
                        groundtruth_class_labels):
     """Compute CorLoc score for object detection result.
 
+    Only classes that have both detections and groundtruth in the image are
+    visited; every other class is trivially not correctly detected.
+
     Args:
       detected_boxes: A float numpy array of shape [N, 4], representing N
           regions of detected object regions.
@@ -123,16 +127,19 @@ class PerImageEvaluation(object):
     """
     is_class_correctly_detected_in_image = np.zeros(
         self.num_groundtruth_classes, dtype=int)
-    for i in range(self.num_groundtruth_classes):
-      gt_boxes_at_ith_class = groundtruth_boxes[groundtruth_class_labels ==
-                                                i, :]
-      detected_boxes_at_ith_class = detected_boxes[detected_class_labels ==
-                                                   i, :]
-      detected_scores_at_ith_class = detected_scores[detected_class_labels == i]
+    detected_order, detected_offsets = _group_indices_by_class(
+        detected_class_labels, self.num_groundtruth_classes)
+    gt_order, gt_offsets = _group_indices_by_class(
+        groundtruth_class_labels, self.num_groundtruth_classes)
+    for i in _classes_present(detected_offsets, gt_offsets):
+      detected_indices = detected_order[
+          detected_offsets[i]:detected_offsets[i + 1]]
+      gt_indices = gt_order[gt_offsets[i]:gt_offsets[i + 1]]
       is_class_correctly_detected_in_image[i] = (
           self._compute_is_aclass_correctly_detected_in_image(
-              detected_boxes_at_ith_class, detected_scores_at_ith_class,
-              gt_boxes_at_ith_class))
+              detected_boxes[detected_indices, :],
+              detected_scores[detected_indices],
+              groundtruth_boxes[gt_indices, :]))
 
     return is_class_correctly_detected_in_image
 
@@ -169,6 +176,13 @@ class PerImageEvaluation(object):
                      groundtruth_is_group_of_list):
     """Labels true/false positives of detections of an image across all classes.
 
+    Detections and groundtruth are grouped by class in a single pass and the
+    pairwise overlaps are computed once for the whole image. Only overlaps of
+    at least the matching threshold can change a label, so they are kept in
+    sparse form and the dense per-class matrices only hold those. Only classes
+    with at least one detection are then labeled; all other classes get empty
+    results.
+
     Args:
       detected_boxes: A float numpy array of shape [N, 4], representing N
           regions of detected object regions.
@@ -194,24 +208,62 @@ class PerImageEvaluation(object):
           shape [K, 1], representing K True/False positive label of object
           instances detected with class label c
     """
-    result_scores = []
-    result_tp_fp_labels = []
-    for i in range(self.num_groundtruth_classes):
-      gt_boxes_at_ith_class = groundtruth_boxes[(groundtruth_class_labels == i
-                                                ), :]
-      groundtruth_is_difficult_list_at_ith_class = (
-          groundtruth_is_difficult_lists[groundtruth_class_labels == i])
-      groundtruth_is_group_of_list_at_ith_class = (
-          groundtruth_is_group_of_list[groundtruth_class_labels == i])
-      detected_boxes_at_ith_class = detected_boxes[(detected_class_labels == i
-                                                   ), :]
-      detected_scores_at_ith_class = detected_scores[detected_class_labels == i]
-      scores, tp_fp_labels = self._compute_tp_fp_for_single_class(
-          detected_boxes_at_ith_class, detected_scores_at_ith_class,
-          gt_boxes_at_ith_class, groundtruth_is_difficult_list_at_ith_class,
-          groundtruth_is_group_of_list_at_ith_class)
-      result_scores.append(scores)
-      result_tp_fp_labels.append(tp_fp_labels)
+    result_scores = [
+        np.array([], dtype=float) for _ in range(self.num_groundtruth_classes)
+    ]
+    result_tp_fp_labels = [
+        np.array([], dtype=bool) for _ in range(self.num_groundtruth_classes)
+    ]
+    detected_order, detected_offsets = _group_indices_by_class(
+        detected_class_labels, self.num_groundtruth_classes)
+    gt_order, gt_offsets = _group_indices_by_class(
+        groundtruth_class_labels, self.num_groundtruth_classes)
+
+    iou_pairs = None
+    ioa_pairs = None
+    if detected_boxes.size > 0 and groundtruth_boxes.size > 0:
+      iou_pairs = _group_pairs_by_class(
+          np_box_ops.iou_above_threshold(detected_boxes, groundtruth_boxes,
+                                         self.matching_iou_threshold),
+          detected_class_labels, groundtruth_class_labels,
+          self.num_groundtruth_classes)
+      if np.any(groundtruth_is_group_of_list):
+        ioa_pairs = _group_pairs_by_class(
+            np_box_ops.ioa_above_threshold(
+                groundtruth_boxes[groundtruth_is_group_of_list, :],
+                detected_boxes, self.matching_iou_threshold),
+            groundtruth_class_labels[groundtruth_is_group_of_list],
+            detected_class_labels, self.num_groundtruth_classes)
+
+    for i in _classes_present(detected_offsets):
+      detected_indices = detected_order[
+          detected_offsets[i]:detected_offsets[i + 1]]
+      gt_indices = gt_order[gt_offsets[i]:gt_offsets[i + 1]]
+      detected_boxlist = self._non_max_suppression(
+          detected_boxes[detected_indices, :],
+          detected_scores[detected_indices], detected_indices)
+      scores = detected_boxlist.get_field('scores')
+      if gt_indices.size == 0:
+        result_scores[i] = scores
+        result_tp_fp_labels[i] = np.zeros(
+            detected_boxlist.num_boxes(), dtype=bool)
+        continue
+      kept_indices = detected_boxlist.get_field('detection_indices')
+      is_group_of = groundtruth_is_group_of_list[gt_indices]
+      non_group_of_indices = gt_indices[~is_group_of]
+      iou_at_ith_class = _dense_overlaps(
+          _pairs_at_class(iou_pairs, i), kept_indices, non_group_of_indices)
+      ioa_at_ith_class = None
+      if np.any(is_group_of):
+        # Group-of boxes are indexed among the group-of boxes of the image.
+        group_of_indices = np.nonzero(groundtruth_is_group_of_list)[0]
+        ioa_at_ith_class = _dense_overlaps(
+            _pairs_at_class(ioa_pairs, i),
+            np.searchsorted(group_of_indices, gt_indices[is_group_of]),
+            kept_indices)
+      result_scores[i], result_tp_fp_labels[i] = self._label_tp_fp(
+          scores, iou_at_ith_class, ioa_at_ith_class,
+          groundtruth_is_difficult_lists[non_group_of_indices])
     return result_scores, result_tp_fp_labels
 
   def _remove_invalid_boxes(self, detected_boxes, detected_scores,
@@ -253,21 +305,72 @@ class PerImageEvaluation(object):
     """
     if detected_boxes.size == 0:
       return np.array([], dtype=float), np.array([], dtype=bool)
-    detected_boxlist = np_box_list.BoxList(detected_boxes)
-    detected_boxlist.add_field('scores', detected_scores)
-    detected_boxlist = np_box_list_ops.non_max_suppression(
-        detected_boxlist, self.nms_max_output_boxes, self.nms_iou_threshold)
+    detected_boxlist = self._non_max_suppression(detected_boxes,
+                                                 detected_scores)
 
     scores = detected_boxlist.get_field('scores')
 
     if groundtruth_boxes.size == 0:
       return scores, np.zeros(detected_boxlist.num_boxes(), dtype=bool)
 
-    tp_fp_labels = np.zeros(detected_boxlist.num_boxes(), dtype=bool)
-    is_matched_to_difficult_box = np.zeros(
-        detected_boxlist.num_boxes(), dtype=bool)
-    is_matched_to_group_of_box = np.zeros(
-        detected_boxlist.num_boxes(), dtype=bool)
+    iou = np_box_ops.iou(detected_boxlist.get(),
+                         groundtruth_boxes[~groundtruth_is_group_of_list, :])
+    ioa = None
+    if np.any(groundtruth_is_group_of_list):
+      ioa = np_box_ops.ioa(groundtruth_boxes[groundtruth_is_group_of_list, :],
+                           detected_boxlist.get())
+    return self._label_tp_fp(
+        scores, iou, ioa,
+        groundtruth_is_difficult_list[~groundtruth_is_group_of_list])
+
+  def _non_max_suppression(self, detected_boxes, detected_scores,
+                           detected_indices=None):
+    """Applies NMS to the detections of a single class.
+
+    Args:
+      detected_boxes: A numpy array of shape [N, 4] representing detected box
+          coordinates
+      detected_scores: A 1-d numpy array of length N representing classification
+          score
+      detected_indices: (optional) A 1-d integer numpy array of length N with
+          the row of each detection in the image level arrays. If given, it is
+          carried through NMS in the 'detection_indices' field.
+
+    Returns:
+      A BoxList with the detections surviving NMS, sorted by decreasing score.
+    """
+    detected_boxlist = np_box_list.BoxList(detected_boxes)
+    detected_boxlist.add_field('scores', detected_scores)
+    if detected_indices is not None:
+      detected_boxlist.add_field('detection_indices', detected_indices)
+    return np_box_list_ops.non_max_suppression(
+        detected_boxlist, self.nms_max_output_boxes, self.nms_iou_threshold)
+
+  def _label_tp_fp(self, scores, iou, ioa, groundtruth_is_difficult_list):
+    """Labels NMSed detections of a single class given their overlaps.
+
+    Only overlaps of at least the matching threshold matter, so smaller
+    entries of iou and ioa may be given as zero.
+
+    Args:
+      scores: A 1-d numpy array of length K with the scores of the detections
+          surviving NMS, sorted by decreasing score.
+      iou: A numpy array of shape [K, M1] with the IOU between the detections
+          and the M1 groundtruth boxes that are not group-of boxes.
+      ioa: A numpy array of shape [M2, K] with the IOA between the M2 group-of
+          groundtruth boxes and the detections, or None if M2 is zero.
+      groundtruth_is_difficult_list: A boolean numpy array of length M1 denoting
+          whether a non group-of ground truth box is a difficult instance.
+
+    Returns:
+      scores: A numpy array representing the detection scores.
+      tp_fp_labels: a boolean numpy array indicating whether a detection is a
+          true positive.
+    """
+    num_detections = scores.shape[0]
+    tp_fp_labels = np.zeros(num_detections, dtype=bool)
+    is_matched_to_difficult_box = np.zeros(num_detections, dtype=bool)
+    is_matched_to_group_of_box = np.zeros(num_detections, dtype=bool)
 
     # The evaluation is done in two stages:
     # 1. All detections are matched to non group-of boxes; true positives are
@@ -276,19 +379,13 @@ class PerImageEvaluation(object):
     #    group-of boxes and ignored if matched.
 
     # Tp-fp evaluation for non-group of boxes (if any).
-    gt_non_group_of_boxlist = np_box_list.BoxList(
-        groundtruth_boxes[~groundtruth_is_group_of_list, :])
-    if gt_non_group_of_boxlist.num_boxes() > 0:
-      groundtruth_nongroup_of_is_difficult_list = groundtruth_is_difficult_list[
-          ~groundtruth_is_group_of_list]
-      iou = np_box_list_ops.iou(detected_boxlist, gt_non_group_of_boxlist)
+    if iou.shape[1] > 0:
       max_overlap_gt_ids = np.argmax(iou, axis=1)
-      is_gt_box_detected = np.zeros(
-          gt_non_group_of_boxlist.num_boxes(), dtype=bool)
-      for i in range(detected_boxlist.num_boxes()):
+      is_gt_box_detected = np.zeros(iou.shape[1], dtype=bool)
+      for i in range(num_detections):
         gt_id = max_overlap_gt_ids[i]
         if iou[i, gt_id] >= self.matching_iou_threshold:
-          if not groundtruth_nongroup_of_is_difficult_list[gt_id]:
+          if not groundtruth_is_difficult_list[gt_id]:
             if not is_gt_box_detected[gt_id]:
               tp_fp_labels[i] = True
               is_gt_box_detected[gt_id] = True
@@ -296,17 +393,109 @@ class PerImageEvaluation(object):
             is_matched_to_difficult_box[i] = True
 
     # Tp-fp evaluation for group of boxes.
-    gt_group_of_boxlist = np_box_list.BoxList(
-        groundtruth_boxes[groundtruth_is_group_of_list, :])
-    if gt_group_of_boxlist.num_boxes() > 0:
-      ioa = np_box_list_ops.ioa(gt_group_of_boxlist, detected_boxlist)
+    if ioa is not None:
       max_overlap_group_of_gt = np.max(ioa, axis=0)
-      for i in range(detected_boxlist.num_boxes()):
-        if (not tp_fp_labels[i] and not is_matched_to_difficult_box[i] and
-            max_overlap_group_of_gt[i] >= self.matching_iou_threshold):
-          is_matched_to_group_of_box[i] = True
+      is_matched_to_group_of_box = (
+          ~tp_fp_labels & ~is_matched_to_difficult_box &
+          (max_overlap_group_of_gt >= self.matching_iou_threshold))
 
     return scores[~is_matched_to_difficult_box
                   & ~is_matched_to_group_of_box], tp_fp_labels[
                       ~is_matched_to_difficult_box
                       & ~is_matched_to_group_of_box]
+
+
+def _group_indices_by_class(class_labels, num_classes):
+  """Groups the rows of an image by class label in a single pass.
+
+  Args:
+    class_labels: An integer numpy array of length N with the class labels.
+    num_classes: Number of classes C. Labels outside [0, C) are dropped.
+
+  Returns:
+    order: An integer numpy array with the row indices sorted by class. Rows
+        of the same class keep their original relative order.
+    offsets: An integer numpy array of length C + 1 such that the rows of
+        class c are order[offsets[c]:offsets[c + 1]].
+  """
+  class_labels = np.asarray(class_labels)
+  order = np.argsort(class_labels, kind='mergesort')
+  offsets = np.searchsorted(class_labels[order], np.arange(num_classes + 1))
+  return order, offsets
+
+
+def _classes_present(*offsets_list):
+  """Returns the classes that have rows in every one of the given groupings."""
+  is_present = np.ones(len(offsets_list[0]) - 1, dtype=bool)
+  for offsets in offsets_list:
+    is_present &= np.diff(offsets) > 0
+  return np.nonzero(is_present)[0]
+
+
+def _group_pairs_by_class(pairs, class_labels1, class_labels2, num_classes):
+  """Keeps the sparse overlaps between boxes of the same class, by class.
+
+  Args:
+    pairs: A tuple (indices1, indices2, values) of sparse overlaps as returned
+        by np_box_ops.iou_above_threshold.
+    class_labels1: An integer numpy array with the class labels of the boxes
+        indexed by indices1.
+    class_labels2: An integer numpy array with the class labels of the boxes
+        indexed by indices2.
+    num_classes: Number of classes C.
+
+  Returns:
+    A tuple (indices1, indices2, values, offsets) where the pairs of class c
+    are at [offsets[c]:offsets[c + 1]].
+  """
+  indices1, indices2, values = pairs
+  pair_labels = class_labels1[indices1]
+  is_same_class = pair_labels == class_labels2[indices2]
+  order, offsets = _group_indices_by_class(pair_labels[is_same_class],
+                                           num_classes)
+  return (indices1[is_same_class][order], indices2[is_same_class][order],
+          values[is_same_class][order], offsets)
+
+
+def _pairs_at_class(grouped_pairs, class_index):
+  """Returns the (indices1, indices2, values) of a class of grouped pairs."""
+  if grouped_pairs is None:
+    empty_indices = np.zeros([0], dtype=int)
+    return empty_indices, empty_indices, np.zeros([0], dtype=float)
+  indices1, indices2, values, offsets = grouped_pairs
+  start, end = offsets[class_index], offsets[class_index + 1]
+  return indices1[start:end], indices2[start:end], values[start:end]
+
+
+def _positions(values, sequence):
+  """Returns the position of each value in sequence and whether it is there."""
+  if sequence.size == 0:
+    return (np.zeros(values.shape, dtype=int),
+            np.zeros(values.shape, dtype=bool))
+  sorter = np.argsort(sequence)
+  positions = np.minimum(
+      np.searchsorted(sequence, values, sorter=sorter), sequence.size - 1)
+  positions = sorter[positions]
+  return positions, sequence[positions] == values
+
+
+def _dense_overlaps(pairs, rows, cols):
+  """Scatters sparse overlaps into a dense [len(rows), len(cols)] matrix.
+
+  Args:
+    pairs: A tuple (indices1, indices2, values) of sparse overlaps.
+    rows: A 1-d integer numpy array of the indices1 values to use as rows.
+    cols: A 1-d integer numpy array of the indices2 values to use as columns.
+
+  Returns:
+    A float numpy array of shape [len(rows), len(cols)]. Pairs that are not
+    given are zero.
+  """
+  indices1, indices2, values = pairs
+  overlaps = np.zeros([rows.size, cols.size], dtype=float)
+  row_positions, is_in_rows = _positions(indices1, rows)
+  col_positions, is_in_cols = _positions(indices2, cols)
+  is_in_matrix = is_in_rows & is_in_cols
+  overlaps[row_positions[is_in_matrix],
+           col_positions[is_in_matrix]] = values[is_in_matrix]
+  return overlaps
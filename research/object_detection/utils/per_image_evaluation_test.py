@@ -220,6 +220,41 @@ class MultiClassesTpFpTest(tf.test.TestCase):
       self.assertTrue(np.allclose(expected_scores[i], scores[i]))
       self.assertTrue(np.array_equal(expected_tp_fp_labels[i], tp_fp_labels[i]))
 
+  def test_tp_fp_with_group_of_and_absent_classes(self):
+    num_groundtruth_classes = 5
+    matching_iou_threshold = 0.5
+    nms_iou_threshold = 1.0
+    nms_max_output_boxes = 10000
+    eval1 = per_image_evaluation.PerImageEvaluation(num_groundtruth_classes,
+                                                    matching_iou_threshold,
+                                                    nms_iou_threshold,
+                                                    nms_max_output_boxes)
+    detected_boxes = np.array([[0, 0, 1, 1], [0, 0, 2, 1], [0, 0, 3, 1],
+                               [0, 0, 1, 1], [5, 5, 6, 6]], dtype=float)
+    detected_scores = np.array([0.8, 0.6, 0.5, 0.7, 0.4], dtype=float)
+    detected_class_labels = np.array([3, 3, 3, 7, 1], dtype=int)
+    groundtruth_boxes = np.array(
+        [[0, 0, 1, 1], [0, 0, 5, 5], [0, 0, 1, 1]], dtype=float)
+    groundtruth_class_labels = np.array([3, 3, 4], dtype=int)
+    groundtruth_groundtruth_is_difficult_list = np.zeros(3, dtype=bool)
+    groundtruth_groundtruth_is_group_of_list = np.array(
+        [False, True, False], dtype=bool)
+    scores, tp_fp_labels, _ = eval1.compute_object_detection_metrics(
+        detected_boxes, detected_scores, detected_class_labels,
+        groundtruth_boxes, groundtruth_class_labels,
+        groundtruth_groundtruth_is_difficult_list,
+        groundtruth_groundtruth_is_group_of_list)
+    expected_scores = [np.array([], dtype=float), np.array([0.4]),
+                       np.array([], dtype=float), np.array([0.8]),
+                       np.array([], dtype=float)]
+    expected_tp_fp_labels = [np.array([], dtype=bool), np.array([False]),
+                             np.array([], dtype=bool), np.array([True]),
+                             np.array([], dtype=bool)]
+    self.assertEqual(len(expected_scores), len(scores))
+    for i in range(len(expected_scores)):
+      self.assertTrue(np.allclose(expected_scores[i], scores[i]))
+      self.assertTrue(np.array_equal(expected_tp_fp_labels[i], tp_fp_labels[i]))
+
 
 class CorLocTest(tf.test.TestCase):
 
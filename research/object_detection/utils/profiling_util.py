@@ -0,0 +1,274 @@
+# Copyright 2017 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""Utilities for profiling the detection train and eval loops.
+
+TrainProfiler replaces the train step function of slim.learning.train. Every
+profile_every_n_steps steps it traces a training step and uses the trace to
+  * write summaries of the op time spent per stage (input, model
+    preprocessing, model, loss, backward pass and optimizer) and of the input
+    queue sizes, together with the trace itself, through the summary writer of
+    the trainer,
+  * optionally save the trace in Chrome trace format, and
+  * log a bottleneck report, which warns when the model waits for input.
+
+StageTimer accumulates Python-side wall time per stage, e.g. to separate
+session runs from metric accumulation during evaluation.
+"""
+import collections
+import contextlib
+import logging
+import os
+import re
+import time
+
+import tensorflow as tf
+
+from tensorflow.python.client import timeline
+
+slim = tf.contrib.slim
+
+# Ordered (stage, regex) pairs used to assign traced ops to stages by node name.
+# The first matching pattern wins; ops matching no pattern belong to 'model'.
+# Gradient ops mirror the names of the forward ops, so they are matched first.
+# 'model_preprocess' covers the resizing and normalization done by
+# DetectionModel.preprocess under the 'Preprocessor' name scope. Data
+# augmentation (core/preprocessor.py) runs in the input threads before the
+# examples are enqueued, so it is not part of the traced step; its cost shows
+# up as time spent in the 'input' stage and as empty input queues.
+STAGE_PATTERNS = [
+    ('input', r'_Dequeue(Many|UpTo)?(_\d+)?$'),
+    ('backward', r'(^|/)gradients(_\d+)?/'),
+    ('model_preprocess', r'(^|/)Preprocessor/'),
+    ('loss', r'(^|/)(Loss|RPNLoss|BoxClassifierLoss)/'),
+    ('optimizer', r'(^|/)(clip_grads|update_[^/]*)/|(^|/)Apply\w*$'),
+]
+DEFAULT_STAGE = 'model'
+
+# Fraction of a traced step spent waiting for input above which the bottleneck
+# report warns that the input pipeline is starving the model.
+INPUT_STARVATION_FRACTION = 0.2
+
+
+def aggregate_stage_times(step_stats, stage_patterns=None):
+  """Sums the op execution times of a traced step per stage.
+
+  Ops running concurrently are all counted, so the total op time may exceed the
+  wall time of the step.
+
+  Args:
+    step_stats: a StepStats proto, e.g. RunMetadata.step_stats.
+    stage_patterns: list of (stage, regex) pairs assigning ops to stages by
+      node name. Defaults to STAGE_PATTERNS.
+
+  Returns:
+    An OrderedDict mapping stage names to op time in milliseconds, with one
+    entry per stage in stage_patterns followed by DEFAULT_STAGE.
+  """
+  if stage_patterns is None:
+    stage_patterns = STAGE_PATTERNS
+  compiled_patterns = [(stage, re.compile(pattern))
+                       for stage, pattern in stage_patterns]
+  stage_times = collections.OrderedDict(
+      [(stage, 0.0) for stage, _ in stage_patterns] + [(DEFAULT_STAGE, 0.0)])
+  for device_stats in step_stats.dev_stats:
+    # GPU stream devices repeat the kernels of the compute device.
+    if '/stream:' in device_stats.device or '/memcpy' in device_stats.device:
+      continue
+    for node_stats in device_stats.node_stats:
+      stage = DEFAULT_STAGE
+      for pattern_stage, pattern in compiled_patterns:
+        if pattern.search(node_stats.node_name):
+          stage = pattern_stage
+          break
+      stage_times[stage] += node_stats.all_end_rel_micros / 1000.0
+  return stage_times
+
+
+class TrainProfiler(object):
+  """Profiles training steps run by slim.learning.train."""
+
+  def __init__(self,
+               logdir,
+               profile_every_n_steps,
+               summary_writer,
+               save_traces=False,
+               stage_patterns=None):
+    """Constructor.
+
+    Must be called before the graph is finalized, as it creates ops fetching
+    the size of every queue with a registered queue runner.
+
+    Args:
+      logdir: directory to save Chrome traces to.
+      profile_every_n_steps: profile a step every profile_every_n_steps steps.
+      summary_writer: the tf.summary.FileWriter of the trainer, used to write
+        the profiling summaries and the run metadata of profiled steps.
+      save_traces: whether to save the traces of profiled steps in Chrome trace
+        format to <logdir>/timeline-<global step>.json.
+      stage_patterns: list of (stage, regex) pairs assigning ops to stages.
+        Defaults to STAGE_PATTERNS.
+
+    Raises:
+      ValueError: if profile_every_n_steps is not positive.
+    """
+    if profile_every_n_steps <= 0:
+      raise ValueError('profile_every_n_steps must be positive.')
+    self._logdir = logdir
+    self._profile_every_n_steps = profile_every_n_steps
+    self._summary_writer = summary_writer
+    self._save_traces = save_traces
+    self._stage_patterns = stage_patterns
+    self._queue_sizes = {}
+    for queue_runner in tf.get_collection(tf.GraphKeys.QUEUE_RUNNERS):
+      queue = queue_runner.queue
+      self._queue_sizes[queue.name] = queue.size()
+    self._num_steps = 0
+    self._step_times = []
+
+  def train_step(self, sess, train_op, global_step, train_step_kwargs):
+    """Runs a training step, profiling it if it is due.
+
+    This function is a drop-in replacement of slim.learning.train_step and is
+    meant to be passed as train_step_fn to slim.learning.train.
+
+    Args:
+      sess: the current session.
+      train_op: an op that computes the loss and applies the gradients.
+      global_step: the global step tensor.
+      train_step_kwargs: a dictionary of keyword arguments, see
+        slim.learning.train_step.
+
+    Returns:
+      The total loss and a boolean indicating whether or not to stop training.
+    """
+    self._num_steps += 1
+    if self._num_steps % self._profile_every_n_steps:
+      start_time = time.time()
+      result = slim.learning.train_step(sess, train_op, global_step,
+                                        train_step_kwargs)
+      self._step_times.append(time.time() - start_time)
+      return result
+
+    run_options = tf.RunOptions(trace_level=tf.RunOptions.FULL_TRACE)
+    run_metadata = tf.RunMetadata()
+    start_time = time.time()
+    total_loss, np_global_step, queue_sizes = sess.run(
+        [train_op, global_step, self._queue_sizes],
+        options=run_options, run_metadata=run_metadata)
+    traced_step_time = time.time() - start_time
+
+    stage_times = aggregate_stage_times(run_metadata.step_stats,
+                                        self._stage_patterns)
+    input_wait_fraction = min(
+        stage_times['input'] / (1000.0 * traced_step_time), 1.0)
+    sec_per_step = traced_step_time
+    if self._step_times:
+      sec_per_step = sum(self._step_times) / len(self._step_times)
+    self._step_times = []
+
+    self._write_summaries(np_global_step, sec_per_step, stage_times,
+                          input_wait_fraction, queue_sizes)
+    self._summary_writer.add_run_metadata(
+        run_metadata, 'step{}'.format(np_global_step), np_global_step)
+    if self._save_traces:
+      trace_path = os.path.join(self._logdir,
+                                'timeline-{}.json'.format(np_global_step))
+      trace = timeline.Timeline(run_metadata.step_stats)
+      with tf.gfile.GFile(trace_path, 'w') as trace_file:
+        trace_file.write(trace.generate_chrome_trace_format())
+      logging.info('Wrote trace to %s', trace_path)
+    self._log_report(np_global_step, sec_per_step, traced_step_time,
+                     stage_times, input_wait_fraction, queue_sizes)
+
+    should_stop = False
+    if 'should_stop' in train_step_kwargs:
+      should_stop = sess.run(train_step_kwargs['should_stop'])
+    return total_loss, should_stop
+
+  def _write_summaries(self, global_step, sec_per_step, stage_times,
+                       input_wait_fraction, queue_sizes):
+    """Writes the profile of a step as scalar summaries."""
+    values = [
+        tf.Summary.Value(tag='Profiling/sec_per_step',
+                         simple_value=sec_per_step),
+        tf.Summary.Value(tag='Profiling/input_wait_fraction',
+                         simple_value=input_wait_fraction),
+    ]
+    for stage, stage_time in stage_times.items():
+      values.append(tf.Summary.Value(tag='Profiling/op_time_ms/' + stage,
+                                     simple_value=stage_time))
+    for name, size in sorted(queue_sizes.items()):
+      values.append(tf.Summary.Value(tag='Profiling/queue_size/' + name,
+                                     simple_value=size))
+    self._summary_writer.add_summary(tf.Summary(value=values), global_step)
+
+  def _log_report(self, global_step, sec_per_step, traced_step_time,
+                  stage_times, input_wait_fraction, queue_sizes):
+    """Logs where the time of a step goes."""
+    total_op_time = max(sum(stage_times.values()), 1e-9)
+    stages = sorted(stage_times.items(), key=lambda item: -item[1])
+    logging.info(
+        'Profile at global step %d: %.3f sec/step (%.3f sec traced step).\n'
+        '  Op time by stage: %s\n  Queue sizes: %s', global_step,
+        sec_per_step, traced_step_time,
+        ', '.join('%s %.1f ms (%.0f%%)' % (stage, stage_time,
+                                           100.0 * stage_time / total_op_time)
+                  for stage, stage_time in stages),
+        ', '.join('%s %d' % (name, size)
+                  for name, size in sorted(queue_sizes.items())) or 'none')
+    if input_wait_fraction > INPUT_STARVATION_FRACTION:
+      logging.warning(
+          'Input pipeline is starving the model: %.0f%% of the traced step was '
+          'spent waiting for input.', 100.0 * input_wait_fraction)
+
+
+class StageTimer(object):
+  """Accumulates wall time per named stage.
+
+  Example usage:
+    timer = StageTimer()
+    with timer.time('session_run'):
+      result_dict = sess.run(tensor_dict)
+    logging.info(timer.report())
+  """
+
+  def __init__(self):
+    self._total_secs = collections.OrderedDict()
+    self._counts = collections.defaultdict(int)
+
+  @contextlib.contextmanager
+  def time(self, stage):
+    """Context manager adding the wall time of its body to stage."""
+    start_time = time.time()
+    try:
+      yield
+    finally:
+      self._total_secs[stage] = (self._total_secs.get(stage, 0.0) +
+                                 time.time() - start_time)
+      self._counts[stage] += 1
+
+  def total_secs(self):
+    """Returns an OrderedDict mapping stages to their total time in seconds."""
+    return collections.OrderedDict(self._total_secs)
+
+  def report(self):
+    """Returns a one line summary of the time spent per stage."""
+    total = max(sum(self._total_secs.values()), 1e-9)
+    return ', '.join(
+        '%s: %.2f sec (%d calls, %.1f ms/call, %.0f%%)' % (
+            stage, secs, self._counts[stage],
+            1000.0 * secs / self._counts[stage], 100.0 * secs / total)
+        for stage, secs in self._total_secs.items())
@@ -0,0 +1,93 @@
+# Copyright 2017 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for object_detection.utils.profiling_util."""
+
+import tensorflow as tf
+
+from object_detection.utils import profiling_util
+
+
+class AggregateStageTimesTest(tf.test.TestCase):
+
+  def _add_node_stats(self, device_stats, node_name, micros):
+    node_stats = device_stats.node_stats.add()
+    node_stats.node_name = node_name
+    node_stats.all_end_rel_micros = micros
+
+  def test_ops_are_assigned_to_stages(self):
+    run_metadata = tf.RunMetadata()
+    device_stats = run_metadata.step_stats.dev_stats.add()
+    device_stats.device = '/job:localhost/replica:0/task:0/gpu:0'
+    self._add_node_stats(device_stats, 'prefetch_queue_Dequeue', 3000)
+    self._add_node_stats(device_stats, 'batch_queue_DequeueMany_1', 1000)
+    self._add_node_stats(device_stats,
+                         'Preprocessor/random_horizontal_flip/cond', 500)
+    self._add_node_stats(device_stats, 'FeatureExtractor/Conv/Conv2D', 8000)
+    self._add_node_stats(device_stats,
+                         'gradients/FeatureExtractor/Conv/Conv2D_grad', 9000)
+    self._add_node_stats(device_stats, 'Loss/Sum', 250)
+    self._add_node_stats(device_stats, 'update_Conv/weights/ApplyMomentum',
+                         750)
+    stream_stats = run_metadata.step_stats.dev_stats.add()
+    stream_stats.device = '/gpu:0/stream:all'
+    self._add_node_stats(stream_stats, 'FeatureExtractor/Conv/Conv2D', 8000)
+
+    stage_times = profiling_util.aggregate_stage_times(run_metadata.step_stats)
+    self.assertEqual(list(stage_times.keys()),
+                     ['input', 'backward', 'model_preprocess', 'loss',
+                      'optimizer', 'model'])
+    self.assertAllClose(list(stage_times.values()),
+                        [4.0, 9.0, 0.5, 0.25, 0.75, 8.0])
+
+  def test_custom_stage_patterns(self):
+    run_metadata = tf.RunMetadata()
+    device_stats = run_metadata.step_stats.dev_stats.add()
+    device_stats.device = '/job:localhost/replica:0/task:0/cpu:0'
+    self._add_node_stats(device_stats, 'Postprocessor/nms', 2000)
+    self._add_node_stats(device_stats, 'Loss/Sum', 1000)
+
+    stage_times = profiling_util.aggregate_stage_times(
+        run_metadata.step_stats, [('postprocess', r'^Postprocessor/')])
+    self.assertEqual(dict(stage_times), {'postprocess': 2.0, 'model': 1.0})
+
+
+class StageTimerTest(tf.test.TestCase):
+
+  def test_accumulates_time_per_stage(self):
+    timer = profiling_util.StageTimer()
+    for _ in range(3):
+      with timer.time('run_batch'):
+        pass
+    with timer.time('compute_metrics'):
+      pass
+    total_secs = timer.total_secs()
+    self.assertEqual(list(total_secs.keys()), ['run_batch', 'compute_metrics'])
+    for secs in total_secs.values():
+      self.assertGreaterEqual(secs, 0.0)
+    report = timer.report()
+    self.assertIn('run_batch', report)
+    self.assertIn('3 calls', report)
+    self.assertIn('1 calls', report)
+
+  def test_time_recorded_on_exception(self):
+    timer = profiling_util.StageTimer()
+    with self.assertRaises(ValueError):
+      with timer.time('failing'):
+        raise ValueError()
+    self.assertIn('failing', timer.total_secs())
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -33,6 +33,9 @@ import tensorflow as tf
 
 _TITLE_LEFT_MARGIN = 10
 _TITLE_TOP_MARGIN = 10
+# Caches of the NumPy rasterizer, see _get_rgb and _get_glyph_atlas.
+_RGB_CACHE = {}
+_GLYPH_ATLAS_CACHE = {}
 STANDARD_COLORS = [
     'AliceBlue', 'Chartreuse', 'Aqua', 'Aquamarine', 'Azure', 'Beige', 'Bisque',
     'BlanchedAlmond', 'BlueViolet', 'BurlyWood', 'CadetBlue', 'AntiqueWhite',
@@ -279,7 +282,7 @@ def draw_bounding_boxes_on_image_tensors(images,
     4D image tensor of type uint8, with boxes drawn on top.
   """
   visualize_boxes_fn = functools.partial(
-      visualize_boxes_and_labels_on_image_array,
+      visualize_boxes_and_labels_on_image_batch,
       category_index=category_index,
       instance_masks=None,
       keypoints=None,
@@ -289,18 +292,10 @@ def draw_bounding_boxes_on_image_tensors(images,
       agnostic_mode=False,
       line_thickness=4)
 
-  def draw_boxes(image_boxes_classes_scores):
-    """Draws boxes on image."""
-    (image, boxes, classes, scores) = image_boxes_classes_scores
-    image_with_boxes = tf.py_func(visualize_boxes_fn,
-                                  [image, boxes, classes, scores], tf.uint8)
-    return image_with_boxes
-
-  images = tf.map_fn(
-      draw_boxes, (images, boxes, classes, scores),
-      dtype=tf.uint8,
-      back_prop=False)
-  return images
+  images_with_boxes = tf.py_func(visualize_boxes_fn,
+                                 [images, boxes, classes, scores], tf.uint8)
+  images_with_boxes.set_shape(images.get_shape())
+  return images_with_boxes
 
 
 def draw_keypoints_on_image_array(image,
@@ -382,6 +377,148 @@ def draw_mask_on_image_array(image, mask, color='red', alpha=0.7):
   np.copyto(image, np.array(pil_image.convert('RGB')))
 
 
+def _get_rgb(color):
+  """Returns the (r, g, b) tuple of a color name, caching the conversion."""
+  if color not in _RGB_CACHE:
+    _RGB_CACHE[color] = ImageColor.getrgb(color)[:3]
+  return _RGB_CACHE[color]
+
+
+class _GlyphAtlas(object):
+  """Alpha masks of the glyphs of a font, rendered once with PIL.
+
+  Strings are rendered by concatenating the masks of their characters, which
+  ignores kerning but avoids a round trip through PIL for every label.
+  """
+
+  def __init__(self, font):
+    self._font = font
+    self._height = max(
+        font.getsize(chr(code))[1] for code in range(32, 127))
+    self._glyphs = {}
+
+  @property
+  def height(self):
+    return self._height
+
+  def _get_glyph(self, char):
+    if char not in self._glyphs:
+      width = max(self._font.getsize(char)[0], 1)
+      glyph_image = Image.new('L', (width, self._height), 0)
+      ImageDraw.Draw(glyph_image).text((0, 0), char, fill=255, font=self._font)
+      self._glyphs[char] = np.array(glyph_image)
+    return self._glyphs[char]
+
+  def render(self, text):
+    """Returns a uint8 alpha mask of shape [height, width] for text."""
+    if not text:
+      return np.zeros([self._height, 0], dtype=np.uint8)
+    return np.concatenate([self._get_glyph(char) for char in text], axis=1)
+
+
+def _get_glyph_atlas():
+  """Returns the glyph atlas of the label font, creating it on first use."""
+  if 'default' not in _GLYPH_ATLAS_CACHE:
+    try:
+      font = ImageFont.truetype('arial.ttf', 24)
+    except IOError:
+      font = ImageFont.load_default()
+    _GLYPH_ATLAS_CACHE['default'] = _GlyphAtlas(font)
+  return _GLYPH_ATLAS_CACHE['default']
+
+
+def _rasterize_rectangle(image, top, left, bottom, right, rgb):
+  """Fills the pixels [top, bottom) x [left, right) of image, clipped."""
+  im_height, im_width = image.shape[:2]
+  top, bottom = max(top, 0), min(bottom, im_height)
+  left, right = max(left, 0), min(right, im_width)
+  if top < bottom and left < right:
+    image[top:bottom, left:right] = rgb
+
+
+def _rasterize_box_outline(image, top, left, bottom, right, rgb, thickness):
+  """Draws the outline of a box with lines of the given thickness."""
+  top, left, bottom, right = [int(round(c)) for c in (top, left, bottom, right)]
+  thickness = max(int(thickness), 1)
+  start = -(thickness // 2)
+  end = start + thickness
+  _rasterize_rectangle(image, top + start, left + start, top + end,
+                       right + end, rgb)
+  _rasterize_rectangle(image, bottom + start, left + start, bottom + end,
+                       right + end, rgb)
+  _rasterize_rectangle(image, top + start, left + start, bottom + end,
+                       left + end, rgb)
+  _rasterize_rectangle(image, top + start, right + start, bottom + end,
+                       right + end, rgb)
+
+
+def _rasterize_display_strs(image, left, top, bottom, rgb, display_str_list):
+  """Draws labels above the box (or below it if there is no room).
+
+  Follows the layout of draw_bounding_box_on_image: each string is drawn in
+  black on a rectangle filled with the box color.
+  """
+  atlas = _get_glyph_atlas()
+  im_height, im_width = image.shape[:2]
+  text_height = atlas.height
+  margin = int(np.ceil(0.05 * text_height))
+  line_height = text_height + 2 * margin
+  total_display_str_height = line_height * len(display_str_list)
+  if top > total_display_str_height:
+    text_bottom = top
+  else:
+    text_bottom = bottom + total_display_str_height
+  left = int(round(left))
+  text_bottom = int(round(text_bottom))
+  # Reverse list and print from bottom to top.
+  for display_str in display_str_list[::-1]:
+    text_mask = atlas.render(display_str)
+    text_top = text_bottom - line_height
+    _rasterize_rectangle(image, text_top, left, text_bottom,
+                         left + text_mask.shape[1] + 2 * margin, rgb)
+    # Blend black text into the label background, clipped to the image.
+    y0, x0 = text_top + margin, left + margin
+    y_start, x_start = max(y0, 0), max(x0, 0)
+    y_end = min(y0 + text_mask.shape[0], im_height)
+    x_end = min(x0 + text_mask.shape[1], im_width)
+    if y_start < y_end and x_start < x_end:
+      alpha = text_mask[y_start - y0:y_end - y0, x_start - x0:x_end - x0]
+      region = image[y_start:y_end, x_start:x_end]
+      region[...] = (region.astype(np.uint16) *
+                     (255 - alpha[:, :, np.newaxis]) // 255)
+    text_bottom = text_top
+
+
+def _rasterize_mask(image, mask, rgb, alpha):
+  """Blends rgb into the pixels of image where mask is 1."""
+  if image.dtype != np.uint8:
+    raise ValueError('`image` not of type np.uint8')
+  if mask.dtype != np.uint8:
+    raise ValueError('`mask` not of type np.uint8')
+  selected = mask.astype(bool)
+  weight = int(255.0 * alpha)
+  blended = (image[selected].astype(np.uint32) * (255 - weight) +
+             np.array(rgb, dtype=np.uint32) * weight + 127) // 255
+  image[selected] = blended.astype(np.uint8)
+
+
+def _rasterize_keypoints(image, keypoints_y, keypoints_x, rgb, radius):
+  """Draws filled disks of the given radius centered on the keypoints."""
+  if not len(keypoints_y):
+    return
+  im_height, im_width = image.shape[:2]
+  extent = int(np.ceil(radius))
+  offsets_y, offsets_x = np.mgrid[-extent:extent + 1, -extent:extent + 1]
+  in_disk = offsets_y**2 + offsets_x**2 <= radius**2
+  offsets_y, offsets_x = offsets_y[in_disk], offsets_x[in_disk]
+  ys = (np.round(keypoints_y).astype(np.int64)[:, np.newaxis] +
+        offsets_y[np.newaxis, :]).ravel()
+  xs = (np.round(keypoints_x).astype(np.int64)[:, np.newaxis] +
+        offsets_x[np.newaxis, :]).ravel()
+  valid = (ys >= 0) & (ys < im_height) & (xs >= 0) & (xs < im_width)
+  image[ys[valid], xs[valid]] = rgb
+
+
 def visualize_boxes_and_labels_on_image_array(image,
                                               boxes,
                                               classes,
@@ -393,7 +530,8 @@ def visualize_boxes_and_labels_on_image_array(image,
                                               max_boxes_to_draw=20,
                                               min_score_thresh=.5,
                                               agnostic_mode=False,
-                                              line_thickness=4):
+                                              line_thickness=4,
+                                              use_numpy_rasterizer=False):
   """Overlay labeled boxes on an image with formatted scores and label names.
 
   This function groups boxes that correspond to the same location
@@ -424,6 +562,9 @@ def visualize_boxes_and_labels_on_image_array(image,
       class-agnostic mode or not.  This mode will display scores but ignore
       classes.
     line_thickness: integer (default: 4) controlling line width of the boxes.
+    use_numpy_rasterizer: boolean (default: False) controlling whether to draw
+      directly into the numpy array instead of going through PIL for every box.
+      This is much faster, but labels are rendered without kerning.
 
   Returns:
     uint8 numpy array with shape (img_height, img_width, 3) with overlaid boxes.
@@ -463,6 +604,14 @@ def visualize_boxes_and_labels_on_image_array(image,
           box_to_color_map[box] = STANDARD_COLORS[
               classes[i] % len(STANDARD_COLORS)]
 
+  if use_numpy_rasterizer:
+    _rasterize_boxes_and_labels(image, box_to_color_map,
+                                box_to_display_str_map,
+                                box_to_instance_masks_map,
+                                box_to_keypoints_map,
+                                use_normalized_coordinates, line_thickness)
+    return image
+
   # Draw all boxes onto image.
   for box, color in box_to_color_map.items():
     ymin, xmin, ymax, xmax = box
@@ -493,6 +642,104 @@ def visualize_boxes_and_labels_on_image_array(image,
   return image
 
 
+def _rasterize_boxes_and_labels(image, box_to_color_map, box_to_display_str_map,
+                                box_to_instance_masks_map, box_to_keypoints_map,
+                                use_normalized_coordinates, line_thickness):
+  """Draws grouped boxes, labels, masks and keypoints with NumPy."""
+  im_height, im_width = image.shape[:2]
+  if use_normalized_coordinates:
+    y_scale, x_scale = im_height, im_width
+  else:
+    y_scale, x_scale = 1, 1
+  # Masks are blended first so that outlines and labels stay readable.
+  for box, color in box_to_color_map.items():
+    if box in box_to_instance_masks_map:
+      _rasterize_mask(image, box_to_instance_masks_map[box], _get_rgb(color),
+                      alpha=0.7)
+  for box, color in box_to_color_map.items():
+    rgb = _get_rgb(color)
+    ymin, xmin, ymax, xmax = box
+    top, left = ymin * y_scale, xmin * x_scale
+    bottom, right = ymax * y_scale, xmax * x_scale
+    _rasterize_box_outline(image, top, left, bottom, right, rgb,
+                           line_thickness)
+    if box_to_display_str_map[box]:
+      _rasterize_display_strs(image, left, top, bottom, rgb,
+                              box_to_display_str_map[box])
+    if box_to_keypoints_map[box]:
+      keypoints = np.array(box_to_keypoints_map[box], dtype=np.float64)
+      _rasterize_keypoints(image, keypoints[:, 0] * y_scale,
+                           keypoints[:, 1] * x_scale, rgb,
+                           line_thickness / 2.0)
+
+
+def visualize_boxes_and_labels_on_image_batch(images,
+                                              boxes,
+                                              classes,
+                                              scores,
+                                              category_index,
+                                              instance_masks=None,
+                                              keypoints=None,
+                                              use_normalized_coordinates=False,
+                                              max_boxes_to_draw=20,
+                                              min_score_thresh=.5,
+                                              agnostic_mode=False,
+                                              line_thickness=4):
+  """Overlays labeled boxes on a batch of images with the NumPy rasterizer.
+
+  See visualize_boxes_and_labels_on_image_array for the meaning of the
+  arguments, which hold one leading batch dimension more here.
+
+  Args:
+    images: uint8 numpy array with shape [batch, img_height, img_width, 3].
+      Modified in place if writeable.
+    boxes: a numpy array of shape [batch, N, 4].
+    classes: a numpy array of shape [batch, N].
+    scores: a numpy array of shape [batch, N] or None.
+    category_index: a dict containing category dictionaries keyed by category
+      indices.
+    instance_masks: a numpy array of shape [batch, N, img_height, img_width],
+      can be None.
+    keypoints: a numpy array of shape [batch, N, num_keypoints, 2], can be None.
+    use_normalized_coordinates: whether boxes is to be interpreted as
+      normalized coordinates or not.
+    max_boxes_to_draw: maximum number of boxes to visualize per image.  If None,
+      draw all boxes.
+    min_score_thresh: minimum score threshold for a box to be visualized.
+    agnostic_mode: boolean (default: False) controlling whether to evaluate in
+      class-agnostic mode or not.
+    line_thickness: integer (default: 4) controlling line width of the boxes.
+
+  Returns:
+    uint8 numpy array with shape [batch, img_height, img_width, 3] with
+    overlaid boxes.
+
+  Raises:
+    ValueError: if images is not a [batch, height, width, 3] array.
+  """
+  if images.ndim != 4 or images.shape[3] != 3:
+    raise ValueError('images must be of shape [batch, height, width, 3].')
+  if not images.flags.writeable:
+    images = images.copy()
+  for i in range(images.shape[0]):
+    visualize_boxes_and_labels_on_image_array(
+        images[i],
+        boxes[i],
+        classes[i] if classes is not None else None,
+        scores[i] if scores is not None else None,
+        category_index,
+        instance_masks=(instance_masks[i]
+                        if instance_masks is not None else None),
+        keypoints=keypoints[i] if keypoints is not None else None,
+        use_normalized_coordinates=use_normalized_coordinates,
+        max_boxes_to_draw=max_boxes_to_draw,
+        min_score_thresh=min_score_thresh,
+        agnostic_mode=agnostic_mode,
+        line_thickness=line_thickness,
+        use_numpy_rasterizer=True)
+  return images
+
+
 def add_cdf_image_summary(values, name):
   """Adds a tf.summary.image for a CDF plot of the values.
 
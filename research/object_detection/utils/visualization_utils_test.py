@@ -185,6 +185,61 @@ class VisualizationUtilsTest(tf.test.TestCase):
                                                  color='Blue', alpha=.5)
     self.assertAllEqual(test_image, expected_result)
 
+  def test_visualize_boxes_with_numpy_rasterizer(self):
+    test_image = np.full([100, 100, 3], 128, dtype=np.uint8)
+    boxes = np.array([[10.0, 20.0, 50.0, 60.0]])
+    keypoints = np.array([[[70.0, 70.0], [80.0, 30.0]]])
+
+    visualization_utils.visualize_boxes_and_labels_on_image_array(
+        test_image, boxes, None, None, {}, keypoints=keypoints,
+        line_thickness=2, use_numpy_rasterizer=True)
+    # Groundtruth boxes and their keypoints are drawn in black.
+    self.assertAllEqual(test_image[10, 40], [0, 0, 0])
+    self.assertAllEqual(test_image[50, 40], [0, 0, 0])
+    self.assertAllEqual(test_image[30, 20], [0, 0, 0])
+    self.assertAllEqual(test_image[30, 60], [0, 0, 0])
+    self.assertAllEqual(test_image[30, 40], [128, 128, 128])
+    self.assertAllEqual(test_image[70, 70], [0, 0, 0])
+    self.assertAllEqual(test_image[80, 30], [0, 0, 0])
+    self.assertAllEqual(test_image[90, 90], [128, 128, 128])
+
+  def test_numpy_rasterizer_mask_matches_pil(self):
+    image = self.create_colorful_test_image()
+    mask = np.zeros(image.shape[:2], dtype=np.uint8)
+    mask[20:80, 50:150] = 1
+    expected_image = image.copy()
+    visualization_utils.draw_mask_on_image_array(expected_image, mask,
+                                                 color='Blue', alpha=0.7)
+    boxes = np.array([[20.0, 50.0, 80.0, 150.0]])
+    visualization_utils.visualize_boxes_and_labels_on_image_array(
+        image, boxes, np.array([1]), np.array([0.9]), {},
+        instance_masks=np.expand_dims(mask, 0), line_thickness=0,
+        use_numpy_rasterizer=True)
+    self.assertAllClose(image[30:70, 60:140], expected_image[30:70, 60:140],
+                        atol=1)
+
+  def test_visualize_boxes_and_labels_on_image_batch(self):
+    category_index = {1: {'id': 1, 'name': 'dog'}, 2: {'id': 2, 'name': 'cat'}}
+    images = np.stack([self.create_colorful_test_image()] * 2, axis=0)
+    boxes = np.array([[[0.4, 0.25, 0.75, 0.75], [0.5, 0.3, 0.6, 0.9]],
+                      [[0.25, 0.25, 0.75, 0.75], [0.1, 0.3, 0.6, 1.0]]])
+    classes = np.array([[1, 1], [1, 2]])
+    scores = np.array([[0.8, 0.1], [0.6, 0.5]])
+    expected_images = images.copy()
+    for i in range(2):
+      visualization_utils.visualize_boxes_and_labels_on_image_array(
+          expected_images[i], boxes[i], classes[i], scores[i], category_index,
+          use_normalized_coordinates=True, min_score_thresh=0.2,
+          use_numpy_rasterizer=True)
+
+    images_with_boxes = (
+        visualization_utils.visualize_boxes_and_labels_on_image_batch(
+            images, boxes, classes, scores, category_index,
+            use_normalized_coordinates=True, min_score_thresh=0.2))
+    self.assertAllEqual(images_with_boxes, expected_images)
+    self.assertFalse(np.array_equal(images_with_boxes[0],
+                                    self.create_colorful_test_image()))
+
   def test_add_cdf_image_summary(self):
     values = [0.1, 0.2, 0.3, 0.4, 0.42, 0.44, 0.46, 0.48, 0.50]
     visualization_utils.add_cdf_image_summary(values, 'PositiveAnchorLoss')
@@ -0,0 +1,242 @@
+# Copyright 2017 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+r"""Benchmarks the networks of nets_factory on synthetic inputs.
+
+For every network and batch size, measures the step time of the forward pass
+(is_training=False) and of the forward and backward passes
+(is_training=True, the gradients of the loss and the batch norm updates but no
+optimizer), together with the peak memory of a traced step, the FLOPs of the
+graph and the number of trainable parameters. The images are held in a
+variable, so that the input pipeline is not measured and no dataset is needed;
+use the --input_benchmark_num_batches flag of train_image_classifier to measure
+the input pipeline alone.
+
+The networks of nets_factory only take NHWC images, so NCHW is not supported
+and all the networks are benchmarked in NHWC.
+
+To use it, run something like this:
+
+bazel build tensorflow_models/research/slim:benchmark_nets
+bazel-bin/tensorflow_models/research/slim/benchmark_nets \
+--model_names=inception_v1,resnet_v1_50,mobilenet_v1 \
+--batch_sizes=1,32 \
+--output_csv=/tmp/benchmark_nets.csv
+
+The results are written as one row per network, batch size and mode, and can
+be appended to a history of results to track regressions.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import csv
+import json
+import time
+
+import tensorflow as tf
+
+from nets import nets_factory
+
+slim = tf.contrib.slim
+
+tf.app.flags.DEFINE_string(
+    'model_names', '',
+    'Comma separated names of the networks to benchmark. Defaults to all the '
+    'networks of nets_factory.')
+
+tf.app.flags.DEFINE_string(
+    'batch_sizes', '1,32', 'Comma separated batch sizes to benchmark.')
+
+tf.app.flags.DEFINE_string(
+    'modes', 'forward,forward_backward',
+    'Comma separated modes to benchmark, among forward and forward_backward.')
+
+tf.app.flags.DEFINE_integer(
+    'num_classes', 1000, 'The number of classes of the logits layer.')
+
+tf.app.flags.DEFINE_integer(
+    'num_warmup_steps', 2, 'The number of steps to run before timing.')
+
+tf.app.flags.DEFINE_integer(
+    'num_steps', 10, 'The number of timed steps.')
+
+tf.app.flags.DEFINE_string(
+    'output_csv', '', 'If set, the file to write the results to as CSV.')
+
+tf.app.flags.DEFINE_string(
+    'output_json', '', 'If set, the file to write the results to as JSON.')
+
+FLAGS = tf.app.flags.FLAGS
+
+MODES = ('forward', 'forward_backward')
+RESULT_FIELDS = ('model_name', 'batch_size', 'mode', 'status', 'step_time_ms',
+                 'images_per_sec', 'peak_memory_bytes', 'flops', 'num_params')
+
+
+def _split(flag_value):
+  return [value.strip() for value in flag_value.split(',') if value.strip()]
+
+
+def peak_memory_bytes(step_stats):
+  """Returns the largest peak memory of the allocators of a traced step.
+
+  Args:
+    step_stats: the StepStats of the RunMetadata of a traced step.
+
+  Returns:
+    The peak number of bytes allocated by any allocator during the step, or 0
+    if the step holds no memory statistics.
+  """
+  peak_bytes = 0
+  for device_stats in step_stats.dev_stats:
+    for node_stats in device_stats.node_stats:
+      for memory in node_stats.memory:
+        peak_bytes = max(peak_bytes, memory.peak_bytes)
+  return peak_bytes
+
+
+def _build_step(model_name, batch_size, mode, num_classes):
+  """Builds the op of one benchmark step in the default graph."""
+  is_training = mode == 'forward_backward'
+  network_fn = nets_factory.get_network_fn(
+      model_name, num_classes=num_classes, is_training=is_training)
+  image_size = network_fn.default_image_size
+  images = tf.Variable(
+      tf.random_uniform([batch_size, image_size, image_size, 3]),
+      trainable=False, name='synthetic_images')
+  logits, _ = network_fn(images)
+  if not is_training:
+    return tf.group(logits)
+
+  labels = tf.Variable(
+      tf.random_uniform([batch_size], maxval=num_classes, dtype=tf.int32),
+      trainable=False, name='synthetic_labels')
+  tf.losses.sparse_softmax_cross_entropy(labels, logits)
+  gradients = tf.gradients(tf.losses.get_total_loss(),
+                           tf.trainable_variables())
+  update_ops = tf.get_collection(tf.GraphKeys.UPDATE_OPS)
+  return tf.group(*(gradients + update_ops))
+
+
+def benchmark_model(model_name, batch_size, mode='forward', num_classes=1000,
+                    num_warmup_steps=2, num_steps=10):
+  """Benchmarks one network of nets_factory.
+
+  Args:
+    model_name: the name of the network in nets_factory.networks_map.
+    batch_size: the number of images per step.
+    mode: 'forward' or 'forward_backward'.
+    num_classes: the number of classes of the logits layer.
+    num_warmup_steps: the number of steps run before timing.
+    num_steps: the number of timed steps.
+
+  Returns:
+    A dictionary with the keys of RESULT_FIELDS. `status` is 'ok', or the
+    reason why the configuration could not be benchmarked, in which case the
+    measurements are None.
+
+  Raises:
+    ValueError: if `model_name` or `mode` is unknown.
+  """
+  if model_name not in nets_factory.networks_map:
+    raise ValueError('Name of network unknown %s' % model_name)
+  if mode not in MODES:
+    raise ValueError('Unknown mode %s' % mode)
+  result = dict.fromkeys(RESULT_FIELDS)
+  result.update(model_name=model_name, batch_size=batch_size, mode=mode)
+
+  with tf.Graph().as_default() as graph:
+    step_op = _build_step(model_name, batch_size, mode, num_classes)
+    num_params = sum(variable.get_shape().num_elements()
+                     for variable in tf.trainable_variables())
+    flops = tf.profiler.profile(
+        graph,
+        options=tf.profiler.ProfileOptionBuilder(
+            tf.profiler.ProfileOptionBuilder.float_operation())
+        .with_empty_output().build()).total_float_ops
+
+    with tf.Session() as sess:
+      try:
+        sess.run(tf.global_variables_initializer())
+        for _ in range(num_warmup_steps):
+          sess.run(step_op)
+        start_time = time.time()
+        for _ in range(num_steps):
+          sess.run(step_op)
+        step_time = (time.time() - start_time) / num_steps
+        run_metadata = tf.RunMetadata()
+        sess.run(step_op,
+                 options=tf.RunOptions(trace_level=tf.RunOptions.FULL_TRACE),
+                 run_metadata=run_metadata)
+      except tf.errors.OpError as e:
+        # E.g. the step does not fit in memory.
+        result['status'] = 'failed: %s' % e.message.split('\n')[0]
+        return result
+
+  result.update(status='ok',
+                step_time_ms=1000.0 * step_time,
+                images_per_sec=batch_size / step_time,
+                peak_memory_bytes=peak_memory_bytes(run_metadata.step_stats),
+                flops=flops,
+                num_params=num_params)
+  return result
+
+
+def write_results(results, output_csv=None, output_json=None):
+  """Writes benchmark results as CSV and/or JSON.
+
+  Args:
+    results: a list of dictionaries returned by benchmark_model.
+    output_csv: if set, the path of the CSV file to write.
+    output_json: if set, the path of the JSON file to write.
+  """
+  if output_csv:
+    with tf.gfile.GFile(output_csv, 'w') as f:
+      writer = csv.DictWriter(f, fieldnames=RESULT_FIELDS)
+      writer.writeheader()
+      writer.writerows(results)
+  if output_json:
+    with tf.gfile.GFile(output_json, 'w') as f:
+      json.dump(results, f, indent=2, sort_keys=True)
+
+
+def main(_):
+  tf.logging.set_verbosity(tf.logging.INFO)
+  model_names = (_split(FLAGS.model_names) or
+                 sorted(nets_factory.networks_map.keys()))
+  results = []
+  for model_name in model_names:
+    for batch_size in [int(value) for value in _split(FLAGS.batch_sizes)]:
+      for mode in _split(FLAGS.modes):
+        result = benchmark_model(
+            model_name, batch_size, mode=mode, num_classes=FLAGS.num_classes,
+            num_warmup_steps=FLAGS.num_warmup_steps, num_steps=FLAGS.num_steps)
+        if result['status'] == 'ok':
+          tf.logging.info(
+              '%s batch_size=%d %s: %.1f ms/step, %.1f images/sec, '
+              '%d peak bytes, %d FLOPs, %d params', model_name, batch_size,
+              mode, result['step_time_ms'], result['images_per_sec'],
+              result['peak_memory_bytes'], result['flops'],
+              result['num_params'])
+        else:
+          tf.logging.warning('%s batch_size=%d %s: %s', model_name,
+                             batch_size, mode, result['status'])
+        results.append(result)
+  write_results(results, FLAGS.output_csv, FLAGS.output_json)
+
+
+if __name__ == '__main__':
+  tf.app.run()
@@ -0,0 +1,75 @@
+# Copyright 2017 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""Tests for benchmark_nets."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import csv
+import json
+import os
+
+import tensorflow as tf
+
+import benchmark_nets
+
+
+class BenchmarkNetsTest(tf.test.TestCase):
+
+  def testPeakMemoryBytes(self):
+    run_metadata = tf.RunMetadata()
+    device_stats = run_metadata.step_stats.dev_stats.add()
+    for peak_bytes in [100, 300, 200]:
+      memory = device_stats.node_stats.add().memory.add()
+      memory.allocator_name = 'cpu'
+      memory.peak_bytes = peak_bytes
+    self.assertEqual(
+        benchmark_nets.peak_memory_bytes(run_metadata.step_stats), 300)
+
+  def testBenchmarkModel(self):
+    for mode in benchmark_nets.MODES:
+      result = benchmark_nets.benchmark_model(
+          'lenet', batch_size=2, mode=mode, num_classes=10,
+          num_warmup_steps=1, num_steps=1)
+      self.assertEqual(result['status'], 'ok')
+      self.assertEqual(result['mode'], mode)
+      self.assertGreater(result['step_time_ms'], 0)
+      self.assertGreater(result['flops'], 0)
+      self.assertGreater(result['num_params'], 0)
+
+  def testUnknownMode(self):
+    with self.assertRaises(ValueError):
+      benchmark_nets.benchmark_model('lenet', batch_size=2, mode='backward')
+
+  def testWriteResults(self):
+    tmpdir = self.get_temp_dir()
+    output_csv = os.path.join(tmpdir, 'results.csv')
+    output_json = os.path.join(tmpdir, 'results.json')
+    result = benchmark_nets.benchmark_model('lenet', batch_size=1,
+                                            num_classes=10, num_warmup_steps=0,
+                                            num_steps=1)
+    benchmark_nets.write_results([result], output_csv, output_json)
+    with open(output_csv) as f:
+      rows = list(csv.DictReader(f))
+    self.assertEqual(len(rows), 1)
+    self.assertEqual(rows[0]['model_name'], 'lenet')
+    with open(output_json) as f:
+      self.assertEqual(json.load(f), [result])
+
+
+if __name__ == '__main__':
+  tf.test.main()
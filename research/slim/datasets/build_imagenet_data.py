@@ -81,6 +81,9 @@ Note that the length of xmin is identical to the length of xmax, ymin and ymax
 for each example.
 
 Running this script using 16 threads may take around ~2.5 hours on a HP Z420.
+The images are converted by --num_processes processes and the examples are
+written round-robin to the shards. An interrupted run is resumed by running the
+same command again: the shards that were completely written are skipped.
 """
 from __future__ import absolute_import
 from __future__ import division
@@ -89,13 +92,12 @@ from __future__ import print_function
 from datetime import datetime
 import os
 import random
-import sys
-import threading
 
 import google3
-import numpy as np
 import tensorflow as tf
 
+from datasets import dataset_utils
+
 tf.app.flags.DEFINE_string('train_directory', '/tmp/',
                            'Training data directory')
 tf.app.flags.DEFINE_string('validation_directory', '/tmp/',
@@ -108,8 +110,8 @@ tf.app.flags.DEFINE_integer('train_shards', 1024,
 tf.app.flags.DEFINE_integer('validation_shards', 128,
                             'Number of shards in validation TFRecord files.')
 
-tf.app.flags.DEFINE_integer('num_threads', 8,
-                            'Number of threads to preprocess the images.')
+tf.app.flags.DEFINE_integer('num_processes', 8,
+                            'Number of processes to preprocess the images.')
 
 # The labels file contains a list of valid labels are held in this file.
 # Assumes that the file contains entries as such:
@@ -337,76 +339,12 @@ def _process_image(filename, coder):
   return image_data, height, width
 
 
-def _process_image_files_batch(coder, thread_index, ranges, name, filenames,
-                               synsets, labels, humans, bboxes, num_shards):
-  """Processes and saves list of images as TFRecord in 1 thread.
-
-  Args:
-    coder: instance of ImageCoder to provide TensorFlow image coding utils.
-    thread_index: integer, unique batch to run index is within [0, len(ranges)).
-    ranges: list of pairs of integers specifying ranges of each batches to
-      analyze in parallel.
-    name: string, unique identifier specifying the data set
-    filenames: list of strings; each string is a path to an image file
-    synsets: list of strings; each string is a unique WordNet ID
-    labels: list of integer; each integer identifies the ground truth
-    humans: list of strings; each string is a human-readable label
-    bboxes: list of bounding boxes for each image. Note that each entry in this
-      list might contain from 0+ entries corresponding to the number of bounding
-      box annotations for the image.
-    num_shards: integer number of shards for this data set.
-  """
-  # Each thread produces N shards where N = int(num_shards / num_threads).
-  # For instance, if num_shards = 128, and the num_threads = 2, then the first
-  # thread would produce shards [0, 64).
-  num_threads = len(ranges)
-  assert not num_shards % num_threads
-  num_shards_per_batch = int(num_shards / num_threads)
-
-  shard_ranges = np.linspace(ranges[thread_index][0],
-                             ranges[thread_index][1],
-                             num_shards_per_batch + 1).astype(int)
-  num_files_in_thread = ranges[thread_index][1] - ranges[thread_index][0]
-
-  counter = 0
-  for s in xrange(num_shards_per_batch):
-    # Generate a sharded version of the file name, e.g. 'train-00002-of-00010'
-    shard = thread_index * num_shards_per_batch + s
-    output_filename = '%s-%.5d-of-%.5d' % (name, shard, num_shards)
-    output_file = os.path.join(FLAGS.output_directory, output_filename)
-    writer = tf.python_io.TFRecordWriter(output_file)
-
-    shard_counter = 0
-    files_in_shard = np.arange(shard_ranges[s], shard_ranges[s + 1], dtype=int)
-    for i in files_in_shard:
-      filename = filenames[i]
-      label = labels[i]
-      synset = synsets[i]
-      human = humans[i]
-      bbox = bboxes[i]
-
-      image_buffer, height, width = _process_image(filename, coder)
-
-      example = _convert_to_example(filename, image_buffer, label,
-                                    synset, human, bbox,
-                                    height, width)
-      writer.write(example.SerializeToString())
-      shard_counter += 1
-      counter += 1
-
-      if not counter % 1000:
-        print('%s [thread %d]: Processed %d of %d images in thread batch.' %
-              (datetime.now(), thread_index, counter, num_files_in_thread))
-        sys.stdout.flush()
-
-    writer.close()
-    print('%s [thread %d]: Wrote %d images to %s' %
-          (datetime.now(), thread_index, shard_counter, output_file))
-    sys.stdout.flush()
-    shard_counter = 0
-  print('%s [thread %d]: Wrote %d images to %d shards.' %
-        (datetime.now(), thread_index, counter, num_files_in_thread))
-  sys.stdout.flush()
+def _convert_image(coder, item):
+  """Returns the Example proto of a (filename, label, synset, human, bbox)."""
+  filename, label, synset, human, bbox = item
+  image_buffer, height, width = _process_image(filename, coder)
+  return _convert_to_example(filename, image_buffer, label, synset, human, bbox,
+                             height, width)
 
 
 def _process_image_files(name, filenames, synsets, labels, humans,
@@ -429,36 +367,20 @@ def _process_image_files(name, filenames, synsets, labels, humans,
   assert len(filenames) == len(humans)
   assert len(filenames) == len(bboxes)
 
-  # Break all images into batches with a [ranges[i][0], ranges[i][1]].
-  spacing = np.linspace(0, len(filenames), FLAGS.num_threads + 1).astype(np.int)
-  ranges = []
-  threads = []
-  for i in xrange(len(spacing) - 1):
-    ranges.append([spacing[i], spacing[i+1]])
-
-  # Launch a thread for each batch.
-  print('Launching %d threads for spacings: %s' % (FLAGS.num_threads, ranges))
-  sys.stdout.flush()
-
-  # Create a mechanism for monitoring when all threads are finished.
-  coord = tf.train.Coordinator()
-
-  # Create a generic TensorFlow-based utility for converting all image codings.
-  coder = ImageCoder()
-
-  threads = []
-  for thread_index in xrange(len(ranges)):
-    args = (coder, thread_index, ranges, name, filenames,
-            synsets, labels, humans, bboxes, num_shards)
-    t = threading.Thread(target=_process_image_files_batch, args=args)
-    t.start()
-    threads.append(t)
-
-  # Wait for all the threads to terminate.
-  coord.join(threads)
+  # Generate sharded versions of the file name, e.g. 'train-00002-of-00010'.
+  output_files = [
+      os.path.join(FLAGS.output_directory,
+                   '%s-%.5d-of-%.5d' % (name, shard, num_shards))
+      for shard in xrange(num_shards)]
+
+  print('%s: Launching %d processes to write %d images to %d shards.' %
+        (datetime.now(), FLAGS.num_processes, len(filenames), num_shards))
+  # Each process creates its own ImageCoder and thus TensorFlow session.
+  dataset_utils.convert_to_tfrecords(
+      list(zip(filenames, labels, synsets, humans, bboxes)), output_files,
+      _convert_image, coder_fn=ImageCoder, num_processes=FLAGS.num_processes)
   print('%s: Finished writing all %d images in data set.' %
         (datetime.now(), len(filenames)))
-  sys.stdout.flush()
 
 
 def _find_image_files(data_dir, labels_file):
@@ -509,7 +431,9 @@ def _find_image_files(data_dir, labels_file):
   # Construct the list of JPEG files and labels.
   for synset in challenge_synsets:
     jpeg_file_path = '%s/%s/*.JPEG' % (data_dir, synset)
-    matching_files = tf.gfile.Glob(jpeg_file_path)
+    # Sort the files so that an interrupted conversion is resumed with the
+    # same shards.
+    matching_files = sorted(tf.gfile.Glob(jpeg_file_path))
 
     labels.extend([label_index] * len(matching_files))
     synsets.extend([synset] * len(matching_files))
@@ -681,11 +605,6 @@ def _build_bounding_box_lookup(bounding_box_file):
 
 
 def main(unused_argv):
-  assert not FLAGS.train_shards % FLAGS.num_threads, (
-      'Please make the FLAGS.num_threads commensurate with FLAGS.train_shards')
-  assert not FLAGS.validation_shards % FLAGS.num_threads, (
-      'Please make the FLAGS.num_threads commensurate with '
-      'FLAGS.validation_shards')
   print('Saving results to %s' % FLAGS.output_directory)
 
   # Build a map from synset to human-readable label.
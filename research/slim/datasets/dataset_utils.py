@@ -17,15 +17,26 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import multiprocessing
 import os
 import sys
 import tarfile
+import time
 
+import six
 from six.moves import urllib
 import tensorflow as tf
 
 LABELS_FILENAME = 'labels.txt'
 
+# Suffix of the shards being written by convert_to_tfrecords.
+_INCOMPLETE_SHARD_SUFFIX = '.incomplete'
+
+# The coder and conversion function of the current process, set by
+# _init_conversion_worker.
+_worker_coder = None
+_worker_convert_fn = None
+
 
 def int64_feature(values):
   """Returns a TF-Feature of int64s.
@@ -148,3 +159,126 @@ def read_label_file(dataset_dir, filename=LABELS_FILENAME):
     index = line.index(':')
     labels_to_class_names[int(line[:index])] = line[index+1:]
   return labels_to_class_names
+
+
+class ImageCoder(object):
+  """Helper class that provides TensorFlow image coding utilities.
+
+  The coding ops run in a dedicated graph and session, so that every process
+  converting a dataset can create its own ImageCoder.
+  """
+
+  def __init__(self):
+    graph = tf.Graph()
+    with graph.as_default():
+      # Initializes function that decodes RGB JPEG data.
+      self._decode_jpeg_data = tf.placeholder(dtype=tf.string)
+      self._decode_jpeg = tf.image.decode_jpeg(self._decode_jpeg_data,
+                                               channels=3)
+
+      # Initializes function that encodes uint8 images to PNG.
+      self._encode_png_image = tf.placeholder(dtype=tf.uint8)
+      self._encode_png = tf.image.encode_png(self._encode_png_image)
+    self._sess = tf.Session(graph=graph)
+
+  def decode_jpeg(self, image_data):
+    image = self._sess.run(self._decode_jpeg,
+                           feed_dict={self._decode_jpeg_data: image_data})
+    assert len(image.shape) == 3
+    assert image.shape[2] == 3
+    return image
+
+  def encode_png(self, image):
+    return self._sess.run(self._encode_png,
+                          feed_dict={self._encode_png_image: image})
+
+
+def _init_conversion_worker(coder_fn, convert_fn):
+  """Creates the coder of the current process."""
+  global _worker_coder, _worker_convert_fn
+  _worker_coder = coder_fn() if coder_fn is not None else None
+  _worker_convert_fn = convert_fn
+
+
+def _convert_item(item):
+  """Converts an item to a serialized TF-Example in the current process."""
+  return _worker_convert_fn(_worker_coder, item).SerializeToString()
+
+
+def convert_to_tfrecords(items, output_filenames, convert_fn, coder_fn=None,
+                         num_processes=1, chunk_size=16):
+  """Converts items to TF-Examples written round-robin to TFRecord shards.
+
+  Item i is written to shard i % len(output_filenames), so every shard gets a
+  similar number of items in the order of `items`. The items are converted by
+  `num_processes` worker processes, each with its own coder, and written in
+  order, so the output does not depend on `num_processes`.
+
+  Shards are written one at a time to a temporary file, which is renamed when
+  the shard is complete. An interrupted conversion is resumed by calling this
+  function again with the same items: the existing shards are skipped.
+
+  Args:
+    items: A list of picklable items to convert, e.g. image paths.
+    output_filenames: A list of the paths of the shards to write.
+    convert_fn: A function called as `convert_fn(coder, item)` that returns the
+      tf.train.Example of an item. It must be defined at module level, so that
+      it can be sent to the worker processes.
+    coder_fn: An optional function returning the `coder` passed to
+      `convert_fn`, e.g. `ImageCoder`. It is called once in every process, so
+      that each process runs its own TensorFlow session. It must be defined at
+      module level. If None, `convert_fn` is passed None.
+    num_processes: The number of worker processes. If 1, the items are
+      converted in the calling process.
+    chunk_size: The number of items sent to a worker process at a time.
+
+  Returns:
+    The number of examples written.
+  """
+  num_shards = len(output_filenames)
+  shard_ids = [shard_id for shard_id in range(num_shards)
+               if not tf.gfile.Exists(output_filenames[shard_id])]
+  if len(shard_ids) < num_shards:
+    print('Skipping %d of %d shards that already exist.' % (
+        num_shards - len(shard_ids), num_shards))
+  num_items = sum(len(items[shard_id::num_shards]) for shard_id in shard_ids)
+
+  pool = None
+  if num_processes > 1:
+    pool = multiprocessing.Pool(num_processes, _init_conversion_worker,
+                                (coder_fn, convert_fn))
+    def map_fn(items):
+      return pool.imap(_convert_item, items, chunksize=chunk_size)
+  else:
+    _init_conversion_worker(coder_fn, convert_fn)
+    def map_fn(items):
+      return six.moves.map(_convert_item, items)
+
+  num_converted = 0
+  start_time = time.time()
+  try:
+    for shard_id in shard_ids:
+      output_filename = output_filenames[shard_id]
+      temp_filename = output_filename + _INCOMPLETE_SHARD_SUFFIX
+      with tf.python_io.TFRecordWriter(temp_filename) as tfrecord_writer:
+        for serialized_example in map_fn(items[shard_id::num_shards]):
+          tfrecord_writer.write(serialized_example)
+          num_converted += 1
+          sys.stdout.write(
+              '\r>> Converting image %d/%d shard %d (%.1f images/sec)' % (
+                  num_converted, num_items, shard_id,
+                  num_converted / max(time.time() - start_time, 1e-9)))
+          sys.stdout.flush()
+      tf.gfile.Rename(temp_filename, output_filename, overwrite=True)
+  finally:
+    if pool is not None:
+      pool.terminate()
+      pool.join()
+    else:
+      _init_conversion_worker(None, None)
+
+  duration = max(time.time() - start_time, 1e-9)
+  print('\nConverted %d images in %.1f sec (%.1f images/sec) with %d '
+        'processes.' % (num_converted, duration, num_converted / duration,
+                        num_processes))
+  return num_converted
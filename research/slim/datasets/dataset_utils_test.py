@@ -0,0 +1,86 @@
+# Copyright 2017 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for dataset_utils."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import os
+
+import numpy as np
+import tensorflow as tf
+
+from datasets import dataset_utils
+
+
+def _convert_image(coder, item):
+  image, label = item
+  return dataset_utils.image_to_tfexample(
+      coder.encode_png(image), b'png', image.shape[0], image.shape[1], label)
+
+
+class ConvertToTfrecordsTest(tf.test.TestCase):
+
+  def _create_items(self, num_items):
+    return [(np.full([2, 3, 3], i, dtype=np.uint8), i)
+            for i in range(num_items)]
+
+  def _read_labels(self, filename):
+    labels = []
+    for record in tf.python_io.tf_record_iterator(filename):
+      example = tf.train.Example.FromString(record)
+      labels.append(
+          example.features.feature['image/class/label'].int64_list.value[0])
+    return labels
+
+  def _convert(self, num_processes):
+    output_dir = os.path.join(self.get_temp_dir(), str(num_processes))
+    tf.gfile.MakeDirs(output_dir)
+    output_filenames = [os.path.join(output_dir, 'shard-%d' % i)
+                        for i in range(3)]
+    num_converted = dataset_utils.convert_to_tfrecords(
+        self._create_items(8), output_filenames, _convert_image,
+        coder_fn=dataset_utils.ImageCoder, num_processes=num_processes)
+    self.assertEqual(num_converted, 8)
+    return output_filenames
+
+  def testWritesRoundRobinShards(self):
+    output_filenames = self._convert(num_processes=1)
+    self.assertEqual([self._read_labels(f) for f in output_filenames],
+                     [[0, 3, 6], [1, 4, 7], [2, 5]])
+
+  def testMultipleProcessesWriteTheSameShards(self):
+    single_process_filenames = self._convert(num_processes=1)
+    multi_process_filenames = self._convert(num_processes=2)
+    for single_process_filename, multi_process_filename in zip(
+        single_process_filenames, multi_process_filenames):
+      self.assertEqual(
+          list(tf.python_io.tf_record_iterator(single_process_filename)),
+          list(tf.python_io.tf_record_iterator(multi_process_filename)))
+
+  def testResumesConversion(self):
+    output_filenames = self._convert(num_processes=1)
+    tf.gfile.Remove(output_filenames[1])
+    num_converted = dataset_utils.convert_to_tfrecords(
+        self._create_items(8), output_filenames, _convert_image,
+        coder_fn=dataset_utils.ImageCoder)
+    self.assertEqual(num_converted, 3)
+    self.assertEqual(self._read_labels(output_filenames[1]), [1, 4, 7])
+    self.assertFalse(tf.gfile.Exists(output_filenames[1] + '.incomplete'))
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -61,16 +61,15 @@ _CLASS_NAMES = [
 ]
 
 
-def _add_to_tfrecord(filename, tfrecord_writer, offset=0):
-  """Loads data from the cifar10 pickle files and writes files to a TFRecord.
+def _load_images_and_labels(filename):
+  """Loads the images and labels of a cifar10 pickle file.
 
   Args:
     filename: The filename of the cifar10 pickle file.
-    tfrecord_writer: The TFRecord writer to use for writing.
-    offset: An offset into the absolute number of images previously written.
 
   Returns:
-    The new offset.
+    A list of (image, label) pairs, where the images are numpy arrays of shape
+    [height, width, 3].
   """
   with tf.gfile.Open(filename, 'rb') as f:
     if sys.version_info < (3,):
@@ -83,29 +82,33 @@ def _add_to_tfrecord(filename, tfrecord_writer, offset=0):
 
   images = images.reshape((num_images, 3, 32, 32))
   labels = data[b'labels']
+  return [(np.squeeze(images[j]).transpose((1, 2, 0)), labels[j])
+          for j in range(num_images)]
 
-  with tf.Graph().as_default():
-    image_placeholder = tf.placeholder(dtype=tf.uint8)
-    encoded_image = tf.image.encode_png(image_placeholder)
 
-    with tf.Session('') as sess:
+def _convert_image(coder, item):
+  """Returns the TF-Example of an (image, label) pair."""
+  image, label = item
+  png_string = coder.encode_png(image)
+  return dataset_utils.image_to_tfexample(
+      png_string, b'png', _IMAGE_SIZE, _IMAGE_SIZE, label)
 
-      for j in range(num_images):
-        sys.stdout.write('\r>> Reading file [%s] image %d/%d' % (
-            filename, offset + j + 1, offset + num_images))
-        sys.stdout.flush()
 
-        image = np.squeeze(images[j]).transpose((1, 2, 0))
-        label = labels[j]
+def _convert_to_tfrecord(filenames, output_filename, num_processes=1):
+  """Loads data from cifar10 pickle files and writes it to a TFRecord.
 
-        png_string = sess.run(encoded_image,
-                              feed_dict={image_placeholder: image})
-
-        example = dataset_utils.image_to_tfexample(
-            png_string, b'png', _IMAGE_SIZE, _IMAGE_SIZE, label)
-        tfrecord_writer.write(example.SerializeToString())
-
-  return offset + num_images
+  Args:
+    filenames: The filenames of the cifar10 pickle files.
+    output_filename: The path of the TFRecord to write.
+    num_processes: The number of processes converting images.
+  """
+  items = []
+  for filename in filenames:
+    print('Reading file [%s]' % filename)
+    items.extend(_load_images_and_labels(filename))
+  dataset_utils.convert_to_tfrecords(
+      items, [output_filename], _convert_image,
+      coder_fn=dataset_utils.ImageCoder, num_processes=num_processes)
 
 
 def _get_output_filename(dataset_dir, split_name):
@@ -139,6 +142,7 @@ def _download_and_uncompress_dataset(dataset_dir):
     print()
     statinfo = os.stat(filepath)
     print('Successfully downloaded', filename, statinfo.st_size, 'bytes.')
+  if not os.path.exists(os.path.join(dataset_dir, 'cifar-10-batches-py')):
     tarfile.open(filepath, 'r:gz').extractall(dataset_dir)
 
 
@@ -156,11 +160,12 @@ def _clean_up_temporary_files(dataset_dir):
   tf.gfile.DeleteRecursively(tmp_dir)
 
 
-def run(dataset_dir):
+def run(dataset_dir, num_processes=1):
   """Runs the download and conversion operation.
 
   Args:
     dataset_dir: The dataset directory where the dataset is stored.
+    num_processes: The number of processes converting images.
   """
   if not tf.gfile.Exists(dataset_dir):
     tf.gfile.MakeDirs(dataset_dir)
@@ -172,23 +177,20 @@ def run(dataset_dir):
     print('Dataset files already exist. Exiting without re-creating them.')
     return
 
-  dataset_utils.download_and_uncompress_tarball(_DATA_URL, dataset_dir)
+  # Does not download the data again if a previous conversion was interrupted.
+  _download_and_uncompress_dataset(dataset_dir)
 
   # First, process the training data:
-  with tf.python_io.TFRecordWriter(training_filename) as tfrecord_writer:
-    offset = 0
-    for i in range(_NUM_TRAIN_FILES):
-      filename = os.path.join(dataset_dir,
-                              'cifar-10-batches-py',
-                              'data_batch_%d' % (i + 1))  # 1-indexed.
-      offset = _add_to_tfrecord(filename, tfrecord_writer, offset)
+  _convert_to_tfrecord(
+      [os.path.join(dataset_dir, 'cifar-10-batches-py',
+                    'data_batch_%d' % (i + 1))  # 1-indexed.
+       for i in range(_NUM_TRAIN_FILES)],
+      training_filename, num_processes)
 
   # Next, process the testing data:
-  with tf.python_io.TFRecordWriter(testing_filename) as tfrecord_writer:
-    filename = os.path.join(dataset_dir,
-                            'cifar-10-batches-py',
-                            'test_batch')
-    _add_to_tfrecord(filename, tfrecord_writer)
+  _convert_to_tfrecord(
+      [os.path.join(dataset_dir, 'cifar-10-batches-py', 'test_batch')],
+      testing_filename, num_processes)
 
   # Finally, write the labels file:
   labels_to_class_names = dict(zip(range(len(_CLASS_NAMES)), _CLASS_NAMES))
@@ -27,10 +27,8 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
-import math
 import os
 import random
-import sys
 
 import tensorflow as tf
 
@@ -49,26 +47,6 @@ _RANDOM_SEED = 0
 _NUM_SHARDS = 5
 
 
-class ImageReader(object):
-  """Helper class that provides TensorFlow image coding utilities."""
-
-  def __init__(self):
-    # Initializes function that decodes RGB JPEG data.
-    self._decode_jpeg_data = tf.placeholder(dtype=tf.string)
-    self._decode_jpeg = tf.image.decode_jpeg(self._decode_jpeg_data, channels=3)
-
-  def read_image_dims(self, sess, image_data):
-    image = self.decode_jpeg(sess, image_data)
-    return image.shape[0], image.shape[1]
-
-  def decode_jpeg(self, sess, image_data):
-    image = sess.run(self._decode_jpeg,
-                     feed_dict={self._decode_jpeg_data: image_data})
-    assert len(image.shape) == 3
-    assert image.shape[2] == 3
-    return image
-
-
 def _get_filenames_and_classes(dataset_dir):
   """Returns a list of filenames and inferred class names.
 
@@ -95,7 +73,9 @@ def _get_filenames_and_classes(dataset_dir):
       path = os.path.join(directory, filename)
       photo_filenames.append(path)
 
-  return photo_filenames, sorted(class_names)
+  # Sort the files so that the splits and shards are the same when resuming an
+  # interrupted conversion.
+  return sorted(photo_filenames), sorted(class_names)
 
 
 def _get_dataset_filename(dataset_dir, split_name, shard_id):
@@ -104,7 +84,17 @@ def _get_dataset_filename(dataset_dir, split_name, shard_id):
   return os.path.join(dataset_dir, output_filename)
 
 
-def _convert_dataset(split_name, filenames, class_names_to_ids, dataset_dir):
+def _convert_image(coder, item):
+  """Returns the TF-Example of a (filename, class id) pair."""
+  filename, class_id = item
+  image_data = tf.gfile.FastGFile(filename, 'rb').read()
+  image = coder.decode_jpeg(image_data)
+  return dataset_utils.image_to_tfexample(
+      image_data, b'jpg', image.shape[0], image.shape[1], class_id)
+
+
+def _convert_dataset(split_name, filenames, class_names_to_ids, dataset_dir,
+                     num_processes=1):
   """Converts the given filenames to a TFRecord dataset.
 
   Args:
@@ -113,41 +103,19 @@ def _convert_dataset(split_name, filenames, class_names_to_ids, dataset_dir):
     class_names_to_ids: A dictionary from class names (strings) to ids
       (integers).
     dataset_dir: The directory where the converted datasets are stored.
+    num_processes: The number of processes converting images.
   """
   assert split_name in ['train', 'validation']
 
-  num_per_shard = int(math.ceil(len(filenames) / float(_NUM_SHARDS)))
-
-  with tf.Graph().as_default():
-    image_reader = ImageReader()
-
-    with tf.Session('') as sess:
-
-      for shard_id in range(_NUM_SHARDS):
-        output_filename = _get_dataset_filename(
-            dataset_dir, split_name, shard_id)
-
-        with tf.python_io.TFRecordWriter(output_filename) as tfrecord_writer:
-          start_ndx = shard_id * num_per_shard
-          end_ndx = min((shard_id+1) * num_per_shard, len(filenames))
-          for i in range(start_ndx, end_ndx):
-            sys.stdout.write('\r>> Converting image %d/%d shard %d' % (
-                i+1, len(filenames), shard_id))
-            sys.stdout.flush()
-
-            # Read the filename:
-            image_data = tf.gfile.FastGFile(filenames[i], 'rb').read()
-            height, width = image_reader.read_image_dims(sess, image_data)
-
-            class_name = os.path.basename(os.path.dirname(filenames[i]))
-            class_id = class_names_to_ids[class_name]
-
-            example = dataset_utils.image_to_tfexample(
-                image_data, b'jpg', height, width, class_id)
-            tfrecord_writer.write(example.SerializeToString())
-
-  sys.stdout.write('\n')
-  sys.stdout.flush()
+  items = [(filename,
+            class_names_to_ids[os.path.basename(os.path.dirname(filename))])
+           for filename in filenames]
+  output_filenames = [
+      _get_dataset_filename(dataset_dir, split_name, shard_id)
+      for shard_id in range(_NUM_SHARDS)]
+  dataset_utils.convert_to_tfrecords(
+      items, output_filenames, _convert_image,
+      coder_fn=dataset_utils.ImageCoder, num_processes=num_processes)
 
 
 def _clean_up_temporary_files(dataset_dir):
@@ -174,11 +142,12 @@ def _dataset_exists(dataset_dir):
   return True
 
 
-def run(dataset_dir):
+def run(dataset_dir, num_processes=1):
   """Runs the download and conversion operation.
 
   Args:
     dataset_dir: The dataset directory where the dataset is stored.
+    num_processes: The number of processes converting images.
   """
   if not tf.gfile.Exists(dataset_dir):
     tf.gfile.MakeDirs(dataset_dir)
@@ -187,7 +156,9 @@ def run(dataset_dir):
     print('Dataset files already exist. Exiting without re-creating them.')
     return
 
-  dataset_utils.download_and_uncompress_tarball(_DATA_URL, dataset_dir)
+  # The images are still there if a previous conversion was interrupted.
+  if not tf.gfile.Exists(os.path.join(dataset_dir, 'flower_photos')):
+    dataset_utils.download_and_uncompress_tarball(_DATA_URL, dataset_dir)
   photo_filenames, class_names = _get_filenames_and_classes(dataset_dir)
   class_names_to_ids = dict(zip(class_names, range(len(class_names))))
 
@@ -199,9 +170,9 @@ def run(dataset_dir):
 
   # First, convert the training and validation sets.
   _convert_dataset('train', training_filenames, class_names_to_ids,
-                   dataset_dir)
+                   dataset_dir, num_processes)
   _convert_dataset('validation', validation_filenames, class_names_to_ids,
-                   dataset_dir)
+                   dataset_dir, num_processes)
 
   # Finally, write the labels file:
   labels_to_class_names = dict(zip(range(len(class_names)), class_names))
@@ -99,34 +99,30 @@ def _extract_labels(filename, num_labels):
   return labels
 
 
-def _add_to_tfrecord(data_filename, labels_filename, num_images,
-                     tfrecord_writer):
-  """Loads data from the binary MNIST files and writes files to a TFRecord.
+def _convert_image(coder, item):
+  """Returns the TF-Example of an (image, label) pair."""
+  image, label = item
+  png_string = coder.encode_png(image)
+  return dataset_utils.image_to_tfexample(
+      png_string, 'png'.encode(), _IMAGE_SIZE, _IMAGE_SIZE, label)
+
+
+def _convert_to_tfrecord(data_filename, labels_filename, num_images,
+                         output_filename, num_processes=1):
+  """Loads data from the binary MNIST files and writes it to a TFRecord.
 
   Args:
     data_filename: The filename of the MNIST images.
     labels_filename: The filename of the MNIST labels.
     num_images: The number of images in the dataset.
-    tfrecord_writer: The TFRecord writer to use for writing.
+    output_filename: The path of the TFRecord to write.
+    num_processes: The number of processes converting images.
   """
   images = _extract_images(data_filename, num_images)
   labels = _extract_labels(labels_filename, num_images)
-
-  shape = (_IMAGE_SIZE, _IMAGE_SIZE, _NUM_CHANNELS)
-  with tf.Graph().as_default():
-    image = tf.placeholder(dtype=tf.uint8, shape=shape)
-    encoded_png = tf.image.encode_png(image)
-
-    with tf.Session('') as sess:
-      for j in range(num_images):
-        sys.stdout.write('\r>> Converting image %d/%d' % (j + 1, num_images))
-        sys.stdout.flush()
-
-        png_string = sess.run(encoded_png, feed_dict={image: images[j]})
-
-        example = dataset_utils.image_to_tfexample(
-            png_string, 'png'.encode(), _IMAGE_SIZE, _IMAGE_SIZE, labels[j])
-        tfrecord_writer.write(example.SerializeToString())
+  dataset_utils.convert_to_tfrecords(
+      list(zip(images, labels)), [output_filename], _convert_image,
+      coder_fn=dataset_utils.ImageCoder, num_processes=num_processes)
 
 
 def _get_output_filename(dataset_dir, split_name):
@@ -183,11 +179,12 @@ def _clean_up_temporary_files(dataset_dir):
     tf.gfile.Remove(filepath)
 
 
-def run(dataset_dir):
+def run(dataset_dir, num_processes=1):
   """Runs the download and conversion operation.
 
   Args:
     dataset_dir: The dataset directory where the dataset is stored.
+    num_processes: The number of processes converting images.
   """
   if not tf.gfile.Exists(dataset_dir):
     tf.gfile.MakeDirs(dataset_dir)
@@ -202,16 +199,16 @@ def run(dataset_dir):
   _download_dataset(dataset_dir)
 
   # First, process the training data:
-  with tf.python_io.TFRecordWriter(training_filename) as tfrecord_writer:
-    data_filename = os.path.join(dataset_dir, _TRAIN_DATA_FILENAME)
-    labels_filename = os.path.join(dataset_dir, _TRAIN_LABELS_FILENAME)
-    _add_to_tfrecord(data_filename, labels_filename, 60000, tfrecord_writer)
+  data_filename = os.path.join(dataset_dir, _TRAIN_DATA_FILENAME)
+  labels_filename = os.path.join(dataset_dir, _TRAIN_LABELS_FILENAME)
+  _convert_to_tfrecord(data_filename, labels_filename, 60000,
+                       training_filename, num_processes)
 
   # Next, process the testing data:
-  with tf.python_io.TFRecordWriter(testing_filename) as tfrecord_writer:
-    data_filename = os.path.join(dataset_dir, _TEST_DATA_FILENAME)
-    labels_filename = os.path.join(dataset_dir, _TEST_LABELS_FILENAME)
-    _add_to_tfrecord(data_filename, labels_filename, 10000, tfrecord_writer)
+  data_filename = os.path.join(dataset_dir, _TEST_DATA_FILENAME)
+  labels_filename = os.path.join(dataset_dir, _TEST_LABELS_FILENAME)
+  _convert_to_tfrecord(data_filename, labels_filename, 10000,
+                       testing_filename, num_processes)
 
   # Finally, write the labels file:
   labels_to_class_names = dict(zip(range(len(_CLASS_NAMES)), _CLASS_NAMES))
@@ -0,0 +1,162 @@
+# Copyright 2017 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Contains a tf.data input pipeline for the datasets of dataset_factory.
+
+The pipeline replaces DatasetDataProvider and tf.train.batch, which run in
+queue runner threads, with a tf.data.Dataset of batches:
+
+  dataset = dataset_factory.get_dataset('flowers', 'train', dataset_dir)
+  image_preprocessing_fn = preprocessing_factory.get_preprocessing(
+      'inception_v3', is_training=True)
+  batched_dataset = input_pipeline.batched_dataset(
+      dataset, image_preprocessing_fn, image_size=299, batch_size=32,
+      is_training=True)
+  images, labels = batched_dataset.make_one_shot_iterator().get_next()
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import time
+
+import six
+import tensorflow as tf
+
+
+def _get_data_files(data_sources):
+  """Returns the files matching a pattern or a list of patterns.
+
+  Args:
+    data_sources: A file pattern or a list of file patterns.
+
+  Returns:
+    A sorted list of the matching files.
+
+  Raises:
+    ValueError: If no file matches `data_sources`.
+  """
+  if isinstance(data_sources, six.string_types):
+    data_sources = [data_sources]
+  data_files = []
+  for data_source in data_sources:
+    data_files.extend(tf.gfile.Glob(data_source))
+  if not data_files:
+    raise ValueError('No data files found in %s' % (data_sources,))
+  return sorted(data_files)
+
+
+def batched_dataset(dataset, image_preprocessing_fn, image_size, batch_size,
+                    is_training, labels_offset=0, num_readers=4,
+                    num_parallel_calls=4, shuffle_buffer_size=None,
+                    prefetch_buffer_size=2):
+  """Returns a tf.data.Dataset of preprocessed (images, labels) batches.
+
+  The TFRecord files of `dataset` are read in parallel by interleaving
+  `num_readers` of them, the examples are decoded and preprocessed by
+  `num_parallel_calls` parallel calls and grouped into batches of exactly
+  `batch_size` examples. The dataset repeats indefinitely, like
+  DatasetDataProvider. Every pass interleaves a single pass over the files, so
+  that the first pass yields every example of the dataset exactly once.
+
+  Args:
+    dataset: A slim.dataset.Dataset of TFRecord files providing the items
+      'image' and 'label', e.g. from dataset_factory.get_dataset.
+    image_preprocessing_fn: A function called as
+      `image_preprocessing_fn(image, height, width)`, e.g. from
+      preprocessing_factory.get_preprocessing.
+    image_size: The height and width of the preprocessed images.
+    batch_size: The number of examples per batch.
+    is_training: Whether to shuffle the files and the examples.
+    labels_offset: An offset subtracted from the labels.
+    num_readers: The number of files read in parallel.
+    num_parallel_calls: The number of examples preprocessed in parallel.
+    shuffle_buffer_size: The number of examples to shuffle when training.
+      Defaults to 10 batches, the minimum size of the common queue of the
+      queue based training pipeline.
+    prefetch_buffer_size: The number of batches to prefetch.
+
+  Returns:
+    A tf.data.Dataset of (images, labels) batches.
+  """
+  data_files = _get_data_files(dataset.data_sources)
+  files = tf.data.Dataset.from_tensor_slices(data_files)
+  if is_training:
+    files = files.shuffle(len(data_files))
+  # Repeating the files instead of the records would read the short files of
+  # the next pass before the end of the long files of the current one.
+  records = files.apply(
+      tf.contrib.data.parallel_interleave(
+          tf.data.TFRecordDataset,
+          cycle_length=num_readers,
+          sloppy=is_training)).repeat()
+  if is_training:
+    records = records.shuffle(shuffle_buffer_size or 10 * batch_size)
+
+  def decode_and_preprocess(serialized_example):
+    image, label = dataset.decoder.decode(serialized_example,
+                                          ['image', 'label'])
+    label -= labels_offset
+    image = image_preprocessing_fn(image, image_size, image_size)
+    return image, label
+
+  examples = records.map(decode_and_preprocess,
+                         num_parallel_calls=num_parallel_calls)
+  batches = examples.apply(
+      tf.contrib.data.batch_and_drop_remainder(batch_size))
+  return batches.prefetch(prefetch_buffer_size)
+
+
+def benchmark_input(images, labels, num_batches, log_every_n_batches=10,
+                    num_warmup_batches=10):
+  """Runs an input pipeline without a model and logs its images/sec.
+
+  Works for both tf.data and queue based pipelines, as the queue runners of
+  the default graph are started.
+
+  Args:
+    images: A batch of images with a static batch size.
+    labels: The batch of labels.
+    num_batches: The number of batches to time.
+    log_every_n_batches: The frequency with which the throughput is logged.
+    num_warmup_batches: The number of batches to run before timing, e.g. to
+      fill the shuffle buffers.
+
+  Returns:
+    The average number of images/sec over the `num_batches` batches.
+  """
+  batch_size = images.get_shape()[0].value
+  # Only run the pipeline without fetching the batches, so that the transfer
+  # to Python is not timed.
+  input_op = tf.group(images, labels)
+  with tf.Session() as sess:
+    coord = tf.train.Coordinator()
+    threads = tf.train.start_queue_runners(sess=sess, coord=coord)
+    try:
+      for _ in range(num_warmup_batches):
+        sess.run(input_op)
+      start_time = time.time()
+      for i in range(num_batches):
+        sess.run(input_op)
+        if not (i + 1) % log_every_n_batches:
+          tf.logging.info('Batch %d/%d: %.1f images/sec', i + 1, num_batches,
+                          (i + 1) * batch_size / (time.time() - start_time))
+      images_per_sec = num_batches * batch_size / (time.time() - start_time)
+    finally:
+      coord.request_stop()
+      coord.join(threads)
+  tf.logging.info('Input pipeline: %.1f images/sec over %d batches of %d.',
+                  images_per_sec, num_batches, batch_size)
+  return images_per_sec
@@ -0,0 +1,76 @@
+# Copyright 2017 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for input_pipeline."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import collections
+import os
+
+import tensorflow as tf
+
+from datasets import input_pipeline
+
+_Dataset = collections.namedtuple('_Dataset', ['data_sources', 'decoder'])
+
+
+class _LabelDecoder(object):
+  """Decodes the label of an example, with a constant image."""
+
+  def decode(self, serialized_example, items):
+    features = tf.parse_single_example(
+        serialized_example, {'label': tf.FixedLenFeature([], tf.int64)})
+    decoded = {'image': tf.zeros([2, 2, 3]), 'label': features['label']}
+    return [decoded[item] for item in items]
+
+
+class InputPipelineTest(tf.test.TestCase):
+
+  def _write_files(self, num_examples_per_file):
+    """Writes TFRecord files of examples with consecutive labels."""
+    label = 0
+    for i, num_examples in enumerate(num_examples_per_file):
+      path = os.path.join(self.get_temp_dir(), 'data-%d.tfrecord' % i)
+      with tf.python_io.TFRecordWriter(path) as writer:
+        for _ in range(num_examples):
+          example = tf.train.Example(features=tf.train.Features(feature={
+              'label': tf.train.Feature(
+                  int64_list=tf.train.Int64List(value=[label]))}))
+          writer.write(example.SerializeToString())
+          label += 1
+    return os.path.join(self.get_temp_dir(), 'data-*.tfrecord'), label
+
+  def testEvalEpochReadsEveryExampleOnce(self):
+    # The files have different lengths, so that the short files are exhausted
+    # before the long ones.
+    data_sources, num_samples = self._write_files([1, 2, 7])
+    batched_dataset = input_pipeline.batched_dataset(
+        _Dataset(data_sources, _LabelDecoder()),
+        lambda image, height, width: image, image_size=2, batch_size=1,
+        is_training=False, num_readers=3)
+    images, labels = batched_dataset.make_one_shot_iterator().get_next()
+    self.assertEqual(images.get_shape().as_list(), [1, 2, 2, 3])
+
+    with self.test_session() as sess:
+      epoch_labels = [sess.run(labels)[0] for _ in range(num_samples)]
+      next_epoch_labels = [sess.run(labels)[0] for _ in range(num_samples)]
+    self.assertEqual(sorted(epoch_labels), list(range(num_samples)))
+    self.assertEqual(sorted(next_epoch_labels), list(range(num_samples)))
+
+
+if __name__ == '__main__':
+  tf.test.main()
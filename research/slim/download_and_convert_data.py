@@ -52,6 +52,13 @@ tf.app.flags.DEFINE_string(
     None,
     'The directory where the output TFRecords and temporary files are saved.')
 
+tf.app.flags.DEFINE_integer(
+    'num_processes',
+    1,
+    'The number of processes converting images, each with its own TensorFlow '
+    'session. An interrupted conversion is resumed by running the same command '
+    'again.')
+
 
 def main(_):
   if not FLAGS.dataset_name:
@@ -60,11 +67,11 @@ def main(_):
     raise ValueError('You must supply the dataset directory with --dataset_dir')
 
   if FLAGS.dataset_name == 'cifar10':
-    download_and_convert_cifar10.run(FLAGS.dataset_dir)
+    download_and_convert_cifar10.run(FLAGS.dataset_dir, FLAGS.num_processes)
   elif FLAGS.dataset_name == 'flowers':
-    download_and_convert_flowers.run(FLAGS.dataset_dir)
+    download_and_convert_flowers.run(FLAGS.dataset_dir, FLAGS.num_processes)
   elif FLAGS.dataset_name == 'mnist':
-    download_and_convert_mnist.run(FLAGS.dataset_dir)
+    download_and_convert_mnist.run(FLAGS.dataset_dir, FLAGS.num_processes)
   else:
     raise ValueError(
         'dataset_name [%s] was not recognized.' % FLAGS.dataset_name)
@@ -18,11 +18,17 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import io
 import math
+import time
+
+import numpy as np
 import tensorflow as tf
 
 from datasets import dataset_factory
+from datasets import input_pipeline
 from nets import nets_factory
+from preprocessing import multi_crop
 from preprocessing import preprocessing_factory
 
 slim = tf.contrib.slim
@@ -49,6 +55,20 @@ tf.app.flags.DEFINE_integer(
     'num_preprocessing_threads', 4,
     'The number of threads used to create the batches.')
 
+tf.app.flags.DEFINE_boolean(
+    'use_tf_data', False,
+    'Whether to read and preprocess the data with a tf.data pipeline instead '
+    'of queue runners.')
+
+tf.app.flags.DEFINE_integer(
+    'num_readers', 1,
+    'The number of files read in parallel by the tf.data pipeline.')
+
+tf.app.flags.DEFINE_integer(
+    'input_benchmark_num_batches', 0,
+    'If positive, only runs the input pipeline for that many batches and '
+    'reports its images/sec, without building the network.')
+
 tf.app.flags.DEFINE_string(
     'dataset_name', 'imagenet', 'The name of the dataset to load.')
 
@@ -79,9 +99,109 @@ tf.app.flags.DEFINE_float(
 tf.app.flags.DEFINE_integer(
     'eval_image_size', None, 'Eval image size')
 
+tf.app.flags.DEFINE_string(
+    'eval_crop_scales', '',
+    'If set, comma separated scales of multi-crop evaluation: for each scale '
+    'the 4 corner and the center crops of eval_image_size are taken from the '
+    'image preprocessed to scale * eval_image_size, and the class '
+    'probabilities are averaged over all the crops. E.g. 1.143 gives the 10 '
+    'crops of 224x224 images preprocessed to 256x256. By default, a single '
+    'center crop is evaluated.')
+
+tf.app.flags.DEFINE_boolean(
+    'eval_crop_flip', True,
+    'Whether multi-crop evaluation also uses the horizontal flips of the '
+    'crops.')
+
+tf.app.flags.DEFINE_string(
+    'predictions_file', '',
+    'If set, instead of computing the streaming metrics, writes the top-k '
+    'predictions and the labels of the images to this NumPy .npz file.')
+
+tf.app.flags.DEFINE_integer(
+    'predictions_top_k', 5,
+    'The number of top predictions written to predictions_file.')
+
 FLAGS = tf.app.flags.FLAGS
 
 
+class _EvalLoopTimerHook(tf.train.SessionRunHook):
+  """Measures the wall time of the evaluation loop of evaluate_once.
+
+  Restoring the checkpoint and running the final and summary ops happen
+  outside of the run calls the hook sees, so they are not timed.
+  """
+
+  def __init__(self):
+    self.start_time = None
+    self.end_time = None
+
+  def before_run(self, run_context):
+    if self.start_time is None:
+      self.start_time = time.time()
+
+  def after_run(self, run_context, run_values):
+    self.end_time = time.time()
+
+
+def _write_predictions(scores, labels, checkpoint_path, variables_to_restore,
+                       num_batches, num_samples):
+  """Writes the top-k predictions of the images to FLAGS.predictions_file.
+
+  The predictions file holds the arrays `top_k_classes` and `top_k_scores` of
+  shape [num_images, FLAGS.predictions_top_k], by decreasing score, and
+  `labels` of shape [num_images], in the order the images were read.
+
+  Args:
+    scores: The [batch_size, num_classes] class scores of a batch.
+    labels: The [batch_size] labels of the batch.
+    checkpoint_path: The checkpoint to restore.
+    variables_to_restore: The variables to restore from the checkpoint.
+    num_batches: The number of batches to run.
+    num_samples: The maximum number of images to write, the images of the last
+      batch wrapping around to the beginning of the dataset being dropped.
+  """
+  top_k_scores, top_k_classes = tf.nn.top_k(scores, k=FLAGS.predictions_top_k)
+  saver = tf.train.Saver(variables_to_restore)
+  batch_top_k_classes = []
+  batch_top_k_scores = []
+  batch_labels = []
+  with tf.Session(FLAGS.master) as sess:
+    sess.run(tf.local_variables_initializer())
+    saver.restore(sess, checkpoint_path)
+    coord = tf.train.Coordinator()
+    threads = tf.train.start_queue_runners(sess=sess, coord=coord)
+    try:
+      start_time = time.time()
+      for _ in range(num_batches):
+        classes_np, scores_np, labels_np = sess.run(
+            [top_k_classes, top_k_scores, labels])
+        batch_top_k_classes.append(classes_np)
+        batch_top_k_scores.append(scores_np)
+        batch_labels.append(labels_np)
+      elapsed_time = time.time() - start_time
+    finally:
+      coord.request_stop()
+      coord.join(threads)
+
+  all_top_k_classes = np.concatenate(batch_top_k_classes)[:num_samples]
+  all_labels = np.concatenate(batch_labels)[:num_samples]
+  # np.savez needs a seekable file, which GFile does not provide.
+  predictions = io.BytesIO()
+  np.savez(predictions,
+           top_k_classes=all_top_k_classes.astype(np.int32),
+           top_k_scores=np.concatenate(batch_top_k_scores)[:num_samples],
+           labels=all_labels.astype(np.int32))
+  with tf.gfile.GFile(FLAGS.predictions_file, 'wb') as f:
+    f.write(predictions.getvalue())
+  tf.logging.info(
+      'Wrote the predictions of %d images to %s: accuracy %.4f, recall@%d '
+      '%.4f, %.1f images/sec.', all_labels.shape[0], FLAGS.predictions_file,
+      np.mean(all_top_k_classes[:, 0] == all_labels), FLAGS.predictions_top_k,
+      np.mean(np.any(all_top_k_classes == all_labels[:, np.newaxis], axis=1)),
+      num_batches * FLAGS.batch_size / elapsed_time)
+
+
 def main(_):
   if not FLAGS.dataset_dir:
     raise ValueError('You must supply the dataset directory with --dataset_dir')
@@ -104,17 +224,6 @@ def main(_):
         num_classes=(dataset.num_classes - FLAGS.labels_offset),
         is_training=False)
 
-    ##############################################################
-    # Create a dataset provider that loads data from the dataset #
-    ##############################################################
-    provider = slim.dataset_data_provider.DatasetDataProvider(
-        dataset,
-        shuffle=False,
-        common_queue_capacity=2 * FLAGS.batch_size,
-        common_queue_min=FLAGS.batch_size)
-    [image, label] = provider.get(['image', 'label'])
-    label -= FLAGS.labels_offset
-
     #####################################
     # Select the preprocessing function #
     #####################################
@@ -125,18 +234,65 @@ def main(_):
 
     eval_image_size = FLAGS.eval_image_size or network_fn.default_image_size
 
-    image = image_preprocessing_fn(image, eval_image_size, eval_image_size)
-
-    images, labels = tf.train.batch(
-        [image, label],
-        batch_size=FLAGS.batch_size,
-        num_threads=FLAGS.num_preprocessing_threads,
-        capacity=5 * FLAGS.batch_size)
+    if FLAGS.eval_crop_scales:
+      image_preprocessing_fn = multi_crop.get_multi_crop_preprocessing(
+          image_preprocessing_fn,
+          [float(scale) for scale in FLAGS.eval_crop_scales.split(',')],
+          flip=FLAGS.eval_crop_flip)
+
+    if FLAGS.use_tf_data:
+      # Like the queue based pipeline, the last batch wraps around to the
+      # beginning of the dataset.
+      batched_dataset = input_pipeline.batched_dataset(
+          dataset,
+          image_preprocessing_fn,
+          eval_image_size,
+          FLAGS.batch_size,
+          is_training=False,
+          labels_offset=FLAGS.labels_offset,
+          num_readers=FLAGS.num_readers,
+          num_parallel_calls=FLAGS.num_preprocessing_threads)
+      images, labels = batched_dataset.make_one_shot_iterator().get_next()
+    else:
+      ##############################################################
+      # Create a dataset provider that loads data from the dataset #
+      ##############################################################
+      provider = slim.dataset_data_provider.DatasetDataProvider(
+          dataset,
+          shuffle=False,
+          common_queue_capacity=2 * FLAGS.batch_size,
+          common_queue_min=FLAGS.batch_size)
+      [image, label] = provider.get(['image', 'label'])
+      label -= FLAGS.labels_offset
+
+      image = image_preprocessing_fn(image, eval_image_size, eval_image_size)
+
+      images, labels = tf.train.batch(
+          [image, label],
+          batch_size=FLAGS.batch_size,
+          num_threads=FLAGS.num_preprocessing_threads,
+          capacity=5 * FLAGS.batch_size)
+
+    if FLAGS.input_benchmark_num_batches:
+      input_pipeline.benchmark_input(
+          images, labels, num_batches=FLAGS.input_benchmark_num_batches)
+      return
 
     ####################
     # Define the model #
     ####################
-    logits, _ = network_fn(images)
+    if FLAGS.eval_crop_scales:
+      # All the crops of the batch go through the network together, and the
+      # class probabilities are averaged over the crops of every image.
+      num_crops = images.get_shape()[1].value
+      logits, _ = network_fn(
+          tf.reshape(images, [-1] + images.get_shape()[2:].as_list()))
+      probabilities = tf.reshape(tf.nn.softmax(logits),
+                                 [FLAGS.batch_size, num_crops, -1])
+      scores = tf.reduce_mean(probabilities, axis=1)
+    else:
+      logits, _ = network_fn(images)
+      scores = logits
 
     if FLAGS.moving_average_decay:
       variable_averages = tf.train.ExponentialMovingAverage(
@@ -147,29 +303,15 @@ def main(_):
     else:
       variables_to_restore = slim.get_variables_to_restore()
 
-    predictions = tf.argmax(logits, 1)
     labels = tf.squeeze(labels)
 
-    # Define the metrics:
-    names_to_values, names_to_updates = slim.metrics.aggregate_metric_map({
-        'Accuracy': slim.metrics.streaming_accuracy(predictions, labels),
-        'Recall_5': slim.metrics.streaming_recall_at_k(
-            logits, labels, 5),
-    })
-
-    # Print the summaries to screen.
-    for name, value in names_to_values.items():
-      summary_name = 'eval/%s' % name
-      op = tf.summary.scalar(summary_name, value, collections=[])
-      op = tf.Print(op, [value], summary_name)
-      tf.add_to_collection(tf.GraphKeys.SUMMARIES, op)
-
     # TODO(sguada) use num_epochs=1
     if FLAGS.max_num_batches:
       num_batches = FLAGS.max_num_batches
     else:
       # This ensures that we make a single pass over all of the data.
-      num_batches = math.ceil(dataset.num_samples / float(FLAGS.batch_size))
+      num_batches = int(
+          math.ceil(dataset.num_samples / float(FLAGS.batch_size)))
 
     if tf.gfile.IsDirectory(FLAGS.checkpoint_path):
       checkpoint_path = tf.train.latest_checkpoint(FLAGS.checkpoint_path)
@@ -178,13 +320,40 @@ def main(_):
 
     tf.logging.info('Evaluating %s' % checkpoint_path)
 
+    if FLAGS.predictions_file:
+      _write_predictions(scores, labels, checkpoint_path, variables_to_restore,
+                         num_batches, dataset.num_samples)
+      return
+
+    predictions = tf.argmax(scores, 1)
+
+    # Define the metrics:
+    names_to_values, names_to_updates = slim.metrics.aggregate_metric_map({
+        'Accuracy': slim.metrics.streaming_accuracy(predictions, labels),
+        'Recall_5': slim.metrics.streaming_recall_at_k(
+            scores, labels, 5),
+    })
+
+    # Print the summaries to screen.
+    for name, value in names_to_values.items():
+      summary_name = 'eval/%s' % name
+      op = tf.summary.scalar(summary_name, value, collections=[])
+      op = tf.Print(op, [value], summary_name)
+      tf.add_to_collection(tf.GraphKeys.SUMMARIES, op)
+
+    timer_hook = _EvalLoopTimerHook()
     slim.evaluation.evaluate_once(
         master=FLAGS.master,
         checkpoint_path=checkpoint_path,
         logdir=FLAGS.eval_dir,
         num_evals=num_batches,
         eval_op=list(names_to_updates.values()),
-        variables_to_restore=variables_to_restore)
+        variables_to_restore=variables_to_restore,
+        hooks=[timer_hook])
+    tf.logging.info('Evaluated %d images at %.1f images/sec.',
+                    num_batches * FLAGS.batch_size,
+                    num_batches * FLAGS.batch_size /
+                    (timer_hook.end_time - timer_hook.start_time))
 
 
 if __name__ == '__main__':
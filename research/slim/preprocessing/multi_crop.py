@@ -0,0 +1,92 @@
+# Copyright 2017 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Provides multi-crop and multi-scale evaluation on top of a preprocessing."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import tensorflow as tf
+
+
+def _corner_and_center_crops(image, height, width, crop_height, crop_width):
+  """Returns the 4 corner crops and the center crop of an image.
+
+  Args:
+    image: A `Tensor` of shape [height, width, channels].
+    height: The height of `image`.
+    width: The width of `image`.
+    crop_height: The height of the crops.
+    crop_width: The width of the crops.
+
+  Returns:
+    A list of crops, holding only `image` if it already has the crop size.
+  """
+  if height == crop_height and width == crop_width:
+    return [image]
+  max_y = height - crop_height
+  max_x = width - crop_width
+  offsets = [(0, 0), (0, max_x), (max_y, 0), (max_y, max_x),
+             (max_y // 2, max_x // 2)]
+  return [image[y:y + crop_height, x:x + crop_width, :] for y, x in offsets]
+
+
+def get_multi_crop_preprocessing(image_preprocessing_fn, scales, flip=True):
+  """Returns a preprocessing_fn producing several crops of every image.
+
+  For every scale, the image is preprocessed by `image_preprocessing_fn` to
+  `scale` times the output size, and the 4 corner crops and the center crop of
+  the output size are taken, or the whole image if the scale is 1. With
+  `flip`, the horizontal flips of all the crops are added. A single scale of
+  256 / 224 and `flip` thus give the usual 10 crops.
+
+  The preprocessing of the image must support the larger sizes; e.g. with
+  vgg_preprocessing the preprocessed size must be at most 256 pixels.
+
+  Args:
+    image_preprocessing_fn: A function called as
+      `image_preprocessing_fn(image, height, width)`, e.g. from
+      preprocessing_factory.get_preprocessing.
+    scales: A list of scales, each greater than or equal to 1.
+    flip: Whether to add the horizontal flips of the crops.
+
+  Returns:
+    preprocessing_fn: A function with the following signature:
+        crops = preprocessing_fn(image, output_height, output_width)
+      where `crops` has shape [num_crops, output_height, output_width,
+      channels].
+
+  Raises:
+    ValueError: If `scales` is empty or holds a scale smaller than 1.
+  """
+  if not scales:
+    raise ValueError('At least one scale must be given.')
+  if min(scales) < 1.0:
+    raise ValueError('The scales must be greater than or equal to 1, got %s.'
+                     % (scales,))
+
+  def preprocessing_fn(image, output_height, output_width):
+    crops = []
+    for scale in scales:
+      height = int(round(output_height * scale))
+      width = int(round(output_width * scale))
+      preprocessed_image = image_preprocessing_fn(image, height, width)
+      crops.extend(_corner_and_center_crops(
+          preprocessed_image, height, width, output_height, output_width))
+    if flip:
+      crops.extend([tf.image.flip_left_right(crop) for crop in crops])
+    return tf.stack(crops)
+
+  return preprocessing_fn
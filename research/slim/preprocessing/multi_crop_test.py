@@ -0,0 +1,73 @@
+# Copyright 2017 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for preprocessing.multi_crop."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import numpy as np
+import tensorflow as tf
+
+from preprocessing import multi_crop
+
+
+def _range_preprocessing_fn(image, height, width):
+  """Ignores the image and returns the pixel indices of a height x width one."""
+  del image
+  return tf.reshape(tf.to_float(tf.range(height * width)), [height, width, 1])
+
+
+class MultiCropTest(tf.test.TestCase):
+
+  def testSingleScaleWithoutFlip(self):
+    preprocessing_fn = multi_crop.get_multi_crop_preprocessing(
+        _range_preprocessing_fn, scales=[1.0], flip=False)
+    crops = preprocessing_fn(tf.zeros([8, 8, 3]), 4, 4)
+    self.assertEqual(crops.get_shape().as_list(), [1, 4, 4, 1])
+    with self.test_session() as sess:
+      crops_np = sess.run(crops)
+    self.assertAllEqual(crops_np[0, :, :, 0], np.arange(16).reshape(4, 4))
+
+  def testCropsAndFlips(self):
+    preprocessing_fn = multi_crop.get_multi_crop_preprocessing(
+        _range_preprocessing_fn, scales=[1.0, 1.5])
+    crops = preprocessing_fn(tf.zeros([8, 8, 3]), 4, 4)
+    # 1 crop at scale 1 and 5 crops at scale 1.5, followed by their flips.
+    self.assertEqual(crops.get_shape().as_list(), [12, 4, 4, 1])
+    with self.test_session() as sess:
+      crops_np = sess.run(crops)[:, :, :, 0]
+
+    image = np.arange(16).reshape(4, 4)
+    scaled_image = np.arange(36).reshape(6, 6)
+    expected_crops = [image,
+                      scaled_image[0:4, 0:4],
+                      scaled_image[0:4, 2:6],
+                      scaled_image[2:6, 0:4],
+                      scaled_image[2:6, 2:6],
+                      scaled_image[1:5, 1:5]]
+    expected_crops += [crop[:, ::-1] for crop in expected_crops]
+    self.assertAllEqual(crops_np, np.stack(expected_crops))
+
+  def testInvalidScales(self):
+    with self.assertRaises(ValueError):
+      multi_crop.get_multi_crop_preprocessing(_range_preprocessing_fn, [])
+    with self.assertRaises(ValueError):
+      multi_crop.get_multi_crop_preprocessing(_range_preprocessing_fn,
+                                              [1.0, 0.5])
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -21,6 +21,7 @@ from __future__ import print_function
 import tensorflow as tf
 
 from datasets import dataset_factory
+from datasets import input_pipeline
 from deployment import model_deploy
 from nets import nets_factory
 from preprocessing import preprocessing_factory
@@ -55,6 +56,17 @@ tf.app.flags.DEFINE_integer(
     'num_preprocessing_threads', 4,
     'The number of threads used to create the batches.')
 
+tf.app.flags.DEFINE_boolean(
+    'use_tf_data', False,
+    'Whether to read and preprocess the data with a tf.data pipeline instead '
+    'of queue runners. num_readers files are then interleaved and '
+    'num_preprocessing_threads examples are preprocessed in parallel.')
+
+tf.app.flags.DEFINE_integer(
+    'input_benchmark_num_batches', 0,
+    'If positive, only runs the input pipeline for that many batches and '
+    'reports its images/sec, without building the network.')
+
 tf.app.flags.DEFINE_integer(
     'log_every_n_steps', 10,
     'The frequency with which logs are print.')
@@ -425,35 +437,66 @@ def main(_):
     ##############################################################
     # Create a dataset provider that loads data from the dataset #
     ##############################################################
+    train_image_size = FLAGS.train_image_size or network_fn.default_image_size
     with tf.device(deploy_config.inputs_device()):
-      provider = slim.dataset_data_provider.DatasetDataProvider(
-          dataset,
-          num_readers=FLAGS.num_readers,
-          common_queue_capacity=20 * FLAGS.batch_size,
-          common_queue_min=10 * FLAGS.batch_size)
-      [image, label] = provider.get(['image', 'label'])
-      label -= FLAGS.labels_offset
-
-      train_image_size = FLAGS.train_image_size or network_fn.default_image_size
-
-      image = image_preprocessing_fn(image, train_image_size, train_image_size)
-
-      images, labels = tf.train.batch(
-          [image, label],
-          batch_size=FLAGS.batch_size,
-          num_threads=FLAGS.num_preprocessing_threads,
-          capacity=5 * FLAGS.batch_size)
-      labels = slim.one_hot_encoding(
-          labels, dataset.num_classes - FLAGS.labels_offset)
-      batch_queue = slim.prefetch_queue.prefetch_queue(
-          [images, labels], capacity=2 * deploy_config.num_clones)
+      if FLAGS.use_tf_data:
+        batched_dataset = input_pipeline.batched_dataset(
+            dataset,
+            image_preprocessing_fn,
+            train_image_size,
+            FLAGS.batch_size,
+            is_training=True,
+            labels_offset=FLAGS.labels_offset,
+            num_readers=FLAGS.num_readers,
+            num_parallel_calls=FLAGS.num_preprocessing_threads,
+            prefetch_buffer_size=2 * deploy_config.num_clones)
+        batched_dataset = batched_dataset.map(
+            lambda images, labels: (images, slim.one_hot_encoding(
+                labels, dataset.num_classes - FLAGS.labels_offset)))
+        batch_queue = batched_dataset.make_one_shot_iterator()
+      else:
+        provider = slim.dataset_data_provider.DatasetDataProvider(
+            dataset,
+            num_readers=FLAGS.num_readers,
+            common_queue_capacity=20 * FLAGS.batch_size,
+            common_queue_min=10 * FLAGS.batch_size)
+        [image, label] = provider.get(['image', 'label'])
+        label -= FLAGS.labels_offset
+
+        image = image_preprocessing_fn(image, train_image_size,
+                                       train_image_size)
+
+        images, labels = tf.train.batch(
+            [image, label],
+            batch_size=FLAGS.batch_size,
+            num_threads=FLAGS.num_preprocessing_threads,
+            capacity=5 * FLAGS.batch_size)
+        labels = slim.one_hot_encoding(
+            labels, dataset.num_classes - FLAGS.labels_offset)
+        batch_queue = slim.prefetch_queue.prefetch_queue(
+            [images, labels], capacity=2 * deploy_config.num_clones)
+
+    def dequeue_batch(batch_queue):
+      """Returns the next batch of images and one-hot labels."""
+      if FLAGS.use_tf_data:
+        # The iterator lives on the inputs device and gives every clone its own
+        # batch.
+        with tf.device(deploy_config.inputs_device()):
+          return batch_queue.get_next()
+      return batch_queue.dequeue()
+
+    if FLAGS.input_benchmark_num_batches:
+      input_pipeline.benchmark_input(
+          *dequeue_batch(batch_queue),
+          num_batches=FLAGS.input_benchmark_num_batches)
+      return
 
     ####################
     # Define the model #
     ####################
     def clone_fn(batch_queue):
       """Allows data parallelism by creating multiple clones of network_fn."""
-      images, labels = batch_queue.dequeue()
+      images, labels = dequeue_batch(batch_queue)
       logits, end_points = network_fn(images)
 
       #############################
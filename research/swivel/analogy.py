@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+#
+# Copyright 2017 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Computes the accuracy of the embeddings on analogy evaluation data.
+
+This is the Python counterpart of the `analogy` tool: each analogy "a is to b
+as c is to d" is answered by the nearest neighbor of c - a + b which is not one
+of the query words, and analogies with a word missing from the vocabulary count
+as errors.  The analogies are solved in batches with blocked matrix multiplies.
+
+Usage:
+
+  analogy.py --embeddings=<binvecs> --vocab=<vocab> eval1.an.tab ...
+
+Options:
+
+  --embeddings=<filename>: the vectors to test
+  --vocab=<filename>: the vocabulary file
+  --normalized=<filename>: optional cache of the normalized vectors, written
+    the first time and memory mapped afterwards
+  --float16: store the normalized vectors as float16
+  --batch_size=<n>: the number of analogies solved at once (default 1024)
+
+Evaluation files are assumed to hold four whitespace-separated words per line.
+
+"""
+
+from __future__ import print_function
+import numpy as np
+import sys
+from getopt import GetoptError, getopt
+
+from vecs import Vecs
+
+try:
+  opts, args = getopt(sys.argv[1:], 'v:e:',
+                      ['embeddings=', 'vocab=', 'normalized=', 'float16',
+                       'batch_size='])
+except GetoptError as e:
+  print(e, file=sys.stderr)
+  sys.exit(2)
+
+opt_embeddings = None
+opt_vocab = None
+opt_normalized = None
+opt_dtype = np.float32
+opt_batch_size = 1024
+
+for o, a in opts:
+  if o in ('-e', '--embeddings'):
+    opt_embeddings = a
+  if o in ('-v', '--vocab'):
+    opt_vocab = a
+  if o == '--normalized':
+    opt_normalized = a
+  if o == '--float16':
+    opt_dtype = np.float16
+  if o == '--batch_size':
+    opt_batch_size = int(a)
+
+if not opt_vocab:
+  print('please specify a vocabulary file with "--vocab"', file=sys.stderr)
+  sys.exit(2)
+
+if not opt_embeddings:
+  print('please specify the embeddings with "--embeddings"', file=sys.stderr)
+  sys.exit(2)
+
+try:
+  vecs = Vecs(opt_vocab, opt_embeddings, normalized_filename=opt_normalized,
+              dtype=opt_dtype)
+except IOError as e:
+  print(e, file=sys.stderr)
+  sys.exit(1)
+
+
+def evaluate(lines):
+  queries, answers, total = [], [], 0
+  for line in lines:
+    words = line.split()
+    if not words:
+      continue
+
+    total += 1
+    if len(words) == 4 and all(word in vecs.word_to_idx for word in words):
+      queries.append(words[:3])
+      answers.append(words[3])
+
+  correct = 0
+  for start in range(0, len(queries), opt_batch_size):
+    predictions = vecs.analogies(queries[start:start + opt_batch_size])
+    correct += sum(prediction == answer for prediction, answer in zip(
+        predictions, answers[start:start + opt_batch_size]))
+
+  return float(correct) / total if total else 0.0
+
+
+for filename in args:
+  with open(filename, 'r') as lines:
+    print('%0.3f %s' % (evaluate(lines), filename))
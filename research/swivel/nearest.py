@@ -17,6 +17,7 @@
 """Simple tool for inspecting nearest neighbors and analogies."""
 
 from __future__ import print_function
+import numpy as np
 import re
 import sys
 from getopt import GetoptError, getopt
@@ -24,21 +25,29 @@ from getopt import GetoptError, getopt
 from vecs import Vecs
 
 try:
-  opts, args = getopt(sys.argv[1:], 'v:e:', ['vocab=', 'embeddings='])
+  opts, args = getopt(sys.argv[1:], 'v:e:',
+                      ['vocab=', 'embeddings=', 'normalized=', 'float16'])
 except GetoptError as e:
   print(e, file=sys.stderr)
   sys.exit(2)
 
 opt_vocab = 'vocab.txt'
 opt_embeddings = None
+opt_normalized = None
+opt_dtype = np.float32
 
 for o, a in opts:
   if o in ('-v', '--vocab'):
     opt_vocab = a
   if o in ('-e', '--embeddings'):
     opt_embeddings = a
+  if o == '--normalized':
+    opt_normalized = a
+  if o == '--float16':
+    opt_dtype = np.float16
 
-vecs = Vecs(opt_vocab, opt_embeddings)
+vecs = Vecs(opt_vocab, opt_embeddings, normalized_filename=opt_normalized,
+            dtype=opt_dtype)
 
 while True:
   sys.stdout.write('query> ')
@@ -51,7 +60,7 @@ while True:
   parts = re.split(r'\s+', query)
 
   if len(parts) == 1:
-    res = vecs.neighbors(parts[0])
+    res = vecs.neighbors(parts[0], k=20)
 
   elif len(parts) == 3:
     vs = [vecs.lookup(w) for w in parts]
@@ -61,7 +70,7 @@ while True:
 
       continue
 
-    res = vecs.neighbors(vs[2] - vs[0] + vs[1])
+    res = vecs.neighbors(vs[2] - vs[0] + vs[1], k=20)
 
   else:
     print('use a single word to query neighbors, or three words for analogy')
@@ -18,75 +18,310 @@ import os
 
 from six import string_types
 
+# The number of vectors normalized or searched at once, which bounds the memory
+# used on top of the vectors themselves.
+BLOCK_SIZE = 65536
+
+
+def _top_k(sims, k):
+  """Returns the column indices of the k largest values of each row of sims."""
+  if sims.shape[1] > k:
+    return np.argpartition(-sims, k - 1, axis=1)[:, :k]
+  return np.tile(np.arange(sims.shape[1]), (sims.shape[0], 1))
+
+
+def _merge_top_k(best_idx, best_sims, idx, sims, k):
+  """Merges a block of candidates into the current top k of each query."""
+  idx = np.concatenate([best_idx, idx], axis=1)
+  sims = np.concatenate([best_sims, sims], axis=1)
+  top = _top_k(sims, k)
+  rows = np.arange(sims.shape[0])[:, np.newaxis]
+  return idx[rows, top], sims[rows, top]
+
+
+def _sort_top_k(best_idx, best_sims):
+  """Sorts the top k of each query by decreasing similarity."""
+  order = np.argsort(-best_sims, axis=1)
+  rows = np.arange(best_sims.shape[0])[:, np.newaxis]
+  return best_idx[rows, order], best_sims[rows, order]
+
 
 class Vecs(object):
-  def __init__(self, vocab_filename, rows_filename, cols_filename=None):
-    """Initializes the vectors from a text vocabulary and binary data."""
+  def __init__(self, vocab_filename, rows_filename, cols_filename=None,
+               normalized_filename=None, dtype=np.float32):
+    """Initializes the vectors from a text vocabulary and binary data.
+
+    The vectors are normalized so that dot products are cosine similarities.
+    If `normalized_filename` is given, the normalized vectors are written to
+    that file the first time, and memory mapped from it afterwards, so that
+    they need not fit in memory.
+
+    Args:
+      vocab_filename: the vocabulary, one token per line.
+      rows_filename: the binary float32 row vectors.
+      cols_filename: optional binary float32 column vectors, added to the rows.
+      normalized_filename: optional cache of the normalized vectors.
+      dtype: the dtype of the normalized vectors, np.float32 or np.float16.
+    """
     with open(vocab_filename, 'r') as lines:
       self.vocab = [line.split()[0] for line in lines]
       self.word_to_idx = {word: idx for idx, word in enumerate(self.vocab)}
 
     n = len(self.vocab)
 
-    with open(rows_filename, 'r') as rows_fh:
+    with open(rows_filename, 'rb') as rows_fh:
       rows_fh.seek(0, os.SEEK_END)
       size = rows_fh.tell()
 
-      # Make sure that the file size seems reasonable.
-      if size % (4 * n) != 0:
-        raise IOError(
-            'unexpected file size for binary vector file %s' % rows_filename)
+    # Make sure that the file size seems reasonable.
+    if size % (4 * n) != 0:
+      raise IOError(
+          'unexpected file size for binary vector file %s' % rows_filename)
+
+    dim = size // (4 * n)
 
+    if normalized_filename and os.path.exists(normalized_filename):
+      if os.path.getsize(normalized_filename) != n * dim * np.dtype(
+          dtype).itemsize:
+        raise IOError('unexpected file size for normalized vector file %s' %
+                      normalized_filename)
+    else:
+      self._normalize(rows_filename, cols_filename, size, n, dim,
+                      normalized_filename, dtype)
+
+    if normalized_filename:
+      self.vecs = np.memmap(
+          normalized_filename, dtype=dtype, mode='r', shape=(n, dim))
+
+  def _normalize(self, rows_filename, cols_filename, size, n, dim,
+                 normalized_filename, dtype):
+    """Normalizes the vectors block by block, into memory or into a file."""
+    if normalized_filename:
+      # Write to a temporary file first, so that an interrupted run does not
+      # leave a truncated cache behind.
+      tmp_filename = normalized_filename + '.incomplete'
+      vecs = np.memmap(tmp_filename, dtype=dtype, mode='w+', shape=(n, dim))
+    else:
+      vecs = np.empty((n, dim), dtype=dtype)
+
+    with open(rows_filename, 'rb') as rows_fh:
       # Memory map the rows.
-      dim = size / (4 * n)
       rows_mm = mmap.mmap(rows_fh.fileno(), 0, prot=mmap.PROT_READ)
-      rows = np.matrix(
-          np.frombuffer(rows_mm, dtype=np.float32).reshape(n, dim))
+      rows = np.frombuffer(rows_mm, dtype=np.float32).reshape(n, dim)
 
       # If column vectors were specified, then open them and add them to the
       # row vectors.
+      cols_mm = None
       if cols_filename:
-        with open(cols_filename, 'r') as cols_fh:
-          cols_mm = mmap.mmap(cols_fh.fileno(), 0, prot=mmap.PROT_READ)
+        with open(cols_filename, 'rb') as cols_fh:
           cols_fh.seek(0, os.SEEK_END)
           if cols_fh.tell() != size:
             raise IOError('row and column vector files have different sizes')
 
-          cols = np.matrix(
-              np.frombuffer(cols_mm, dtype=np.float32).reshape(n, dim))
+          cols_mm = mmap.mmap(cols_fh.fileno(), 0, prot=mmap.PROT_READ)
+          cols = np.frombuffer(cols_mm, dtype=np.float32).reshape(n, dim)
+
+      for start in range(0, n, BLOCK_SIZE):
+        block = np.array(rows[start:start + BLOCK_SIZE])
+        if cols_mm:
+          block += cols[start:start + BLOCK_SIZE]
 
-          rows += cols
-          cols_mm.close()
+        # Normalize so that dot products are just cosine similarity.
+        norms = np.linalg.norm(block, axis=1)
+        norms[norms == 0] = 1
+        vecs[start:start + BLOCK_SIZE] = block / norms[:, np.newaxis]
 
-      # Normalize so that dot products are just cosine similarity.
-      self.vecs = rows / np.linalg.norm(rows, axis=1).reshape(n, 1)
+      # The arrays must be released before their buffers can be closed.
+      del rows
       rows_mm.close()
+      if cols_mm:
+        del cols
+        cols_mm.close()
+
+    if normalized_filename:
+      vecs.flush()
+      del vecs
+      os.rename(tmp_filename, normalized_filename)
+    else:
+      self.vecs = vecs
+
+  def _query_vectors(self, queries):
+    """Returns a float32 matrix of query vectors from words or vectors."""
+    if isinstance(queries, np.ndarray):
+      return np.atleast_2d(queries).astype(np.float32)
+
+    rows = []
+    for query in queries:
+      if isinstance(query, string_types):
+        query = self.vecs[self.word_to_idx[query]]
+      rows.append(query)
+    return np.array(rows, dtype=np.float32)
 
   def similarity(self, word1, word2):
     """Computes the similarity of two tokens."""
     idx1 = self.word_to_idx.get(word1)
     idx2 = self.word_to_idx.get(word2)
-    if not idx1 or not idx2:
+    if idx1 is None or idx2 is None:
       return None
 
-    return float(self.vecs[idx1] * self.vecs[idx2].transpose())
+    return float(np.dot(self.vecs[idx1].astype(np.float32),
+                        self.vecs[idx2].astype(np.float32)))
+
+  def similarities(self, pairs):
+    """Computes the similarities of a list of token pairs.
 
-  def neighbors(self, query):
-    """Returns the nearest neighbors to the query (a word or vector)."""
-    if isinstance(query, string_types):
-      idx = self.word_to_idx.get(query)
-      if idx is None:
-        return None
+    Returns:
+      A float32 array of the similarities, NaN for pairs with an unknown token.
+    """
+    idx = np.array([[self.word_to_idx.get(word, -1) for word in pair]
+                    for pair in pairs], dtype=np.int64).reshape(-1, 2)
+    known = np.all(idx >= 0, axis=1)
+    sims = np.full(len(idx), np.nan, dtype=np.float32)
+    if np.any(known):
+      vecs1 = self.vecs[idx[known, 0]].astype(np.float32)
+      vecs2 = self.vecs[idx[known, 1]].astype(np.float32)
+      sims[known] = np.einsum('ij,ij->i', vecs1, vecs2)
+    return sims
 
-      query = self.vecs[idx]
+  def neighbors_batch(self, queries, k=10, block_size=BLOCK_SIZE):
+    """Returns the k nearest neighbors of a batch of queries.
 
-    neighbors = self.vecs * query.transpose()
+    The similarities of all the queries are computed against blocks of
+    `block_size` vectors at once, keeping the k best of each query with
+    argpartition, so that no query by vocabulary matrix is materialized.
 
-    return sorted(
-      zip(self.vocab, neighbors.flat),
-      key=lambda kv: kv[1], reverse=True)
+    Args:
+      queries: a list of words or vectors, or a [num_queries, dim] array.
+      k: the number of neighbors to return.
+      block_size: the number of vectors multiplied at once.
+
+    Returns:
+      A pair of [num_queries, k] arrays of the indices of the neighbors in the
+      vocabulary and of their similarities, by decreasing similarity.
+
+    Raises:
+      KeyError: if a query word is not in the vocabulary.
+    """
+    queries = self._query_vectors(queries)
+    k = min(k, len(self.vocab))
+    best_idx = np.zeros((len(queries), 0), dtype=np.int64)
+    best_sims = np.zeros((len(queries), 0), dtype=np.float32)
+    for start in range(0, len(self.vocab), block_size):
+      block = self.vecs[start:start + block_size].astype(np.float32)
+      sims = np.dot(queries, block.T)
+      idx = np.tile(np.arange(start, start + len(block)), (len(queries), 1))
+      best_idx, best_sims = _merge_top_k(best_idx, best_sims, idx, sims, k)
+    return _sort_top_k(best_idx, best_sims)
+
+  def neighbors(self, query, k=None):
+    """Returns the nearest neighbors to the query (a word or vector).
+
+    Returns:
+      A list of (word, similarity) pairs by decreasing similarity, the k first
+      or all of them, or None if the query word is not in the vocabulary.
+    """
+    if isinstance(query, string_types) and query not in self.word_to_idx:
+      return None
+
+    idx, sims = self.neighbors_batch([query], k=k or len(self.vocab))
+    return [(self.vocab[i], float(sim)) for i, sim in zip(idx[0], sims[0])]
+
+  def analogies(self, queries, block_size=BLOCK_SIZE):
+    """Solves a batch of analogies "a is to b as c is to ?".
+
+    Like the `analogy` tool, the answer is the nearest neighbor of c - a + b
+    which is not one of the query words.
+
+    Args:
+      queries: a list of (a, b, c) word triples, all in the vocabulary.
+      block_size: the number of vectors multiplied at once.
+
+    Returns:
+      A list of the answer words.
+    """
+    idx = np.array([[self.word_to_idx[word] for word in query]
+                    for query in queries], dtype=np.int64).reshape(-1, 3)
+    vecs = [self.vecs[idx[:, i]].astype(np.float32) for i in range(3)]
+    neighbor_idx, _ = self.neighbors_batch(
+        vecs[2] - vecs[0] + vecs[1], k=4, block_size=block_size)
+    return [self.vocab[next(i for i in neighbors if i not in query)]
+            for neighbors, query in zip(neighbor_idx, idx)]
 
   def lookup(self, word):
     """Returns the embedding for a token, or None if no embedding exists."""
     idx = self.word_to_idx.get(word)
-    return None if idx is None else self.vecs[idx]
+    return None if idx is None else self.vecs[idx].astype(np.float32)
+
+
+class IvfIndex(object):
+  """An inverted file index for approximate nearest neighbor search.
+
+  The vectors are clustered by spherical k-means, and a query is only compared
+  to the vectors of the `num_probes` clusters whose centroids are the most
+  similar to it.
+  """
+
+  def __init__(self, vecs, num_lists=1024, num_iterations=10,
+               sample_size=262144, seed=0):
+    """Clusters the vectors of a Vecs.
+
+    Args:
+      vecs: the Vecs to index.
+      num_lists: the number of clusters.
+      num_iterations: the number of k-means iterations.
+      sample_size: the number of vectors sampled to train the centroids.
+      seed: the seed of the sampling and of the initial centroids.
+    """
+    self._vecs = vecs
+    n = len(vecs.vocab)
+    num_lists = min(num_lists, n)
+    random_state = np.random.RandomState(seed)
+    sample = vecs.vecs[np.sort(random_state.choice(
+        n, min(sample_size, n), replace=False))].astype(np.float32)
+    self.centroids = sample[random_state.choice(
+        len(sample), num_lists, replace=False)]
+    for _ in range(num_iterations):
+      assignments = np.argmax(np.dot(sample, self.centroids.T), axis=1)
+      for i in range(num_lists):
+        members = sample[assignments == i]
+        if len(members):
+          centroid = members.sum(axis=0)
+          self.centroids[i] = centroid / max(np.linalg.norm(centroid), 1e-12)
+
+    assignments = np.empty(n, dtype=np.int64)
+    for start in range(0, n, BLOCK_SIZE):
+      block = vecs.vecs[start:start + BLOCK_SIZE].astype(np.float32)
+      assignments[start:start + len(block)] = np.argmax(
+          np.dot(block, self.centroids.T), axis=1)
+    order = np.argsort(assignments, kind='mergesort')
+    boundaries = np.searchsorted(assignments[order], np.arange(num_lists + 1))
+    self.lists = [order[boundaries[i]:boundaries[i + 1]]
+                  for i in range(num_lists)]
+
+  def neighbors_batch(self, queries, k=10, num_probes=8):
+    """Returns the approximate k nearest neighbors of a batch of queries.
+
+    Args:
+      queries: a list of words or vectors, or a [num_queries, dim] array.
+      k: the number of neighbors to return.
+      num_probes: the number of clusters searched for each query.
+
+    Returns:
+      Like Vecs.neighbors_batch, with fewer than k valid neighbors, marked by
+      an index of -1 and a similarity of -inf, if the probed clusters hold
+      fewer than k vectors.
+    """
+    queries = self._vecs._query_vectors(queries)
+    num_probes = min(num_probes, len(self.lists))
+    probes = _top_k(np.dot(queries, self.centroids.T), num_probes)
+    best_idx = np.full((len(queries), k), -1, dtype=np.int64)
+    best_sims = np.full((len(queries), k), -np.inf, dtype=np.float32)
+    for i, (query, query_probes) in enumerate(zip(queries, probes)):
+      # Sorted indices read the memory mapped vectors sequentially.
+      candidates = np.sort(
+          np.concatenate([self.lists[p] for p in query_probes]))
+      sims = np.dot(self._vecs.vecs[candidates].astype(np.float32), query)
+      top = _top_k(sims[np.newaxis], k)[0]
+      best_idx[i, :len(top)] = candidates[top]
+      best_sims[i, :len(top)] = sims[top]
+    return _sort_top_k(best_idx, best_sims)
@@ -27,6 +27,9 @@ Options:
 
   --embeddings=<filename>: the vectors to test
   --vocab=<filename>: the vocabulary file
+  --normalized=<filename>: optional cache of the normalized vectors, written
+    the first time and memory mapped afterwards
+  --float16: store the normalized vectors as float16
 
 Evaluation files are assumed to be tab-separated files with exactly three
 columns.  The first two columns contain the words, and the third column contains
@@ -35,6 +38,7 @@ the scored human judgement.
 """
 
 from __future__ import print_function
+import numpy as np
 import scipy.stats
 import sys
 from getopt import GetoptError, getopt
@@ -42,19 +46,26 @@ from getopt import GetoptError, getopt
 from vecs import Vecs
 
 try:
-  opts, args = getopt(sys.argv[1:], '', ['embeddings=', 'vocab='])
+  opts, args = getopt(sys.argv[1:], 'v:e:',
+                      ['embeddings=', 'vocab=', 'normalized=', 'float16'])
 except GetoptError as e:
   print(e, file=sys.stderr)
   sys.exit(2)
 
 opt_embeddings = None
 opt_vocab = None
+opt_normalized = None
+opt_dtype = np.float32
 
 for o, a in opts:
-  if o == '--embeddings':
+  if o in ('-e', '--embeddings'):
     opt_embeddings = a
-  if o == '--vocab':
+  if o in ('-v', '--vocab'):
     opt_vocab = a
+  if o == '--normalized':
+    opt_normalized = a
+  if o == '--float16':
+    opt_dtype = np.float16
 
 if not opt_vocab:
   print('please specify a vocabulary file with "--vocab"', file=sys.stderr)
@@ -65,26 +76,24 @@ if not opt_embeddings:
   sys.exit(2)
 
 try:
-  vecs = Vecs(opt_vocab, opt_embeddings)
+  vecs = Vecs(opt_vocab, opt_embeddings, normalized_filename=opt_normalized,
+              dtype=opt_dtype)
 except IOError as e:
   print(e, file=sys.stderr)
   sys.exit(1)
 
 
 def evaluate(lines):
-  acts, preds = [], []
-
-  with open(filename, 'r') as lines:
-    for line in lines:
-      w1, w2, act = line.strip().split('\t')
-      pred = vecs.similarity(w1, w2)
-      if pred is None:
-        continue
-
-      acts.append(float(act))
-      preds.append(pred)
-
-  rho, _ = scipy.stats.spearmanr(acts, preds)
+  pairs, acts = [], []
+  for line in lines:
+    w1, w2, act = line.strip().split('\t')
+    pairs.append((w1, w2))
+    acts.append(float(act))
+
+  # Pairs with a word missing from the vocabulary have a NaN similarity.
+  preds = vecs.similarities(pairs)
+  known = ~np.isnan(preds)
+  rho, _ = scipy.stats.spearmanr(np.array(acts)[known], preds[known])
   return rho
 
 
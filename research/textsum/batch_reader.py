@@ -15,8 +15,12 @@
 
 """Batch reader to seq2seq attention model, with bucketing support."""
 
+from collections import defaultdict
 from collections import namedtuple
+import glob
+import os
 from random import shuffle
+import re
 from threading import Thread
 import time
 
@@ -35,6 +39,48 @@ ModelInput = namedtuple('ModelInput',
 BUCKET_CACHE_BATCH = 100
 QUEUE_NUM_BATCH = 100
 
+# Suffixes of the arrays of a shard written by preprocess_data.py.
+SHARD_ARRAYS = ('enc_ids', 'dec_ids', 'articles', 'abstracts', 'enc_lens',
+                'dec_lens')
+# Matches the length bucket suffix of the shard names of preprocess_data.py.
+SHARD_BUCKET_PATTERN = re.compile(r'\.(b\d+)$')
+
+
+def ToWordIds(article, abstract, vocab, max_article_sentences,
+              max_abstract_sentences):
+  """Converts an article and its abstract to word ids.
+
+  Args:
+    article: article text, with sentences between <s> and </s>.
+    abstract: abstract text, with sentences between <s> and </s>.
+    vocab: Vocabulary.
+    max_article_sentences: Max number of sentences used from article.
+    max_abstract_sentences: Max number of sentences used from abstract.
+  Returns:
+    enc_inputs: the word ids of the first sentences of the article.
+    dec_inputs: <s> followed by the word ids of the first sentences of the
+      abstract.
+    origin_article: the text of the article sentences.
+    origin_abstract: the text of the abstract sentences.
+  """
+  article_sentences = [sent.strip() for sent in
+                       data.ToSentences(article, include_token=False)]
+  abstract_sentences = [sent.strip() for sent in
+                        data.ToSentences(abstract, include_token=False)]
+
+  enc_inputs = []
+  # Use the <s> as the <GO> symbol for decoder inputs.
+  dec_inputs = [vocab.WordToId(data.SENTENCE_START)]
+
+  # Convert first N sentences to word IDs, stripping existing <s> and </s>.
+  for i in xrange(min(max_article_sentences, len(article_sentences))):
+    enc_inputs += data.GetWordIds(article_sentences[i], vocab)
+  for i in xrange(min(max_abstract_sentences, len(abstract_sentences))):
+    dec_inputs += data.GetWordIds(abstract_sentences[i], vocab)
+
+  return (enc_inputs, dec_inputs, ' '.join(article_sentences),
+          ' '.join(abstract_sentences))
+
 
 class Batcher(object):
   """Batch reader with shuffling and bucketing support."""
@@ -129,28 +175,14 @@ class Batcher(object):
 
   def _FillInputQueue(self):
     """Fill input queue with ModelInput."""
-    start_id = self._vocab.WordToId(data.SENTENCE_START)
     end_id = self._vocab.WordToId(data.SENTENCE_END)
     pad_id = self._vocab.WordToId(data.PAD_TOKEN)
     input_gen = self._TextGenerator(data.ExampleGen(self._data_path))
     while True:
       (article, abstract) = six.next(input_gen)
-      article_sentences = [sent.strip() for sent in
-                           data.ToSentences(article, include_token=False)]
-      abstract_sentences = [sent.strip() for sent in
-                            data.ToSentences(abstract, include_token=False)]
-
-      enc_inputs = []
-      # Use the <s> as the <GO> symbol for decoder inputs.
-      dec_inputs = [start_id]
-
-      # Convert first N sentences to word IDs, stripping existing <s> and </s>.
-      for i in xrange(min(self._max_article_sentences,
-                          len(article_sentences))):
-        enc_inputs += data.GetWordIds(article_sentences[i], self._vocab)
-      for i in xrange(min(self._max_abstract_sentences,
-                          len(abstract_sentences))):
-        dec_inputs += data.GetWordIds(abstract_sentences[i], self._vocab)
+      enc_inputs, dec_inputs, origin_article, origin_abstract = ToWordIds(
+          article, abstract, self._vocab, self._max_article_sentences,
+          self._max_abstract_sentences)
 
       # Filter out too-short input
       if (len(enc_inputs) < self._hps.min_input_len or
@@ -192,8 +224,7 @@ class Batcher(object):
         targets.append(end_id)
 
       element = ModelInput(enc_inputs, dec_inputs, targets, enc_input_len,
-                           dec_output_len, ' '.join(article_sentences),
-                           ' '.join(abstract_sentences))
+                           dec_output_len, origin_article, origin_abstract)
       self._input_queue.put(element)
 
   def _FillBucketInputQueue(self):
@@ -263,3 +294,150 @@ class Batcher(object):
       feature: a feature text extracted.
     """
     return ex.features.feature[key].bytes_list.value[0]
+
+
+class ShardBatcher(object):
+  """Batch reader of the length-bucketed shards of preprocess_data.py.
+
+  The shards are memory mapped, and batches are assembled by slicing their
+  arrays, without per-example or per-token Python work. NextBatch returns the
+  same batches as Batcher.NextBatch.
+
+  With bucketing, every batch is taken from the shards of a single length
+  bucket, across all the input files. The examples of the buckets holding
+  fewer usable examples than a batch are dropped.
+  """
+
+  def __init__(self, data_path, vocab, hps, bucketing=True,
+               truncate_input=False, seed=None):
+    """ShardBatcher constructor.
+
+    Args:
+      data_path: directory of the shards written by preprocess_data.py.
+      vocab: Vocabulary.
+      hps: Seq2SeqAttention model hyperparameters.
+      bucketing: Whether to take every batch from a single length bucket, i.e.
+        from articles of similar length.
+      truncate_input: Whether to truncate input that is too long. Alternative is
+        to discard such examples.
+      seed: Optional seed of the shuffling.
+    """
+    self._hps = hps
+    self._bucketing = bucketing
+    self._end_id = vocab.WordToId(data.SENTENCE_END)
+    self._pad_id = vocab.WordToId(data.PAD_TOKEN)
+    self._random_state = np.random.RandomState(seed)
+
+    self._shards = []
+    self._examples = []
+    # The shards of every length bucket, by bucket name.
+    bucket_shards = defaultdict(list)
+    for enc_lens_path in sorted(glob.glob(
+        os.path.join(data_path, '*.enc_lens.npy'))):
+      prefix = enc_lens_path[:-len('.enc_lens.npy')]
+      shard = {name: np.load('%s.%s.npy' % (prefix, name), mmap_mode='r')
+               for name in SHARD_ARRAYS}
+      valid = ((shard['enc_lens'] >= hps.min_input_len) &
+               (shard['dec_lens'] >= hps.min_input_len))
+      if not truncate_input:
+        valid &= ((shard['enc_lens'] <= hps.enc_timesteps) &
+                  (shard['dec_lens'] <= hps.dec_timesteps))
+      examples = np.nonzero(valid)[0]
+      tf.logging.info('%s: %d of %d examples used', prefix, len(examples),
+                      len(valid))
+      if not len(examples):
+        continue
+      match = SHARD_BUCKET_PATTERN.search(prefix)
+      bucket_shards[match.group(1) if match else prefix].append(
+          len(self._shards))
+      self._shards.append(shard)
+      self._examples.append(examples)
+
+    # The shards of every bucket of examples batches are taken from.
+    buckets = []
+    self._num_dropped_examples = 0
+    for bucket_name, shard_ids in sorted(bucket_shards.items()):
+      num_examples = sum(len(self._examples[i]) for i in shard_ids)
+      if num_examples >= hps.batch_size:
+        buckets.append(shard_ids)
+      elif bucketing:
+        self._num_dropped_examples += num_examples
+        tf.logging.warning('Bucket %s: dropped %d examples, fewer than a '
+                           'batch', bucket_name, num_examples)
+    if bucketing:
+      tf.logging.info('%d examples dropped by bucketing',
+                      self._num_dropped_examples)
+    if not (buckets if bucketing else self._shards):
+      raise ValueError('No usable shards in %s' % data_path)
+
+    num_examples = np.array([len(e) for e in self._examples])
+    self._shard_ids = np.repeat(np.arange(len(self._shards)), num_examples)
+    self._example_ids = np.concatenate(self._examples)
+    self._bucket_shard_ids = [
+        np.repeat(shard_ids, num_examples[shard_ids]) for shard_ids in buckets]
+    self._bucket_example_ids = [
+        np.concatenate([self._examples[i] for i in shard_ids])
+        for shard_ids in buckets]
+    self._bucket_sizes = np.array(
+        [len(e) for e in self._bucket_example_ids], dtype=np.float64)
+
+  def NextBatch(self):
+    """Returns a batch of inputs for seq2seq attention model.
+
+    Returns:
+      The same arrays as Batcher.NextBatch.
+    """
+    hps = self._hps
+    if self._bucketing:
+      bucket = self._random_state.choice(
+          len(self._bucket_sizes),
+          p=self._bucket_sizes / np.sum(self._bucket_sizes))
+      batch = self._random_state.choice(
+          len(self._bucket_example_ids[bucket]), hps.batch_size,
+          replace=False)
+      shard_ids = self._bucket_shard_ids[bucket][batch]
+      example_ids = self._bucket_example_ids[bucket][batch]
+    else:
+      batch = self._random_state.randint(len(self._example_ids),
+                                         size=hps.batch_size)
+      shard_ids = self._shard_ids[batch]
+      example_ids = self._example_ids[batch]
+
+    enc_batch = np.full((hps.batch_size, hps.enc_timesteps), self._pad_id,
+                        dtype=np.int32)
+    dec_batch = np.full((hps.batch_size, hps.dec_timesteps), self._end_id,
+                        dtype=np.int32)
+    target_batch = np.full((hps.batch_size, hps.dec_timesteps), self._end_id,
+                           dtype=np.int32)
+    enc_input_lens = np.zeros((hps.batch_size), dtype=np.int32)
+    dec_output_lens = np.zeros((hps.batch_size), dtype=np.int32)
+    origin_articles = [None] * hps.batch_size
+    origin_abstracts = [None] * hps.batch_size
+    for shard_id in np.unique(shard_ids):
+      shard = self._shards[shard_id]
+      rows = np.nonzero(shard_ids == shard_id)[0]
+      # Sorted indices read the memory mapped shards sequentially.
+      order = np.argsort(example_ids[rows])
+      rows = rows[order]
+      examples = example_ids[rows]
+      # The shards are padded with <PAD> for the encoder inputs and with </s>
+      # for the decoder inputs, like Batcher.
+      enc_width = min(shard['enc_ids'].shape[1], hps.enc_timesteps)
+      enc_batch[rows, :enc_width] = shard['enc_ids'][examples, :enc_width]
+      dec_width = min(shard['dec_ids'].shape[1], hps.dec_timesteps)
+      dec_inputs = shard['dec_ids'][examples, :dec_width]
+      dec_batch[rows, :dec_width] = dec_inputs
+      # targets is dec_inputs without <s> at beginning, plus </s> at end.
+      target_batch[rows, :dec_width - 1] = dec_inputs[:, 1:]
+      enc_input_lens[rows] = np.minimum(shard['enc_lens'][examples],
+                                        hps.enc_timesteps)
+      dec_output_lens[rows] = np.minimum(shard['dec_lens'][examples],
+                                         hps.dec_timesteps)
+      for row, article, abstract in zip(rows, shard['articles'][examples],
+                                        shard['abstracts'][examples]):
+        origin_articles[row] = article
+        origin_abstracts[row] = abstract
+    loss_weights = (np.arange(hps.dec_timesteps)[np.newaxis, :] <
+                    dec_output_lens[:, np.newaxis]).astype(np.float32)
+    return (enc_batch, dec_batch, target_batch, enc_input_lens, dec_output_lens,
+            loss_weights, origin_articles, origin_abstracts)
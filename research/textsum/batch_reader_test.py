@@ -0,0 +1,148 @@
+# Copyright 2017 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""Tests for batch_reader and preprocess_data."""
+
+import collections
+import os
+import struct
+
+import numpy as np
+from six.moves import xrange
+import tensorflow as tf
+
+import batch_reader
+import data
+import preprocess_data
+
+HParams = collections.namedtuple(
+    'HParams', 'batch_size min_input_len enc_timesteps dec_timesteps')
+
+_NUM_WORDS = 20
+
+
+def _WriteDataFile(path, examples):
+  """Writes (article, abstract) pairs in the binary format of ExampleGen."""
+  with open(path, 'wb') as writer:
+    for article, abstract in examples:
+      tf_example = tf.train.Example()
+      tf_example.features.feature['article'].bytes_list.value.append(
+          tf.compat.as_bytes(article))
+      tf_example.features.feature['abstract'].bytes_list.value.append(
+          tf.compat.as_bytes(abstract))
+      tf_example_str = tf_example.SerializeToString()
+      str_len = len(tf_example_str)
+      writer.write(struct.pack('q', str_len))
+      writer.write(struct.pack('%ds' % str_len, tf_example_str))
+
+
+def _Examples(num_examples, offset=0):
+  """Returns examples with distinct articles of increasing lengths."""
+  examples = []
+  for i in xrange(offset, offset + num_examples):
+    article = ' '.join('w%d' % ((i + j) % _NUM_WORDS) for j in xrange(i + 1))
+    abstract = ' '.join('w%d' % j for j in xrange(i % 5 + 1))
+    examples.append(('<s> %s </s>' % article, '<s> %s </s>' % abstract))
+  return examples
+
+
+class ShardBatcherTest(tf.test.TestCase):
+
+  def setUp(self):
+    self._tmp_dir = self.get_temp_dir()
+    self._vocab_path = os.path.join(self._tmp_dir, 'vocab')
+    with open(self._vocab_path, 'w') as f:
+      for word in ([data.SENTENCE_START, data.SENTENCE_END, data.UNKNOWN_TOKEN,
+                    data.PAD_TOKEN] +
+                   ['w%d' % i for i in xrange(_NUM_WORDS)]):
+        f.write('%s 1\n' % word)
+    self._vocab = data.Vocab(self._vocab_path, 1000)
+
+  def _ConvertFiles(self, examples_per_file, name, boundaries):
+    """Writes data files and converts them to shards."""
+    input_paths = []
+    for i, examples in enumerate(examples_per_file):
+      input_paths.append(os.path.join(self._tmp_dir, '%s-%d' % (name, i)))
+      _WriteDataFile(input_paths[-1], examples)
+    shard_dir = os.path.join(self._tmp_dir, '%s_shards' % name)
+    num_examples = preprocess_data.ConvertFiles(
+        input_paths, self._vocab_path, shard_dir, boundaries, 'article',
+        'abstract', max_article_sentences=2, max_abstract_sentences=100,
+        num_processes=1)
+    self.assertEqual(num_examples, sum(len(e) for e in examples_per_file))
+    return os.path.join(self._tmp_dir, '%s-*' % name), shard_dir
+
+  def _RowsByArticle(self, batcher, num_articles, max_batches=500):
+    """Returns the rows of the batches of batcher by article."""
+    rows = {}
+    for _ in xrange(max_batches):
+      batch = batcher.NextBatch()
+      for i, article in enumerate(batch[6]):
+        rows[tf.compat.as_text(article)] = (
+            batch[0][i].tolist(), batch[1][i].tolist(), batch[2][i].tolist(),
+            int(batch[3][i]), int(batch[4][i]), batch[5][i].tolist(),
+            tf.compat.as_text(batch[7][i]))
+      if len(rows) >= num_articles:
+        break
+    return rows
+
+  def _CheckSameBatches(self, truncate_input):
+    # Articles of 1 to 12 words and abstracts of 2 to 6 ids with <s>, so that
+    # examples are dropped as too short and, without truncation, too long.
+    hps = HParams(batch_size=2, min_input_len=2, enc_timesteps=8,
+                  dec_timesteps=4)
+    name = 'truncate' if truncate_input else 'filter'
+    data_path, shard_dir = self._ConvertFiles(
+        [_Examples(7), _Examples(5, offset=7)], name, [4, 8])
+
+    shard_batcher = batch_reader.ShardBatcher(
+        shard_dir, self._vocab, hps, bucketing=False,
+        truncate_input=truncate_input, seed=0)
+    num_articles = len(shard_batcher._example_ids)
+    expected_rows = self._RowsByArticle(shard_batcher, num_articles)
+    self.assertEqual(len(expected_rows), num_articles)
+
+    batcher = batch_reader.Batcher(
+        data_path, self._vocab, hps, 'article', 'abstract', 2, 100,
+        bucketing=False, truncate_input=truncate_input)
+    rows = self._RowsByArticle(batcher, num_articles)
+    self.assertEqual(rows, expected_rows)
+    return num_articles
+
+  def testSameBatchesAsBatcherWithFiltering(self):
+    # Articles of 2 to 8 words with abstracts of at most 4 ids.
+    self.assertEqual(self._CheckSameBatches(truncate_input=False), 5)
+
+  def testSameBatchesAsBatcherWithTruncation(self):
+    self.assertEqual(self._CheckSameBatches(truncate_input=True), 11)
+
+  def testBucketingMergesTheShardsOfABucket(self):
+    hps = HParams(batch_size=4, min_input_len=1, enc_timesteps=20,
+                  dec_timesteps=10)
+    # Every file holds fewer examples than a batch in each bucket.
+    _, shard_dir = self._ConvertFiles(
+        [_Examples(3), _Examples(3, offset=3), _Examples(3, offset=6)],
+        'bucketing', [5])
+    shard_batcher = batch_reader.ShardBatcher(
+        shard_dir, self._vocab, hps, bucketing=True, seed=0)
+    self.assertEqual(shard_batcher._num_dropped_examples, 0)
+    for _ in xrange(20):
+      enc_input_lens = shard_batcher.NextBatch()[3]
+      self.assertTrue(np.all(enc_input_lens <= 5) or
+                      np.all(enc_input_lens > 5))
+
+
+if __name__ == '__main__':
+  tf.test.main()
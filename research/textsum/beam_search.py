@@ -21,6 +21,7 @@ K*K results, and start over again until certain number of results are fully
 decoded.
 """
 
+import numpy as np
 from six.moves import xrange
 import tensorflow as tf
 
@@ -154,3 +155,138 @@ class BeamSearch(object):
       return sorted(hyps, key=lambda h: h.log_prob/len(h.tokens), reverse=True)
     else:
       return sorted(hyps, key=lambda h: h.log_prob, reverse=True)
+
+
+class BatchedBeamSearch(BeamSearch):
+  """Beam search over the articles of a batch at once.
+
+  Each step decodes the beam_size hypotheses of every article of the batch in a
+  single decode_topk call, so the model batch size must be the number of
+  articles times beam_size. The hypotheses are held in NumPy arrays, and the
+  hypotheses kept at each step and the final results are the same as when
+  BeamSearch decodes the articles one by one.
+  """
+
+  def BeamSearch(self, sess, enc_inputs, enc_seqlen):
+    """Performs beam search for decoding a batch of articles.
+
+    Args:
+      sess: tf.Session, session
+      enc_inputs: ndarray of shape (num_articles, enc_length), the document
+          ids to encode
+      enc_seqlen: ndarray of shape (num_articles), the length of the sequences
+
+    Returns:
+      hyps: for each article, the list of Hypothesis found by beam search,
+          ordered by score
+    """
+    num_articles = enc_inputs.shape[0]
+    beam_size = self._beam_size
+    num_candidates = 2 * beam_size
+
+    # Run the encoder on beam_size copies of every article.
+    enc_top_states, dec_in_states = self._model.encode_top_states(
+        sess, np.repeat(enc_inputs, beam_size, axis=0),
+        np.repeat(enc_seqlen, beam_size, axis=0))
+    states = np.array(dec_in_states)
+
+    # The hypotheses on the beams of every article. All the hypotheses on the
+    # beams have the same length, steps + 1.
+    tokens = np.full((num_articles, beam_size, self._max_steps + 1),
+                     self._start_token, dtype=np.int64)
+    log_probs = np.zeros((num_articles, beam_size), dtype=np.float64)
+    # Whether a beam holds a hypothesis. The first step only extends the first
+    # beam, as all the beams hold the start token.
+    live = np.zeros((num_articles, beam_size), dtype=np.bool_)
+    live[:, 0] = True
+    results = [[] for _ in xrange(num_articles)]
+    num_results = np.zeros(num_articles, dtype=np.int64)
+    rows = np.arange(num_articles)[:, np.newaxis]
+    positions = np.arange(num_candidates)[np.newaxis, :]
+
+    last_active = np.ones(num_articles, dtype=np.bool_)
+    steps = 0
+    while steps < self._max_steps:
+      # Articles whose beam search would have stopped are finished.
+      active = num_results < beam_size
+      if not np.any(active):
+        break
+      last_active = active
+
+      topk_ids, topk_log_probs, new_states = self._model.decode_topk(
+          sess, tokens[:, :, steps].reshape(-1), enc_top_states, states)
+      new_states = np.array(new_states)
+
+      # The scores of the num_candidates best extensions of every hypothesis.
+      scores = (log_probs[:, :, np.newaxis] +
+                topk_log_probs.reshape(num_articles, beam_size, -1))
+      scores[~(live & active[:, np.newaxis])] = -np.inf
+      scores = scores.reshape(num_articles, -1)
+      ids = topk_ids.reshape(num_articles, -1)
+
+      # At most beam_size hypotheses are kept and beam_size results added per
+      # article, so only the num_candidates best extensions matter.
+      best = np.sort(np.argpartition(-scores, num_candidates - 1,
+                                     axis=1)[:, :num_candidates], axis=1)
+      # Like sorted() in BeamSearch, the sort is stable.
+      best = best[rows, np.argsort(-scores[rows, best], axis=1,
+                                   kind='mergesort')]
+      best_scores = scores[rows, best]
+      best_ids = ids[rows, best]
+      best_beams = best // num_candidates
+
+      # Take the extensions by decreasing score, until beam_size hypotheses
+      # are kept or beam_size results collected.
+      is_end = best_ids == self._end_token
+      is_kept = ~is_end
+      num_kept = np.cumsum(is_kept, axis=1)
+      total_results = np.cumsum(is_end, axis=1) + num_results[:, np.newaxis]
+      is_last = (num_kept == beam_size) | (total_results == beam_size)
+      last = np.where(np.any(is_last, axis=1), np.argmax(is_last, axis=1),
+                      num_candidates - 1)
+      taken = ((positions <= last[:, np.newaxis]) &
+               np.isfinite(best_scores) & active[:, np.newaxis])
+
+      # Pull the hypotheses which reached the end token off the beam.
+      for article, position in zip(*np.nonzero(taken & is_end)):
+        beam = best_beams[article, position]
+        results[article].append(Hypothesis(
+            tokens[article, beam, :steps + 1].tolist() +
+            [best_ids[article, position]],
+            best_scores[article, position], None))
+      num_results += np.sum(taken & is_end, axis=1)
+
+      # Move the other hypotheses to their beams.
+      article_idx, position_idx = np.nonzero(taken & is_kept)
+      new_beams = num_kept[article_idx, position_idx] - 1
+      source_beams = best_beams[article_idx, position_idx]
+      new_tokens = tokens.copy()
+      new_tokens[article_idx, new_beams] = tokens[article_idx, source_beams]
+      new_tokens[article_idx, new_beams, steps + 1] = best_ids[
+          article_idx, position_idx]
+      new_log_probs = np.zeros_like(log_probs)
+      new_log_probs[article_idx, new_beams] = best_scores[
+          article_idx, position_idx]
+      state_rows = new_states.reshape(num_articles, beam_size, -1)
+      states = np.zeros_like(state_rows)
+      states[article_idx, new_beams] = state_rows[article_idx, source_beams]
+      states = states.reshape(num_articles * beam_size, -1)
+      new_live = np.zeros_like(live)
+      new_live[article_idx, new_beams] = True
+      # Finished articles keep their beams, as their search has stopped.
+      tokens = np.where(active[:, np.newaxis, np.newaxis], new_tokens, tokens)
+      log_probs = np.where(active[:, np.newaxis], new_log_probs, log_probs)
+      live = np.where(active[:, np.newaxis], new_live, live)
+
+      steps += 1
+
+    # Add the hypotheses on the beams of the articles which were decoded until
+    # max_steps.
+    if steps == self._max_steps:
+      for article in np.nonzero(last_active)[0]:
+        for beam in np.nonzero(live[article])[0]:
+          results[article].append(Hypothesis(
+              tokens[article, beam, :steps + 1].tolist(),
+              log_probs[article, beam], None))
+
+    return [self._BestHyps(article_results) for article_results in results]
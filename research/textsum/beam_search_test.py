@@ -0,0 +1,96 @@
+# Copyright 2017 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""Tests for beam_search."""
+
+import numpy as np
+from six.moves import xrange
+import tensorflow as tf
+
+import beam_search
+
+_VOCAB_SIZE = 8
+_START_TOKEN = 0
+_END_TOKEN = 1
+
+
+class _MockModel(object):
+  """Mock of Seq2SeqAttentionModel with random but deterministic outputs.
+
+  The decoder state of a hypothesis is [article, hash of its tokens], and the
+  log probabilities of the next token only depend on the state and on the
+  latest token.
+  """
+
+  def __init__(self, num_candidates):
+    self._num_candidates = num_candidates
+
+  def encode_top_state(self, sess, enc_inputs, enc_len):
+    enc_top_states, dec_in_states = self.encode_top_states(
+        sess, enc_inputs, enc_len)
+    return enc_top_states, dec_in_states[0]
+
+  def encode_top_states(self, sess, enc_inputs, enc_len):
+    del sess, enc_len
+    dec_in_states = np.zeros((enc_inputs.shape[0], 2), dtype=np.float32)
+    dec_in_states[:, 0] = enc_inputs[:, 0]
+    return enc_inputs, dec_in_states
+
+  def decode_topk(self, sess, latest_tokens, enc_top_states, dec_init_states):
+    del sess, enc_top_states
+    ids = []
+    log_probs = []
+    new_states = []
+    for token, state in zip(latest_tokens, dec_init_states):
+      token_hash = (int(state[1]) * _VOCAB_SIZE + int(token) + 1) % 65521
+      rng = np.random.RandomState(int(state[0]) * 65521 + token_hash)
+      token_log_probs = np.log(rng.dirichlet(np.ones(_VOCAB_SIZE)))
+      topk_ids = np.argsort(-token_log_probs)[:self._num_candidates]
+      ids.append(topk_ids)
+      log_probs.append(token_log_probs[topk_ids].astype(np.float32))
+      new_states.append(np.array([state[0], token_hash], dtype=np.float32))
+    return np.array(ids), np.array(log_probs), new_states
+
+
+class BatchedBeamSearchTest(tf.test.TestCase):
+
+  def testMatchesBeamSearch(self):
+    beam_size = 3
+    max_steps = 6
+    num_articles = 20
+    model = _MockModel(2 * beam_size)
+    enc_inputs = np.arange(num_articles)[:, np.newaxis] * np.ones(
+        [1, 5], dtype=np.int64)
+    enc_seqlen = np.full(num_articles, 5, dtype=np.int64)
+
+    batched_hyps = beam_search.BatchedBeamSearch(
+        model, beam_size, _START_TOKEN, _END_TOKEN, max_steps).BeamSearch(
+            None, enc_inputs, enc_seqlen)
+    self.assertEqual(len(batched_hyps), num_articles)
+    for article in xrange(num_articles):
+      hyps = beam_search.BeamSearch(
+          model, beam_size, _START_TOKEN, _END_TOKEN, max_steps).BeamSearch(
+              None, np.repeat(enc_inputs[article:article + 1], beam_size,
+                              axis=0),
+              np.repeat(enc_seqlen[article:article + 1], beam_size))
+      self.assertEqual(len(batched_hyps[article]), len(hyps))
+      for batched_hyp, hyp in zip(batched_hyps[article], hyps):
+        self.assertEqual([int(t) for t in batched_hyp.tokens],
+                         [int(t) for t in hyp.tokens])
+        self.assertAllClose(batched_hyp.log_prob, hyp.log_prob)
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -0,0 +1,195 @@
+# Copyright 2017 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+
+"""Converts tf.Example data files to length-bucketed shards of word ids.
+
+The articles and abstracts are split into sentences and converted to word ids
+once, in parallel processes, instead of in the input threads of Batcher. The
+examples of every input file are grouped by article length into buckets, and
+each bucket is written as a shard of .npy arrays, which ShardBatcher memory
+maps to assemble batches:
+
+  <name>.enc_ids.npy: [num_examples, max_enc_len] int32 article word ids,
+    padded with <PAD>.
+  <name>.dec_ids.npy: [num_examples, max_dec_len] int32 <s> and abstract word
+    ids, padded with </s>.
+  <name>.enc_lens.npy, <name>.dec_lens.npy: [num_examples] int32 lengths.
+  <name>.articles.npy, <name>.abstracts.npy: [num_examples] original texts.
+
+The examples are not truncated, so that the shards can be used with any
+enc_timesteps and dec_timesteps.
+
+Usage:
+python preprocess_data.py --data_path=data/training-* \\
+    --vocab_path=data/vocab --output_dir=data/training_shards
+"""
+
+import glob
+import multiprocessing
+import os
+
+import numpy as np
+import tensorflow as tf
+
+import batch_reader
+import data
+
+FLAGS = tf.app.flags.FLAGS
+tf.app.flags.DEFINE_string('data_path', '', 'Path expression to tf.Example.')
+tf.app.flags.DEFINE_string('vocab_path', '',
+                           'Path expression to text vocabulary file.')
+tf.app.flags.DEFINE_string('output_dir', '', 'Directory for the shards.')
+tf.app.flags.DEFINE_string('article_key', 'article',
+                           'tf.Example feature key for article.')
+tf.app.flags.DEFINE_string('abstract_key', 'headline',
+                           'tf.Example feature key for abstract.')
+tf.app.flags.DEFINE_integer('max_article_sentences', 2,
+                            'Max number of first sentences to use from the '
+                            'article')
+tf.app.flags.DEFINE_integer('max_abstract_sentences', 100,
+                            'Max number of first sentences to use from the '
+                            'abstract')
+tf.app.flags.DEFINE_string('bucket_boundaries', '30,60,90,120',
+                           'Comma separated upper bounds of the article '
+                           'lengths of the buckets. Longer articles go to a '
+                           'last bucket.')
+tf.app.flags.DEFINE_integer('num_processes', 0,
+                            'Number of processes converting input files. '
+                            'Defaults to the number of CPUs.')
+
+_vocab = None
+
+
+def _InitWorker(vocab_path):
+  """Loads the vocabulary once in every worker process."""
+  global _vocab
+  _vocab = data.Vocab(vocab_path, 1000000)
+
+
+def _PadIds(ids_list, pad_id):
+  """Returns a [len(ids_list), max_len] int32 array of padded ids."""
+  ids = np.full((len(ids_list), max(len(i) for i in ids_list)), pad_id,
+                dtype=np.int32)
+  for row, row_ids in enumerate(ids_list):
+    ids[row, :len(row_ids)] = row_ids
+  return ids
+
+
+def _WriteShard(prefix, examples):
+  """Writes the arrays of a shard, the lengths last to mark it complete."""
+  enc_ids, dec_ids, articles, abstracts = zip(*examples)
+  arrays = {
+      'enc_ids': _PadIds(enc_ids, _vocab.WordToId(data.PAD_TOKEN)),
+      'dec_ids': _PadIds(dec_ids, _vocab.WordToId(data.SENTENCE_END)),
+      'articles': np.array(articles, dtype=bytes),
+      'abstracts': np.array(abstracts, dtype=bytes),
+      'enc_lens': np.array([len(i) for i in enc_ids], dtype=np.int32),
+      'dec_lens': np.array([len(i) for i in dec_ids], dtype=np.int32),
+  }
+  for name in batch_reader.SHARD_ARRAYS:
+    np.save('%s.%s.npy' % (prefix, name), arrays[name])
+
+
+def _ConvertFile(args):
+  """Converts the examples of an input file to one shard per bucket.
+
+  The worker processes get all the options as arguments instead of reading
+  FLAGS, which are only parsed in the parent process.
+
+  Args:
+    args: tuple of the input file, the output directory, the bucket
+      boundaries, the article and abstract feature keys and the max numbers
+      of article and abstract sentences.
+  Returns:
+    The number of examples converted.
+  """
+  (input_path, output_dir, boundaries, article_key, abstract_key,
+   max_article_sentences, max_abstract_sentences) = args
+  buckets = [[] for _ in range(len(boundaries) + 1)]
+  num_examples = 0
+  for ex in data.ExampleGen(input_path, num_epochs=1):
+    try:
+      article = data.GetExFeatureText(ex, article_key)
+      abstract = data.GetExFeatureText(ex, abstract_key)
+    except (IndexError, ValueError):
+      tf.logging.error('Failed to get article or abstract from example')
+      continue
+    example = batch_reader.ToWordIds(
+        article, abstract, _vocab, max_article_sentences,
+        max_abstract_sentences)
+    buckets[np.searchsorted(boundaries, len(example[0]))].append(example)
+    num_examples += 1
+
+  name = os.path.basename(input_path)
+  for bucket, examples in enumerate(buckets):
+    if examples:
+      _WriteShard(os.path.join(output_dir, '%s.b%d' % (name, bucket)),
+                  examples)
+  return num_examples
+
+
+def ConvertFiles(input_paths, vocab_path, output_dir, boundaries, article_key,
+                 abstract_key, max_article_sentences, max_abstract_sentences,
+                 num_processes=None):
+  """Converts tf.Example data files to shards in parallel processes.
+
+  Args:
+    input_paths: list of tf.Example data files.
+    vocab_path: text vocabulary file.
+    output_dir: directory for the shards.
+    boundaries: sorted upper bounds of the article lengths of the buckets.
+    article_key: tf.Example feature key for article.
+    abstract_key: tf.Example feature key for abstract.
+    max_article_sentences: Max number of sentences used from article.
+    max_abstract_sentences: Max number of sentences used from abstract.
+    num_processes: Number of processes, defaults to the number of CPUs.
+  Returns:
+    The number of examples converted.
+  """
+  if not os.path.exists(output_dir):
+    os.makedirs(output_dir)
+  pool = multiprocessing.Pool(num_processes or None,
+                              initializer=_InitWorker,
+                              initargs=(vocab_path,))
+  try:
+    num_examples = 0
+    for input_path, count in zip(input_paths, pool.imap(
+        _ConvertFile,
+        [(path, output_dir, boundaries, article_key, abstract_key,
+          max_article_sentences, max_abstract_sentences)
+         for path in input_paths])):
+      tf.logging.info('Converted %d examples of %s', count, input_path)
+      num_examples += count
+  finally:
+    pool.close()
+    pool.join()
+  return num_examples
+
+
+def main(unused_argv):
+  boundaries = [int(b) for b in FLAGS.bucket_boundaries.split(',')]
+  input_paths = sorted(glob.glob(FLAGS.data_path))
+  assert input_paths, 'Empty filelist.'
+  num_examples = ConvertFiles(
+      input_paths, FLAGS.vocab_path, FLAGS.output_dir, boundaries,
+      FLAGS.article_key, FLAGS.abstract_key, FLAGS.max_article_sentences,
+      FLAGS.max_abstract_sentences, FLAGS.num_processes)
+  tf.logging.info('Converted %d examples to %s', num_examples,
+                  FLAGS.output_dir)
+
+
+if __name__ == '__main__':
+  tf.logging.set_verbosity(tf.logging.INFO)
+  tf.app.run()
@@ -33,6 +33,9 @@ import seq2seq_attention_model
 FLAGS = tf.app.flags.FLAGS
 tf.app.flags.DEFINE_string('data_path',
                            '', 'Path expression to tf.Example.')
+tf.app.flags.DEFINE_bool('preprocessed_data', False,
+                         'Whether data_path is a directory of shards written '
+                         'by preprocess_data.py instead of tf.Examples.')
 tf.app.flags.DEFINE_string('vocab_path',
                            '', 'Path expression to text vocabulary file.')
 tf.app.flags.DEFINE_string('article_key', 'article',
@@ -54,6 +57,11 @@ tf.app.flags.DEFINE_integer('max_abstract_sentences', 100,
                             'abstract')
 tf.app.flags.DEFINE_integer('beam_size', 4,
                             'beam size for beam search decoding.')
+tf.app.flags.DEFINE_integer('decode_articles_per_batch', 0,
+                            'If positive, number of articles decoded at once '
+                            'by the batched beam search, whose model batch '
+                            'holds beam_size hypotheses per article. If 0, '
+                            'articles are decoded one at a time.')
 tf.app.flags.DEFINE_integer('eval_interval_secs', 60, 'How often to run eval.')
 tf.app.flags.DEFINE_integer('checkpoint_secs', 60, 'How often to checkpoint.')
 tf.app.flags.DEFINE_bool('use_bucketing', False,
@@ -167,7 +175,7 @@ def main(unused_argv):
 
   batch_size = 4
   if FLAGS.mode == 'decode':
-    batch_size = FLAGS.beam_size
+    batch_size = FLAGS.decode_articles_per_batch or FLAGS.beam_size
 
   hps = seq2seq_attention_model.HParams(
       mode=FLAGS.mode,  # train, eval, decode
@@ -183,11 +191,16 @@ def main(unused_argv):
       max_grad_norm=2,
       num_softmax_samples=4096)  # If 0, no sampled softmax.
 
-  batcher = batch_reader.Batcher(
-      FLAGS.data_path, vocab, hps, FLAGS.article_key,
-      FLAGS.abstract_key, FLAGS.max_article_sentences,
-      FLAGS.max_abstract_sentences, bucketing=FLAGS.use_bucketing,
-      truncate_input=FLAGS.truncate_input)
+  if FLAGS.preprocessed_data:
+    batcher = batch_reader.ShardBatcher(
+        FLAGS.data_path, vocab, hps, bucketing=FLAGS.use_bucketing,
+        truncate_input=FLAGS.truncate_input)
+  else:
+    batcher = batch_reader.Batcher(
+        FLAGS.data_path, vocab, hps, FLAGS.article_key,
+        FLAGS.abstract_key, FLAGS.max_article_sentences,
+        FLAGS.max_abstract_sentences, bucketing=FLAGS.use_bucketing,
+        truncate_input=FLAGS.truncate_input)
   tf.set_random_seed(FLAGS.random_seed)
 
   if hps.mode == 'train':
@@ -203,8 +216,13 @@ def main(unused_argv):
     # Only need to restore the 1st step and reuse it since
     # we keep and feed in state for each step's output.
     decode_mdl_hps = hps._replace(dec_timesteps=1)
+    if FLAGS.decode_articles_per_batch:
+      # The batched beam search feeds all the hypotheses of all the articles.
+      decode_mdl_hps = decode_mdl_hps._replace(
+          batch_size=FLAGS.decode_articles_per_batch * FLAGS.beam_size)
     model = seq2seq_attention_model.Seq2SeqAttentionModel(
-        decode_mdl_hps, vocab, num_gpus=FLAGS.num_gpus)
+        decode_mdl_hps, vocab, num_gpus=FLAGS.num_gpus,
+        beam_size=FLAGS.beam_size)
     decoder = seq2seq_attention_decode.BSDecoder(model, batcher, hps, vocab)
     decoder.DecodeLoop()
 
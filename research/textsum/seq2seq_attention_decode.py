@@ -127,6 +127,15 @@ class BSDecoder(object):
     for _ in xrange(FLAGS.decode_batches_per_ckpt):
       (article_batch, _, _, article_lens, _, _, origin_articles,
        origin_abstracts) = self._batch_reader.NextBatch()
+      start_time = time.time()
+      if FLAGS.decode_articles_per_batch:
+        self._DecodeArticles(sess, article_batch, article_lens,
+                             origin_articles, origin_abstracts)
+        tf.logging.info('decoded %d articles, %.2f articles/sec',
+                        self._hps.batch_size,
+                        self._hps.batch_size / (time.time() - start_time))
+        continue
+
       for i in xrange(self._hps.batch_size):
         bs = beam_search.BeamSearch(
             self._model, self._hps.batch_size,
@@ -142,8 +151,33 @@ class BSDecoder(object):
         decode_output = [int(t) for t in best_beam.tokens[1:]]
         self._DecodeBatch(
             origin_articles[i], origin_abstracts[i], decode_output)
+      tf.logging.info('decoded %d articles, %.2f articles/sec',
+                      self._hps.batch_size,
+                      self._hps.batch_size / (time.time() - start_time))
     return True
 
+  def _DecodeArticles(self, sess, article_batch, article_lens,
+                      origin_articles, origin_abstracts):
+    """Decodes all the articles of a batch with a single beam search.
+
+    Args:
+      sess: Tensorflow session.
+      article_batch: The encoder inputs of the articles.
+      article_lens: The lengths of the articles.
+      origin_articles: The original article strings.
+      origin_abstracts: The human (correct) abstract strings.
+    """
+    bs = beam_search.BatchedBeamSearch(
+        self._model, FLAGS.beam_size,
+        self._vocab.WordToId(data.SENTENCE_START),
+        self._vocab.WordToId(data.SENTENCE_END),
+        self._hps.dec_timesteps)
+    best_beams = bs.BeamSearch(sess, article_batch, article_lens)
+    for i in xrange(self._hps.batch_size):
+      decode_output = [int(t) for t in best_beams[i][0].tokens[1:]]
+      self._DecodeBatch(
+          origin_articles[i], origin_abstracts[i], decode_output)
+
   def _DecodeBatch(self, article, abstract, output_ids):
     """Convert id to words and writing results.
 
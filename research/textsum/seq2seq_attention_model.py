@@ -61,11 +61,22 @@ def _extract_argmax_and_embed(embedding, output_projection=None,
 class Seq2SeqAttentionModel(object):
   """Wrapper for Tensorflow model graph for text sum vectors."""
 
-  def __init__(self, hps, vocab, num_gpus=0):
+  def __init__(self, hps, vocab, num_gpus=0, beam_size=None):
+    """Model constructor.
+
+    Args:
+      hps: HParams.
+      vocab: Vocabulary.
+      num_gpus: Number of gpus used.
+      beam_size: In decode mode, decode_topk returns the 2 * beam_size best
+        tokens of each hypothesis. Defaults to hps.batch_size, i.e. a batch
+        holding the hypotheses of a single article.
+    """
     self._hps = hps
     self._vocab = vocab
     self._num_gpus = num_gpus
     self._cur_gpu = 0
+    self._beam_size = beam_size or hps.batch_size
 
   def run_train_step(self, sess, article_batch, abstract_batch, targets,
                      article_lens, abstract_lens, loss_weights):
@@ -221,7 +232,7 @@ class Seq2SeqAttentionModel(object):
               axis=1, values=[tf.reshape(x, [hps.batch_size, 1]) for x in best_outputs])
 
           self._topk_log_probs, self._topk_ids = tf.nn.top_k(
-              tf.log(tf.nn.softmax(model_outputs[-1])), hps.batch_size*2)
+              tf.log(tf.nn.softmax(model_outputs[-1])), self._beam_size*2)
 
       with tf.variable_scope('loss'), tf.device(self._next_device()):
         def sampled_loss_func(inputs, labels):
@@ -273,6 +284,24 @@ class Seq2SeqAttentionModel(object):
                                   self._article_lens: enc_len})
     return results[0], results[1][0]
 
+  def encode_top_states(self, sess, enc_inputs, enc_len):
+    """Return the top states from encoder and the decoder states of a batch.
+
+    Unlike encode_top_state, which returns the decoder state of the first
+    article only, returns the decoder initial states of all the articles.
+
+    Args:
+      sess: tensorflow session.
+      enc_inputs: encoder inputs of shape [batch_size, enc_timesteps].
+      enc_len: encoder input length of shape [batch_size]
+    Returns:
+      enc_top_states: The top level encoder states.
+      dec_in_states: The decoder layer initial states, [batch_size, ...].
+    """
+    return sess.run([self._enc_top_states, self._dec_in_state],
+                    feed_dict={self._articles: enc_inputs,
+                               self._article_lens: enc_len})
+
   def decode_topk(self, sess, latest_tokens, enc_top_states, dec_init_states):
     """Return the topK results and new decoder states."""
     feed = {